@@ -228,6 +228,20 @@ class AdminLoopDashboard:
         self.history_tree.pack(side="left", fill="both", expand=True)
         history_scrollbar.pack(side="right", fill="y")
         
+        # Offender details (loaded on demand for the selected detection)
+        offenders_frame = tb.LabelFrame(history_frame, text="Offenders (select a detection)",
+                                      bootstyle="info", padding=5)
+        offenders_frame.pack(fill='x', pady=(10, 0))
+        
+        offender_columns = ("MAC", "Severity", "Reason", "Interface")
+        self.offenders_tree = ttk.Treeview(offenders_frame, columns=offender_columns, show="headings", height=5)
+        for col in offender_columns:
+            self.offenders_tree.heading(col, text=col)
+            self.offenders_tree.column(col, width=160 if col != "Reason" else 320, anchor="center")
+        self.offenders_tree.pack(fill='x')
+        
+        self.history_tree.bind("<<TreeviewSelect>>", self._on_history_select)
+        
     def _build_config_tab(self):
         """Build the configuration tab."""
         config_frame = tb.Frame(self.notebook)
@@ -306,7 +320,7 @@ class AdminLoopDashboard:
         charts_frame.pack(fill='both', expand=True, pady=(10, 0))
         
         # Create matplotlib figure
-        self.fig, (self.ax1, self.ax2) = plt.subplots(2, 1, figsize=(12, 8))
+        self.fig, (self.ax1, self.ax2, self.ax3) = plt.subplots(3, 1, figsize=(12, 10))
         self.canvas = FigureCanvasTkAgg(self.fig, charts_frame)
         self.canvas.get_tk_widget().pack(fill='both', expand=True)
         
@@ -526,7 +540,11 @@ Duration: {latest.get('detection_duration', 0)} seconds"""
                         'loop_detected': '⚠️ Loop'
                     }.get(status, f'❓ {status}')
                     
-                    self.history_tree.insert("", "end", values=(
+                    run_count = record.get('run_count', 1) or 1
+                    if run_count > 1:
+                        status_emoji = f"{status_emoji} ×{run_count}"
+                    
+                    self.history_tree.insert("", "end", iid=str(record.get('id')), values=(
                         formatted_time,
                         status_emoji,
                         record.get('total_packets', 0),
@@ -539,6 +557,38 @@ Duration: {latest.get('detection_duration', 0)} seconds"""
         except Exception as e:
             messagebox.showerror("Error", f"Failed to refresh history: {str(e)}")
             
+    def _on_history_select(self, event=None):
+        """Fetch offender details for the selected detection in the background."""
+        selection = self.history_tree.selection()
+        if not selection:
+            return
+        detection_id = selection[0]
+        
+        for item in self.offenders_tree.get_children():
+            self.offenders_tree.delete(item)
+        
+        def fetch():
+            try:
+                response = requests.get(f"{self.api_base_url}/api/loop-detection/{detection_id}/offenders", timeout=10)
+                offenders = response.json() if response.status_code == 200 else []
+            except Exception:
+                offenders = []
+            self.root.after(0, lambda: self._show_offenders(offenders))
+        
+        threading.Thread(target=fetch, daemon=True).start()
+        
+    def _show_offenders(self, offenders):
+        """Fill the offender details table."""
+        for item in self.offenders_tree.get_children():
+            self.offenders_tree.delete(item)
+        for offender in offenders:
+            self.offenders_tree.insert("", "end", values=(
+                offender.get('mac', ''),
+                f"{offender.get('severity') or 0:.2f}",
+                offender.get('reason') or '-',
+                offender.get('network_interface') or '-'
+            ))
+            
     def export_history(self):
         """Export history to CSV."""
         try:
@@ -576,10 +626,13 @@ Duration: {latest.get('detection_duration', 0)} seconds"""
                 # Clear previous plots
                 self.ax1.clear()
                 self.ax2.clear()
+                self.ax3.clear()
                 
-                # Plot 1: Detection frequency over time
+                # Plot 1: Detection frequency over time (compacted clean rows count run_count times)
                 df['date'] = df['detection_time'].dt.date
-                daily_counts = df.groupby('date').size()
+                if 'run_count' not in df:
+                    df['run_count'] = 1
+                daily_counts = df.groupby('date')['run_count'].sum()
                 self.ax1.plot(daily_counts.index, daily_counts.values, marker='o')
                 self.ax1.set_title('Detection Frequency Over Time')
                 self.ax1.set_xlabel('Date')
@@ -587,10 +640,21 @@ Duration: {latest.get('detection_duration', 0)} seconds"""
                 self.ax1.tick_params(axis='x', rotation=45)
                 
                 # Plot 2: Status distribution
-                status_counts = df['status'].value_counts()
+                status_counts = df.groupby('status')['run_count'].sum()
                 self.ax2.pie(status_counts.values, labels=status_counts.index, autopct='%1.1f%%')
                 self.ax2.set_title('Detection Status Distribution')
                 
+                # Plot 3: Most frequent offender MACs (from the offenders table)
+                top_response = requests.get(
+                    f"{self.api_base_url}/api/loop-detection/offenders/top?days={days}&limit=10", timeout=10)
+                top = top_response.json() if top_response.status_code == 200 else []
+                if top:
+                    macs = [row['mac'] for row in reversed(top)]
+                    occurrences = [row['occurrences'] for row in reversed(top)]
+                    self.ax3.barh(macs, occurrences)
+                self.ax3.set_title('Top Offender MACs')
+                self.ax3.set_xlabel('Detections as Offender')
+                
                 # Refresh canvas
                 self.canvas.draw()
                 
@@ -0,0 +1,415 @@
+"""
+Streaming Anomaly Detection
+Flags unusual bandwidth and latency samples per router in O(1) per sample.
+
+Each (router, metric) series keeps an EWMA mean/variance for recent
+behaviour and an hour-of-week profile (mean, variance and seconds observed
+for each of the 168 hours) in one flat array, so memory and per-sample cost
+stay fixed however much history has been seen. A sample is scored against
+its hour-of-week bucket once that bucket has enough data, otherwise against
+the EWMA. Alerts need several anomalous samples in a row, fire once per
+episode, respect a per-series cooldown and an hourly budget, and go to
+NotificationManager.
+"""
+
+import base64
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from array import array
+
+HOURS_PER_WEEK = 168
+_BUCKET = 3  # mean, variance, seconds observed
+
+# metric -> (minimum stddev in the metric's unit, deviations flagged: "high", "low" or "both")
+DEFAULT_METRICS = {
+    "download_mbps": (1.0, "high"),
+    "upload_mbps": (0.5, "high"),
+    "latency_ms": (5.0, "high"),
+}
+
+METRIC_LABELS = {
+    "download_mbps": ("Download", "Mbps"),
+    "upload_mbps": ("Upload", "Mbps"),
+    "latency_ms": ("Latency", "ms"),
+}
+
+
+def _default_profile_file():
+    """anomaly_profiles.json next to the executable (frozen) or this module."""
+    if getattr(sys, 'frozen', False):
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, "anomaly_profiles.json")
+
+
+def hour_of_week(ts):
+    """0 (Monday 00:00-01:00, local time) to 167."""
+    local = time.localtime(ts)
+    return local.tm_wday * 24 + local.tm_hour
+
+
+class _Series:
+    """Learned state and alert state of one (router, metric) series."""
+
+    __slots__ = ("n", "ewma", "ewm_var", "last_ts", "season",
+                 "streak", "calm", "direction", "alerting", "last_alert", "last_score")
+
+    def __init__(self):
+        self.n = 0
+        self.ewma = 0.0
+        self.ewm_var = 0.0
+        self.last_ts = 0.0
+        self.season = array('d', bytes(8 * _BUCKET * HOURS_PER_WEEK))
+        self.streak = 0          # Consecutive anomalous samples
+        self.calm = 0            # Consecutive normal samples
+        self.direction = None
+        self.alerting = False    # Inside an episode that has already been handled
+        self.last_alert = 0.0
+        self.last_score = 0.0
+
+    def to_dict(self):
+        return {"n": self.n, "ewma": self.ewma, "ewm_var": self.ewm_var, "last_ts": self.last_ts,
+                "last_alert": self.last_alert,
+                "season": base64.b64encode(self.season.tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, data, byteorder):
+        series = cls()
+        series.n = int(data.get("n", 0))
+        series.ewma = float(data.get("ewma", 0.0))
+        series.ewm_var = float(data.get("ewm_var", 0.0))
+        series.last_ts = float(data.get("last_ts", 0.0))
+        series.last_alert = float(data.get("last_alert", 0.0))
+        season = array('d', base64.b64decode(data.get("season", "")))
+        if len(season) == len(series.season):
+            if byteorder != sys.byteorder:
+                season.byteswap()
+            series.season = season
+        return series
+
+
+class AnomalyDetector:
+    """
+    Per-router anomaly detector for bandwidth and latency samples.
+
+    Learning is time-weighted rather than per-sample, so callers sampling
+    every 5 seconds and every minute learn at the same pace.
+
+    Args:
+        metrics (dict): {metric: (min_stddev, "high" | "low" | "both")}, default DEFAULT_METRICS
+        threshold (float): Deviation, in standard deviations, that counts as anomalous
+        warmup (int): Samples a series needs before it can flag anything
+        persistence (int): Consecutive anomalous samples before an alert (and normal
+            samples before the episode is considered over)
+        cooldown (float): Minimum seconds between alerts for the same series
+        max_alerts_per_hour (int): Alerts allowed per hour across all series
+        ewma_window (float): Time constant of the recent-behaviour EWMA, in seconds
+        season_weeks (float): Weeks of history the hour-of-week profile remembers
+        season_min_seconds (float): Seconds of data an hour-of-week bucket needs before it is trusted
+        min_relative (float): Stddev floor as a fraction of the expected value
+        anomaly_weight (float): Learning weight of anomalous samples, so a lasting shift
+            becomes the new normal without one spike skewing the baseline
+        max_gap (float): Longest interval credited to one sample, in seconds
+        sink (callable): Called with each alert dict; default notify_alert
+        path (str): Checkpoint file (default: anomaly_profiles.json beside the app)
+        checkpoint_interval (float): Minimum seconds between automatic checkpoints
+    """
+
+    def __init__(self, metrics=None, threshold=4.0, warmup=20, persistence=3, cooldown=1800.0,
+                 max_alerts_per_hour=30, ewma_window=900.0, season_weeks=4, season_min_seconds=1200.0,
+                 min_relative=0.1, anomaly_weight=0.1, max_gap=600.0, sink=None, path=None,
+                 checkpoint_interval=300.0):
+        self.metrics = dict(metrics or DEFAULT_METRICS)
+        self.threshold = threshold
+        self.warmup = warmup
+        self.persistence = max(1, int(persistence))
+        self.cooldown = cooldown
+        self.max_alerts_per_hour = max_alerts_per_hour
+        self.ewma_window = ewma_window
+        # Each bucket sees one hour of data per week
+        self.season_window = season_weeks * 3600.0
+        self.season_min_seconds = season_min_seconds
+        self.min_relative = min_relative
+        self.anomaly_weight = anomaly_weight
+        self.max_gap = max_gap
+        self.sink = sink if sink is not None else notify_alert
+        self.path = path or _default_profile_file()
+        self.checkpoint_interval = checkpoint_interval
+        self._series = {}  # (key, metric) -> _Series
+        self._lock = threading.Lock()
+        self._budget_start = 0.0
+        self._budget_used = 0
+        self._last_checkpoint = time.time()
+        self._dirty = False
+        self.stats = {
+            "samples": 0,
+            "anomalous_samples": 0,
+            "alerts": 0,
+            "suppressed": 0,
+            "sink_errors": 0
+        }
+
+    def observe(self, key, values, ts=None, name=None):
+        """
+        Score and learn one sample of each metric for a router.
+
+        Args:
+            key: Router identifier (database id or IP)
+            values (dict): {metric: value}; unknown metrics and None values are skipped
+            ts (float): Sample time (default: now)
+            name (str): Router name for notifications
+
+        Returns:
+            list: Alerts raised by this sample (usually empty)
+        """
+        ts = time.time() if ts is None else float(ts)
+        hour = hour_of_week(ts)
+        key = str(key)
+        alerts = []
+        with self._lock:
+            self.stats["samples"] += 1
+            for metric, value in values.items():
+                config = self.metrics.get(metric)
+                if config is None or value is None:
+                    continue
+                series = self._series.get((key, metric))
+                if series is None:
+                    series = self._series[(key, metric)] = _Series()
+                alert = self._update(series, float(value), ts, hour, config)
+                if alert is not None:
+                    alert.update({"key": key, "name": name or key, "metric": metric})
+                    alerts.append(alert)
+            self._dirty = True
+
+        for alert in alerts:
+            try:
+                self.sink(alert)
+            except Exception as e:
+                self.stats["sink_errors"] += 1
+                logging.error(f"Anomaly notification failed for {alert['name']}: {e}")
+        self.checkpoint()
+        return alerts
+
+    def _expected(self, series, hour, min_stddev):
+        """(expected value, stddev, seasonal?) for a sample in this hour of the week."""
+        season = series.season
+        base = hour * _BUCKET
+        if season[base + 2] >= self.season_min_seconds:
+            # Recent variance counts too, so a noisy day is not scored against a quiet profile
+            expected, var, seasonal = season[base], max(season[base + 1], series.ewm_var), True
+        else:
+            expected, var, seasonal = series.ewma, series.ewm_var, False
+        stddev = max(math.sqrt(var), min_stddev, self.min_relative * abs(expected))
+        return expected, stddev, seasonal
+
+    def _update(self, series, value, ts, hour, config):
+        if series.n == 0:
+            series.n = 1
+            series.ewma = value
+            series.last_ts = ts
+            return None
+        elapsed = ts - series.last_ts
+        if elapsed <= 0:
+            return None  # Duplicate or out-of-order sample
+        min_stddev, flagged = config
+
+        expected, stddev, seasonal = self._expected(series, hour, min_stddev)
+        score = (value - expected) / stddev
+        series.last_score = score
+        direction = "high" if score >= self.threshold else "low" if score <= -self.threshold else None
+        if direction is not None and flagged != "both" and direction != flagged:
+            direction = None
+        anomalous = direction is not None and series.n >= self.warmup
+
+        if anomalous:
+            series.streak = series.streak + 1 if direction == series.direction else 1
+            series.direction = direction
+            series.calm = 0
+            self.stats["anomalous_samples"] += 1
+        else:
+            series.calm += 1
+            if series.calm >= self.persistence:
+                series.streak = 0
+                series.direction = None
+                series.alerting = False
+
+        # Learn (time-weighted). Anomalies only nudge the baselines, and are clipped to the
+        # threshold so one spike cannot inflate the variance enough to hide the next
+        weight = min(elapsed, self.max_gap)
+        learned = value
+        if anomalous:
+            weight *= self.anomaly_weight
+            learned = expected + math.copysign(self.threshold * stddev, score)
+        alpha = 1.0 - math.exp(-weight / self.ewma_window)
+        diff = learned - series.ewma
+        incr = alpha * diff
+        series.ewma += incr
+        series.ewm_var = (1 - alpha) * (series.ewm_var + diff * incr)
+
+        season = series.season
+        base = hour * _BUCKET
+        seen = season[base + 2]
+        if not seasonal:
+            # The bucket did not score this sample, so it learns it as is
+            weight, learned = min(elapsed, self.max_gap), value
+        # Plain time-weighted mean while the bucket is young, then exponential forgetting
+        alpha = max(weight / (seen + weight), 1.0 - math.exp(-weight / self.season_window))
+        diff = learned - season[base]
+        incr = alpha * diff
+        season[base] += incr
+        season[base + 1] = (1 - alpha) * (season[base + 1] + diff * incr)
+        season[base + 2] = seen + weight
+
+        series.n += 1
+        series.last_ts = ts
+
+        if not anomalous or series.streak < self.persistence or series.alerting:
+            return None
+        series.alerting = True
+        if (series.last_alert and ts - series.last_alert < self.cooldown) or not self._take_budget(ts):
+            self.stats["suppressed"] += 1
+            return None
+        series.last_alert = ts
+        self.stats["alerts"] += 1
+        return {
+            "direction": direction,
+            "value": value,
+            "expected": expected,
+            "stddev": stddev,
+            "zscore": score,
+            "seasonal": seasonal,
+            "timestamp": ts
+        }
+
+    def _take_budget(self, ts):
+        if ts - self._budget_start >= 3600:
+            self._budget_start = ts
+            self._budget_used = 0
+        if self._budget_used >= self.max_alerts_per_hour:
+            return False
+        self._budget_used += 1
+        return True
+
+    def describe(self, key, ts=None):
+        """
+        Current baseline per metric for a router.
+
+        Returns:
+            dict: {metric: {"expected", "stddev", "seasonal", "last_score", "samples", "alerting"}}
+        """
+        hour = hour_of_week(time.time() if ts is None else ts)
+        key = str(key)
+        result = {}
+        with self._lock:
+            for metric, config in self.metrics.items():
+                series = self._series.get((key, metric))
+                if series is None:
+                    continue
+                expected, stddev, seasonal = self._expected(series, hour, config[0])
+                result[metric] = {
+                    "expected": round(expected, 3),
+                    "stddev": round(stddev, 3),
+                    "seasonal": seasonal,
+                    "last_score": round(series.last_score, 2),
+                    "samples": series.n,
+                    "alerting": series.alerting
+                }
+        return result
+
+    def forget(self, key):
+        """Drop everything learned for a router."""
+        key = str(key)
+        with self._lock:
+            for metric in self.metrics:
+                self._series.pop((key, metric), None)
+            self._dirty = True
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["series"] = len(self._series)
+        return stats
+
+    def to_dict(self):
+        with self._lock:
+            routers = {}
+            for (key, metric), series in self._series.items():
+                routers.setdefault(key, {})[metric] = series.to_dict()
+            return {"version": 1, "saved_at": time.time(), "byteorder": sys.byteorder, "routers": routers}
+
+    def load(self):
+        """Load the checkpoint file if present. Returns True if loaded."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            byteorder = data.get("byteorder", sys.byteorder)
+            loaded = {(key, metric): _Series.from_dict(state, byteorder)
+                      for key, metrics in data.get("routers", {}).items()
+                      for metric, state in metrics.items() if metric in self.metrics}
+        except Exception as e:
+            logging.warning(f"Could not load anomaly profiles from {self.path}: {e}")
+            return False
+        with self._lock:
+            self._series = loaded
+            self._dirty = False
+        logging.info(f"Loaded anomaly profiles: {len(loaded)} series")
+        return True
+
+    def save(self):
+        """Write the checkpoint atomically (temp file + rename)."""
+        data = self.to_dict()
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.warning(f"Could not save anomaly profiles to {self.path}: {e}")
+            return False
+        with self._lock:
+            self._dirty = False
+            self._last_checkpoint = time.time()
+        return True
+
+    def checkpoint(self, force=False):
+        """Save if there are changes and checkpoint_interval has passed (or force)."""
+        if not self._dirty:
+            return False
+        if not force and time.time() - self._last_checkpoint < self.checkpoint_interval:
+            return False
+        return self.save()
+
+
+def notify_alert(alert):
+    """Default sink: log the alert and raise a notification."""
+    label, unit = METRIC_LABELS.get(alert["metric"], (alert["metric"], ""))
+    logging.warning(
+        f"Anomaly on {alert['name']}: {label} {alert['value']:.2f} {unit} "
+        f"(expected {alert['expected']:.2f}, z={alert['zscore']:.1f})"
+    )
+    # Imported here: notification_utils pulls in tkinter and the database layer
+    from notification_utils import notify_anomaly
+    notify_anomaly(alert["name"], label, alert["value"], alert["expected"], unit,
+                   alert["zscore"], alert["direction"], alert["seasonal"])
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_anomaly_detector():
+    """Process-wide AnomalyDetector, loaded from disk on first use."""
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            _detector = AnomalyDetector()
+            _detector.load()
+        return _detector
@@ -0,0 +1,385 @@
+"""
+Multi-Subnet ARP Scanner
+Sweeps every router subnet in one pass instead of one srp() per router:
+requests for all subnets are interleaved on a shared layer-2 socket under a
+global packets-per-second budget, replies are collected by one sniffer and
+streamed to the caller as they arrive, and each subnet's reply wait is
+learned from the latency of its previous replies.
+"""
+
+import ipaddress
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from dns_resolver import get_resolver
+from oui_db import get_vendor
+
+
+def capture_filter_kwargs(expression, lfilter):
+    """
+    sniff()/AsyncSniffer keyword arguments for a capture filter.
+
+    Uses the BPF `expression` when scapy can compile it, else the Python
+    `lfilter` (no libpcap / Npcap filter support). AsyncSniffer only fails
+    on a bad filter inside its own thread, so this has to be decided up front.
+    """
+    try:
+        from scapy.arch.common import compile_filter
+        compile_filter(expression)
+        return {"filter": expression}
+    except Exception as e:
+        logging.debug(f"BPF filter {expression!r} unavailable ({e}); filtering in Python")
+        return {"lfilter": lfilter}
+
+
+class TokenBucket:
+    """
+    Blocking token bucket shared by all senders.
+
+    Args:
+        rate (float): Tokens (packets) per second
+        burst (int): Bucket size
+    """
+
+    def __init__(self, rate, burst=32):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.perf_counter()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SubnetScan:
+    """Progress of one subnet within a scan."""
+
+    def __init__(self, network, routers, iface, timeout):
+        self.network = network
+        self.routers = routers          # Routers whose subnet this is (first one owns the clients)
+        self.iface = iface
+        self.timeout = timeout          # Seconds to wait for replies after the last request
+        self.hosts = [str(h) for h in network.hosts()]
+        self.sent = 0
+        self.sent_at = {}               # ip -> perf_counter at send
+        self.last_sent_at = None
+        self.replies = {}               # mac -> result dict
+        self.latencies = []
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done_sending(self):
+        return self.sent >= len(self.hosts)
+
+    def summary(self):
+        owner = self.routers[0] if self.routers else {}
+        return {
+            "subnet": str(self.network),
+            "router_id": owner.get("id"),
+            "router_name": owner.get("name"),
+            "iface": self.iface,
+            "hosts": len(self.hosts),
+            "replies": len(self.replies),
+            "timeout": round(self.timeout, 3),
+            "avg_latency_ms": round(sum(self.latencies) / len(self.latencies) * 1000, 2) if self.latencies else None,
+            "duration": round((self.finished_at or time.perf_counter()) - self.started_at, 3) if self.started_at else None
+        }
+
+
+class MultiSubnetARPScanner:
+    """
+    Parallel ARP scanner for many router subnets.
+
+    - All subnets are swept concurrently: requests are interleaved
+      round-robin so every subnet makes progress, while a global token
+      bucket caps the total send rate at `max_pps`.
+    - A subnet is finished `timeout` seconds after its last request, where
+      timeout = clamp(latency_factor * p95 of its recent reply latencies,
+      min_timeout, max_timeout); subnets never seen before use default_timeout.
+    - Replies stream to on_result as they arrive; hostnames are resolved in
+      the background and filled into the final report.
+
+    Args:
+        max_pps (float): Global ARP request budget, packets per second
+        burst (int): Token bucket size
+        default_timeout (float): Reply wait for subnets without latency history
+        min_timeout (float): Lower bound for learned timeouts
+        max_timeout (float): Upper bound for learned timeouts
+        latency_factor (float): Multiplier applied to the p95 reply latency
+        history (int): Reply latencies remembered per subnet
+    """
+
+    def __init__(self, max_pps=1000, burst=32, default_timeout=2.0, min_timeout=0.3,
+                 max_timeout=3.0, latency_factor=3.0, history=256):
+        self.max_pps = max_pps
+        self.burst = burst
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.latency_factor = latency_factor
+        self.history = history
+
+        self._lock = threading.Lock()
+        self._latency_history = {}  # subnet str -> deque of reply latencies (seconds)
+        self._scan_lock = threading.Lock()  # One scan at a time shares the budget
+        self.last_report = None
+
+    # --- adaptive timeouts ---
+
+    def subnet_timeout(self, network):
+        """Reply wait for `network`, learned from its previous reply latencies."""
+        with self._lock:
+            samples = self._latency_history.get(str(network))
+            if not samples:
+                return self.default_timeout
+            ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return max(self.min_timeout, min(self.max_timeout, p95 * self.latency_factor))
+
+    def _learn(self, network, latencies):
+        if not latencies:
+            return  # No replies: keep the previous estimate rather than shrinking it
+        with self._lock:
+            samples = self._latency_history.setdefault(str(network), deque(maxlen=self.history))
+            samples.extend(latencies)
+
+    # --- planning ---
+
+    @staticmethod
+    def _route_iface(ip, fallback):
+        try:
+            from scapy.all import conf
+            iface = conf.route.route(ip)[0]
+            return getattr(iface, "name", iface) or fallback
+        except Exception:
+            return fallback
+
+    def plan(self, routers, iface=None, default_netmask="255.255.255.0"):
+        """
+        Group routers by subnet (each subnet is swept once).
+
+        Args:
+            routers: Router dicts with ip_address and optional netmask, id, name
+            iface: Interface override; by default the route to each router decides
+
+        Returns:
+            list: SubnetScan objects
+        """
+        by_network = {}
+        for router in routers:
+            ip = router.get("ip_address")
+            if not ip:
+                continue
+            try:
+                network = ipaddress.IPv4Network(f"{ip}/{router.get('netmask') or default_netmask}", strict=False)
+            except ValueError:
+                logging.warning(f"Skipping router with invalid address {ip!r}")
+                continue
+            if network.num_addresses > 4096:
+                logging.warning(f"Skipping {network}: larger than /20")
+                continue
+            if network not in by_network:
+                by_network[network] = SubnetScan(network, [], iface or self._route_iface(ip, None),
+                                                 self.subnet_timeout(network))
+            by_network[network].routers.append(router)
+        return list(by_network.values())
+
+    # --- scanning ---
+
+    def _interleaved(self, subnets):
+        """Yield (subnet, ip) round-robin across subnets."""
+        cursors = [(s, iter(s.hosts)) for s in subnets]
+        while cursors:
+            remaining = []
+            for subnet, hosts in cursors:
+                ip = next(hosts, None)
+                if ip is None:
+                    continue
+                yield subnet, ip
+                remaining.append((subnet, hosts))
+            cursors = remaining
+
+    def scan(self, routers, iface=None, on_result=None, on_subnet_done=None, dns_timeout=2.0,
+             max_pps=None):
+        """
+        Sweep all router subnets concurrently.
+
+        Args:
+            routers: Router dicts (id, name, ip_address[, netmask]); UniFi routers should be excluded
+            iface: Interface override (default: routed interface per subnet)
+            on_result: Callable(result) called from the capture thread as each reply arrives
+            on_subnet_done: Callable(summary) called when a subnet's reply window closes
+            dns_timeout (float): Max seconds to wait for hostnames after the sweep
+            max_pps (float): Send budget for this scan only (default: self.max_pps)
+
+        Returns:
+            dict: {"clients": {mac: result}, "subnets": [summary], "total_time": float,
+                   "packets_sent": int, "max_pps": float}
+        """
+        from scapy.all import ARP, Ether, AsyncSniffer, conf, get_if_hwaddr
+
+        max_pps = max_pps or self.max_pps
+        subnets = self.plan(routers, iface=iface)
+        report = {"clients": {}, "subnets": [], "total_time": 0.0, "packets_sent": 0, "max_pps": max_pps}
+        if not subnets:
+            return report
+
+        with self._scan_lock:
+            started = time.perf_counter()
+            by_ip = {}
+            for subnet in subnets:
+                for ip in subnet.hosts:
+                    by_ip.setdefault(ip, subnet)
+            results = report["clients"]
+            results_lock = threading.Lock()
+
+            def handle_reply(pkt):
+                try:
+                    if not pkt.haslayer(ARP) or pkt[ARP].op != 2:
+                        return
+                    ip = pkt[ARP].psrc
+                    subnet = by_ip.get(ip)
+                    if subnet is None:
+                        return
+                    received = time.perf_counter()
+                    mac = pkt[ARP].hwsrc.lower()
+                    with results_lock:
+                        sent_at = subnet.sent_at.get(ip)
+                        if sent_at is None or mac in subnet.replies:
+                            return  # Unsolicited or duplicate
+                        latency = received - sent_at
+                        owner = subnet.routers[0]
+                        result = {
+                            "ip": ip,
+                            "mac": mac,
+                            "vendor": get_vendor(mac),
+                            "hostname": get_resolver().resolve_later(ip),
+                            "latency_ms": round(latency * 1000, 2),
+                            "subnet": str(subnet.network),
+                            "router_id": owner.get("id"),
+                            "router_name": owner.get("name"),
+                            "last_seen": datetime.now()
+                        }
+                        subnet.replies[mac] = result
+                        subnet.latencies.append(latency)
+                        results[mac] = result
+                    if on_result is not None:
+                        on_result(result)
+                except Exception as e:
+                    logging.debug(f"ARP reply handling failed: {e}")
+
+            ifaces = sorted({s.iface for s in subnets if s.iface}) or None
+            capture_started = threading.Event()
+            sniffer = AsyncSniffer(iface=ifaces, prn=handle_reply, store=False,
+                                   started_callback=capture_started.set,
+                                   **capture_filter_kwargs("arp", lambda p: p.haslayer(ARP)))
+            sniffer.start()
+            capture_started.wait(2.0)
+
+            sockets = {}
+            hwaddrs = {}
+            bucket = TokenBucket(max_pps, self.burst)
+            pending = list(subnets)
+            try:
+                for subnet, ip in self._interleaved(subnets):
+                    sock = sockets.get(subnet.iface)
+                    if sock is None:
+                        sock = sockets[subnet.iface] = conf.L2socket(iface=subnet.iface or conf.iface)
+                        hwaddrs[subnet.iface] = get_if_hwaddr(subnet.iface or conf.iface)
+                    bucket.acquire()
+                    now = time.perf_counter()
+                    with results_lock:
+                        if subnet.started_at is None:
+                            subnet.started_at = now
+                        subnet.sent_at[ip] = now
+                        subnet.sent += 1
+                        if subnet.done_sending:
+                            subnet.last_sent_at = now
+                    sock.send(Ether(dst="ff:ff:ff:ff:ff:ff", src=hwaddrs[subnet.iface]) / ARP(pdst=ip))
+                    report["packets_sent"] += 1
+                    pending = self._close_finished(pending, now, on_subnet_done)
+
+                # Everything sent: wait out the remaining reply windows
+                while pending:
+                    now = time.perf_counter()
+                    pending = self._close_finished(pending, now, on_subnet_done)
+                    if pending:
+                        deadline = min(s.last_sent_at + s.timeout for s in pending)
+                        time.sleep(max(0.01, min(0.1, deadline - now)))
+            finally:
+                try:
+                    sniffer.stop()
+                except Exception:
+                    pass
+                for sock in sockets.values():
+                    try:
+                        sock.close()
+                    except Exception:
+                        pass
+
+            # Fill in hostnames (lookups were queued as replies arrived)
+            hostnames = get_resolver().resolve_many([r["ip"] for r in results.values()], timeout=dns_timeout)
+            for result in results.values():
+                result["hostname"] = hostnames.get(result["ip"], "Unknown")
+
+            for subnet in subnets:
+                self._learn(subnet.network, subnet.latencies)
+            report["subnets"] = [s.summary() for s in subnets]
+            report["total_time"] = round(time.perf_counter() - started, 3)
+            self.last_report = {k: v for k, v in report.items() if k != "clients"}
+            self.last_report["clients"] = len(results)
+
+        print(f"✅ ARP sweep of {len(subnets)} subnet(s): {len(results)} clients, "
+              f"{report['packets_sent']} requests in {report['total_time']:.1f}s")
+        return report
+
+    def _close_finished(self, pending, now, on_subnet_done):
+        still_pending = []
+        for subnet in pending:
+            if subnet.done_sending and (now - subnet.last_sent_at >= subnet.timeout
+                                        or len(subnet.replies) >= len(subnet.hosts)):
+                subnet.finished_at = now
+                if on_subnet_done is not None:
+                    try:
+                        on_subnet_done(subnet.summary())
+                    except Exception:
+                        pass
+            else:
+                still_pending.append(subnet)
+        return still_pending
+
+    def get_stats(self):
+        with self._lock:
+            subnets = list(self._latency_history)
+        return {
+            "max_pps": self.max_pps,
+            "learned_timeouts": {subnet: round(self.subnet_timeout(subnet), 3) for subnet in subnets},
+            "last_scan": self.last_report
+        }
+
+
+_scanner = None
+_scanner_lock = threading.Lock()
+
+
+def get_arp_scanner():
+    """Process-wide MultiSubnetARPScanner (keeps the learned per-subnet timeouts)."""
+    global _scanner
+    with _scanner_lock:
+        if _scanner is None:
+            _scanner = MultiSubnetARPScanner()
+        return _scanner
@@ -1,10 +1,16 @@
 # bandwidth_logger.py
+import heapq
+import math
+import random
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from network_utils import get_bandwidth
 from db import get_connection   # your existing DB helper
 
 LOG_INTERVAL = 300  # every 5 minutes
+MAX_CONCURRENT_MEASUREMENTS = 4  # get_bandwidth pings then sleeps through its sampling window
 
 def log_bandwidth(router_id, ip_address):
     """Run bandwidth test and insert result into bandwidth_logs table."""
@@ -50,22 +56,279 @@ def log_bandwidth(router_id, ip_address):
         print(f"[ERROR] Logging bandwidth for {router_id}: {e}")
 
 
-def start_bandwidth_logging(get_router_list_func):
+class BandwidthLogScheduler:
     """
-    Start a background thread that logs bandwidth for all routers every 5 minutes.
+    Spreads bandwidth measurements over the logging interval.
+
+    Each router gets a phase offset (routers sorted by id, evenly spaced
+    across the interval, plus a little random jitter) and is measured once
+    per interval at that offset, on a bounded worker pool. When the pool
+    falls behind, the start lag of every run is recorded; missed periods of
+    one router are merged into a single measurement, a router still being
+    measured is skipped, and a run that starts more than `max_lag` late is
+    skipped if the router already has a measurement from the last interval.
+
+    Args:
+        get_router_list_func: Function returning routers [{id, ip_address, brand}, ...]
+        interval (float): Seconds between measurements of one router
+        max_workers (int): Measurements running at the same time
+        jitter (float): Random delay per run, as a fraction of the slot spacing
+        max_lag (float): Seconds late after which a run may be skipped (default interval / 2)
+        refresh_interval (float): Seconds between router list refreshes (default interval)
+        measure: Callable(router_id, ip_address) doing one measurement
+        skip_router: Callable(router) -> True for routers measured elsewhere (e.g. by SNMP)
+    """
+
+    def __init__(self, get_router_list_func, interval=LOG_INTERVAL, max_workers=MAX_CONCURRENT_MEASUREMENTS,
+                 jitter=0.1, max_lag=None, refresh_interval=None, measure=None, skip_router=None):
+        self.get_router_list_func = get_router_list_func
+        self.interval = float(interval)
+        self.max_workers = max(1, int(max_workers))
+        self.jitter = jitter
+        self.max_lag = self.interval / 2 if max_lag is None else max_lag
+        self.refresh_interval = self.interval if refresh_interval is None else refresh_interval
+        self.measure = measure or log_bandwidth
+        self.skip_router = skip_router
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._slots = threading.Semaphore(self.max_workers)
+        self._executor = None
+        self._thread = None
+        self._anchor = None
+        self._schedule = {}  # router_id -> {"ip", "phase", "slot", "due", "last_started", "last_completed"}
+        self._heap = []      # (due, router_id); stale entries are skipped on pop
+        self._inflight = set()
+        self._lags = deque(maxlen=512)
+
+        self.stats = {
+            "routers": 0,
+            "runs": 0,
+            "completed": 0,
+            "failed": 0,
+            "merged_periods": 0,    # Missed periods folded into a later run
+            "skipped_inflight": 0,  # Previous measurement of the router still running
+            "skipped_late": 0,      # Started > max_lag late with a recent measurement
+            "lag_max": 0.0,
+            "last_lag": 0.0,
+            "duration_avg": 0.0
+        }
+
+    # --- schedule ---
+
+    def _next_occurrence(self, phase, not_before):
+        """
+        First anchor + phase + k * interval at or after `not_before`.
+        
+        A slot that fell due only moments ago (e.g. phase 0 when the first
+        refresh runs just after the anchor) still counts, instead of being
+        pushed a whole interval out.
+        """
+        base = self._anchor + phase
+        not_before -= min(1.0, self.interval / 10)
+        if base >= not_before:
+            return base
+        periods = math.ceil((not_before - base) / self.interval)
+        return base + periods * self.interval
+
+    def _set_due(self, router_id, entry, slot):
+        entry["slot"] = slot
+        spacing = self.interval / max(1, len(self._schedule))
+        entry["due"] = slot + random.uniform(0, self.jitter * spacing) if self.jitter else slot
+        heapq.heappush(self._heap, (entry["due"], router_id))
+
+    def _refresh(self, now):
+        try:
+            routers = self.get_router_list_func() or []
+        except Exception as e:
+            print(f"[ERROR] Bandwidth scheduler could not load routers: {e}")
+            return
+        wanted = {}
+        for r in routers:
+            # Skip UniFi routers here to avoid double-logging; they are logged via UniFi API fetch
+            try:
+                if str(r.get('brand', '')).lower() == 'unifi':
+                    continue
+            except Exception:
+                pass
+            if self.skip_router is not None and self.skip_router(r):
+                continue
+            if r.get('id') is not None and r.get('ip_address'):
+                wanted[r['id']] = r['ip_address']
+
+        with self._lock:
+            for router_id in list(self._schedule):
+                if router_id not in wanted:
+                    del self._schedule[router_id]
+            order = sorted(wanted, key=str)
+            spacing = self.interval / max(1, len(order))
+            for index, router_id in enumerate(order):
+                phase = index * spacing
+                entry = self._schedule.get(router_id)
+                if entry is None:
+                    entry = self._schedule[router_id] = {
+                        "ip": wanted[router_id], "phase": None, "slot": None, "due": None,
+                        "last_started": None, "last_completed": None
+                    }
+                entry["ip"] = wanted[router_id]
+                if entry["phase"] == phase:
+                    continue
+                # Fleet changed: move to the new phase without measuring twice in half an interval
+                entry["phase"] = phase
+                not_before = now
+                if entry["last_started"] is not None:
+                    not_before = max(now, entry["last_started"] + self.interval / 2)
+                self._set_due(router_id, entry, self._next_occurrence(phase, not_before))
+            self.stats["routers"] = len(self._schedule)
+        self._wake.set()
+
+    # --- dispatch ---
+
+    def _pop_due(self, now):
+        """Next router whose run is due, with its nominal slot (or None)."""
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due, router_id = heapq.heappop(self._heap)
+                entry = self._schedule.get(router_id)
+                if entry is None or entry["due"] != due:
+                    continue  # Removed or rescheduled
+                slot = entry["slot"]
+                # Missed periods collapse into this one run
+                missed = int((now - slot) // self.interval)
+                if missed > 0:
+                    self.stats["merged_periods"] += missed
+                self._set_due(router_id, entry, slot + (missed + 1) * self.interval)
+                return router_id, entry, slot
+            return None
+
+    def _dispatch(self, router_id, entry, slot, now):
+        lag = max(0.0, now - slot)
+        with self._lock:
+            self._lags.append(lag)
+            self.stats["last_lag"] = round(lag, 3)
+            self.stats["lag_max"] = max(self.stats["lag_max"], round(lag, 3))
+            if router_id in self._inflight:
+                self.stats["skipped_inflight"] += 1
+                return False
+            recent = entry["last_completed"] is not None and now - entry["last_completed"] < self.interval
+            if lag > self.max_lag and recent:
+                self.stats["skipped_late"] += 1
+                return False
+            self._inflight.add(router_id)
+            entry["last_started"] = now
+            self.stats["runs"] += 1
+        self._executor.submit(self._run_measurement, router_id, entry["ip"])
+        return True
+
+    def _run_measurement(self, router_id, ip_address):
+        started = time.monotonic()
+        ok = True
+        try:
+            self.measure(router_id, ip_address)
+        except Exception as e:
+            ok = False
+            print(f"[ERROR] Logging bandwidth for {router_id}: {e}")
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                self._inflight.discard(router_id)
+                entry = self._schedule.get(router_id)
+                if entry is not None:
+                    entry["last_completed"] = finished
+                self.stats["completed" if ok else "failed"] += 1
+                done = self.stats["completed"] + self.stats["failed"]
+                self.stats["duration_avg"] += ((finished - started) - self.stats["duration_avg"]) / done
+            self._slots.release()
+            self._wake.set()
+
+    def _loop(self):
+        next_refresh = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_refresh:
+                self._refresh(now)
+                next_refresh = now + self.refresh_interval
+            # Wait for a free worker first, so the start lag is measured honestly
+            if not self._slots.acquire(timeout=0.5):
+                continue
+            due = self._pop_due(time.monotonic())
+            if due is None:
+                self._slots.release()
+                with self._lock:
+                    next_due = self._heap[0][0] if self._heap else next_refresh
+                self._wake.clear()
+                self._wake.wait(max(0.0, min(next_due, next_refresh) - time.monotonic()))
+                continue
+            router_id, entry, slot = due
+            if not self._dispatch(router_id, entry, slot, time.monotonic()):
+                self._slots.release()
+
+    # --- control ---
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._anchor = time.monotonic()
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bandwidth-log")
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="bandwidth-log-scheduler")
+        self._thread.start()
+        return self
+
+    def stop(self, wait=False):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def get_stats(self):
+        """Counters plus the start-lag distribution of recent runs (seconds)."""
+        with self._lock:
+            stats = dict(self.stats)
+            lags = sorted(self._lags)
+            stats["inflight"] = len(self._inflight)
+            overdue = time.monotonic()
+            stats["overdue"] = sum(1 for e in self._schedule.values()
+                                   if e["due"] is not None and e["due"] <= overdue)
+        stats["interval"] = self.interval
+        stats["max_workers"] = self.max_workers
+        if lags:
+            stats["lag_avg"] = round(sum(lags) / len(lags), 3)
+            stats["lag_p95"] = round(lags[min(len(lags) - 1, int(len(lags) * 0.95))], 3)
+        else:
+            stats["lag_avg"] = stats["lag_p95"] = 0.0
+        stats["duration_avg"] = round(stats["duration_avg"], 3)
+        # Measurements one worker pool can fit into an interval vs. what the fleet needs
+        stats["capacity_per_interval"] = (round(self.max_workers * self.interval / stats["duration_avg"])
+                                          if stats["duration_avg"] else None)
+        return stats
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_bandwidth_scheduler():
+    """The scheduler started by start_bandwidth_logging, or None."""
+    return _scheduler
+
+
+def start_bandwidth_logging(get_router_list_func, interval=LOG_INTERVAL, max_workers=MAX_CONCURRENT_MEASUREMENTS,
+                            skip_router=None):
+    """
+    Start the background scheduler that logs bandwidth for all routers once per interval.
+    Routers are spread across the interval instead of being measured back to back.
     - get_router_list_func: function returning routers [{id, ip_address}, ...]
+    - skip_router: optional predicate for routers logged by another source (SNMP poller)
     """
-    def loop():
-        while True:
-            routers = get_router_list_func()
-            for r in routers:
-                # Skip UniFi routers here to avoid double-logging; they are logged via UniFi API fetch
-                try:
-                    if str(r.get('brand', '')).lower() == 'unifi':
-                        continue
-                except Exception:
-                    pass
-                log_bandwidth(r['id'], r['ip_address'])
-            time.sleep(LOG_INTERVAL)
-
-    threading.Thread(target=loop, daemon=True).start()
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BandwidthLogScheduler(get_router_list_func, interval=interval,
+                                               max_workers=max_workers, skip_router=skip_router).start()
+        return _scheduler
@@ -1,15 +1,102 @@
 """
 Bandwidth Tracker Module
 Handles cumulative bandwidth tracking for UniFi devices with delta calculations.
+
+A poll cycle is persisted with record_poll_cycle(): every device's snapshot,
+the routers.total_* increments and the per-router last-snapshot row are
+written with executemany in one transaction, and start-up reads the
+last-snapshot rows instead of searching bandwidth_snapshots history.
 """
 
 from datetime import datetime
-from typing import Dict, Tuple, Optional
+from typing import Dict, Iterable, List, Tuple, Optional
 from db import get_connection, execute_with_error_handling
 import logging
 
 logger = logging.getLogger(__name__)
 
+_LAST_SNAPSHOT_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS bandwidth_last_snapshot (
+        router_id INT NOT NULL PRIMARY KEY,
+        rx_bytes_total BIGINT UNSIGNED NOT NULL,
+        tx_bytes_total BIGINT UNSIGNED NOT NULL,
+        timestamp DATETIME NOT NULL,
+        FOREIGN KEY (router_id) REFERENCES routers(id) ON DELETE CASCADE
+    ) COMMENT 'Latest counter values per router (one row each)'
+"""
+
+_SNAPSHOT_INSERT_SQL = """
+    INSERT INTO bandwidth_snapshots
+    (router_id, rx_bytes_total, tx_bytes_total, rx_bytes_diff, tx_bytes_diff, timestamp)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+_ROUTER_TOTALS_SQL = """
+    UPDATE routers
+    SET
+        total_rx_bytes = COALESCE(total_rx_bytes, 0) + %s,
+        total_tx_bytes = COALESCE(total_tx_bytes, 0) + %s,
+        last_bandwidth_update = %s
+    WHERE id = %s
+"""
+
+_LAST_SNAPSHOT_UPSERT_SQL = """
+    INSERT INTO bandwidth_last_snapshot (router_id, rx_bytes_total, tx_bytes_total, timestamp)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        rx_bytes_total = VALUES(rx_bytes_total),
+        tx_bytes_total = VALUES(tx_bytes_total),
+        timestamp = VALUES(timestamp)
+"""
+
+# Used once to backfill bandwidth_last_snapshot from existing history
+_LEGACY_LATEST_SQL = """
+    SELECT router_id, rx_bytes_total, tx_bytes_total, timestamp
+    FROM bandwidth_snapshots
+    WHERE (router_id, timestamp) IN (
+        SELECT router_id, MAX(timestamp)
+        FROM bandwidth_snapshots
+        GROUP BY router_id
+    )
+"""
+
+
+def ensure_last_snapshot_table(cursor=None) -> bool:
+    """
+    Create bandwidth_last_snapshot and backfill it from bandwidth_snapshots.
+
+    The backfill runs the history scan a single time, when the table is
+    created; afterwards record_poll_cycle keeps each row current.
+    """
+    own = cursor is None
+    conn = None
+    try:
+        if own:
+            conn = get_connection()
+            cursor = conn.cursor()
+        cursor.execute("SHOW TABLES LIKE 'bandwidth_last_snapshot'")
+        exists = cursor.fetchone() is not None
+        if not exists:
+            cursor.execute(_LAST_SNAPSHOT_TABLE_SQL)
+            cursor.execute(f"""
+                INSERT IGNORE INTO bandwidth_last_snapshot
+                (router_id, rx_bytes_total, tx_bytes_total, timestamp)
+                {_LEGACY_LATEST_SQL}
+            """)
+            logger.info("📊 Created bandwidth_last_snapshot table")
+        if own:
+            conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Failed to ensure bandwidth_last_snapshot table: {e}")
+        return False
+    finally:
+        if own:
+            if cursor is not None:
+                cursor.close()
+            if conn is not None:
+                conn.close()
+
 
 class BandwidthTracker:
     """
@@ -17,10 +104,11 @@ class BandwidthTracker:
     Handles cumulative byte counters and computes deltas between checks.
     """
     
-    def __init__(self):
+    def __init__(self, load_from_db: bool = True):
         # In-memory cache: {router_id: {'rx_bytes': int, 'tx_bytes': int, 'timestamp': datetime}}
         self._cache = {}
-        self._initialized = False
+        # Trackers for other counter sources (e.g. SNMP) start empty instead of from UniFi snapshots
+        self._initialized = not load_from_db
     
     def initialize_from_db(self):
         """Load last known values from database into cache."""
@@ -28,18 +116,14 @@ class BandwidthTracker:
             return
         
         try:
+            ensure_last_snapshot_table()
             conn = get_connection()
             cursor = conn.cursor(dictionary=True)
             
-            # Get the most recent bandwidth snapshot for each router
+            # One maintained row per router; no scan of snapshot history
             cursor.execute("""
                 SELECT router_id, rx_bytes_total, tx_bytes_total, timestamp
-                FROM bandwidth_snapshots
-                WHERE (router_id, timestamp) IN (
-                    SELECT router_id, MAX(timestamp)
-                    FROM bandwidth_snapshots
-                    GROUP BY router_id
-                )
+                FROM bandwidth_last_snapshot
             """)
             
             rows = cursor.fetchall()
@@ -60,19 +144,59 @@ class BandwidthTracker:
             logger.error(f"Failed to initialize bandwidth tracker from database: {e}")
             self._initialized = True  # Mark as initialized anyway to avoid repeated failures
     
+    def _delta(self, router_id: int, current_rx: int, current_tx: int,
+               previous: Optional[Dict] = None, counter_max: Optional[int] = None,
+               uptime: Optional[int] = None) -> Tuple[int, int, bool]:
+        """Delta against `previous` (default: the cached counters), without updating the cache."""
+        if previous is None:
+            previous = self._cache.get(router_id)
+        if previous is None:
+            # First time seeing this router - no delta to compute
+            return (0, 0, False)
+        
+        # An uptime that went backwards is a reboot, whatever the counters say
+        rebooted = uptime is not None and previous.get('uptime') is not None and uptime < previous['uptime']
+        # A 64-bit counter does not wrap in practice (decades at 100 Gb/s), so any
+        # decrease there is a discontinuity: a reboot, "clear counters" or an interface reset
+        if not rebooted and counter_max and counter_max < (1 << 64):
+            # Narrower counters wrap; without an uptime, only a counter in its upper half may wrap
+            diffs = []
+            for current, prev in ((current_rx, previous['rx_bytes']), (current_tx, previous['tx_bytes'])):
+                if current >= prev:
+                    diffs.append(current - prev)
+                elif uptime is not None or prev >= counter_max // 2:
+                    diffs.append(current + counter_max - prev)
+                else:
+                    rebooted = True
+                    break
+            if not rebooted:
+                return (diffs[0], diffs[1], False)
+        
+        # Detect counter reset (router reboot)
+        if rebooted or current_rx < previous['rx_bytes'] or current_tx < previous['tx_bytes']:
+            logger.warning(f"🔄 Router {router_id} counter reset detected (reboot?)")
+            return (0, 0, True)
+        
+        return (current_rx - previous['rx_bytes'], current_tx - previous['tx_bytes'], False)
+    
     def compute_delta(
         self, 
         router_id: int, 
         current_rx: int, 
-        current_tx: int
+        current_tx: int,
+        counter_max: Optional[int] = None,
+        uptime: Optional[int] = None
     ) -> Tuple[int, int, bool]:
         """
         Compute bandwidth delta since last check.
         
         Args:
-            router_id: Router database ID
+            router_id: Router database ID (any hashable key, e.g. (router_id, ifIndex))
             current_rx: Current RX bytes counter
             current_tx: Current TX bytes counter
+            counter_max: Counter modulus (e.g. 2**32) if the counters wrap instead of only
+                resetting; a decrease of a 64-bit (or wider) counter is always a reset
+            uptime: Device uptime at this reading; a decrease means a reboot
         
         Returns:
             Tuple of (rx_diff, tx_diff, is_reset)
@@ -84,43 +208,108 @@ class BandwidthTracker:
         if not self._initialized:
             self.initialize_from_db()
         
-        # Get previous values from cache
-        previous = self._cache.get(router_id)
-        
-        if previous is None:
-            # First time seeing this router - no delta to compute
-            self._cache[router_id] = {
-                'rx_bytes': current_rx,
-                'tx_bytes': current_tx,
-                'timestamp': datetime.now()
-            }
-            return (0, 0, False)
-        
-        prev_rx = previous['rx_bytes']
-        prev_tx = previous['tx_bytes']
+        rx_diff, tx_diff, is_reset = self._delta(router_id, current_rx, current_tx,
+                                                 counter_max=counter_max, uptime=uptime)
         
-        # Detect counter reset (router reboot)
-        is_reset = (current_rx < prev_rx) or (current_tx < prev_tx)
-        
-        if is_reset:
-            # Counter was reset - treat as new baseline
-            logger.warning(f"🔄 Router {router_id} counter reset detected (reboot?)")
-            rx_diff = 0
-            tx_diff = 0
-        else:
-            # Normal case - compute delta
-            rx_diff = current_rx - prev_rx
-            tx_diff = current_tx - prev_tx
-        
-        # Update cache with current values
+        # Update cache with current values (a reset becomes the new baseline)
         self._cache[router_id] = {
             'rx_bytes': current_rx,
             'tx_bytes': current_tx,
-            'timestamp': datetime.now()
+            'timestamp': datetime.now(),
+            'uptime': uptime
         }
         
         return (rx_diff, tx_diff, is_reset)
     
+    def record_poll_cycle(
+        self,
+        samples: Iterable[Tuple[int, int, int]],
+        timestamp: Optional[datetime] = None
+    ) -> List[Dict]:
+        """
+        Compute deltas for every device of one poll and persist them together.
+        
+        Snapshots (for devices that moved), the routers.total_* increments and
+        the bandwidth_last_snapshot rows (for every device, so the baseline
+        survives a restart) are written with executemany and committed once.
+        The in-memory cache only advances after the commit, so a failed write
+        is folded into the next cycle's deltas instead of being lost.
+        
+        Args:
+            samples: (router_id, rx_bytes_total, tx_bytes_total) per device
+            timestamp: Cycle timestamp (defaults to now)
+        
+        Returns:
+            List of {'router_id', 'rx_bytes', 'tx_bytes', 'rx_diff', 'tx_diff', 'is_reset'}
+            per sample, or an empty list if the transaction failed
+        """
+        if not self._initialized:
+            self.initialize_from_db()
+        
+        # DATETIME columns have whole-second precision
+        now = (timestamp or datetime.now()).replace(microsecond=0)
+        results = {}
+        for router_id, current_rx, current_tx in samples:
+            # A device reported twice in one poll accumulates both deltas
+            pending = results.get(router_id)
+            previous = {'rx_bytes': pending['rx_bytes'], 'tx_bytes': pending['tx_bytes']} if pending else None
+            rx_diff, tx_diff, is_reset = self._delta(router_id, current_rx, current_tx, previous)
+            results[router_id] = {
+                'router_id': router_id,
+                'rx_bytes': current_rx,
+                'tx_bytes': current_tx,
+                'rx_diff': rx_diff + (pending['rx_diff'] if pending else 0),
+                'tx_diff': tx_diff + (pending['tx_diff'] if pending else 0),
+                'is_reset': is_reset or (pending['is_reset'] if pending else False)
+            }
+        if not results:
+            return []
+        
+        moved = [r for r in results.values() if r['rx_diff'] > 0 or r['tx_diff'] > 0]
+        snapshot_rows = [(r['router_id'], r['rx_bytes'], r['tx_bytes'], r['rx_diff'], r['tx_diff'], now)
+                         for r in moved]
+        totals_rows = [(r['rx_diff'], r['tx_diff'], now, r['router_id']) for r in moved]
+        last_rows = [(r['router_id'], r['rx_bytes'], r['tx_bytes'], now) for r in results.values()]
+        
+        conn = None
+        cursor = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            if snapshot_rows:
+                cursor.executemany(_SNAPSHOT_INSERT_SQL, snapshot_rows)
+                cursor.executemany(_ROUTER_TOTALS_SQL, totals_rows)
+            try:
+                cursor.executemany(_LAST_SNAPSHOT_UPSERT_SQL, last_rows)
+            except Exception as e:
+                if getattr(e, 'errno', None) != 1146:  # 1146 = table doesn't exist
+                    raise
+                # CREATE TABLE commits implicitly; the snapshot rows above go with it
+                ensure_last_snapshot_table(cursor)
+                cursor.executemany(_LAST_SNAPSHOT_UPSERT_SQL, last_rows)
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to record bandwidth poll cycle ({len(results)} device(s)): {e}")
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            return []
+        finally:
+            if cursor is not None:
+                cursor.close()
+            if conn is not None:
+                conn.close()
+        
+        for r in results.values():
+            self._cache[r['router_id']] = {
+                'rx_bytes': r['rx_bytes'],
+                'tx_bytes': r['tx_bytes'],
+                'timestamp': now
+            }
+        return list(results.values())
+    
     def save_snapshot(
         self,
         router_id: int,
@@ -0,0 +1,174 @@
+"""
+Microbenchmark for LoopDetectionEngine scoring.
+
+Compares the vectorized NumPy scoring (ring arrays + searchsorted bursts +
+batch severity) against the original per-MAC Python implementation, checks
+that both produce the same severity breakdowns (to float rounding), and reports timings.
+
+Usage:
+    python benchmark_loop_scoring.py                 # 10k MACs x 1k timestamps
+    python benchmark_loop_scoring.py --macs 2000 --timestamps 500
+"""
+
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+from network_utils import LoopDetectionEngine
+
+
+# --- Original (pre-vectorization) scoring, kept here as the reference ---
+
+def legacy_packet_frequency(times):
+    if len(times) < 2:
+        return 0
+    time_span = times[-1] - times[0]
+    if time_span == 0:
+        return 0
+    return len(times) / time_span
+
+
+def legacy_packet_bursts(times, burst_window=1.0, burst_threshold=20):
+    if len(times) < burst_threshold:
+        return 0
+    bursts = 0
+    times_list = list(times)
+    for i in range(len(times_list)):
+        window_end = times_list[i] + burst_window
+        count = sum(1 for t in times_list[i:] if t <= window_end)
+        if count >= burst_threshold:
+            bursts += 1
+    return bursts
+
+
+def legacy_entropy(fingerprints):
+    if not fingerprints:
+        return 0
+    total = sum(fingerprints.values())
+    entropy = 0
+    for count in fingerprints.values():
+        p = count / total
+        if p > 0:
+            entropy -= p * (p ** 0.5)
+    return entropy
+
+
+def legacy_severity(history, stats, timeout):
+    packet_times = list(history["packet_times"])
+    freq_score = min(legacy_packet_frequency(packet_times) / 10, 10)
+    burst_score = min(legacy_packet_bursts(packet_times) / 5, 10)
+    entropy_score = max(0, 10 - legacy_entropy(stats.get("fingerprints", {})) * 2)
+    subnet_score = min(len(history["subnets"]) * 3, 10)
+    packet_type_score = (
+        stats.get("arp_count", 0) * 2.5 + stats.get("stp_count", 0) * 5 +
+        stats.get("lldp_count", 0) * 4 + stats.get("cdp_count", 0) * 4 +
+        stats.get("dhcp_count", 0) * 0.5 + stats.get("mdns_count", 0) * 0.3 +
+        stats.get("nbns_count", 0) * 0.4 + stats.get("icmp_redirect_count", 0) * 3 +
+        stats.get("other_count", 0) * 1.5
+    ) / max(1, timeout)
+    ip_change_score = min(len(history["ip_changes"]) * 0.5, 5)
+    total = (
+        freq_score * 1.5 + burst_score * 2.0 + entropy_score * 1.2 +
+        subnet_score * 1.8 + packet_type_score * 1.0 + ip_change_score * 0.5
+    )
+    return {
+        "total": total,
+        "frequency": freq_score,
+        "bursts": burst_score,
+        "entropy": entropy_score,
+        "subnets": subnet_score,
+        "packet_types": packet_type_score,
+        "ip_changes": ip_change_score
+    }
+
+
+# --- Synthetic workload ---
+
+def build_engine(n_macs, n_timestamps, seed=7):
+    """Fill an engine with n_macs histories of up to n_timestamps each."""
+    rng = np.random.default_rng(seed)
+    pyrng = random.Random(seed)
+    engine = LoopDetectionEngine()
+    stats = {}
+    start = time.time()
+
+    for i in range(n_macs):
+        mac = "02:00:%02x:%02x:%02x:%02x" % ((i >> 24) & 0xff, (i >> 16) & 0xff, (i >> 8) & 0xff, i & 0xff)
+        # Mix of quiet hosts, normal talkers and storming MACs
+        count = int(rng.integers(1, n_timestamps + 1))
+        rate = float(rng.choice([2.0, 40.0, 800.0]))
+        times = start + np.cumsum(rng.exponential(1.0 / rate, size=count))
+        history = engine.mac_history[mac]
+        engine.mac_history.packet_store.extend(engine.mac_history.rows[mac], times)
+        for _ in range(pyrng.randint(0, 3)):
+            history["subnets"].add(f"10.{pyrng.randint(0, 3)}.0.0/24")
+        for _ in range(pyrng.randint(0, 4)):
+            history["ip_changes"].append((start, "10.0.0.1"))
+
+        stats[mac] = {
+            "count": count,
+            "arp_count": pyrng.randint(0, count),
+            "dhcp_count": pyrng.randint(0, 5),
+            "mdns_count": pyrng.randint(0, 5),
+            "nbns_count": pyrng.randint(0, 5),
+            "stp_count": pyrng.randint(0, 2),
+            "lldp_count": 0,
+            "cdp_count": 0,
+            "icmp_redirect_count": 0,
+            "other_count": pyrng.randint(0, 20),
+            "fingerprints": {f"sig{k}": pyrng.randint(1, 50) for k in range(pyrng.randint(0, 6))},
+        }
+    return engine, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LoopDetectionEngine scoring")
+    parser.add_argument("--macs", type=int, default=10000)
+    parser.add_argument("--timestamps", type=int, default=1000)
+    parser.add_argument("--legacy-sample", type=int, default=200,
+                        help="MACs scored with the quadratic reference (extrapolated)")
+    parser.add_argument("--timeout", type=float, default=10)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"LOOP SCORING BENCHMARK: {args.macs} MACs x {args.timestamps} timestamps")
+    print("=" * 60)
+
+    t0 = time.perf_counter()
+    engine, stats = build_engine(args.macs, args.timestamps)
+    print(f"  Workload built in {time.perf_counter() - t0:.2f}s")
+
+    t0 = time.perf_counter()
+    batch = engine._calculate_advanced_severity_batch(stats, args.timeout)
+    vector_time = time.perf_counter() - t0
+    print(f"  Vectorized batch severity: {vector_time:.3f}s "
+          f"({vector_time / args.macs * 1e6:.1f} us/MAC)")
+
+    sample = list(stats)[:min(args.legacy_sample, args.macs)]
+    t0 = time.perf_counter()
+    reference = {mac: legacy_severity(engine.mac_history[mac], stats[mac], args.timeout) for mac in sample}
+    legacy_time = time.perf_counter() - t0
+    per_mac = legacy_time / max(1, len(sample))
+    print(f"  Legacy per-MAC severity:   {legacy_time:.3f}s for {len(sample)} MACs "
+          f"(~{per_mac * args.macs:.1f}s extrapolated to {args.macs})")
+    print(f"  Speedup: ~{per_mac * args.macs / max(vector_time, 1e-9):.0f}x")
+
+    def same_scores(a, b):
+        # sqrt vs pow(p, 0.5) may differ in the last ulp of the entropy term
+        return a.keys() == b.keys() and all(math.isclose(a[k], b[k], rel_tol=1e-9, abs_tol=1e-12) for k in a)
+
+    mismatches = [mac for mac in sample if not same_scores(batch[mac], reference[mac])]
+    if mismatches:
+        mac = mismatches[0]
+        print(f"\n❌ {len(mismatches)} mismatched MACs, e.g. {mac}:")
+        print(f"   vectorized: {batch[mac]}")
+        print(f"   legacy:     {reference[mac]}")
+        raise SystemExit(1)
+    print(f"\n✅ Vectorized scores match the reference for {len(sample)} MACs")
+
+
+if __name__ == "__main__":
+    main()
@@ -185,9 +185,34 @@ def check_pyinstaller():
             print(f"❌ Failed to install PyInstaller: {e}")
             return False
 
+def compile_oui_database():
+    """Compile the OUI vendor registry into oui_vendors.bin (bundled by winyfi.spec)"""
+    print_step("STEP 6: Compiling OUI vendor database")
+    
+    try:
+        from oui_db import compile_oui_database as _compile, parse_ieee_csv, parse_manuf, default_manuf_text, DB_FILENAME
+        
+        # Prefer IEEE registry CSVs if they were downloaded next to the build script
+        ieee_files = [f for f in ('oui.csv', 'mam.csv', 'oui36.csv') if os.path.exists(f)]
+        if ieee_files:
+            entries = [entry for path in ieee_files for entry in parse_ieee_csv(path)]
+            source = ', '.join(ieee_files)
+        else:
+            entries = list(parse_manuf(default_manuf_text()))
+            source = "scapy bundled manuf data"
+        
+        counts = _compile(entries, DB_FILENAME)
+        print(f"✅ {DB_FILENAME} compiled from {source}")
+        print(f"   MA-L: {counts['ma_l']}  MA-M: {counts['ma_m']}  MA-S: {counts['ma_s']}  "
+              f"({counts['bytes'] / 1024:.0f} KB)")
+        return True
+    except Exception as e:
+        print(f"❌ Failed to compile OUI database: {e}")
+        return False
+
 def build_exe():
     """Build EXE using PyInstaller"""
-    print_step("STEP 6: Building EXE with PyInstaller")
+    print_step("STEP 7: Building EXE with PyInstaller")
     
     try:
         if os.path.exists('winyfi.spec'):
@@ -290,7 +315,7 @@ def build_exe():
 
 def create_installer():
     """Create installer using Inno Setup"""
-    print_step("STEP 7: Creating installer (optional)")
+    print_step("STEP 8: Creating installer (optional)")
     
     # Common Inno Setup locations
     inno_paths = [
@@ -373,12 +398,17 @@ def main():
         print("\n❌ Build aborted: PyInstaller not available")
         return
     
-    # Step 6: Build EXE
+    # Step 6: Compile OUI vendor database
+    if not compile_oui_database():
+        print("\n❌ Build aborted: OUI database compilation failed")
+        return
+    
+    # Step 7: Build EXE
     if not build_exe():
         print("\n❌ Build failed!")
         return
     
-    # Step 7: Create installer (optional)
+    # Step 8: Create installer (optional)
     create_installer()
     
     # Summary
@@ -0,0 +1,144 @@
+"""
+Client Snapshot Diffing
+Compares each discovery cycle with the previous in-memory snapshot and turns
+the set differences into CONNECT / DISCONNECT / IP_CHANGE events, so a cycle
+costs one batched write for what changed instead of a query per client.
+"""
+
+from datetime import datetime, timedelta
+
+
+class ClientSnapshotDiffer:
+    """
+    Previous-cycle view of which clients were online, and where.
+
+    - CONNECT:    MAC present now, absent from the previous snapshot
+    - IP_CHANGE:  MAC in both, with a different IP
+    - DISCONNECT: MAC absent now and not seen for `offline_after` seconds;
+      until then it is carried forward, so one missed ARP reply does not
+      produce a leave/join pair
+
+    Args:
+        offline_after (float): Grace period in seconds before a missing client
+            counts as gone (0 = gone as soon as a cycle misses it)
+    """
+
+    def __init__(self, offline_after=0.0):
+        self.offline_after = offline_after
+        self.seeded = False
+        self._snapshot = {}  # mac -> {"ip_address", "hostname", "vendor", "last_seen", "connected_at"}
+
+    def seed(self, rows):
+        """
+        Start from the clients the database currently lists as online, so the
+        first cycle after start-up does not re-announce everyone.
+
+        Args:
+            rows: network_clients rows (dicts) as returned by db.get_network_clients
+        """
+        self._snapshot = {}
+        for row in rows:
+            if not row.get("is_online"):
+                continue
+            last_seen = row.get("last_seen")
+            self._snapshot[row["mac_address"]] = {
+                "ip_address": row.get("ip_address"),
+                "hostname": row.get("hostname"),
+                "vendor": row.get("vendor"),
+                "last_seen": last_seen if isinstance(last_seen, datetime) else datetime.now(),
+                "connected_at": None
+            }
+        self.seeded = True
+
+    def diff(self, current, now=None):
+        """
+        Fold one discovery cycle into the snapshot.
+
+        Args:
+            current (dict): {mac: {"ip_address", "hostname", "vendor", "ping_latency"}}
+            now (datetime): Cycle timestamp
+
+        Returns:
+            list: Event dicts with log_connection_event's keyword arguments
+        """
+        now = now or datetime.now()
+        previous = self._snapshot
+        seen = current.keys()
+        events = []
+
+        for mac in sorted(seen - previous.keys()):
+            info = current[mac]
+            events.append(self._event(mac, "CONNECT", info))
+
+        for mac in sorted(seen & previous.keys()):
+            info = current[mac]
+            old_ip = previous[mac]["ip_address"]
+            if info.get("ip_address") and old_ip and info["ip_address"] != old_ip:
+                events.append(self._event(mac, "IP_CHANGE", info, previous_ip=old_ip))
+
+        cutoff = now - timedelta(seconds=self.offline_after)
+        snapshot = {}
+        for mac in sorted(previous.keys() - seen):
+            entry = previous[mac]
+            if entry["last_seen"] >= cutoff:
+                snapshot[mac] = entry
+                continue
+            session = None
+            if entry["connected_at"] is not None:
+                session = int((entry["last_seen"] - entry["connected_at"]).total_seconds())
+            events.append(self._event(mac, "DISCONNECT", entry, session_duration=session))
+
+        for mac, info in current.items():
+            old = previous.get(mac)
+            snapshot[mac] = {
+                "ip_address": info.get("ip_address") or (old["ip_address"] if old else None),
+                "hostname": info.get("hostname"),
+                "vendor": info.get("vendor"),
+                "last_seen": now,
+                "connected_at": old["connected_at"] if old else now
+            }
+
+        self._snapshot = snapshot
+        return events
+
+    @staticmethod
+    def _event(mac, event_type, info, previous_ip=None, session_duration=None):
+        return {
+            "mac_address": mac,
+            "event_type": event_type,
+            "ip_address": info.get("ip_address"),
+            "previous_ip": previous_ip,
+            "ping_latency": info.get("ping_latency"),
+            "hostname": info.get("hostname", "Unknown"),
+            "vendor": info.get("vendor", "Unknown"),
+            "session_duration": session_duration
+        }
+
+    def online_macs(self):
+        return set(self._snapshot)
+
+
+def sync_client_snapshot(differ, current, now=None):
+    """
+    Diff one discovery cycle and persist it in a single transaction:
+    upsert the clients seen, write the events, and mark everything not seen
+    within differ.offline_after as offline.
+
+    Args:
+        differ (ClientSnapshotDiffer): Snapshot to diff against (seeded by the caller)
+        current (dict): {mac: {"ip_address", "hostname", "vendor", "ping_latency",
+            optional "router_id", "router_name"}}
+        now (datetime): Cycle timestamp (also written as last_seen)
+
+    Returns:
+        list: The events written
+    """
+    from db import apply_client_snapshot
+
+    # network_clients.last_seen has whole-second precision
+    now = (now or datetime.now()).replace(microsecond=0)
+    events = differ.diff(current, now)
+    seen_rows = [dict(info, mac_address=mac) for mac, info in current.items()]
+    apply_client_snapshot(seen_rows, events, seen_at=now,
+                          offline_before=now - timedelta(seconds=differ.offline_after))
+    return events
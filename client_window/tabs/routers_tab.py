@@ -25,6 +25,8 @@ class RoutersTab:
         # Flags to prevent multiple modal openings
         self.client_modal_is_open = False
         self.loop_modal_is_open = False
+        # Previous client scan, diffed to derive connection events (created on first scan)
+        self.client_snapshot = None
         router_header_frame = tb.Frame(self.parent_frame)
         router_header_frame.pack(fill="x", padx=10, pady=(10, 0))
         tb.Label(router_header_frame, text="Routers",
@@ -1749,30 +1751,30 @@ class RoutersTab:
                 import os
                 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
                 from network_utils import scan_subnet, get_default_iface, ping_latency
-                from db import (save_network_client, create_network_clients_table, create_connection_history_table, 
-                              get_network_clients, update_client_offline_status, log_connection_event, get_connection_history)
+                from db import create_network_clients_table, create_connection_history_table, get_network_clients
+                from client_snapshot import ClientSnapshotDiffer, sync_client_snapshot
                 
                 # Create tables if they don't exist
                 create_network_clients_table()
                 create_connection_history_table()
                 
-                # Get existing clients from database
+                # Get existing clients from database (for the offline rows shown below)
                 existing_clients = get_network_clients(online_only=False, limit=1000)
                 existing_macs = {client['mac_address']: client for client in existing_clients}
                 
-                # Track previous online status
-                previous_online_status = {mac: client.get('is_online', False) for mac, client in existing_macs.items()}
-                
-                # Mark all existing clients as offline first
-                for client in existing_clients:
-                    update_client_offline_status(client['mac_address'])
+                # First scan diffs against what the database last saw online
+                if self.client_snapshot is None:
+                    self.client_snapshot = ClientSnapshotDiffer()
+                if not self.client_snapshot.seeded:
+                    self.client_snapshot.seed(existing_clients)
                 
                 iface = get_default_iface()
                 scanned_clients = scan_subnet(iface=iface, timeout=3)
                 
-                # Process and save clients
+                # Process clients
                 self.client_data = []
                 current_time = datetime.now()
+                current = {}
                 
                 for mac, info in scanned_clients.items():
                     # Get ping latency
@@ -1780,48 +1782,18 @@ class RoutersTab:
                     if info.get("ip"):
                         ping_lat = ping_latency(info["ip"], timeout=1000)
                     
-                    # Determine vendor (simplified)
+                    # Determine vendor (OUI lookup)
                     vendor = self.get_vendor_from_mac(mac)
                     
                     # Determine if client is online
                     is_online = bool(info.get("ip"))
                     
-                    # Check for connection state changes
-                    was_online = previous_online_status.get(mac, False)
-                    current_ip = info.get("ip")
-                    previous_ip = existing_macs.get(mac, {}).get('ip_address')
-                    
-                    # Log connection events
-                    if not was_online and is_online:
-                        # Device connected
-                        log_connection_event(
-                            mac_address=mac,
-                            event_type='CONNECT',
-                            ip_address=current_ip,
-                            ping_latency=ping_lat,
-                            hostname=info.get("hostname", "Unknown"),
-                            vendor=vendor
-                        )
-                    elif was_online and is_online and current_ip != previous_ip:
-                        # IP address changed
-                        log_connection_event(
-                            mac_address=mac,
-                            event_type='IP_CHANGE',
-                            ip_address=current_ip,
-                            previous_ip=previous_ip,
-                            ping_latency=ping_lat,
-                            hostname=info.get("hostname", "Unknown"),
-                            vendor=vendor
-                        )
-                    
-                    # Save to database
-                    save_network_client(
-                        mac_address=mac,
-                        ip_address=info.get("ip"),
-                        hostname=info.get("hostname", "Unknown"),
-                        vendor=vendor,
-                        ping_latency=ping_lat
-                    )
+                    current[mac] = {
+                        "ip_address": info.get("ip"),
+                        "hostname": info.get("hostname", "Unknown"),
+                        "vendor": vendor,
+                        "ping_latency": ping_lat
+                    }
                     
                     # Get first seen time from existing data or use current time
                     first_seen = existing_macs.get(mac, {}).get('first_seen', current_time)
@@ -1842,30 +1814,13 @@ class RoutersTab:
                     }
                     self.client_data.append(client_info)
                 
+                # One transaction: upsert seen clients, write CONNECT/IP_CHANGE/DISCONNECT
+                # events derived from the previous snapshot, bulk-mark the rest offline
+                sync_client_snapshot(self.client_snapshot, current, now=current_time)
+                
                 # Add offline clients that weren't found in scan
                 for mac, client in existing_macs.items():
-                    if mac not in [c["mac"] for c in self.client_data]:
-                        # Log disconnection event if device was previously online
-                        if previous_online_status.get(mac, False):
-                            # Calculate session duration
-                            last_seen = client.get('last_seen', current_time)
-                            if isinstance(last_seen, str):
-                                last_seen = current_time
-                            
-                            session_duration = None
-                            if hasattr(last_seen, 'timestamp') and hasattr(current_time, 'timestamp'):
-                                session_duration = int((current_time.timestamp() - last_seen.timestamp()))
-                            
-                            log_connection_event(
-                                mac_address=mac,
-                                event_type='DISCONNECT',
-                                ip_address=client.get('ip_address'),
-                                ping_latency=None,
-                                hostname=client.get('hostname', 'Unknown'),
-                                vendor=client.get('vendor', 'Unknown'),
-                                session_duration=session_duration
-                            )
-                        
+                    if mac not in current:
                         first_seen = client.get('first_seen', current_time)
                         if isinstance(first_seen, str):
                             first_seen = current_time
@@ -1896,45 +1851,9 @@ class RoutersTab:
         threading.Thread(target=scan_thread, daemon=True).start()
 
     def get_vendor_from_mac(self, mac):
-        """Get vendor information from MAC address (simplified)."""
-        # Common OUI prefixes
-        oui_prefixes = {
-            "00:50:56": "VMware",
-            "08:00:27": "VirtualBox",
-            "00:0c:29": "VMware",
-            "00:1c:42": "Parallels",
-            "00:15:5d": "Microsoft",
-            "00:16:3e": "Xen",
-            "52:54:00": "QEMU",
-            "00:1b:21": "Intel",
-            "00:1f:5b": "Apple",
-            "00:23:12": "Apple",
-            "00:25:00": "Apple",
-            "00:26:bb": "Apple",
-            "00:26:4a": "Apple",
-            "00:26:b0": "Apple",
-            "00:26:08": "Apple",
-            "00:25:4b": "Apple",
-            "00:25:bc": "Apple",
-            "00:25:ca": "Apple",
-            "00:25:00": "Apple",
-            "00:23:12": "Apple",
-            "00:1f:5b": "Apple",
-            "00:1b:21": "Apple",
-            "00:16:3e": "Xen",
-            "52:54:00": "QEMU",
-            "00:15:5d": "Microsoft",
-            "00:1c:42": "Parallels",
-            "00:0c:29": "VMware",
-            "08:00:27": "VirtualBox",
-            "00:50:56": "VMware"
-        }
-        
-        mac_upper = mac.upper()
-        for prefix, vendor in oui_prefixes.items():
-            if mac_upper.startswith(prefix):
-                return vendor
-        return "Unknown"
+        """Get vendor information from MAC address (IEEE OUI registry)."""
+        from oui_db import get_vendor
+        return get_vendor(mac)
 
     def update_client_display(self):
         """Update the client display with current data."""
@@ -2640,7 +2559,8 @@ class RoutersTab:
                     "severity_score": detection['severity_score'],
                     "network_interface": detection['network_interface'],
                     "detection_duration": detection['detection_duration'],
-                    "status": detection['status']
+                    "status": detection['status'],
+                    "run_count": detection.get('run_count') or 1
                 }
                 self.loop_data.append(detection_info)
             
@@ -2669,6 +2589,8 @@ class RoutersTab:
                 status_display = "✅ Clean"
             else:
                 status_display = status
+            if detection.get('run_count', 1) > 1:
+                status_display = f"{status_display} ×{detection['run_count']}"
             
             # Format time
             detection_time = detection['detection_time']
@@ -2691,7 +2613,8 @@ class RoutersTab:
             ))
         
         # Update statistics
-        total_detections = len(self.loop_data)
+        # Compacted clean rows stand for run_count detections each
+        total_detections = sum(d.get('run_count', 1) for d in self.loop_data)
         loops_detected = len([d for d in self.loop_data if d['status'] == 'loop_detected'])
         suspicious = len([d for d in self.loop_data if d['status'] == 'suspicious'])
         
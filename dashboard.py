@@ -38,6 +38,9 @@ from router_utils import get_routers
 from user_utils import insert_user, get_all_users, delete_user, update_user, get_user_last_login
 from network_utils import ping_latency,get_bandwidth, detect_loops, discover_clients, get_default_iface,scan_subnet, get_default_iface
 from bandwidth_logger import start_bandwidth_logging
+from snmp_poller import start_snmp_polling
+from live_metrics import publish_live, close_live_writer
+from anomaly_detector import get_anomaly_detector
 from db import get_connection 
 from db import database_health_check, get_database_info, DatabaseConnectionError
 from db import create_activity_logs_table, log_activity, get_activity_logs, log_user_logout
@@ -81,6 +84,8 @@ from notification_utils import (
     NotificationPriority
 )
 from notification_ui import NotificationSystem
+from loop_scan_coordinator import LoopScanCoordinator
+from client_snapshot import ClientSnapshotDiffer
 from resource_utils import get_resource_path, ensure_directory, resource_exists
 from service_manager import get_service_manager
 import logging
@@ -169,9 +174,19 @@ class Dashboard:
         self.loop_detection_thread = None
         self.loop_detection_history = []
         
+        # Router-offline loop scans are debounced and coalesced into one capture
+        self.loop_scan_coordinator = LoopScanCoordinator(
+            scan_fn=self._run_offline_loop_scan,
+            on_result=self._handle_offline_loop_scan_result,
+            window=3.0,
+            router_cooldown=120.0
+        )
+        
         # Client modal tracking
         self.client_modal = None
         self.client_modal_is_open = False
+        # Previous client scan, diffed to derive connection events
+        self.client_snapshot = ClientSnapshotDiffer()
         
         # Initialize database and load stats (with error handling)
         self._initialize_database()
@@ -215,7 +230,10 @@ class Dashboard:
         if self.loop_detection_enabled and self.db_health_status["status"] == "healthy":
             self.start_loop_detection()
 
-        start_bandwidth_logging(self._fetch_router_list)
+        # Routers configured in snmp_config.json are polled over SNMP instead of pinged
+        snmp_poller = start_snmp_polling(self._fetch_router_list)
+        start_bandwidth_logging(self._fetch_router_list,
+                                skip_router=snmp_poller.covers if snmp_poller else None)
             
     def _start_unifi_bandwidth_polling(self, interval_ms=60000):
         """Periodically fetch UniFi device bandwidth and log to DB."""
@@ -258,6 +276,8 @@ class Dashboard:
                                 # Persist into stored data for future refreshes
                                 router['download_speed'] = down
                                 router['upload_speed'] = up
+                                publish_live(rid, download_mbps=down, upload_mbps=up,
+                                             ip=router.get('ip_address'), name=router.get('name'))
                                 lbl = widgets.get('bandwidth_label')
                                 latency = router.get('latency')
                                 # Compose display string (show speeds even if latency unknown)
@@ -2388,7 +2408,7 @@ class Dashboard:
             # Export recent loop detection history
             from db import get_loop_detections_history
             history = get_loop_detections_history(limit=1000) or []
-            fieldnames = ["id", "detection_time", "status", "severity", "offenders", "interface", "duration_s"]
+            fieldnames = ["id", "detection_time", "status", "severity", "offenders", "interface", "duration_s", "runs"]
             for row in history:
                 # Normalize/format values safely
                 det_time = row.get("detection_time")
@@ -2404,6 +2424,7 @@ class Dashboard:
                     "offenders": row.get("offenders_count"),
                     "interface": row.get("network_interface"),
                     "duration_s": row.get("detection_duration"),
+                    "runs": row.get("run_count", 1),
                 })
 
         elif export_type == "tickets":
@@ -2608,7 +2629,7 @@ class Dashboard:
                     lbl.after(0, lambda: lbl.config(text="Fetching loop detections…"))
                     from db import get_loop_detections_history
                     hist = get_loop_detections_history(limit=1000) or []
-                    fieldnames = ["id", "detection_time", "status", "severity", "offenders", "interface", "duration_s"]
+                    fieldnames = ["id", "detection_time", "status", "severity", "offenders", "interface", "duration_s", "runs"]
                     def fmt_dt(dt):
                         try:
                             return dt.strftime("%Y-%m-%d %H:%M:%S") if hasattr(dt, 'strftime') else str(dt)
@@ -2625,6 +2646,7 @@ class Dashboard:
                             "offenders": r.get("offenders_count"),
                             "interface": r.get("network_interface"),
                             "duration_s": r.get("detection_duration"),
+                            "runs": r.get("run_count", 1),
                         })
 
                 else:  # reports
@@ -3169,8 +3191,10 @@ class Dashboard:
                         if info.get("ip"):
                             ping_lat = ping_latency(info["ip"], timeout=1000)
                         
-                        # Determine vendor (simplified)
-                        vendor = info.get("vendor", "Unknown")
+                        # Determine vendor (OUI lookup if the scan didn't provide one)
+                        vendor = info.get("vendor") or "Unknown"
+                        if vendor == "Unknown":
+                            vendor = self.get_vendor_from_mac(mac)
                         
                         # Save to database with router association
                         try:
@@ -4552,6 +4576,17 @@ class Dashboard:
                 self.bandwidth_data = {}
             self.bandwidth_data[rid] = bw
 
+            # Live view for other processes (API, client window) via shared memory
+            if bw:
+                router_data = self.router_widgets.get(rid, {}).get('data', {})
+                publish_live(rid, status=True, latency_ms=bw.get('latency'), download_mbps=bw.get('download'),
+                             upload_mbps=bw.get('upload'), ip=ip, name=router_data.get('name'))
+                # Flag readings far from what this router usually does at this hour
+                get_anomaly_detector().observe(rid, {"download_mbps": bw.get('download'),
+                                                     "upload_mbps": bw.get('upload'),
+                                                     "latency_ms": bw.get('latency')},
+                                               name=router_data.get('name') or ip)
+
             # Trigger UI update in the main thread
             self.root.after(0, self._update_bandwidth_label, rid, bw)
         except Exception as e:
@@ -4831,6 +4866,10 @@ class Dashboard:
                                         # Update notification count
                                         self.root.after(0, self.update_notification_count)
 
+                                        # Trigger a (coalesced) loop scan when a router goes offline
+                                        if not new:
+                                            self._trigger_loop_detection_on_router_offline(router_name, router_ip)
+
                             if self.app_running:
                                 # fetch bandwidth in a thread if online
                                 if new:
@@ -4840,6 +4879,8 @@ class Dashboard:
                                         daemon=True
                                     ).start()
                                 else:
+                                    publish_live(rid, status=False, ip=router_data.get('ip_address'),
+                                                 name=router_name)
                                     # just update GUI to offline
                                     self.root.after(0, lambda r=rid, s=new: self._update_gui_status(r, s))
                         except Exception as e:
@@ -11194,7 +11235,9 @@ Type: {values[11]}
                 if "detection_time" in record:
                     # Database record
                     record_id = record.get("id")
-                    timestamp = record["detection_time"].strftime("%Y-%m-%d %H:%M:%S") if hasattr(record["detection_time"], 'strftime') else str(record["detection_time"])[:19]
+                    # Compacted clean runs show when the run was last extended
+                    shown_time = record.get("last_detection_time") or record["detection_time"]
+                    timestamp = shown_time.strftime("%Y-%m-%d %H:%M:%S") if hasattr(shown_time, 'strftime') else str(shown_time)[:19]
                     status = record["status"]
                     packets = record["total_packets"]
                     offenders = record["offenders_count"]
@@ -11220,6 +11263,9 @@ Type: {values[11]}
                     'suspicious': '🔍 Suspicious',
                     'loop_detected': '⚠️ Loop Detected'
                 }.get(status, f'❓ {status}')
+                run_count = record.get("run_count") or 1
+                if run_count > 1:
+                    status_emoji = f"{status_emoji} ×{run_count}"
                 
                 # Insert with record ID as tag for retrieval
                 self.loop_detection_tree.insert("", "end", values=(
@@ -11816,113 +11862,148 @@ Type: {values[11]}
 
 
     def _trigger_loop_detection_on_router_offline(self, router_name, router_ip):
-        """Trigger manual loop detection when a router goes offline (runs in background thread)."""
-        def run_detection():
-            try:
-                print(f"🔍 Running loop detection triggered by router offline: {router_name} ({router_ip})")
-                from network_utils import detect_loops, get_default_iface
-                
-                # Get the primary network interface
-                iface = get_default_iface()
-                print(f"🔍 Router offline scan - scanning interface: {iface}")
-                
-                # Run detection on primary interface with advanced engine (same as manual)
-                total_packets, offenders, stats, advanced_metrics = detect_loops(
-                    timeout=5,  # 5 seconds for thorough scan
-                    threshold=100,  # Threshold for severity
-                    iface=iface,
-                    enable_advanced=True  # Use advanced detection
-                )
-                
-                # Extract status from advanced detection
-                max_severity = 0
-                for mac, info in stats.items():
-                    if isinstance(info.get("severity"), dict):
-                        severity_value = info["severity"]["total"]
-                    else:
-                        severity_value = info.get("severity", 0)
-                    max_severity = max(max_severity, severity_value)
-                
-                # Determine status
-                if advanced_metrics.get("arp_storm_detected") or advanced_metrics.get("broadcast_flood_detected"):
-                    status = "loop_detected"
-                elif max_severity > 250:
-                    status = "loop_detected"
-                elif max_severity > 100:
-                    status = "suspicious"
+        """Request a loop scan because a router went offline.
+
+        Requests go through the LoopScanCoordinator so that many routers going
+        offline together share one capture and one saved result.
+        """
+        outcome = self.loop_scan_coordinator.request(router_ip, router_name)
+        print(f"🔍 Router offline loop scan for {router_name} ({router_ip}): {outcome}")
+
+    def _run_offline_loop_scan(self):
+        """Capture and score one router-offline loop scan (runs in a background thread)."""
+        try:
+            from network_utils import detect_loops, get_default_iface
+            
+            # Get the primary network interface
+            iface = get_default_iface()
+            print(f"🔍 Router offline scan - scanning interface: {iface}")
+            
+            # Run detection on primary interface with advanced engine (same as manual)
+            total_packets, offenders, stats, advanced_metrics = detect_loops(
+                timeout=5,  # 5 seconds for thorough scan
+                threshold=100,  # Threshold for severity
+                iface=iface,
+                enable_advanced=True  # Use advanced detection
+            )
+            
+            # Extract status from advanced detection
+            max_severity = 0
+            for mac, info in stats.items():
+                if isinstance(info.get("severity"), dict):
+                    severity_value = info["severity"]["total"]
                 else:
-                    status = "clean"
-                
-                # Build efficiency metrics
-                efficiency_metrics = {
-                    "detection_method": "ADVANCED",
-                    "interfaces_scanned": [iface],
-                    "total_interfaces": 1,
-                    "detection_duration": advanced_metrics.get("duration", 5),
-                    "packets_per_second": total_packets / max(1, advanced_metrics.get("duration", 5)),
-                    "unique_macs": advanced_metrics.get("total_unique_macs", 0),
-                    "arp_storm_detected": advanced_metrics.get("arp_storm_detected", False),
-                    "broadcast_flood_detected": advanced_metrics.get("broadcast_flood_detected", False),
-                    "storm_rate": advanced_metrics.get("storm_rate", 0),
-                    "early_exit": advanced_metrics.get("early_exit", False),
-                    "early_exit_reason": advanced_metrics.get("early_exit_reason", None),
-                    "actual_duration": advanced_metrics.get("duration", 5),
-                    "interface_results": [{
-                        "interface": iface,
-                        "packets": total_packets,
-                        "offenders": offenders,
-                        "status": status
-                    }],
-                    "triggered_by": f"Router offline: {router_name} ({router_ip})"
-                }
-                
-                interface_str = iface
-                
-                # Save to database
-                from db import save_loop_detection
-                detection_id = save_loop_detection(
-                    total_packets=total_packets,
-                    offenders=offenders,
-                    stats=stats,
-                    status=status,
-                    severity_score=max_severity,
-                    interface=interface_str,
-                    duration=efficiency_metrics.get('detection_duration', 5),
-                    efficiency_metrics=efficiency_metrics
-                )
-                
-                # Send notification if loop detected
-                if status in ["loop_detected", "suspicious"]:
-                    from notification_utils import notify_loop_detected
-                    notify_loop_detected(max_severity, offenders, interface_str)
-                    self.root.after(0, self.update_notification_count)
-                    
-                    # Show popup alert for loop detected
-                    if status == "loop_detected":
-                        self.root.after(0, lambda: messagebox.showwarning(
-                            "⚠️ Network Loop Detected!",
-                            f"A network loop has been detected after router {router_name} went offline!\n\n"
-                            f"Severity Score: {max_severity:.1f}\n"
-                            f"Offending Devices: {len(offenders)}\n"
-                            f"Interface: {interface_str}\n\n"
-                            f"Click 'Loop Test' button to view details."
-                        ))
-                
-                # Reload stats and history from database
-                from db import get_loop_detection_stats, get_loop_detections_history
-                self.loop_detection_stats = get_loop_detection_stats()
-                self.loop_detection_history = get_loop_detections_history(100)
-                
-                # Print status
-                safe_emoji_print(f"[SUCCESS] Router offline loop detection complete: status={status}, severity={max_severity:.2f}, offenders={len(offenders)}")
+                    severity_value = info.get("severity", 0)
+                max_severity = max(max_severity, severity_value)
+            
+            # Determine status
+            if advanced_metrics.get("arp_storm_detected") or advanced_metrics.get("broadcast_flood_detected"):
+                status = "loop_detected"
+            elif max_severity > 250:
+                status = "loop_detected"
+            elif max_severity > 100:
+                status = "suspicious"
+            else:
+                status = "clean"
+            
+            # Build efficiency metrics
+            efficiency_metrics = {
+                "detection_method": "ADVANCED",
+                "interfaces_scanned": [iface],
+                "total_interfaces": 1,
+                "detection_duration": advanced_metrics.get("duration", 5),
+                "packets_per_second": total_packets / max(1, advanced_metrics.get("duration", 5)),
+                "unique_macs": advanced_metrics.get("total_unique_macs", 0),
+                "arp_storm_detected": advanced_metrics.get("arp_storm_detected", False),
+                "broadcast_flood_detected": advanced_metrics.get("broadcast_flood_detected", False),
+                "storm_rate": advanced_metrics.get("storm_rate", 0),
+                "early_exit": advanced_metrics.get("early_exit", False),
+                "early_exit_reason": advanced_metrics.get("early_exit_reason", None),
+                "actual_duration": advanced_metrics.get("duration", 5),
+                "interface_results": [{
+                    "interface": iface,
+                    "packets": total_packets,
+                    "offenders": offenders,
+                    "status": status
+                }]
+            }
+            
+            return {
+                "total_packets": total_packets,
+                "offenders": offenders,
+                "stats": stats,
+                "status": status,
+                "max_severity": max_severity,
+                "interface": iface,
+                "efficiency_metrics": efficiency_metrics
+            }
+            
+        except Exception as e:
+            import traceback
+            safe_emoji_print(f"[ERROR] Router offline loop detection error: {e}")
+            traceback.print_exc()
+            return None
+
+    def _handle_offline_loop_scan_result(self, result, routers):
+        """Save and report one coalesced router-offline scan for all affected routers."""
+        try:
+            router_labels = [f"{name} ({ip})" for ip, name in routers]
+            status = result["status"]
+            max_severity = result["max_severity"]
+            offenders = result["offenders"]
+            interface_str = result["interface"]
+            
+            efficiency_metrics = result["efficiency_metrics"]
+            efficiency_metrics["triggered_by"] = "Router offline: " + ", ".join(router_labels)
+            efficiency_metrics["affected_routers"] = [{"ip": ip, "name": name} for ip, name in routers]
+            
+            # Save to database (one row for the whole batch)
+            from db import save_loop_detection
+            detection_id = save_loop_detection(
+                total_packets=result["total_packets"],
+                offenders=offenders,
+                stats=result["stats"],
+                status=status,
+                severity_score=max_severity,
+                interface=interface_str,
+                duration=efficiency_metrics.get('detection_duration', 5),
+                efficiency_metrics=efficiency_metrics
+            )
+            
+            # Send notification if loop detected
+            if status in ["loop_detected", "suspicious"]:
+                from notification_utils import notify_loop_detected
+                notify_loop_detected(max_severity, offenders, interface_str)
+                self.root.after(0, self.update_notification_count)
                 
-            except Exception as e:
-                import traceback
-                safe_emoji_print(f"[ERROR] Router offline loop detection error: {e}")
-                traceback.print_exc()
-        
-        # Run in background thread
-        threading.Thread(target=run_detection, daemon=True).start()
+                # Show popup alert for loop detected
+                if status == "loop_detected":
+                    if len(routers) == 1:
+                        trigger_text = f"router {routers[0][1]} went offline"
+                    else:
+                        trigger_text = f"{len(routers)} routers went offline"
+                    self.root.after(0, lambda: messagebox.showwarning(
+                        "⚠️ Network Loop Detected!",
+                        f"A network loop has been detected after {trigger_text}!\n\n"
+                        f"Severity Score: {max_severity:.1f}\n"
+                        f"Offending Devices: {len(offenders)}\n"
+                        f"Interface: {interface_str}\n\n"
+                        f"Click 'Loop Test' button to view details."
+                    ))
+            
+            # Reload stats and history from database
+            from db import get_loop_detection_stats, get_loop_detections_history
+            self.loop_detection_stats = get_loop_detection_stats()
+            self.loop_detection_history = get_loop_detections_history(100)
+            
+            # Print status
+            safe_emoji_print(f"[SUCCESS] Router offline loop detection complete: status={status}, severity={max_severity:.2f}, "
+                             f"offenders={len(offenders)}, routers={len(routers)}")
+            
+        except Exception as e:
+            import traceback
+            safe_emoji_print(f"[ERROR] Router offline loop detection error: {e}")
+            traceback.print_exc()
 
     def _run_loop_scan_thread(self, modal):
         try:
@@ -12657,23 +12738,20 @@ Type: {values[11]}
                 if not self.client_modal_is_open:
                     return
                 from network_utils import scan_subnet, get_default_iface, ping_latency
-                from db import (save_network_client, create_network_clients_table, create_connection_history_table, 
-                              get_network_clients, update_client_offline_status, log_connection_event, get_connection_history)
+                from db import create_network_clients_table, create_connection_history_table, get_network_clients
+                from client_snapshot import sync_client_snapshot
                 
                 # Create tables if they don't exist
                 create_network_clients_table()
                 create_connection_history_table()
                 
-                # Get existing clients from database
+                # Get existing clients from database (for the offline rows shown below)
                 existing_clients = get_network_clients(online_only=False, limit=1000)
                 existing_macs = {client['mac_address']: client for client in existing_clients}
                 
-                # Track previous online status
-                previous_online_status = {mac: client.get('is_online', False) for mac, client in existing_macs.items()}
-                
-                # Mark all existing clients as offline first
-                for client in existing_clients:
-                    update_client_offline_status(client['mac_address'])
+                # First scan diffs against what the database last saw online
+                if not self.client_snapshot.seeded:
+                    self.client_snapshot.seed(existing_clients)
                 
                 iface = get_default_iface()
                 
@@ -12687,9 +12765,10 @@ Type: {values[11]}
                 if not self.client_modal_is_open:
                     return
                 
-                # Process and save clients
+                # Process clients
                 self.client_data = []
                 current_time = datetime.now()
+                current = {}
                 
                 for mac, info in scanned_clients.items():
                     # Check periodically if modal is still open
@@ -12701,48 +12780,18 @@ Type: {values[11]}
                     if info.get("ip"):
                         ping_lat = ping_latency(info["ip"], timeout=1000)
                     
-                    # Determine vendor (simplified)
+                    # Determine vendor (OUI lookup)
                     vendor = self.get_vendor_from_mac(mac)
                     
                     # Determine if client is online
                     is_online = bool(info.get("ip"))
                     
-                    # Check for connection state changes
-                    was_online = previous_online_status.get(mac, False)
-                    current_ip = info.get("ip")
-                    previous_ip = existing_macs.get(mac, {}).get('ip_address')
-                    
-                    # Log connection events
-                    if not was_online and is_online:
-                        # Device connected
-                        log_connection_event(
-                            mac_address=mac,
-                            event_type='CONNECT',
-                            ip_address=current_ip,
-                            ping_latency=ping_lat,
-                            hostname=info.get("hostname", "Unknown"),
-                            vendor=vendor
-                        )
-                    elif was_online and is_online and current_ip != previous_ip:
-                        # IP address changed
-                        log_connection_event(
-                            mac_address=mac,
-                            event_type='IP_CHANGE',
-                            ip_address=current_ip,
-                            previous_ip=previous_ip,
-                            ping_latency=ping_lat,
-                            hostname=info.get("hostname", "Unknown"),
-                            vendor=vendor
-                        )
-                    
-                    # Save to database
-                    save_network_client(
-                        mac_address=mac,
-                        ip_address=info.get("ip"),
-                        hostname=info.get("hostname", "Unknown"),
-                        vendor=vendor,
-                        ping_latency=ping_lat
-                    )
+                    current[mac] = {
+                        "ip_address": info.get("ip"),
+                        "hostname": info.get("hostname", "Unknown"),
+                        "vendor": vendor,
+                        "ping_latency": ping_lat
+                    }
                     
                     # Get first seen time from existing data or use current time
                     first_seen = existing_macs.get(mac, {}).get('first_seen', current_time)
@@ -12763,30 +12812,13 @@ Type: {values[11]}
                     }
                     self.client_data.append(client_info)
                 
+                # One transaction: upsert seen clients, write CONNECT/IP_CHANGE/DISCONNECT
+                # events derived from the previous snapshot, bulk-mark the rest offline
+                sync_client_snapshot(self.client_snapshot, current, now=current_time)
+                
                 # Add offline clients that weren't found in scan
                 for mac, client in existing_macs.items():
-                    if mac not in [c["mac"] for c in self.client_data]:
-                        # Log disconnection event if device was previously online
-                        if previous_online_status.get(mac, False):
-                            # Calculate session duration
-                            last_seen = client.get('last_seen', current_time)
-                            if isinstance(last_seen, str):
-                                last_seen = current_time
-                            
-                            session_duration = None
-                            if hasattr(last_seen, 'timestamp') and hasattr(current_time, 'timestamp'):
-                                session_duration = int((current_time.timestamp() - last_seen.timestamp()))
-                            
-                            log_connection_event(
-                                mac_address=mac,
-                                event_type='DISCONNECT',
-                                ip_address=client.get('ip_address'),
-                                ping_latency=None,
-                                hostname=client.get('hostname', 'Unknown'),
-                                vendor=client.get('vendor', 'Unknown'),
-                                session_duration=session_duration
-                            )
-                        
+                    if mac not in current:
                         first_seen = client.get('first_seen', current_time)
                         if isinstance(first_seen, str):
                             first_seen = current_time
@@ -12818,45 +12850,9 @@ Type: {values[11]}
         threading.Thread(target=scan_thread, daemon=True).start()
 
     def get_vendor_from_mac(self, mac):
-        """Get vendor information from MAC address (simplified)."""
-        # Common OUI prefixes
-        oui_prefixes = {
-            "00:50:56": "VMware",
-            "08:00:27": "VirtualBox",
-            "00:0c:29": "VMware",
-            "00:1c:42": "Parallels",
-            "00:15:5d": "Microsoft",
-            "00:16:3e": "Xen",
-            "52:54:00": "QEMU",
-            "00:1b:21": "Intel",
-            "00:1f:5b": "Apple",
-            "00:23:12": "Apple",
-            "00:25:00": "Apple",
-            "00:26:bb": "Apple",
-            "00:26:4a": "Apple",
-            "00:26:b0": "Apple",
-            "00:26:08": "Apple",
-            "00:25:4b": "Apple",
-            "00:25:bc": "Apple",
-            "00:25:ca": "Apple",
-            "00:25:00": "Apple",
-            "00:23:12": "Apple",
-            "00:1f:5b": "Apple",
-            "00:1b:21": "Apple",
-            "00:16:3e": "Xen",
-            "52:54:00": "QEMU",
-            "00:15:5d": "Microsoft",
-            "00:1c:42": "Parallels",
-            "00:0c:29": "VMware",
-            "08:00:27": "VirtualBox",
-            "00:50:56": "VMware"
-        }
-        
-        mac_upper = mac.upper()
-        for prefix, vendor in oui_prefixes.items():
-            if mac_upper.startswith(prefix):
-                return vendor
-        return "Unknown"
+        """Get vendor information from MAC address (IEEE OUI registry)."""
+        from oui_db import get_vendor
+        return get_vendor(mac)
 
     def _safe_widget_config(self, widget, **kwargs):
         """Safely configure a widget if it still exists."""
@@ -13228,16 +13224,13 @@ Type: {values[11]}
             
             def refresh_thread():
                 from network_utils import ping_latency
-                import socket
                 
                 # Ping test
                 latency = ping_latency(ip, timeout=1000)
                 
-                # Hostname lookup
-                try:
-                    hostname = socket.gethostbyaddr(ip)[0]
-                except:
-                    hostname = "Unknown"
+                # Hostname lookup (cached, bounded wait)
+                from dns_resolver import get_resolver
+                hostname = get_resolver().resolve(ip, timeout=2.0)
                 
                 def update_result():
                     # Update the client data
@@ -13581,7 +13574,8 @@ Type: {values[11]}
                     timeout=5,  # 5 seconds for thorough scan
                     threshold=100,  # Threshold for severity
                     iface=iface,  # Use same interface as manual detection
-                    enable_advanced=True  # Use advanced detection like manual
+                    enable_advanced=True,  # Use advanced detection like manual
+                    baseline_screening=True  # Skip full scoring for MACs within their learned baseline
                 )
                 
                 # Extract status from advanced detection (same logic as manual)
@@ -14412,6 +14406,26 @@ Type: {values[11]}
 
         # Stop background activities
         self.app_running = False
+        self.loop_scan_coordinator.cancel()
+        
+        # Persist learned loop detection baselines
+        try:
+            from network_utils import get_baseline_store
+            get_baseline_store().checkpoint(force=True)
+        except Exception as e:
+            print(f"Error saving loop detection baselines: {e}")
+        
+        # Persist learned bandwidth/latency profiles
+        try:
+            get_anomaly_detector().checkpoint(force=True)
+        except Exception as e:
+            print(f"Error saving anomaly profiles: {e}")
+        
+        # Remove the shared live metrics segment
+        try:
+            close_live_writer()
+        except Exception as e:
+            print(f"Error closing live metrics: {e}")
         
         # Don't set _report_cancel_requested here to avoid "Cancelled" message
         # The app_running flag will stop background tasks gracefully
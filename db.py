@@ -529,6 +529,31 @@ def insert_bandwidth_log(router_id, download_mbps, upload_mbps, latency_ms=None,
         logger.error(f"insert_bandwidth_log failed: {e}")
         return False
 
+def insert_bandwidth_logs(rows):
+    """Insert many bandwidth log rows in one transaction.
+
+    Args:
+        rows (list): (router_id, download_mbps, upload_mbps, latency_ms, timestamp) tuples;
+            a None timestamp means NOW()
+    """
+    if not rows:
+        return True
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO bandwidth_logs (router_id, download_mbps, upload_mbps, latency_ms, timestamp) "
+            "VALUES (%s, %s, %s, %s, COALESCE(%s, NOW()))",
+            [tuple(row) for row in rows]
+        )
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return True
+    except Exception as e:
+        logger.error(f"insert_bandwidth_logs failed: {e}")
+        return False
+
 def show_database_error_dialog(title, message, error_details=None):
     """Non-intrusive handler for DB errors (logs only; UI decides on dialogs).
 
@@ -922,7 +947,11 @@ def create_loop_detections_table():
             severity_score FLOAT,
             network_interface VARCHAR(100),
             detection_duration INT,
-            status ENUM('clean', 'suspicious', 'loop_detected') DEFAULT 'clean'
+            status ENUM('clean', 'suspicious', 'loop_detected') DEFAULT 'clean',
+            run_count INT DEFAULT 1,
+            first_detection_time TIMESTAMP NULL DEFAULT NULL,
+            last_detection_time TIMESTAMP NULL DEFAULT NULL,
+            INDEX idx_loop_interface (network_interface, id)
         )
         """
         
@@ -942,12 +971,143 @@ def create_loop_detections_table():
     if result is None:
         # Don't log errors for table creation since it's expected to fail sometimes
         return False
+    ensure_loop_detections_run_columns()
+    create_loop_detection_offenders_table()
     return True
 
+def create_loop_detection_offenders_table():
+    """
+    Create the loop_detection_offenders table if it doesn't exist.
+    
+    One row per offending MAC per detection, so per-MAC questions ("how often
+    has X been an offender") are indexed lookups instead of parsing every
+    offenders_data JSON blob.
+    """
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS loop_detection_offenders (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            detection_id INT NOT NULL,
+            mac VARCHAR(17) NOT NULL,
+            severity FLOAT DEFAULT 0,
+            reason VARCHAR(255),
+            network_interface VARCHAR(100),
+            INDEX idx_offender_detection (detection_id),
+            INDEX idx_offender_mac (mac, detection_id),
+            FOREIGN KEY (detection_id) REFERENCES loop_detections(id) ON DELETE CASCADE
+        )
+        """)
+        conn.commit()
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        # Ignore "table already exists" errors since we use IF NOT EXISTS
+        if "already exists" not in str(e).lower():
+            print(f"Error creating loop_detection_offenders table: {e}")
+
+_OFFENDER_REASON_COUNTERS = (
+    ("arp_count", "ARP"),
+    ("broadcast_count", "Broadcast"),
+    ("stp_count", "STP"),
+    ("lldp_count", "LLDP"),
+    ("cdp_count", "CDP"),
+    ("dhcp_count", "DHCP"),
+    ("mdns_count", "mDNS"),
+    ("nbns_count", "NetBIOS"),
+    ("icmp_redirect_count", "ICMP redirect"),
+    ("other_count", "Other"),
+)
+
+def _offender_rows(detection_id, offenders, stats, interface):
+    """Build loop_detection_offenders rows from a detection's offenders and per-MAC stats."""
+    if not isinstance(offenders, list):
+        return []
+    stats = stats if isinstance(stats, dict) else {}
+    rows = []
+    for mac in dict.fromkeys(offenders):
+        info = stats.get(mac) or {}
+        severity = info.get("severity", 0)
+        if isinstance(severity, dict):
+            severity = severity.get("total", 0)
+        
+        # Prefer the detector's own explanation, else name the dominant packet type
+        reason = info.get("loop_reason")
+        if not reason:
+            counts = [(info.get(key) or 0, label) for key, label in _OFFENDER_REASON_COUNTERS]
+            count, label = max(counts, key=lambda c: c[0])
+            reason = f"{label} ({count} packets)" if count else None
+        
+        rows.append((detection_id, str(mac).lower()[:17], float(severity or 0), reason[:255] if reason else None, interface))
+    return rows
+
+def ensure_loop_detections_run_columns():
+    """Ensure the run-length columns exist on loop_detections (for migrations)."""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SHOW COLUMNS FROM loop_detections LIKE 'run_count'")
+        if cursor.fetchone() is None:
+            cursor.execute("ALTER TABLE loop_detections ADD COLUMN run_count INT DEFAULT 1")
+            conn.commit()
+        cursor.execute("SHOW COLUMNS FROM loop_detections LIKE 'first_detection_time'")
+        if cursor.fetchone() is None:
+            cursor.execute("ALTER TABLE loop_detections ADD COLUMN first_detection_time TIMESTAMP NULL DEFAULT NULL")
+            conn.commit()
+        cursor.execute("SHOW COLUMNS FROM loop_detections LIKE 'last_detection_time'")
+        if cursor.fetchone() is None:
+            cursor.execute("ALTER TABLE loop_detections ADD COLUMN last_detection_time TIMESTAMP NULL DEFAULT NULL")
+            conn.commit()
+        cursor.execute("SHOW INDEX FROM loop_detections WHERE Key_name = 'idx_loop_interface'")
+        if not cursor.fetchall():
+            cursor.execute("CREATE INDEX idx_loop_interface ON loop_detections (network_interface, id)")
+            conn.commit()
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        # Log but don't crash
+        print(f" Warning: ensure_loop_detections_run_columns failed: {e}")
+
+def _extend_clean_run(cursor, interface, total_packets, duration, severity):
+    """
+    Fold a clean, offender-free result into the interface's latest row when
+    that row is itself a clean run.
+
+    Returns:
+        int | None: id of the extended summary row, or None if a new row is needed
+    """
+    cursor.execute(
+        "SELECT id, status, offenders_count FROM loop_detections "
+        "WHERE network_interface = %s ORDER BY id DESC LIMIT 1 FOR UPDATE",
+        (interface,)
+    )
+    latest = cursor.fetchone()
+    if not latest or latest[1] != 'clean' or (latest[2] or 0) != 0:
+        return None
+    
+    cursor.execute(
+        "UPDATE loop_detections SET "
+        " run_count = COALESCE(run_count, 1) + 1, "
+        " first_detection_time = COALESCE(first_detection_time, detection_time), "
+        " last_detection_time = CURRENT_TIMESTAMP, "
+        " total_packets = COALESCE(total_packets, 0) + %s, "
+        " detection_duration = COALESCE(detection_duration, 0) + %s, "
+        " severity_score = GREATEST(COALESCE(severity_score, 0), %s) "
+        "WHERE id = %s",
+        (total_packets, int(duration or 0), severity, latest[0])
+    )
+    return latest[0]
+
 def save_loop_detection(total_packets, offenders, stats, status, severity_score, interface="Wi-Fi", duration=3, efficiency_metrics=None):
     """
     Save a loop detection result to the database with enhanced fields.
     
+    Consecutive clean results with no offenders on the same interface are
+    run-length encoded: instead of a new row, the interface's current clean
+    row has its run_count, last_detection_time and packet/duration totals
+    extended. Suspicious and loop results are always stored in full.
+    
     Args:
         total_packets: Total packet count
         offenders: List of offending MAC addresses
@@ -1009,6 +1169,22 @@ def save_loop_detection(total_packets, offenders, stats, status, severity_score,
         offenders_count = len(offenders) if isinstance(offenders, list) else offenders
         severity_json = json.dumps(severity_breakdown) if severity_breakdown else None
         
+        if status == 'clean' and not offenders_count:
+            try:
+                detection_id = _extend_clean_run(cursor, interface, total_packets, duration, actual_severity)
+            except mysql.connector.Error as e:
+                # Run-length columns missing (not migrated yet): store a full row
+                if getattr(e, 'errno', None) != 1054:
+                    raise
+                conn.rollback()
+                detection_id = None
+            if detection_id is not None:
+                conn.commit()
+                cursor.close()
+                conn.close()
+                logger.info(f"Clean loop detection folded into run (ID: {detection_id}, interface: {interface})")
+                return detection_id
+        
         try:
             cursor.execute(insert_sql_extended, (
                 total_packets,
@@ -1026,7 +1202,6 @@ def save_loop_detection(total_packets, offenders, stats, status, severity_score,
                 efficiency_score,
                 severity_json
             ))
-            conn.commit()
             detection_id = cursor.lastrowid
         except mysql.connector.Error as e:
             # Fallback to legacy schema if extended columns are missing
@@ -1040,10 +1215,26 @@ def save_loop_detection(total_packets, offenders, stats, status, severity_score,
                     duration,
                     status
                 ))
-                conn.commit()
                 detection_id = cursor.lastrowid
             else:
                 raise
+        
+        # Offender rows go in the same transaction as their detection
+        offender_rows = _offender_rows(detection_id, offenders, stats, interface)
+        if offender_rows:
+            try:
+                cursor.executemany(
+                    "INSERT INTO loop_detection_offenders "
+                    "(detection_id, mac, severity, reason, network_interface) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    offender_rows
+                )
+            except mysql.connector.Error as e:
+                # Offenders table not created yet: keep the detection (JSON still has them)
+                if getattr(e, 'errno', None) != 1146:
+                    conn.rollback()
+                    raise
+        conn.commit()
         cursor.close()
         conn.close()
         
@@ -1056,23 +1247,48 @@ def save_loop_detection(total_packets, offenders, stats, status, severity_score,
     return result
 
 def get_loop_detections_history(limit=100):
-    """Get loop detection history from database."""
+    """
+    Get loop detection history from database.
+    
+    Clean runs come back as a single row; run_count, first_detection_time and
+    last_detection_time are always populated (1 / detection_time for rows
+    that were never extended), and rows are ordered by their latest activity.
+    """
     def _get_history():
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
         
         select_sql = """
+        SELECT *,
+               COALESCE(run_count, 1) AS run_count,
+               COALESCE(first_detection_time, detection_time) AS first_detection_time,
+               COALESCE(last_detection_time, detection_time) AS last_detection_time
+        FROM loop_detections 
+        ORDER BY COALESCE(last_detection_time, detection_time) DESC, id DESC 
+        LIMIT %s
+        """
+        legacy_sql = """
         SELECT * FROM loop_detections 
         ORDER BY detection_time DESC 
         LIMIT %s
         """
         
-        cursor.execute(select_sql, (limit,))
+        try:
+            cursor.execute(select_sql, (limit,))
+        except mysql.connector.Error as e:
+            if getattr(e, 'errno', None) != 1054:
+                raise
+            cursor.execute(legacy_sql, (limit,))
         results = cursor.fetchall()
         
         cursor.close()
         conn.close()
         
+        for row in results:
+            row.setdefault("run_count", 1)
+            row.setdefault("first_detection_time", row.get("detection_time"))
+            row.setdefault("last_detection_time", row.get("detection_time"))
+        
         return results
     
     result = execute_with_error_handling("get_loop_detections_history", _get_history)
@@ -1084,30 +1300,48 @@ def get_loop_detection_stats():
         conn = get_connection()
         cursor = conn.cursor()
         
-        # Get total detections
-        cursor.execute("SELECT COUNT(*) FROM loop_detections")
-        total_detections = cursor.fetchone()[0]
-        
-        # Get loops detected
-        cursor.execute("SELECT COUNT(*) FROM loop_detections WHERE status = 'loop_detected'")
-        loops_detected = cursor.fetchone()[0]
-        
-        # Get suspicious activity
-        cursor.execute("SELECT COUNT(*) FROM loop_detections WHERE status = 'suspicious'")
-        suspicious_activity = cursor.fetchone()[0]
-        
-        # Get clean detections
-        cursor.execute("SELECT COUNT(*) FROM loop_detections WHERE status = 'clean'")
-        clean_detections = cursor.fetchone()[0]
+        # One pass over the table. Runs are counted (not rows): a compacted
+        # clean row stands for run_count detections.
+        stats_sql = """
+        SELECT status,
+               SUM(COALESCE(run_count, 1)),
+               SUM(CASE WHEN COALESCE(last_detection_time, detection_time) >= NOW() - INTERVAL 1 DAY
+                        THEN COALESCE(run_count, 1) ELSE 0 END),
+               SUM(CASE WHEN COALESCE(last_detection_time, detection_time) >= NOW() - INTERVAL 7 DAY
+                        THEN COALESCE(run_count, 1) ELSE 0 END)
+        FROM loop_detections
+        GROUP BY status
+        """
+        legacy_sql = """
+        SELECT status,
+               COUNT(*),
+               SUM(detection_time >= NOW() - INTERVAL 1 DAY),
+               SUM(detection_time >= NOW() - INTERVAL 7 DAY)
+        FROM loop_detections
+        GROUP BY status
+        """
+        try:
+            cursor.execute(stats_sql)
+        except mysql.connector.Error as e:
+            if getattr(e, 'errno', None) != 1054:
+                raise
+            cursor.execute(legacy_sql)
+        rows = [(status, int(total or 0), int(day or 0), int(week or 0))
+                for status, total, day, week in cursor.fetchall()]
         
         cursor.close()
         conn.close()
         
+        counts = {status: total for status, total, _, _ in rows}
         return {
-            "total_detections": total_detections,
-            "loops_detected": loops_detected,
-            "suspicious_activity": suspicious_activity,
-            "clean_detections": clean_detections
+            "total_detections": sum(counts.values()),
+            "loops_detected": counts.get('loop_detected', 0),
+            "suspicious_activity": counts.get('suspicious', 0),
+            "clean_detections": counts.get('clean', 0),
+            "recent_detections": sum(day for _, _, day, _ in rows),
+            "status_breakdown": [
+                {"status": status, "count": week} for status, _, _, week in rows if week
+            ]
         }
     
     result = execute_with_error_handling("get_loop_detection_stats", _get_stats)
@@ -1115,9 +1349,139 @@ def get_loop_detection_stats():
         "total_detections": 0,
         "loops_detected": 0,
         "suspicious_activity": 0,
-        "clean_detections": 0
+        "clean_detections": 0,
+        "recent_detections": 0,
+        "status_breakdown": []
     }
 
+def get_loop_detection_summaries(limit=100, offset=0, status=None):
+    """
+    Get loop detection history without the offenders_data / severity_breakdown
+    blobs. Offender details are fetched per detection with
+    get_loop_detection_offenders().
+    
+    Args:
+        limit: Maximum number of rows
+        offset: Rows to skip (for paging)
+        status: Optional status filter ('clean', 'suspicious', 'loop_detected')
+    
+    Returns:
+        list: Detection summary dicts, newest activity first
+    """
+    def _get_summaries():
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        
+        where = "WHERE status = %s " if status else ""
+        params = ([status] if status else []) + [limit, offset]
+        summary_sql = (
+            "SELECT id, detection_time, total_packets, offenders_count, severity_score, "
+            "       network_interface, detection_duration, status, "
+            "       COALESCE(run_count, 1) AS run_count, "
+            "       COALESCE(first_detection_time, detection_time) AS first_detection_time, "
+            "       COALESCE(last_detection_time, detection_time) AS last_detection_time "
+            "FROM loop_detections " + where +
+            "ORDER BY COALESCE(last_detection_time, detection_time) DESC, id DESC "
+            "LIMIT %s OFFSET %s"
+        )
+        legacy_sql = (
+            "SELECT id, detection_time, total_packets, offenders_count, severity_score, "
+            "       network_interface, detection_duration, status, "
+            "       1 AS run_count, detection_time AS first_detection_time, "
+            "       detection_time AS last_detection_time "
+            "FROM loop_detections " + where +
+            "ORDER BY detection_time DESC, id DESC "
+            "LIMIT %s OFFSET %s"
+        )
+        try:
+            cursor.execute(summary_sql, params)
+        except mysql.connector.Error as e:
+            if getattr(e, 'errno', None) != 1054:
+                raise
+            cursor.execute(legacy_sql, params)
+        results = cursor.fetchall()
+        
+        cursor.close()
+        conn.close()
+        return results
+    
+    result = execute_with_error_handling("get_loop_detection_summaries", _get_summaries, show_dialog=False)
+    return result if result is not None else []
+
+def get_loop_detection_offenders(detection_id):
+    """Get the offender rows (mac, severity, reason, interface) for one detection."""
+    def _get_offenders():
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT mac, severity, reason, network_interface FROM loop_detection_offenders "
+            "WHERE detection_id = %s ORDER BY severity DESC",
+            (detection_id,)
+        )
+        results = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        return results
+    
+    result = execute_with_error_handling("get_loop_detection_offenders", _get_offenders, show_dialog=False)
+    return result if result is not None else []
+
+def get_mac_offender_history(mac, limit=100):
+    """
+    Get every detection in which a MAC was an offender, newest first.
+    
+    Returns:
+        list: Dicts with detection_id, detection_time, status, severity, reason, network_interface
+    """
+    def _get_mac_history():
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT o.detection_id, d.detection_time, d.status, o.severity, o.reason, o.network_interface "
+            "FROM loop_detection_offenders o "
+            "JOIN loop_detections d ON d.id = o.detection_id "
+            "WHERE o.mac = %s "
+            "ORDER BY o.detection_id DESC "
+            "LIMIT %s",
+            (mac, limit)
+        )
+        results = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        return results
+    
+    result = execute_with_error_handling("get_mac_offender_history", _get_mac_history, show_dialog=False)
+    return result if result is not None else []
+
+def get_top_loop_offenders(days=7, limit=10):
+    """
+    Get the MACs that were offenders most often in the last `days` days.
+    
+    Returns:
+        list: Dicts with mac, occurrences, max_severity, avg_severity, last_seen
+    """
+    def _get_top():
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT o.mac, COUNT(*) AS occurrences, MAX(o.severity) AS max_severity, "
+            "       AVG(o.severity) AS avg_severity, MAX(d.detection_time) AS last_seen "
+            "FROM loop_detection_offenders o "
+            "JOIN loop_detections d ON d.id = o.detection_id "
+            "WHERE d.detection_time >= NOW() - INTERVAL %s DAY "
+            "GROUP BY o.mac "
+            "ORDER BY occurrences DESC, max_severity DESC "
+            "LIMIT %s",
+            (int(days), int(limit))
+        )
+        results = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        return results
+    
+    result = execute_with_error_handling("get_top_loop_offenders", _get_top, show_dialog=False)
+    return result if result is not None else []
+
 def database_health_check():
     """
     Comprehensive database health check
@@ -1264,7 +1628,8 @@ def create_network_clients_table():
             connection_count INT DEFAULT 1,
             device_type VARCHAR(100),
             notes TEXT,
-            UNIQUE KEY unique_mac (mac_address)
+            UNIQUE KEY unique_mac (mac_address),
+            INDEX idx_online_last_seen (is_online, last_seen)
         )
         """
         
@@ -1278,6 +1643,10 @@ def create_network_clients_table():
         except Exception as _e:
             # Non-fatal: table may already have columns or permissions limited
             print(f"  Warning: could not ensure router columns: {_e}")
+        try:
+            ensure_network_clients_indexes()
+        except Exception as _e:
+            print(f"  Warning: could not ensure network_clients indexes: {_e}")
         
         # Create connection history table
         create_history_table_sql = """
@@ -1331,6 +1700,20 @@ def ensure_network_clients_router_columns():
         # Log but don't crash
         print(f" Warning: ensure_network_clients_router_columns failed: {e}")
 
+def ensure_network_clients_indexes():
+    """Add the (is_online, last_seen) index used by bulk offline marking to older tables."""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SHOW INDEX FROM network_clients WHERE Key_name = 'idx_online_last_seen'")
+        if not cursor.fetchall():
+            cursor.execute("ALTER TABLE network_clients ADD INDEX idx_online_last_seen (is_online, last_seen)")
+            conn.commit()
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        print(f" Warning: ensure_network_clients_indexes failed: {e}")
+
 def create_connection_history_table():
     """Create the connection_history table if it doesn't exist."""
     try:
@@ -1474,7 +1857,8 @@ def update_client_offline_status(mac_address):
         conn = get_connection()
         cursor = conn.cursor()
         
-        update_sql = "UPDATE network_clients SET is_online = FALSE WHERE mac_address = %s"
+        # Keep last_seen: the column auto-updates on any row change
+        update_sql = "UPDATE network_clients SET is_online = FALSE, last_seen = last_seen WHERE mac_address = %s"
         cursor.execute(update_sql, (mac_address,))
         
         conn.commit()
@@ -1511,6 +1895,150 @@ def log_connection_event(mac_address, event_type, ip_address=None, previous_ip=N
         print(f" Error logging connection event: {e}")
         return None
 
+_CONNECTION_EVENT_INSERT_SQL = """
+INSERT INTO connection_history
+(mac_address, ip_address, event_type, previous_ip, ping_latency_ms,
+ hostname, vendor, session_duration_seconds)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+_SEEN_CLIENT_UPSERT_SQL = """
+INSERT INTO network_clients
+(mac_address, ip_address, hostname, vendor, router_id, router_name, ping_latency_ms,
+ first_seen, last_seen, is_online)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, TRUE)
+ON DUPLICATE KEY UPDATE
+    connection_count = connection_count + IF(is_online, 0, 1),
+    ip_address = COALESCE(VALUES(ip_address), ip_address),
+    hostname = COALESCE(VALUES(hostname), hostname),
+    vendor = COALESCE(VALUES(vendor), vendor),
+    router_id = COALESCE(VALUES(router_id), router_id),
+    router_name = COALESCE(VALUES(router_name), router_name),
+    ping_latency_ms = VALUES(ping_latency_ms),
+    last_seen = VALUES(last_seen),
+    is_online = TRUE
+"""
+
+_MARK_OFFLINE_SQL = (
+    "UPDATE network_clients SET is_online = FALSE, last_seen = last_seen "
+    "WHERE is_online = TRUE AND last_seen < %s"
+)
+
+
+def _connection_event_rows(events):
+    return [
+        (e["mac_address"], e.get("ip_address"), e["event_type"], e.get("previous_ip"),
+         e.get("ping_latency"), e.get("hostname"), e.get("vendor"), e.get("session_duration"))
+        for e in events
+    ]
+
+def log_connection_events(events):
+    """
+    Log many connection events in one batched INSERT.
+
+    Args:
+        events: Dicts with log_connection_event's keyword arguments
+
+    Returns:
+        int: Rows written
+    """
+    if not events:
+        return 0
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.executemany(_CONNECTION_EVENT_INSERT_SQL, _connection_event_rows(events))
+        conn.commit()
+        written = cursor.rowcount
+        cursor.close()
+        conn.close()
+        return written
+    except Exception as e:
+        print(f" Error logging connection events: {e}")
+        return 0
+
+def mark_clients_offline(last_seen_before):
+    """
+    Mark every online client not seen since `last_seen_before` as offline, in one UPDATE.
+
+    Returns:
+        int: Clients marked offline
+    """
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(_MARK_OFFLINE_SQL, (last_seen_before,))
+        conn.commit()
+        updated = cursor.rowcount
+        cursor.close()
+        conn.close()
+        return updated
+    except Exception as e:
+        print(f" Error marking clients offline: {e}")
+        return 0
+
+def apply_client_snapshot(seen_clients, events, seen_at, offline_before):
+    """
+    Persist one discovery cycle in a single transaction.
+
+    - Clients seen this cycle are upserted with one batched INSERT ... ON
+      DUPLICATE KEY UPDATE (last_seen = seen_at, is_online = TRUE;
+      connection_count only grows when a client comes back online).
+    - Connection events are written with one executemany.
+    - Online clients with last_seen < offline_before are marked offline by a
+      single UPDATE.
+
+    Args:
+        seen_clients: Dicts with mac_address, ip_address, hostname, vendor,
+            ping_latency and optional router_id / router_name
+        events: Event dicts (see log_connection_events)
+        seen_at (datetime): Cycle timestamp written as last_seen
+        offline_before (datetime): Offline cut-off
+
+    Returns:
+        dict: {"seen": int, "events": int, "marked_offline": int} or None on error
+    """
+    import mysql.connector
+
+    seen_rows = [
+        (c["mac_address"], c.get("ip_address"), c.get("hostname"), c.get("vendor"),
+         c.get("router_id"), c.get("router_name"), c.get("ping_latency"), seen_at, seen_at)
+        for c in seen_clients
+    ]
+    event_rows = _connection_event_rows(events)
+
+    def _apply():
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            if seen_rows:
+                cursor.executemany(_SEEN_CLIENT_UPSERT_SQL, seen_rows)
+            if event_rows:
+                cursor.executemany(_CONNECTION_EVENT_INSERT_SQL, event_rows)
+            cursor.execute(_MARK_OFFLINE_SQL, (offline_before,))
+            marked_offline = cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        return {"seen": len(seen_rows), "events": len(event_rows), "marked_offline": marked_offline}
+
+    try:
+        return _apply()
+    except mysql.connector.Error as e:
+        if getattr(e, 'errno', None) == 1054:
+            try:
+                ensure_network_clients_router_columns()
+                return _apply()
+            except Exception as inner:
+                print(f" Error applying client snapshot after migrating columns: {inner}")
+                return None
+        print(f" Error applying client snapshot: {e}")
+        return None
+
 def get_connection_history(mac_address=None, limit=100, event_type=None):
     """Get connection history for a specific client or all clients."""
     try:
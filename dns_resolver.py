@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Reverse DNS Resolver Module
+Cached, concurrent reverse-DNS lookups so packet capture and subnet scans
+never block on socket.gethostbyaddr timeouts.
+"""
+
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+UNKNOWN_HOSTNAME = "Unknown"
+
+
+class ReverseDNSResolver:
+    """
+    Reverse DNS resolver with a TTL cache and a bounded worker pool.
+
+    - Successful lookups are cached for `positive_ttl` seconds, failures
+      (NXDOMAIN, timeouts) for `negative_ttl` seconds.
+    - Lookups run on at most `max_workers` threads; concurrent requests for
+      the same IP share one lookup.
+    - resolve_later() never blocks: it answers from cache or queues the
+      lookup and fires a callback when it completes.
+
+    Args:
+        max_workers (int): Concurrent lookups
+        positive_ttl (float): Seconds to cache a resolved hostname
+        negative_ttl (float): Seconds to cache a failed lookup
+        max_entries (int): Cache size (least recently used entries are evicted)
+        max_pending (int): Queued lookups allowed before new ones are dropped
+    """
+
+    def __init__(self, max_workers=8, positive_ttl=3600.0, negative_ttl=300.0,
+                 max_entries=4096, max_pending=1024):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rdns")
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # ip -> (hostname or None, expires_at)
+        self._pending = {}           # ip -> Future
+        self._callbacks = {}         # ip -> [callback(ip, hostname)]
+
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "resolved": 0,
+            "failed": 0,
+            "dropped": 0,
+            "total_latency": 0.0,
+            "max_latency": 0.0
+        }
+
+    # --- cache ---
+
+    def _cached(self, ip, now):
+        """(found, hostname_or_None) from cache; caller holds the lock."""
+        entry = self._cache.get(ip)
+        if entry is None:
+            return False, None
+        hostname, expires_at = entry
+        if now >= expires_at:
+            del self._cache[ip]
+            return False, None
+        self._cache.move_to_end(ip)
+        return True, hostname
+
+    def _store(self, ip, hostname, now):
+        ttl = self.positive_ttl if hostname else self.negative_ttl
+        self._cache[ip] = (hostname, now + ttl)
+        self._cache.move_to_end(ip)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def get_cached(self, ip):
+        """
+        Cache-only lookup.
+
+        Returns:
+            str | None: Hostname, UNKNOWN_HOSTNAME for a cached failure, or
+            None if the IP is not cached
+        """
+        with self._lock:
+            found, hostname = self._cached(ip, time.time())
+        if not found:
+            return None
+        return hostname or UNKNOWN_HOSTNAME
+
+    # --- lookups ---
+
+    def _lookup(self, ip):
+        started = time.perf_counter()
+        try:
+            hostname = socket.gethostbyaddr(ip)[0]
+        except Exception:
+            hostname = None
+        latency = time.perf_counter() - started
+
+        with self._lock:
+            self._store(ip, hostname, time.time())
+            self._pending.pop(ip, None)
+            callbacks = self._callbacks.pop(ip, [])
+            self.stats["resolved" if hostname else "failed"] += 1
+            self.stats["total_latency"] += latency
+            self.stats["max_latency"] = max(self.stats["max_latency"], latency)
+
+        result = hostname or UNKNOWN_HOSTNAME
+        for callback in callbacks:
+            try:
+                callback(ip, result)
+            except Exception:
+                pass
+        return result
+
+    def _submit(self, ip, callback=None):
+        """
+        Answer from cache or queue a lookup. Caller must NOT hold the lock.
+
+        Returns:
+            (str | None, Future | None): cached hostname, or the pending future
+        """
+        with self._lock:
+            self.stats["lookups"] += 1
+            found, hostname = self._cached(ip, time.time())
+            if found:
+                self.stats["hits" if hostname else "negative_hits"] += 1
+                return hostname or UNKNOWN_HOSTNAME, None
+
+            self.stats["misses"] += 1
+            if callback is not None:
+                self._callbacks.setdefault(ip, []).append(callback)
+
+            future = self._pending.get(ip)
+            if future is None:
+                if len(self._pending) >= self.max_pending:
+                    self.stats["dropped"] += 1
+                    self._callbacks.pop(ip, None)
+                    return UNKNOWN_HOSTNAME, None
+                future = self._executor.submit(self._lookup, ip)
+                self._pending[ip] = future
+            return None, future
+
+    def resolve(self, ip, timeout=2.0):
+        """
+        Resolve one IP, waiting at most `timeout` seconds.
+
+        A lookup that outlives the timeout keeps running and fills the cache
+        for the next caller.
+        """
+        if not ip:
+            return UNKNOWN_HOSTNAME
+        hostname, future = self._submit(ip)
+        if future is None:
+            return hostname
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return UNKNOWN_HOSTNAME
+
+    def resolve_later(self, ip, callback=None):
+        """
+        Non-blocking lookup for capture paths.
+
+        Returns:
+            str | None: Hostname (or UNKNOWN_HOSTNAME) if cached, else None; in
+            that case callback(ip, hostname) is called once the lookup finishes
+        """
+        if not ip:
+            return UNKNOWN_HOSTNAME
+        hostname, _ = self._submit(ip, callback)
+        return hostname
+
+    def resolve_many(self, ips, timeout=3.0):
+        """
+        Resolve many IPs concurrently, waiting at most `timeout` seconds overall.
+
+        Returns:
+            dict: {ip: hostname}; IPs still unresolved at the deadline map to
+            UNKNOWN_HOSTNAME (their lookups continue in the background)
+        """
+        results = {}
+        futures = {}
+        for ip in dict.fromkeys(ip for ip in ips if ip):
+            hostname, future = self._submit(ip)
+            if future is None:
+                results[ip] = hostname
+            else:
+                futures[ip] = future
+
+        if futures:
+            wait(list(futures.values()), timeout=timeout)
+            for ip, future in futures.items():
+                results[ip] = future.result() if future.done() else UNKNOWN_HOSTNAME
+        return results
+
+    def wait_pending(self, ips=None, timeout=2.0):
+        """Wait up to `timeout` seconds for queued lookups (all, or just `ips`) to finish."""
+        with self._lock:
+            if ips is None:
+                futures = list(self._pending.values())
+            else:
+                futures = [self._pending[ip] for ip in set(ips) if ip in self._pending]
+        if futures:
+            wait(futures, timeout=timeout)
+
+    # --- reporting ---
+
+    def get_stats(self):
+        """Cache hit rate, lookup latency and queue figures."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["cache_size"] = len(self._cache)
+            stats["pending"] = len(self._pending)
+        completed = stats["resolved"] + stats["failed"]
+        answered_from_cache = stats["hits"] + stats["negative_hits"]
+        stats["hit_rate"] = answered_from_cache / stats["lookups"] if stats["lookups"] else 0.0
+        stats["avg_latency_ms"] = (stats["total_latency"] / completed * 1000) if completed else 0.0
+        stats["max_latency_ms"] = stats["max_latency"] * 1000
+        del stats["total_latency"], stats["max_latency"]
+        return stats
+
+    def format_stats(self):
+        stats = self.get_stats()
+        return (f"rDNS: {stats['hit_rate'] * 100:.0f}% cache hits of {stats['lookups']} lookups, "
+                f"avg {stats['avg_latency_ms']:.0f} ms, max {stats['max_latency_ms']:.0f} ms, "
+                f"{stats['pending']} pending")
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    """Process-wide ReverseDNSResolver."""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = ReverseDNSResolver()
+        return _resolver
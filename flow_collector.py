@@ -0,0 +1,624 @@
+"""
+NetFlow / IPFIX Collector
+UDP collector for NetFlow v5, NetFlow v9 and IPFIX exports from routers.
+
+Records are decoded with precompiled struct layouts (a fixed one for v5, one
+compiled per template for v9/IPFIX) and folded in memory into per-exporter
+byte/packet totals and per-host top talkers. Every flush interval the
+totals become one bandwidth_logs row per exporter that maps to a router, so
+bandwidth is measured at the router instead of at our own NIC.
+"""
+
+import heapq
+import ipaddress
+import logging
+import socket
+import struct
+import threading
+import time
+from datetime import datetime
+
+
+NETFLOW_PORT = 2055
+
+_V5_HEADER = struct.Struct("!HHIIIIBBH")
+# srcaddr, dstaddr, (nexthop, input, output), dPkts, dOctets, (First .. pad2)
+_V5_RECORD = struct.Struct("!4s4s8xII24x")
+_V9_HEADER = struct.Struct("!HHIIII")
+_IPFIX_HEADER = struct.Struct("!HHIII")
+_SET_HEADER = struct.Struct("!HH")
+_FIELD = struct.Struct("!HH")
+_U16 = struct.Struct("!H")
+
+# Information elements we read (same numbers in NetFlow v9 and IPFIX)
+IN_BYTES = 1
+IN_PKTS = 2
+IPV4_SRC_ADDR = 8
+IPV4_DST_ADDR = 12
+OUT_BYTES = 23
+OUT_PKTS = 24
+IPV6_SRC_ADDR = 27
+IPV6_DST_ADDR = 28
+
+VARIABLE_LENGTH = 65535
+_INT_CODES = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+# Record tuple order produced by every decoder
+_SRC, _DST, _BYTES, _PKTS = range(4)
+_ROLES = {
+    IPV4_SRC_ADDR: _SRC, IPV6_SRC_ADDR: _SRC,
+    IPV4_DST_ADDR: _DST, IPV6_DST_ADDR: _DST,
+    IN_BYTES: _BYTES, IN_PKTS: _PKTS
+}
+# Egress counters stand in when a template carries no ingress ones
+_FALLBACK_ROLES = {OUT_BYTES: _BYTES, OUT_PKTS: _PKTS}
+
+
+class FlowTemplate:
+    """
+    A v9/IPFIX template compiled into a struct layout.
+
+    Fixed-length templates unpack whole data sets with Struct.iter_unpack;
+    templates with variable-length (IPFIX) fields fall back to walking each
+    record. Templates without addresses and a byte counter (e.g. options
+    templates) are kept only so their data sets are recognised and skipped.
+
+    Args:
+        template_id (int): Template ID
+        fields (list): [(element_id, length), ...] in record order
+            (enterprise elements carry element_id | 0x8000 and are skipped)
+    """
+
+    __slots__ = ("template_id", "fields", "usable", "record_length", "variable",
+                 "_struct", "_order", "_convert", "_roles")
+
+    def __init__(self, template_id, fields):
+        self.template_id = template_id
+        self.fields = fields
+        self.variable = any(length == VARIABLE_LENGTH for _, length in fields)
+
+        roles = {}
+        for index, (element, _) in enumerate(fields):
+            role = _ROLES.get(element)
+            if role is not None and role not in roles:
+                roles[role] = index
+        for index, (element, _) in enumerate(fields):
+            role = _FALLBACK_ROLES.get(element)
+            if role is not None and role not in roles:
+                roles[role] = index
+        self._roles = roles
+        self.usable = _SRC in roles and _DST in roles and _BYTES in roles
+
+        self.record_length = None if self.variable else sum(length for _, length in fields)
+        self._struct = None
+        self._order = None
+        self._convert = ()
+        if self.usable and not self.variable:
+            self._compile()
+
+    def _compile(self):
+        wanted = {index: role for role, index in self._roles.items()}
+        fmt = ["!"]
+        position = {}
+        convert = []
+        for index, (element, length) in enumerate(self.fields):
+            role = wanted.get(index)
+            if role is None:
+                fmt.append(f"{length}x")
+                continue
+            position[role] = len(position)
+            if role in (_SRC, _DST) or length not in _INT_CODES:
+                fmt.append(f"{length}s")
+                if role not in (_SRC, _DST):
+                    convert.append(position[role])  # Odd-width counter (reduced-size encoding)
+            else:
+                fmt.append(_INT_CODES[length])
+        self._struct = struct.Struct("".join(fmt))
+        # Unpacked tuple -> (src, dst, bytes, packets); packets may be missing
+        self._order = tuple(position.get(role) for role in (_SRC, _DST, _BYTES, _PKTS))
+        self._convert = tuple(convert)
+
+    def decode(self, data, offset, end, out, multiplier=1):
+        """Append (src, dst, bytes, packets) for each record in data[offset:end]; returns the count."""
+        if not self.usable:
+            return 0
+        if self.variable:
+            return self._decode_variable(data, offset, end, out, multiplier)
+        size = self._struct.size
+        count = (end - offset) // size
+        if not count:
+            return 0
+        view = memoryview(data)[offset:offset + count * size]
+        src_i, dst_i, bytes_i, pkts_i = self._order
+        convert = self._convert
+        for values in self._struct.iter_unpack(view):
+            if convert:
+                values = list(values)
+                for i in convert:
+                    values[i] = int.from_bytes(values[i], "big")
+            out.append((values[src_i], values[dst_i], values[bytes_i] * multiplier,
+                        (values[pkts_i] if pkts_i is not None else 0) * multiplier))
+        return count
+
+    def _decode_variable(self, data, offset, end, out, multiplier):
+        roles = {index: role for role, index in self._roles.items()}
+        # Each variable-length field takes at least its one length byte
+        minimum = sum(1 if length == VARIABLE_LENGTH else length for _, length in self.fields)
+        count = 0
+        while end - offset >= minimum:
+            record = [None, None, 0, 0]
+            for index, (_, length) in enumerate(self.fields):
+                if length == VARIABLE_LENGTH:
+                    if offset >= end:
+                        return count  # Record cut short before its length byte
+                    length = data[offset]
+                    offset += 1
+                    if length == 255:
+                        if offset + 2 > end:
+                            return count
+                        length = _U16.unpack_from(data, offset)[0]
+                        offset += 2
+                if offset + length > end:
+                    return count  # Trailing padding
+                role = roles.get(index)
+                if role is not None:
+                    chunk = bytes(data[offset:offset + length])
+                    record[role] = chunk if role in (_SRC, _DST) else int.from_bytes(chunk, "big")
+                offset += length
+            out.append((record[_SRC], record[_DST], record[_BYTES] * multiplier, record[_PKTS] * multiplier))
+            count += 1
+        return count
+
+
+class FlowDecoder:
+    """
+    Stateful NetFlow v5/v9/IPFIX datagram decoder.
+
+    v9 and IPFIX templates are cached per (exporter, version, source ID /
+    observation domain, template ID); data sets that arrive before their
+    template are counted and dropped.
+    """
+
+    def __init__(self):
+        self.templates = {}
+        self.stats = {
+            "datagrams": 0,
+            "flows": 0,
+            "templates": 0,
+            "missing_template": 0,  # Data sets seen before their template
+            "malformed": 0,
+            "unsupported_version": 0
+        }
+
+    def decode(self, data, exporter):
+        """
+        Decode one export datagram.
+
+        Args:
+            data (bytes): UDP payload
+            exporter (str): Exporter IP address (template scope)
+
+        Returns:
+            list: (src, dst, bytes, packets) per flow; addresses are packed bytes
+        """
+        out = []
+        self.stats["datagrams"] += 1
+        try:
+            version = _U16.unpack_from(data, 0)[0]
+            if version == 5:
+                self._decode_v5(data, out)
+            elif version == 9:
+                self._decode_v9(data, exporter, out)
+            elif version == 10:
+                self._decode_ipfix(data, exporter, out)
+            else:
+                self.stats["unsupported_version"] += 1
+        except Exception as e:
+            # Any decode failure only costs this datagram
+            logging.debug(f"Malformed flow datagram from {exporter}: {e}")
+            self.stats["malformed"] += 1
+        self.stats["flows"] += len(out)
+        return out
+
+    def _decode_v5(self, data, out):
+        _, count, _, _, _, _, _, _, sampling = _V5_HEADER.unpack_from(data, 0)
+        # Top two bits are the sampling mode, the rest the interval
+        multiplier = (sampling & 0x3FFF) or 1
+        end = _V5_HEADER.size + count * _V5_RECORD.size
+        if end > len(data):
+            self.stats["malformed"] += 1
+            end = _V5_HEADER.size + (len(data) - _V5_HEADER.size) // _V5_RECORD.size * _V5_RECORD.size
+        view = memoryview(data)[_V5_HEADER.size:end]
+        # v5 records unpack as (src, dst, packets, bytes)
+        if multiplier == 1:
+            out.extend([(src, dst, octets, pkts) for src, dst, pkts, octets in _V5_RECORD.iter_unpack(view)])
+        else:
+            out.extend([(src, dst, octets * multiplier, pkts * multiplier)
+                        for src, dst, pkts, octets in _V5_RECORD.iter_unpack(view)])
+
+    def _decode_v9(self, data, exporter, out):
+        source_id = _V9_HEADER.unpack_from(data, 0)[5]
+        self._decode_sets(data, _V9_HEADER.size, (exporter, 9, source_id), 0, 1, out)
+
+    def _decode_ipfix(self, data, exporter, out):
+        length = _U16.unpack_from(data, 2)[0]
+        domain = _IPFIX_HEADER.unpack_from(data, 0)[4]
+        self._decode_sets(data[:length] if length < len(data) else data, _IPFIX_HEADER.size,
+                          (exporter, 10, domain), 2, 3, out)
+
+    def _decode_sets(self, data, offset, scope, template_set, options_set, out):
+        total = len(data)
+        while offset + 4 <= total:
+            set_id, length = _SET_HEADER.unpack_from(data, offset)
+            if length < 4 or offset + length > total:
+                self.stats["malformed"] += 1
+                return
+            body, end = offset + 4, offset + length
+            if set_id == template_set:
+                self._read_templates(data, body, end, scope, options=False)
+            elif set_id == options_set:
+                self._read_templates(data, body, end, scope, options=True)
+            elif set_id > 255:
+                template = self.templates.get(scope + (set_id,))
+                if template is None:
+                    self.stats["missing_template"] += 1
+                else:
+                    template.decode(data, body, end, out)
+            offset = end
+
+    def _read_templates(self, data, offset, end, scope, options):
+        ipfix = scope[1] == 10
+        while offset + 4 <= end:
+            if options and ipfix:
+                template_id, field_count, _ = struct.unpack_from("!HHH", data, offset)
+                offset += 6
+            elif options:
+                # v9: scope and option lengths are in bytes of (type, length) pairs
+                template_id, scope_len, option_len = struct.unpack_from("!HHH", data, offset)
+                offset += 6
+                field_count = (scope_len + option_len) // 4
+            else:
+                template_id, field_count = _FIELD.unpack_from(data, offset)
+                offset += 4
+            if template_id < 256:
+                return  # Padding
+            fields = []
+            for _ in range(field_count):
+                element, length = _FIELD.unpack_from(data, offset)
+                offset += 4
+                if ipfix and element & 0x8000:
+                    offset += 4  # Enterprise number; element is vendor-specific
+                fields.append((element, length))
+            if options and not ipfix:
+                # v9 options templates are padded to a 4-byte boundary
+                offset += (-offset) % 4
+            if fields and not any(length for _, length in fields):
+                # A zero-length record can never be walked through a data set
+                self.stats["malformed"] += 1
+                continue
+            key = scope + (template_id,)
+            known = self.templates.get(key)
+            if known is None or known.fields != fields:
+                self.templates[key] = FlowTemplate(template_id, fields)
+                self.stats["templates"] = len(self.templates)
+
+
+_CGNAT = ipaddress.ip_network("100.64.0.0/10")
+
+
+class FlowAggregator:
+    """
+    Per-exporter totals and per-host talkers for one flush interval.
+
+    A flow is upload when its source is a local (private) address and its
+    destination is not, download in the opposite case, and internal when
+    both ends are on the same side. The local end is the talker.
+
+    Args:
+        max_hosts (int): Talkers tracked per exporter; further hosts are
+            summed into the exporter's "other" bucket
+    """
+
+    def __init__(self, max_hosts=65536):
+        self.max_hosts = max_hosts
+        self.exporters = {}  # exporter -> [bytes_in, bytes_out, bytes_internal, packets, flows, other_bytes]
+        self.talkers = {}    # exporter -> {packed host: [bytes, packets]}
+        self._local = {}
+
+    def _is_local(self, packed):
+        local = self._local.get(packed)
+        if local is None:
+            try:
+                address = ipaddress.ip_address(packed)
+                local = address.is_private or (address.version == 4 and address in _CGNAT)
+            except ValueError:
+                local = False
+            if len(self._local) > 262144:
+                self._local.clear()
+            self._local[packed] = local
+        return local
+
+    def add(self, exporter, records):
+        totals = self.exporters.get(exporter)
+        if totals is None:
+            totals = self.exporters[exporter] = [0, 0, 0, 0, 0, 0]
+            self.talkers[exporter] = {}
+        talkers = self.talkers[exporter]
+        is_local = self._is_local
+        max_hosts = self.max_hosts
+        bytes_in = bytes_out = internal = packets = 0
+        for src, dst, octets, pkts in records:
+            src_local = is_local(src)
+            if src_local != is_local(dst):
+                if src_local:
+                    bytes_out += octets
+                    host = src
+                else:
+                    bytes_in += octets
+                    host = dst
+            else:
+                internal += octets
+                host = src
+            packets += pkts
+            entry = talkers.get(host)
+            if entry is not None:
+                entry[0] += octets
+                entry[1] += pkts
+            elif len(talkers) < max_hosts:
+                talkers[host] = [octets, pkts]
+            else:
+                totals[5] += octets
+        totals[0] += bytes_in
+        totals[1] += bytes_out
+        totals[2] += internal
+        totals[3] += packets
+        totals[4] += len(records)
+
+
+def _load_router_ids():
+    """routers.ip_address -> routers.id"""
+    from db import get_connection
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, ip_address FROM routers WHERE ip_address IS NOT NULL")
+        return {ip: router_id for router_id, ip in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _write_bandwidth_logs(rows):
+    from db import insert_bandwidth_logs
+    return insert_bandwidth_logs(rows)
+
+
+class FlowCollector:
+    """
+    UDP flow collector with periodic flush into bandwidth_logs.
+
+    Args:
+        port (int): UDP port to listen on
+        host (str): Bind address
+        flush_interval (float): Seconds between flushes
+        top_n (int): Top talkers kept per exporter in each flush
+        router_lookup: Callable returning {exporter IP: router_id}
+            (default: routers.ip_address from the database)
+        sink: Callable(rows) receiving [(router_id, download_mbps, upload_mbps,
+            latency_ms, timestamp), ...] (default: db.insert_bandwidth_logs)
+        rcvbuf (int): Socket receive buffer size in bytes
+    """
+
+    def __init__(self, port=NETFLOW_PORT, host="0.0.0.0", flush_interval=60.0, top_n=10,
+                 router_lookup=None, sink=None, rcvbuf=4 << 20):
+        self.port = port
+        self.host = host
+        self.flush_interval = flush_interval
+        self.top_n = top_n
+        self.router_lookup = router_lookup or _load_router_ids
+        self.sink = sink or _write_bandwidth_logs
+        self.rcvbuf = rcvbuf
+
+        self.decoder = FlowDecoder()
+        self._aggregator = FlowAggregator()
+        self._lock = threading.Lock()
+        self._sock = None
+        self._threads = []
+        self._stop = threading.Event()
+        self._last_flush = time.monotonic()
+        self._latest = {}  # exporter -> summary of the last flush
+
+        self.stats = {
+            "flushes": 0,
+            "rows_written": 0,
+            "unknown_exporters": 0,  # Exporters with no matching router in the last flush
+            "last_flush": None,
+            "started": None
+        }
+
+    # --- ingest ---
+
+    def handle_datagram(self, data, exporter):
+        """Decode one datagram and fold its flows into the current interval."""
+        with self._lock:
+            records = self.decoder.decode(data, exporter)
+            if records:
+                self._aggregator.add(exporter, records)
+        return len(records)
+
+    def _receive_loop(self):
+        sock = self._sock
+        while not self._stop.is_set():
+            try:
+                data, address = sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self._stop.is_set():
+                    break
+                raise
+            try:
+                self.handle_datagram(data, address[0])
+            except Exception as e:
+                # Never let one bad datagram stop collection
+                logging.debug(f"Flow collector dropped datagram from {address[0]}: {e}")
+                with self._lock:
+                    self.decoder.stats["malformed"] += 1
+
+    # --- flush ---
+
+    def flush(self):
+        """
+        Close the current interval: publish per-exporter summaries and write
+        one bandwidth_logs row per exporter that maps to a router.
+
+        Returns:
+            dict: exporter -> summary
+        """
+        now = time.monotonic()
+        with self._lock:
+            aggregator, self._aggregator = self._aggregator, FlowAggregator(self._aggregator.max_hosts)
+            elapsed = max(now - self._last_flush, 1e-6)
+            self._last_flush = now
+
+        try:
+            routers = self.router_lookup() or {}
+        except Exception as e:
+            logging.warning(f"Flow collector could not load routers: {e}")
+            routers = {}
+
+        when = datetime.now().replace(microsecond=0)
+        summaries = {}
+        rows = []
+        unknown = 0
+        for exporter, (bytes_in, bytes_out, internal, packets, flows, other) in aggregator.exporters.items():
+            talkers = heapq.nlargest(self.top_n, aggregator.talkers[exporter].items(), key=lambda item: item[1][0])
+            router_id = routers.get(exporter)
+            summary = {
+                "exporter": exporter,
+                "router_id": router_id,
+                "interval": round(elapsed, 3),
+                "download_mbps": round(bytes_in * 8 / elapsed / 1e6, 3),
+                "upload_mbps": round(bytes_out * 8 / elapsed / 1e6, 3),
+                "bytes_in": bytes_in,
+                "bytes_out": bytes_out,
+                "bytes_internal": internal,
+                "packets": packets,
+                "flows": flows,
+                "untracked_bytes": other,
+                "top_talkers": [
+                    {"ip": str(ipaddress.ip_address(host)), "bytes": counts[0], "packets": counts[1]}
+                    for host, counts in talkers
+                ],
+                "timestamp": when.isoformat()
+            }
+            summaries[exporter] = summary
+            if router_id is None:
+                unknown += 1
+            else:
+                rows.append((router_id, summary["download_mbps"], summary["upload_mbps"], None, when))
+
+        if rows:
+            try:
+                if self.sink(rows) is not False:
+                    self.stats["rows_written"] += len(rows)
+            except Exception as e:
+                logging.error(f"Flow collector flush failed: {e}")
+
+        with self._lock:
+            # Exporters that went quiet keep their last summary
+            self._latest.update(summaries)
+            self.stats["flushes"] += 1
+            self.stats["unknown_exporters"] = unknown
+            self.stats["last_flush"] = when.isoformat()
+        return summaries
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Flow collector flush error: {e}")
+
+    # --- control ---
+
+    def start(self):
+        if self._sock is not None:
+            return self
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        except OSError:
+            pass
+        sock.bind((self.host, self.port))
+        sock.settimeout(0.5)
+        self._sock = sock
+        self._stop.clear()
+        self._last_flush = time.monotonic()
+        self.stats["started"] = datetime.now().replace(microsecond=0).isoformat()
+        self._threads = [
+            threading.Thread(target=self._receive_loop, daemon=True, name="flow-collector-rx"),
+            threading.Thread(target=self._flush_loop, daemon=True, name="flow-collector-flush")
+        ]
+        for thread in self._threads:
+            thread.start()
+        logging.info(f"Flow collector listening on udp/{self.host}:{self.port}")
+        return self
+
+    def stop(self, flush=True):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if flush:
+            self.flush()
+
+    def is_running(self):
+        """True while the socket is open and the receive thread is alive."""
+        return self._sock is not None and bool(self._threads) and self._threads[0].is_alive()
+
+    # --- queries ---
+
+    def get_exporters(self):
+        """Summaries from the last flush, one per exporter."""
+        with self._lock:
+            return [dict(summary) for summary in self._latest.values()]
+
+    def get_top_talkers(self, exporter=None, limit=None):
+        """Top talkers of the last flush, for one exporter or across all of them."""
+        with self._lock:
+            summaries = [self._latest[exporter]] if exporter in self._latest else (
+                [] if exporter else list(self._latest.values()))
+            talkers = [dict(t, exporter=s["exporter"]) for s in summaries for t in s["top_talkers"]]
+        talkers.sort(key=lambda t: t["bytes"], reverse=True)
+        return talkers[:limit or self.top_n]
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update(self.decoder.stats)
+            stats["exporters"] = len(self._latest)
+            stats["pending_exporters"] = len(self._aggregator.exporters)
+        stats["port"] = self.port
+        stats["flush_interval"] = self.flush_interval
+        stats["running"] = self.is_running()
+        return stats
+
+
+_collector = None
+_collector_lock = threading.Lock()
+
+
+def get_flow_collector(port=NETFLOW_PORT, start=True, **kwargs):
+    """Get or create the process-wide flow collector."""
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            _collector = FlowCollector(port=port, **kwargs)
+            if start:
+                _collector.start()
+        return _collector
@@ -0,0 +1,277 @@
+"""
+NetFlow / IPFIX Replay Tool
+Replays captured flow-export packets against the flow collector, and can
+synthesize captures for testing when no router export is at hand.
+
+Modes:
+    send      - send each captured datagram to a collector over UDP, at the
+                captured pace (scaled by --speed) or at a fixed --rate
+    decode    - feed the datagrams straight into FlowCollector in-process and
+                report decoded flows/sec and the per-exporter summary
+    synth     - write a pcap of NetFlow v5, v9 or IPFIX exports with random
+                flows between LAN hosts and internet peers
+
+Usage:
+    python flow_replay.py synth flows.pcap --version 9 --flows 200000
+    python flow_replay.py decode flows.pcap
+    python flow_replay.py send flows.pcap --target 127.0.0.1:2055 --rate 2000
+"""
+
+import argparse
+import json
+import random
+import socket
+import struct
+import sys
+import time
+
+from flow_collector import FlowCollector, NETFLOW_PORT
+
+
+_PCAP_HEADER = struct.Struct("<IHHiIII")
+_PCAP_RECORD = struct.Struct("<IIII")
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+
+# --- pcap ---
+
+def read_pcap(path):
+    """
+    Yield (timestamp, exporter_ip, udp_payload) for every IPv4/UDP packet.
+
+    Reads classic pcap files (either byte order, micro- or nanosecond
+    timestamps) with Ethernet, Linux cooked or raw IP link types.
+    """
+    with open(path, "rb") as f:
+        header = f.read(_PCAP_HEADER.size)
+        magic = struct.unpack("<I", header[:4])[0]
+        if magic in (0xA1B2C3D4, 0xA1B23C4D):
+            endian = "<"
+        elif magic in (0xD4C3B2A1, 0x4D3CB2A1):
+            endian = ">"
+        else:
+            raise ValueError(f"{path} is not a pcap file (pcapng is not supported)")
+        nano = magic in (0xA1B23C4D, 0x4D3CB2A1)
+        linktype = struct.unpack(endian + "I", header[20:24])[0]
+        record = struct.Struct(endian + "IIII")
+        link_len = {LINKTYPE_ETHERNET: 14, LINKTYPE_LINUX_SLL: 16, LINKTYPE_RAW: 0}.get(linktype)
+        if link_len is None:
+            raise ValueError(f"Unsupported pcap link type {linktype}")
+
+        while True:
+            head = f.read(record.size)
+            if len(head) < record.size:
+                return
+            seconds, fraction, captured, _ = record.unpack(head)
+            frame = f.read(captured)
+            offset = link_len
+            if linktype == LINKTYPE_ETHERNET:
+                ethertype = frame[12:14]
+                if ethertype == b"\x81\x00":  # 802.1Q
+                    ethertype = frame[16:18]
+                    offset += 4
+                if ethertype != b"\x08\x00":
+                    continue
+            elif linktype == LINKTYPE_LINUX_SLL and frame[14:16] != b"\x08\x00":
+                continue
+            if len(frame) < offset + 28 or frame[offset] >> 4 != 4 or frame[offset + 9] != 17:
+                continue
+            ihl = (frame[offset] & 0x0F) * 4
+            udp = offset + ihl
+            length = struct.unpack("!H", frame[udp + 4:udp + 6])[0]
+            exporter = socket.inet_ntoa(frame[offset + 12:offset + 16])
+            yield seconds + fraction / (1e9 if nano else 1e6), exporter, frame[udp + 8:udp + length]
+
+
+def write_pcap(path, datagrams, port=NETFLOW_PORT):
+    """Write (timestamp, exporter_ip, payload) tuples as Ethernet/IPv4/UDP frames."""
+    with open(path, "wb") as f:
+        f.write(_PCAP_HEADER.pack(0xA1B2C3D4, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+        collector = socket.inet_aton("192.0.2.250")
+        for timestamp, exporter, payload in datagrams:
+            udp = struct.pack("!HHHH", 40000, port, 8 + len(payload), 0) + payload
+            ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(udp), 0, 0, 64, 17, 0,
+                             socket.inet_aton(exporter), collector) + udp
+            frame = b"\x02\x00\x00\x00\x00\x02\x02\x00\x00\x00\x00\x01\x08\x00" + ip
+            seconds = int(timestamp)
+            f.write(_PCAP_RECORD.pack(seconds, int((timestamp - seconds) * 1e6), len(frame), len(frame)))
+            f.write(frame)
+
+
+# --- synthetic exports ---
+
+_V9_FIELDS = [(8, 4), (12, 4), (7, 2), (11, 2), (4, 1), (1, 4), (2, 4), (22, 4), (21, 4)]
+_IPFIX_FIELDS = [(8, 4), (12, 4), (7, 2), (11, 2), (4, 1), (1, 8), (2, 8), (152, 8), (153, 8)]
+_V9_RECORD = struct.Struct("!4s4sHHBIIII")
+_IPFIX_RECORD = struct.Struct("!4s4sHHBQQQQ")
+TEMPLATE_ID = 256
+
+
+def _random_flow(rng, lan_hosts):
+    host = rng.choice(lan_hosts)
+    peer = struct.pack("!I", rng.randrange(0x01000000, 0xDF000000))
+    packets = rng.randrange(1, 200)
+    octets = packets * rng.randrange(60, 1500)
+    return (host, peer) if rng.random() < 0.4 else (peer, host), packets, octets
+
+
+def synthesize(version=5, flows=100000, exporters=("192.0.2.1",), hosts=200, seed=7, start=None):
+    """
+    Build export datagrams for `flows` random flows spread over `exporters`.
+
+    Returns:
+        (datagrams, expected): datagrams as (timestamp, exporter, payload) and
+        the true byte/packet totals per exporter
+    """
+    rng = random.Random(seed)
+    start = start or time.time()
+    per_packet = {5: 30, 9: 24, 10: 20}[version]
+    lans = {exporter: [bytes([10, i, rng.randrange(256), rng.randrange(1, 255)]) for _ in range(hosts)]
+            for i, exporter in enumerate(exporters)}
+    expected = {exporter: {"bytes": 0, "packets": 0, "flows": 0} for exporter in exporters}
+    datagrams = []
+    sequences = dict.fromkeys(exporters, 0)
+    made = 0
+    while made < flows:
+        exporter = exporters[len(datagrams) % len(exporters)]
+        sequence = sequences[exporter]
+        batch = []
+        for _ in range(min(per_packet, flows - made)):
+            (src, dst), packets, octets = _random_flow(rng, lans[exporter])
+            batch.append((src, dst, packets, octets, rng.randrange(1024, 65535), rng.choice((80, 443, 53))))
+            totals = expected[exporter]
+            totals["bytes"] += octets
+            totals["packets"] += packets
+            totals["flows"] += 1
+        made += len(batch)
+        now = start + len(datagrams) * 0.001
+        uptime = int((now - start) * 1000)
+        if version == 5:
+            payload = struct.pack("!HHIIIIBBH", 5, len(batch), uptime, int(now), 0, sequence, 0, 0, 0)
+            payload += b"".join(
+                struct.pack("!4s4s4sHHIIIIHHBBBBHHBBH", src, dst, b"\0" * 4, 1, 2, packets, octets,
+                            uptime, uptime, sport, dport, 0, 0, 6, 0, 0, 0, 24, 0, 0)
+                for src, dst, packets, octets, sport, dport in batch)
+        elif version == 9:
+            template = struct.pack("!HH", TEMPLATE_ID, len(_V9_FIELDS)) + b"".join(
+                struct.pack("!HH", *field) for field in _V9_FIELDS)
+            template_set = struct.pack("!HH", 0, 4 + len(template)) + template
+            records = b"".join(_V9_RECORD.pack(src, dst, sport, dport, 6, octets, packets, uptime, uptime)
+                               for src, dst, packets, octets, sport, dport in batch)
+            records += b"\0" * ((-len(records)) % 4)
+            data_set = struct.pack("!HH", TEMPLATE_ID, 4 + len(records)) + records
+            sets = (template_set if sequence % 20 == 0 else b"") + data_set
+            count = len(batch) + (1 if sequence % 20 == 0 else 0)
+            payload = struct.pack("!HHIIII", 9, count, uptime, int(now), sequence, 0) + sets
+        else:
+            template = struct.pack("!HH", TEMPLATE_ID, len(_IPFIX_FIELDS)) + b"".join(
+                struct.pack("!HH", *field) for field in _IPFIX_FIELDS)
+            template_set = struct.pack("!HH", 2, 4 + len(template)) + template
+            millis = int(now * 1000)
+            records = b"".join(_IPFIX_RECORD.pack(src, dst, sport, dport, 6, octets, packets, millis, millis)
+                               for src, dst, packets, octets, sport, dport in batch)
+            data_set = struct.pack("!HH", TEMPLATE_ID, 4 + len(records)) + records
+            sets = (template_set if sequence % 20 == 0 else b"") + data_set
+            payload = struct.pack("!HHIII", 10, 16 + len(sets), int(now), sequence, 0) + sets
+        datagrams.append((now, exporter, payload))
+        sequences[exporter] += 1
+    return datagrams, expected
+
+
+# --- modes ---
+
+def replay_send(datagrams, target, speed=1.0, rate=None):
+    """Send datagrams to `target` (host, port); returns (sent, seconds)."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    started = time.perf_counter()
+    first = None
+    sent = 0
+    for timestamp, _, payload in datagrams:
+        if rate:
+            due = started + sent / rate
+        else:
+            first = timestamp if first is None else first
+            due = started + (timestamp - first) / speed if speed else started
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        sock.sendto(payload, target)
+        sent += 1
+    sock.close()
+    return sent, time.perf_counter() - started
+
+
+def replay_decode(datagrams):
+    """Decode in-process; returns the collector stats, per-exporter summaries and flows/sec."""
+    collector = FlowCollector(router_lookup=dict, sink=lambda rows: True)
+    started = time.perf_counter()
+    for _, exporter, payload in datagrams:
+        collector.handle_datagram(payload, exporter)
+    elapsed = time.perf_counter() - started
+    summaries = collector.flush()
+    stats = collector.get_stats()
+    return {
+        "datagrams": stats["datagrams"],
+        "flows": stats["flows"],
+        "seconds": round(elapsed, 3),
+        "flows_per_sec": round(stats["flows"] / elapsed) if elapsed else None,
+        "stats": stats,
+        "exporters": summaries
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay or synthesize NetFlow/IPFIX exports")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    send = sub.add_parser("send", help="Send a capture to a collector over UDP")
+    send.add_argument("pcap")
+    send.add_argument("--target", default=f"127.0.0.1:{NETFLOW_PORT}", help="Collector host:port")
+    send.add_argument("--speed", type=float, default=1.0, help="Pace multiplier (0 = as fast as possible)")
+    send.add_argument("--rate", type=float, help="Fixed datagrams per second (overrides --speed)")
+
+    decode = sub.add_parser("decode", help="Decode a capture in-process and report throughput")
+    decode.add_argument("pcap")
+    decode.add_argument("--json", help="Write the report to this JSON file")
+
+    synth = sub.add_parser("synth", help="Write a synthetic export capture")
+    synth.add_argument("pcap")
+    synth.add_argument("--version", type=int, choices=(5, 9, 10), default=5, help="5, 9 or 10 (IPFIX)")
+    synth.add_argument("--flows", type=int, default=100000)
+    synth.add_argument("--exporters", default="192.0.2.1", help="Comma-separated exporter IPs")
+    synth.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    if args.mode == "synth":
+        datagrams, expected = synthesize(args.version, args.flows, tuple(args.exporters.split(",")), seed=args.seed)
+        write_pcap(args.pcap, datagrams)
+        print(f"💾 {len(datagrams)} datagram(s), {args.flows} flow(s) written to {args.pcap}")
+        print(json.dumps(expected, indent=2))
+        return 0
+
+    datagrams = list(read_pcap(args.pcap))
+    print(f"📦 {len(datagrams)} flow datagram(s) in {args.pcap}")
+
+    if args.mode == "send":
+        host, _, port = args.target.rpartition(":")
+        sent, seconds = replay_send(datagrams, (host, int(port)), speed=args.speed, rate=args.rate)
+        print(f"📤 Sent {sent} datagram(s) to {args.target} in {seconds:.2f}s")
+        return 0
+
+    report = replay_decode(datagrams)
+    print(f"⚡ {report['flows']:,} flows in {report['seconds']}s (~{report['flows_per_sec']:,} flows/sec)")
+    for summary in report["exporters"].values():
+        print(f"  {summary['exporter']}: in {summary['bytes_in']:,} B, out {summary['bytes_out']:,} B, "
+              f"{summary['flows']:,} flows, top talker "
+              f"{summary['top_talkers'][0]['ip'] if summary['top_talkers'] else '-'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"💾 Report written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Heavy-Hitter Sketches
+Fixed-memory top-K tracking of byte counts per key (e.g. client IP).
+
+SpaceSaving keeps at most `capacity` keys. A key not being tracked evicts
+the smallest one and inherits the largest count evicted so far as an
+over-estimate, so every reported count is an upper bound, `count - error`
+is a lower bound, and the error never exceeds total / capacity; any key
+with more than that share of the traffic is guaranteed to be tracked. With
+a CountMinSketch attached, evicted counts are remembered in the sketch and
+a returning key inherits min(sketch estimate, largest evicted count), which
+tightens the error further; the sketch is only touched on evictions.
+"""
+
+import heapq
+import itertools
+
+
+class CountMinSketch:
+    """
+    Count-min sketch with conservative update.
+
+    Args:
+        width (int): Counters per row (rounded up to a power of two)
+        depth (int): Rows (independent hashes)
+    """
+
+    def __init__(self, width=1024, depth=4):
+        self.width = 1 << max(1, int(width) - 1).bit_length()
+        self.depth = depth
+        self._mask = self.width - 1
+        self._rows = [[0] * self.width for _ in range(depth)]
+
+    def _cells(self, key):
+        # Double hashing: row i uses h1 + i * h2, from a single hash of the key
+        h = hash(key)
+        h2 = (h >> 32) | 1
+        mask = self._mask
+        return [(h + i * h2) & mask for i in range(self.depth)]
+
+    def add(self, key, weight=1):
+        """Add `weight` for `key`; returns the new estimate."""
+        cells = self._cells(key)
+        rows = self._rows
+        estimate = min([row[cell] for row, cell in zip(rows, cells)]) + weight
+        for row, cell in zip(rows, cells):
+            if row[cell] < estimate:
+                row[cell] = estimate
+        return estimate
+
+    def estimate(self, key):
+        """Upper bound on the total weight added for `key`."""
+        return min([row[cell] for row, cell in zip(self._rows, self._cells(key))])
+
+    def clear(self):
+        for row in self._rows:
+            row[:] = [0] * self.width
+
+
+class SpaceSaving:
+    """
+    Space-saving top-K summary with two byte channels per key.
+
+    Channel 0 and 1 are caller-defined (e.g. download/upload); their sum is
+    the ranking count. Channel and packet figures cover the time since the
+    key was last admitted, so they are exact lower bounds.
+
+    Args:
+        capacity (int): Keys tracked at most (memory is O(capacity))
+        sketch (CountMinSketch): Optional sketch remembering evicted counts
+    """
+
+    def __init__(self, capacity=64, sketch=None):
+        self.capacity = max(1, int(capacity))
+        self.sketch = sketch
+        self.total = 0
+        self.evictions = 0
+        self._floor = 0     # Largest evicted count: bounds any untracked key's bytes
+        self._entries = {}  # key -> [count, error, channel0, channel1, packets]
+        self._heap = []     # (count when pushed, seq, key); one per key, never above its count
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def add(self, key, weight, channel=0):
+        """Count `weight` bytes (one packet) for `key` on channel 0 or 1."""
+        self.total += weight
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[0] += weight
+            entry[2 + channel] += weight
+            entry[4] += 1
+            return
+        if len(self._entries) >= self.capacity:
+            self._evict_min()
+        inherited = self._floor
+        if inherited and self.sketch is not None:
+            inherited = min(inherited, self.sketch.estimate(key))
+        entry = [inherited + weight, inherited, 0, 0, 1]
+        entry[2 + channel] = weight
+        self._entries[key] = entry
+        heapq.heappush(self._heap, (entry[0], next(self._seq), key))
+
+    def _evict_min(self):
+        """Drop the key with the smallest count."""
+        heap = self._heap
+        entries = self._entries
+        while True:
+            pushed, _, key = heap[0]
+            count = entries[key][0]
+            if count == pushed:
+                heapq.heappop(heap)
+                break
+            # Counts only grow: refresh the stale entry and look again
+            heapq.heapreplace(heap, (count, next(self._seq), key))
+        count, error = entries.pop(key)[:2]
+        self.evictions += 1
+        if count > self._floor:
+            self._floor = count
+        if self.sketch is not None:
+            # Only the bytes seen while tracked are exact; the inherited part is already bounded
+            self.sketch.add(key, count - error)
+
+    @property
+    def max_error(self):
+        """Largest possible over-count of any reported key, and most bytes any unreported key can have."""
+        return self._floor
+
+    def top(self, n=None):
+        """
+        The n largest keys, biggest first.
+
+        Returns:
+            list of dicts: {"key", "bytes" (upper bound), "error", "min_bytes"
+            (lower bound), "channel_bytes": (c0, c1), "packets", "guaranteed"
+            (True when the key is certainly among the top n)}
+        """
+        ranked = sorted(self._entries.items(), key=lambda item: item[1][0], reverse=True)
+        n = len(ranked) if n is None else n
+        # Anything outside the list could have at most this many bytes
+        threshold = max(ranked[n][1][0] if n < len(ranked) else 0, self._floor)
+        return [{
+            "key": key,
+            "bytes": count,
+            "error": error,
+            "min_bytes": count - error,
+            "channel_bytes": (c0, c1),
+            "packets": packets,
+            "guaranteed": count - error >= threshold
+        } for key, (count, error, c0, c1, packets) in ranked[:n]]
+
+    def clear(self):
+        self._entries.clear()
+        self._heap.clear()
+        self.total = 0
+        self.evictions = 0
+        self._floor = 0
+        if self.sketch is not None:
+            self.sketch.clear()
@@ -0,0 +1,381 @@
+"""
+Live Router Metrics (Shared Memory)
+Cross-process ring of recent per-router samples for zero-query live views.
+
+The Dashboard process is the single writer: every status, latency or
+bandwidth update is appended to the router's ring in a
+multiprocessing.shared_memory segment. Other processes on the machine (the
+Flask API, client window, a second console) attach read-only and read the
+records in place with struct.unpack_from - no database query, no HTTP, and
+no locks shared with the writer.
+
+Each router slot is guarded by a seqlock: the writer makes the slot's
+sequence odd, writes, then makes it even again; a reader retries when it
+saw an odd sequence or the sequence changed while it was reading. Writers
+never wait for readers. (This relies on stores becoming visible in program
+order, as they do on the x86-64 machines the app ships for.)
+
+Layout (little-endian):
+    header     64 bytes  magic, version, max_routers, ring_size, directory
+                         sequence, router count, writer pid, heartbeat
+    slots      max_routers x (slot header + ring_size records)
+    slot header          seq, head (samples written), router_id, ip, name
+    record               timestamp, latency_ms, download_mbps, upload_mbps, status
+"""
+
+import logging
+import math
+import os
+import struct
+import threading
+import time
+
+try:
+    from multiprocessing import shared_memory
+    SHARED_MEMORY_AVAILABLE = True
+except ImportError:  # Python < 3.8
+    shared_memory = None
+    SHARED_MEMORY_AVAILABLE = False
+
+
+SEGMENT_NAME = "winyfi_live_metrics"
+MAGIC = b"WLM1"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sIIIIIId")      # magic, version, max_routers, ring_size, dir_seq, count, pid, heartbeat
+HEADER_SIZE = 64
+_SLOT_HEADER = struct.Struct("<IIq16s40s")  # seq, head, router_id, ip, name
+_SEQ = struct.Struct("<I")
+_SEQ_HEAD = struct.Struct("<II")
+_RECORD = struct.Struct("<ddddi4x")         # timestamp, latency_ms, download_mbps, upload_mbps, status
+_DIR_SEQ_OFFSET = 16
+_HEARTBEAT_OFFSET = 28
+
+STATUS_UNKNOWN = -1
+STATUS_OFFLINE = 0
+STATUS_ONLINE = 1
+
+_STATUS_NAMES = {STATUS_UNKNOWN: "unknown", STATUS_OFFLINE: "offline", STATUS_ONLINE: "online"}
+
+
+def _slot_size(ring_size):
+    return _SLOT_HEADER.size + ring_size * _RECORD.size
+
+
+def _segment_size(max_routers, ring_size):
+    return HEADER_SIZE + max_routers * _slot_size(ring_size)
+
+
+def _text(raw):
+    return raw.split(b"\0", 1)[0].decode("utf-8", "replace")
+
+
+def _optional(value):
+    return None if value is None or math.isnan(value) else value
+
+
+class LiveMetricsWriter:
+    """
+    Owner of the shared segment (one per machine, in the Dashboard process).
+
+    Args:
+        name (str): Shared memory segment name
+        max_routers (int): Router slots in the segment
+        ring_size (int): Samples kept per router
+    """
+
+    def __init__(self, name=SEGMENT_NAME, max_routers=512, ring_size=120):
+        if not SHARED_MEMORY_AVAILABLE:
+            raise RuntimeError("multiprocessing.shared_memory needs Python 3.8+")
+        self.name = name
+        self.max_routers = max_routers
+        self.ring_size = ring_size
+        self._slot_size = _slot_size(ring_size)
+        size = _segment_size(max_routers, ring_size)
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a writer that did not shut down cleanly (Linux/macOS),
+            # unless that writer is still running
+            stale = _attach(name)
+            try:
+                magic, _, _, _, _, _, pid, _ = _HEADER.unpack_from(stale.buf, 0)
+                if magic == MAGIC and pid != os.getpid() and _pid_alive(pid):
+                    raise RuntimeError(f"Live metrics segment '{name}' is owned by running process {pid}")
+            finally:
+                stale.close()
+            shared_memory.SharedMemory(name=name).unlink()
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self._buf = self._shm.buf
+        self._lock = threading.Lock()  # Seqlocks allow one writer; serialise this process's threads
+        self._slots = {}   # router_id -> slot index
+        self._last = {}    # router_id -> last record values, for partial updates
+        self._buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        _HEADER.pack_into(self._buf, 0, MAGIC, VERSION, max_routers, ring_size, 0, 0, os.getpid(), time.time())
+        logging.info(f"Live metrics segment '{name}' created ({size // 1024} KiB, "
+                     f"{max_routers} routers x {ring_size} samples)")
+
+    def _slot_offset(self, index):
+        return HEADER_SIZE + index * self._slot_size
+
+    def _register(self, router_id, ip, name):
+        index = len(self._slots)
+        if index >= self.max_routers:
+            return None
+        offset = self._slot_offset(index)
+        _SLOT_HEADER.pack_into(self._buf, offset, 0, 0, int(router_id), (ip or "").encode()[:16],
+                               (name or "").encode()[:40])
+        self._slots[router_id] = index
+        # Readers rebuild their router_id -> slot map when the directory sequence moves
+        dir_seq = _SEQ.unpack_from(self._buf, _DIR_SEQ_OFFSET)[0]
+        struct.pack_into("<II", self._buf, _DIR_SEQ_OFFSET, dir_seq + 1, index + 1)
+        return index
+
+    def publish(self, router_id, status=None, latency_ms=None, download_mbps=None, upload_mbps=None,
+                timestamp=None, ip=None, name=None):
+        """
+        Append a sample for a router; fields left as None keep their previous value.
+
+        Args:
+            router_id (int): Router database ID
+            status (bool|int): True/STATUS_ONLINE, False/STATUS_OFFLINE
+            latency_ms, download_mbps, upload_mbps (float): Latest measurements
+            timestamp (float): Epoch seconds (default: now)
+            ip, name (str): Stored with the router on first publish
+
+        Returns:
+            bool: False when the segment has no free router slot
+        """
+        if isinstance(status, bool):
+            status = STATUS_ONLINE if status else STATUS_OFFLINE
+        now = time.time() if timestamp is None else timestamp
+        with self._lock:
+            index = self._slots.get(router_id)
+            if index is None:
+                index = self._register(router_id, ip, name)
+                if index is None:
+                    return False
+            last = self._last.get(router_id, (math.nan, math.nan, math.nan, STATUS_UNKNOWN))
+            values = (
+                last[0] if latency_ms is None else float(latency_ms),
+                last[1] if download_mbps is None else float(download_mbps),
+                last[2] if upload_mbps is None else float(upload_mbps),
+                last[3] if status is None else int(status)
+            )
+            self._last[router_id] = values
+
+            buf = self._buf
+            offset = self._slot_offset(index)
+            seq, head = _SEQ_HEAD.unpack_from(buf, offset)
+            _SEQ.pack_into(buf, offset, seq + 1)                      # odd: write in progress
+            record = offset + _SLOT_HEADER.size + (head % self.ring_size) * _RECORD.size
+            _RECORD.pack_into(buf, record, now, *values)
+            _SEQ_HEAD.pack_into(buf, offset, seq + 1, head + 1)
+            _SEQ.pack_into(buf, offset, seq + 2)                      # even: consistent again
+            struct.pack_into("<d", buf, _HEARTBEAT_OFFSET, now)
+        return True
+
+    def close(self):
+        """Release and remove the segment (readers keep their mapping until they close)."""
+        if self._shm is None:
+            return
+        self._buf = None
+        try:
+            self._shm.close()
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        self._shm = None
+
+
+class LiveMetricsReader:
+    """
+    Read-only view of the segment from any process.
+
+    Raises FileNotFoundError when no writer has created the segment.
+
+    Args:
+        name (str): Shared memory segment name
+        max_retries (int): Seqlock retries before a slot read gives up
+    """
+
+    def __init__(self, name=SEGMENT_NAME, max_retries=100):
+        if not SHARED_MEMORY_AVAILABLE:
+            raise RuntimeError("multiprocessing.shared_memory needs Python 3.8+")
+        self.name = name
+        self.max_retries = max_retries
+        self._shm = _attach(name)
+        self._buf = self._shm.buf
+        magic, version, self.max_routers, self.ring_size, _, _, _, _ = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Shared memory '{name}' is not a live metrics segment")
+        self._slot_size = _slot_size(self.ring_size)
+        self._dir_seq = None
+        self._slots = {}
+        self.stats = {"reads": 0, "retries": 0, "torn": 0}
+
+    def _refresh_directory(self):
+        dir_seq, count = struct.unpack_from("<II", self._buf, _DIR_SEQ_OFFSET)
+        if dir_seq == self._dir_seq:
+            return
+        slots = {}
+        for index in range(min(count, self.max_routers)):
+            offset = HEADER_SIZE + index * self._slot_size
+            slots[_SLOT_HEADER.unpack_from(self._buf, offset)[2]] = index
+        self._slots = slots
+        self._dir_seq = dir_seq
+
+    def _read_slot(self, index, limit):
+        """(router header, records oldest first) read consistently, or None."""
+        buf = self._buf
+        offset = HEADER_SIZE + index * self._slot_size
+        ring = self.ring_size
+        self.stats["reads"] += 1
+        for _ in range(self.max_retries):
+            seq = _SEQ.unpack_from(buf, offset)[0]
+            if seq & 1:
+                self.stats["retries"] += 1
+                time.sleep(0)
+                continue
+            _, head, router_id, ip, name = _SLOT_HEADER.unpack_from(buf, offset)
+            count = min(head, ring, limit)
+            base = offset + _SLOT_HEADER.size
+            records = [_RECORD.unpack_from(buf, base + (position % ring) * _RECORD.size)
+                       for position in range(head - count, head)]
+            if _SEQ.unpack_from(buf, offset)[0] == seq:
+                return (router_id, _text(ip), _text(name)), records
+            self.stats["retries"] += 1
+        self.stats["torn"] += 1
+        return None
+
+    @staticmethod
+    def _as_dict(record):
+        timestamp, latency, download, upload, status = record
+        return {
+            "timestamp": timestamp,
+            "status": _STATUS_NAMES.get(status, "unknown"),
+            "latency_ms": _optional(latency),
+            "download_mbps": _optional(download),
+            "upload_mbps": _optional(upload)
+        }
+
+    def router_ids(self):
+        self._refresh_directory()
+        return list(self._slots)
+
+    def latest(self, router_id):
+        """Most recent sample of a router as a dict, or None."""
+        return (self.history(router_id, 1) or [None])[-1]
+
+    def history(self, router_id, limit=None):
+        """Up to `limit` recent samples of a router, oldest first ([] if unknown)."""
+        self._refresh_directory()
+        index = self._slots.get(router_id)
+        if index is None:
+            return []
+        result = self._read_slot(index, self.ring_size if limit is None else limit)
+        if result is None:
+            return []
+        return [self._as_dict(record) for record in result[1]]
+
+    def snapshot(self):
+        """Latest sample of every router: [{router_id, ip, name, timestamp, status, ...}]."""
+        self._refresh_directory()
+        rows = []
+        for router_id, index in self._slots.items():
+            result = self._read_slot(index, 1)
+            if result is None or not result[1]:
+                continue
+            (router_id, ip, name), records = result
+            rows.append(dict(self._as_dict(records[-1]), router_id=router_id, ip=ip, name=name))
+        return rows
+
+    def writer_info(self):
+        """{"pid", "heartbeat", "age_seconds", "routers"} of the writing process."""
+        _, _, _, _, _, count, pid, heartbeat = _HEADER.unpack_from(self._buf, 0)
+        return {"pid": pid, "heartbeat": heartbeat, "age_seconds": round(time.time() - heartbeat, 3),
+                "routers": count}
+
+    def writer_alive(self):
+        """True while the process that created the segment is still running."""
+        return _pid_alive(_HEADER.unpack_from(self._buf, 0)[6])
+
+    def close(self):
+        if self._shm is not None:
+            self._buf = None
+            self._shm.close()
+            self._shm = None
+
+
+def _attach(name):
+    """Attach to an existing segment without letting this process's resource tracker unlink it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # The tracker keeps one registration per name: leave the owning writer's in place
+        owned = _writer is not None and _writer.name == name
+        if os.name == "posix" and not owned:
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except Exception:
+                pass
+        return shm
+
+
+def _pid_alive(pid):
+    try:
+        import psutil
+        return psutil.pid_exists(pid)
+    except ImportError:
+        return True
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_live_writer():
+    """The process-wide writer (created on first use), or None if shared memory is unavailable."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            try:
+                _writer = LiveMetricsWriter()
+            except Exception as e:
+                logging.warning(f"Live metrics segment unavailable: {e}")
+                return None
+        return _writer
+
+
+def close_live_writer():
+    """Remove the segment on shutdown so readers see the Dashboard has gone."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+def publish_live(router_id, **values):
+    """Publish through the shared writer; never raises (live views are best effort)."""
+    writer = get_live_writer()
+    if writer is None:
+        return False
+    try:
+        return writer.publish(router_id, **values)
+    except Exception as e:
+        logging.debug(f"Live metrics publish failed for {router_id}: {e}")
+        return False
+
+
+def open_live_reader(name=SEGMENT_NAME):
+    """A reader for the running Dashboard's segment, or None when it is not running."""
+    if not SHARED_MEMORY_AVAILABLE:
+        return None
+    try:
+        return LiveMetricsReader(name)
+    except (FileNotFoundError, ValueError):
+        return None
@@ -0,0 +1,131 @@
+"""
+Loop Scan Coordinator
+Debounces and coalesces loop-detection scans triggered by router-offline
+events, so a switch dropping many APs at once produces one capture and one
+saved result instead of one overlapping capture per router.
+"""
+
+import threading
+import time
+
+
+class LoopScanBatch:
+    """One coalesced scan and the routers whose offline events it covers."""
+
+    def __init__(self):
+        self.routers = []  # [(router_ip, router_name)]
+        self.created_at = time.time()
+        self.started_at = None
+
+    def add(self, router_ip, router_name):
+        if all(ip != router_ip for ip, _ in self.routers):
+            self.routers.append((router_ip, router_name))
+
+
+class LoopScanCoordinator:
+    """
+    Coalesces router-offline loop scan requests.
+
+    - Requests arriving within `window` seconds of the first are merged
+      into a single scan.
+    - A request arriving while a scan is capturing attaches to that scan
+      instead of starting another.
+    - Each router can trigger at most once per `router_cooldown` seconds.
+
+    Args:
+        scan_fn: Callable() -> result; performs the capture (runs in a worker thread)
+        on_result: Callable(result, routers) -> None; persists/notifies once per scan,
+            where routers is the list of (router_ip, router_name) it covers
+        window (float): Debounce window in seconds
+        router_cooldown (float): Minimum seconds between triggers for the same router
+    """
+
+    def __init__(self, scan_fn, on_result, window=3.0, router_cooldown=120.0):
+        self.scan_fn = scan_fn
+        self.on_result = on_result
+        self.window = window
+        self.router_cooldown = router_cooldown
+
+        self._lock = threading.Lock()
+        self._pending = None     # Batch waiting for its window to close
+        self._in_flight = None   # Batch currently capturing
+        self._timer = None
+        self._last_trigger = {}  # {router_ip: timestamp}
+
+        self.stats = {
+            "requests": 0,
+            "scans_started": 0,
+            "coalesced": 0,       # Merged into a pending batch
+            "reused_in_flight": 0,
+            "rate_limited": 0
+        }
+
+    def request(self, router_ip, router_name=None):
+        """
+        Ask for a loop scan because `router_ip` went offline.
+
+        Returns:
+            str: "scheduled", "coalesced", "reused" or "rate_limited"
+        """
+        now = time.time()
+        router_name = router_name or router_ip
+        with self._lock:
+            self.stats["requests"] += 1
+
+            last = self._last_trigger.get(router_ip)
+            if last is not None and now - last < self.router_cooldown:
+                self.stats["rate_limited"] += 1
+                return "rate_limited"
+            self._last_trigger[router_ip] = now
+
+            if self._in_flight is not None:
+                self._in_flight.add(router_ip, router_name)
+                self.stats["reused_in_flight"] += 1
+                return "reused"
+
+            if self._pending is not None:
+                self._pending.add(router_ip, router_name)
+                self.stats["coalesced"] += 1
+                return "coalesced"
+
+            self._pending = LoopScanBatch()
+            self._pending.add(router_ip, router_name)
+            self._timer = threading.Timer(self.window, self._run_pending)
+            self._timer.daemon = True
+            self._timer.start()
+            return "scheduled"
+
+    def _run_pending(self):
+        with self._lock:
+            batch = self._pending
+            self._pending = None
+            self._timer = None
+            if batch is None:
+                return
+            batch.started_at = time.time()
+            self._in_flight = batch
+            self.stats["scans_started"] += 1
+
+        result = None
+        try:
+            result = self.scan_fn()
+        finally:
+            # Close the batch before reporting so late events start a new scan
+            with self._lock:
+                self._in_flight = None
+                routers = list(batch.routers)
+
+        if result is not None:
+            self.on_result(result, routers)
+
+    def cancel(self):
+        """Drop any scan still waiting for its debounce window (e.g. on shutdown)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+            self._pending = None
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, scan_in_flight=self._in_flight is not None)
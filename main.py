@@ -4,6 +4,7 @@ from login import show_login
 import sys
 import os
 import logging
+import multiprocessing
 import traceback
 from resource_utils import get_resource_path
 from health_check import run_health_check, show_health_check_result
@@ -133,6 +134,9 @@ def setup_global_exception_handlers(root_window) -> None:
         pass
 
 if __name__ == "__main__":
+    # Required for process-mode loop detection workers in the frozen .exe
+    multiprocessing.freeze_support()
+
     # Initialize logging first so early errors are captured
     init_logging()
     logger = logging.getLogger("winyfi")
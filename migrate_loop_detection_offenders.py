@@ -0,0 +1,88 @@
+"""
+Database migration to backfill the loop_detection_offenders table.
+
+Older loop_detections rows keep their offenders only inside the
+offenders_data JSON blob. This migration creates the offenders table (if
+needed) and copies those offenders into it so per-MAC history and the
+top-offenders queries cover past detections too.
+
+Safe to re-run: detections that already have offender rows are skipped.
+"""
+
+import json
+
+from db import get_connection, create_loop_detection_offenders_table, _offender_rows
+
+
+def migrate_loop_detection_offenders(batch_size=500):
+    """Backfill loop_detection_offenders from offenders_data JSON."""
+    print("🔧 Starting loop detection offenders backfill...")
+    create_loop_detection_offenders_table()
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            SELECT d.id, d.offenders_data, d.network_interface
+            FROM loop_detections d
+            WHERE d.offenders_count > 0
+              AND NOT EXISTS (SELECT 1 FROM loop_detection_offenders o WHERE o.detection_id = d.id)
+            ORDER BY d.id
+        """)
+        pending = cursor.fetchall()
+        print(f"  📋 {len(pending)} detections to backfill")
+        
+        inserted = 0
+        rows = []
+        for detection_id, offenders_data, interface in pending:
+            try:
+                data = json.loads(offenders_data) if isinstance(offenders_data, (str, bytes)) else (offenders_data or {})
+            except ValueError:
+                print(f"  ⚠️ Skipping detection {detection_id}: invalid offenders_data JSON")
+                continue
+            rows.extend(_offender_rows(detection_id, data.get("offenders"), data.get("stats"), interface))
+            
+            if len(rows) >= batch_size:
+                cursor.executemany(
+                    "INSERT INTO loop_detection_offenders "
+                    "(detection_id, mac, severity, reason, network_interface) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    rows
+                )
+                conn.commit()
+                inserted += len(rows)
+                rows = []
+        
+        if rows:
+            cursor.executemany(
+                "INSERT INTO loop_detection_offenders "
+                "(detection_id, mac, severity, reason, network_interface) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                rows
+            )
+            conn.commit()
+            inserted += len(rows)
+        
+        print(f"\n✅ Backfill completed: {inserted} offender rows inserted")
+        
+    except Exception as e:
+        print(f"\n❌ Backfill failed: {e}")
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("Loop Detection Offenders Backfill")
+    print("=" * 70)
+    print()
+    
+    response = input("This will populate the loop_detection_offenders table. Continue? (y/n): ")
+    if response.lower() == 'y':
+        migrate_loop_detection_offenders()
+    else:
+        print("❌ Migration cancelled")
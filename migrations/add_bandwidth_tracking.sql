@@ -21,6 +21,23 @@ CREATE TABLE IF NOT EXISTS bandwidth_snapshots (
     FOREIGN KEY (router_id) REFERENCES routers(id) ON DELETE CASCADE
 ) COMMENT 'Tracks bandwidth usage snapshots and deltas over time';
 
+-- 2b. Latest counter values per router, maintained by BandwidthTracker.record_poll_cycle
+-- (start-up reads this instead of searching bandwidth_snapshots for each router's MAX(timestamp))
+CREATE TABLE IF NOT EXISTS bandwidth_last_snapshot (
+    router_id INT NOT NULL PRIMARY KEY,
+    rx_bytes_total BIGINT UNSIGNED NOT NULL,
+    tx_bytes_total BIGINT UNSIGNED NOT NULL,
+    timestamp DATETIME NOT NULL,
+    FOREIGN KEY (router_id) REFERENCES routers(id) ON DELETE CASCADE
+) COMMENT 'Latest counter values per router (one row each)';
+
+INSERT IGNORE INTO bandwidth_last_snapshot (router_id, rx_bytes_total, tx_bytes_total, timestamp)
+SELECT router_id, rx_bytes_total, tx_bytes_total, timestamp
+FROM bandwidth_snapshots
+WHERE (router_id, timestamp) IN (
+    SELECT router_id, MAX(timestamp) FROM bandwidth_snapshots GROUP BY router_id
+);
+
 -- 3. Add computed columns to bandwidth_logs for backward compatibility (optional)
 -- This allows existing queries to still work
 ALTER TABLE bandwidth_logs
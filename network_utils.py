@@ -33,13 +33,17 @@ import os
 from scapy.all import sniff, Ether, ARP, IP, UDP, conf, srp
 import psutil
 from collections import defaultdict
-import socket
 import time
 from collections import deque
 from datetime import datetime
 import ipaddress
 import requests
 import json
+import threading
+import numpy as np
+
+from dns_resolver import get_resolver
+from oui_db import get_vendor
 
 # Ensure stdout/stderr exist in windowed bundles to keep speedtest import from failing
 if sys.stdout is None:
@@ -293,7 +297,8 @@ def _rate_bandwidth(mbps):
 # PRIMARY FUNCTIONS (Automatic - No Data Usage):
 #   - get_bandwidth(ip): Lightweight psutil-based monitoring
 #   - get_throughput(interval): Network-wide throughput snapshot
-#   - get_per_device_bandwidth(timeout): Passive per-device traffic capture
+#   - get_per_device_bandwidth(timeout, top_k=None): Passive per-device traffic capture
+#     (top_k: fixed-memory heavy-hitter mode)
 #
 # MANUAL FUNCTIONS (User-triggered - High Data Usage):
 #   - manual_speedtest(full=False): Convenience wrapper for speed tests
@@ -509,14 +514,35 @@ def get_throughput(interval=1, samples=3, filter_loopback=True):
         return 0.0, 0.0
 
 
-def get_per_device_bandwidth(timeout=5, iface=None):
+def _get_local_ipv4():
+    """First non-loopback IPv4 address of this machine, or None."""
+    try:
+        addrs = psutil.net_if_addrs()
+        for iface_name, snic_list in addrs.items():
+            for snic in snic_list:
+                if snic.family.name == "AF_INET" and snic.address != "127.0.0.1":
+                    return snic.address
+    except Exception as e:
+        logging.warning(f"Could not detect local IP: {e}")
+    return None
+
+
+def get_per_device_bandwidth(timeout=5, iface=None, top_k=None, capacity=None):
     """
     Passive per-device bandwidth monitoring using packet capture.
     Measures actual traffic per IP address without generating any network traffic.
     
+    With top_k, a fixed-size space-saving summary (heavy_hitters) replaces
+    the per-IP table: only the top_k devices by bytes are returned, memory
+    stays at `capacity` entries however many IPs are seen, and each result
+    carries "error_bytes", the most its byte count may be overstated.
+    
     Args:
         timeout (int): Capture duration in seconds
         iface (str): Network interface to monitor (auto-detected if None)
+        top_k (int): Return only the top_k devices by total bytes (None = every device)
+        capacity (int): Devices tracked in top_k mode (default: 8 * top_k); the
+            error is at most total_bytes / capacity
     
     Returns:
         dict: {
@@ -539,6 +565,9 @@ def get_per_device_bandwidth(timeout=5, iface=None):
     if iface is None:
         iface = get_default_iface()
     
+    if top_k:
+        return _get_top_device_bandwidth(timeout, iface, top_k, capacity or 8 * top_k)
+    
     device_stats = defaultdict(lambda: {
         "bytes_sent": 0,
         "bytes_recv": 0,
@@ -548,18 +577,7 @@ def get_per_device_bandwidth(timeout=5, iface=None):
     })
     
     # Get local IP to identify direction
-    local_ip = None
-    try:
-        addrs = psutil.net_if_addrs()
-        for iface_name, snic_list in addrs.items():
-            for snic in snic_list:
-                if snic.family.name == "AF_INET" and snic.address != "127.0.0.1":
-                    local_ip = snic.address
-                    break
-            if local_ip:
-                break
-    except Exception as e:
-        logging.warning(f"Could not detect local IP: {e}")
+    local_ip = _get_local_ipv4()
     
     def pkt_handler(pkt):
         try:
@@ -647,6 +665,81 @@ def get_per_device_bandwidth(timeout=5, iface=None):
     return results
 
 
+def _get_top_device_bandwidth(timeout, iface, top_k, capacity):
+    """Heavy-hitter variant of get_per_device_bandwidth (see its docstring)."""
+    from heavy_hitters import CountMinSketch, SpaceSaving
+    
+    # Channel 0: bytes the device sent, channel 1: bytes it received
+    hitters = SpaceSaving(capacity, sketch=CountMinSketch(width=max(256, 4 * capacity)))
+    macs = {}
+    
+    local_ip = _get_local_ipv4()
+    ignored = ("127.0.0.1", "0.0.0.0", "255.255.255.255")
+    
+    def pkt_handler(pkt):
+        try:
+            ip_layer = pkt.getlayer(IP)
+            if ip_layer is None:
+                return
+            src_ip = ip_layer.src
+            dst_ip = ip_layer.dst
+            pkt_len = len(pkt)
+            if local_ip:
+                if src_ip == local_ip:
+                    hitters.add(dst_ip, pkt_len, 1)
+                elif dst_ip == local_ip:
+                    hitters.add(src_ip, pkt_len, 0)
+            else:
+                hitters.add(src_ip, pkt_len, 0)
+                hitters.add(dst_ip, pkt_len, 1)
+            
+            # MACs only for devices currently in the summary, so this stays bounded too
+            ether = pkt.getlayer(Ether)
+            if ether is not None:
+                if src_ip in hitters:
+                    macs[src_ip] = ether.src
+                if dst_ip in hitters:
+                    macs[dst_ip] = ether.dst
+                if len(macs) > 2 * capacity:
+                    for ip in [ip for ip in macs if ip not in hitters]:
+                        del macs[ip]
+        except Exception as e:
+            logging.debug(f"Top-talker packet error: {e}")
+    
+    start_time = time.time()
+    try:
+        logging.info(f"Starting top-{top_k} device bandwidth capture for {timeout}s on {iface}...")
+        sniff(prn=pkt_handler, timeout=timeout, store=0, iface=iface)
+    except Exception as e:
+        logging.error(f"Per-device capture failed: {e}")
+        return {}
+    actual_duration = max(time.time() - start_time, timeout * 0.9)
+    
+    results = {}
+    for item in hitters.top(top_k + len(ignored)):
+        ip = item["key"]
+        if ip in ignored:
+            continue
+        if len(results) >= top_k:
+            break
+        bytes_sent, bytes_recv = item["channel_bytes"]
+        results[ip] = {
+            "bytes_sent": bytes_sent,
+            "bytes_recv": bytes_recv,
+            "download_mbps": round(bytes_sent * 8 / (actual_duration * 1_000_000), 3),
+            "upload_mbps": round(bytes_recv * 8 / (actual_duration * 1_000_000), 3),
+            "total_bytes": item["bytes"],
+            "error_bytes": item["error"],
+            "packets": item["packets"],
+            "mac": macs.get(ip, "Unknown"),
+            "capture_duration": round(actual_duration, 2)
+        }
+    
+    logging.info(f"Top-talker capture complete: top {len(results)} of {hitters.total} bytes, "
+                 f"{hitters.evictions} evictions, max error {hitters.max_error} bytes")
+    return results
+
+
 def get_mini_speedtest(manual=False):
     """
     Mini speedtest (1MB download, 512KB upload - MANUAL USE ONLY).
@@ -841,6 +934,447 @@ def get_default_iface():
 
 # --- Advanced Loop Detection with Multi-Subnet Support ---
 
+class TimestampRingStore:
+    """
+    Preallocated NumPy ring buffers of packet timestamps, one row per MAC.
+
+    Rows share a single 2-D float64 array so window counts, bursts and
+    frequencies can be computed for every MAC at once. Each row keeps the
+    newest `capacity` timestamps, exactly like deque(maxlen=capacity).
+    """
+
+    def __init__(self, capacity, initial_rows=64):
+        self.capacity = capacity
+        self._data = np.zeros((initial_rows, capacity), dtype=np.float64)
+        self._head = np.zeros(initial_rows, dtype=np.int64)   # next write slot
+        self._count = np.zeros(initial_rows, dtype=np.int64)  # valid entries
+        self._rows = 0
+
+    def __len__(self):
+        return self._rows
+
+    def add_row(self):
+        """Allocate a new empty row (doubling storage when full) and return its index."""
+        if self._rows == self._data.shape[0]:
+            new_rows = self._data.shape[0] * 2
+            self._data = np.resize(self._data, (new_rows, self.capacity))
+            self._head = np.resize(self._head, new_rows)
+            self._count = np.resize(self._count, new_rows)
+        row = self._rows
+        self._head[row] = 0
+        self._count[row] = 0
+        self._rows += 1
+        return row
+
+    def append(self, row, timestamp):
+        head = self._head[row]
+        self._data[row, head] = timestamp
+        self._head[row] = (head + 1) % self.capacity
+        if self._count[row] < self.capacity:
+            self._count[row] += 1
+
+    def extend(self, row, timestamps):
+        """Append many timestamps to a row in one vectorized write."""
+        timestamps = np.asarray(timestamps, dtype=np.float64)[-self.capacity:]
+        n = len(timestamps)
+        if n == 0:
+            return
+        head = self._head[row]
+        slots = (head + np.arange(n)) % self.capacity
+        self._data[row, slots] = timestamps
+        self._head[row] = (head + n) % self.capacity
+        self._count[row] = min(self.capacity, self._count[row] + n)
+
+    def row_len(self, row):
+        return int(self._count[row])
+
+    def row_array(self, row):
+        """Return a row's timestamps in append (chronological) order."""
+        count = self._count[row]
+        if count < self.capacity:
+            return self._data[row, :count].copy()
+        head = self._head[row]
+        return np.concatenate((self._data[row, head:], self._data[row, :head]))
+
+    def row_item(self, row, index):
+        count = int(self._count[row])
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("timestamp index out of range")
+        start = 0 if count < self.capacity else int(self._head[row])
+        return float(self._data[row, (start + index) % self.capacity])
+
+    def ordered_matrix(self, rows):
+        """
+        Return (matrix, counts) for the given rows, each row rotated into
+        chronological order with its valid entries first.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        counts = self._count[rows]
+        # A full ring starts at its head; a partial one starts at slot 0
+        start = np.where(counts == self.capacity, self._head[rows], 0)
+        cols = (start[:, None] + np.arange(self.capacity)[None, :]) % self.capacity
+        return self._data[rows[:, None], cols], counts
+
+    def window_counts(self, rows, current_time, window):
+        """Count entries per row with current_time - t <= window."""
+        matrix, counts = self.ordered_matrix(rows)
+        valid = np.arange(self.capacity)[None, :] < counts[:, None]
+        return np.count_nonzero(valid & (current_time - matrix <= window), axis=1)
+
+
+class _TimestampRingView:
+    """Deque-like handle onto one row of a TimestampRingStore."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def append(self, timestamp):
+        self._store.append(self._row, timestamp)
+
+    def __len__(self):
+        return self._store.row_len(self._row)
+
+    def __getitem__(self, index):
+        return self._store.row_item(self._row, index)
+
+    def __iter__(self):
+        return iter(self.to_array().tolist())
+
+    def to_array(self):
+        return self._store.row_array(self._row)
+
+
+def _as_time_array(times):
+    """Convert a ring view, deque or list of timestamps to a float64 array."""
+    if isinstance(times, _TimestampRingView):
+        return times.to_array()
+    return np.asarray(list(times), dtype=np.float64)
+
+
+def _count_bursts(times, burst_window, burst_threshold):
+    """
+    Count start positions whose following `burst_window` seconds hold at
+    least `burst_threshold` packets, using a searchsorted sliding window.
+    """
+    if len(times) < burst_threshold:
+        return 0
+    times = np.sort(times)
+    window_ends = np.searchsorted(times, times + burst_window, side="right")
+    in_window = window_ends - np.arange(len(times))
+    return int(np.count_nonzero(in_window >= burst_threshold))
+
+
+def _count_bursts_matrix(matrix, counts, burst_window, burst_threshold):
+    """
+    Row-wise _count_bursts over a chronological timestamp matrix.
+
+    Rows are laid end to end on one number line (each offset by more than
+    its own span) so a single searchsorted covers every MAC.
+    """
+    n_rows, width = matrix.shape
+    if n_rows == 0 or width == 0:
+        return np.zeros(n_rows, dtype=np.int64)
+
+    valid = np.arange(width)[None, :] < counts[:, None]
+    if not valid.any():
+        return np.zeros(n_rows, dtype=np.int64)
+
+    base = matrix[valid].min()
+    rel = np.where(valid, matrix - base, 0.0)
+    stride = rel.max() + burst_window + 1.0
+    # Padding sorts after every real timestamp + window, so it is never counted
+    rel = np.where(valid, rel, stride - 0.5)
+    rel.sort(axis=1)
+
+    flat = (rel + np.arange(n_rows)[:, None] * stride).ravel()
+    window_ends = np.searchsorted(flat, flat + burst_window, side="right")
+    in_window = window_ends - np.arange(flat.size)
+    is_burst = (in_window >= burst_threshold).reshape(n_rows, width) & valid
+
+    bursts = np.count_nonzero(is_burst, axis=1)
+    bursts[counts < burst_threshold] = 0
+    return bursts
+
+
+class _MacHistory(dict):
+    """
+    Per-MAC history mapping (used like a defaultdict).
+
+    Timestamp series live in shared TimestampRingStores; the per-MAC dict
+    holds ring views plus the small non-numeric fields.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.packet_store = TimestampRingStore(1000)
+        self.broadcast_store = TimestampRingStore(500)
+        self.arp_broadcast_store = TimestampRingStore(500)
+        self.rows = {}  # mac -> row index shared by all three stores
+
+    def __missing__(self, mac):
+        row = self.packet_store.add_row()
+        self.broadcast_store.add_row()
+        self.arp_broadcast_store.add_row()
+        self.rows[mac] = row
+        entry = {
+            "packet_times": _TimestampRingView(self.packet_store, row),
+            "ip_changes": deque(maxlen=50),
+            "subnets": set(),
+            "first_seen": None,
+            "last_ip": None,
+            # LOOP DETECTION UPDATE: Track broadcast storm patterns
+            "broadcast_times": _TimestampRingView(self.broadcast_store, row),  # Track broadcast packet timestamps
+            "arp_broadcast_times": _TimestampRingView(self.arp_broadcast_store, row),  # Track ARP broadcast timestamps
+            "fingerprint_window": deque(maxlen=500)  # Track fingerprint hashes for repetition
+        }
+        self[mac] = entry
+        return entry
+
+
+class StreamingBaseline:
+    """
+    Streaming statistics for one rate series, updated in O(1) per window.
+
+    Keeps both a Welford running mean/variance (long-term, every sample
+    weighted equally) and an exponentially weighted mean/variance (recent
+    behaviour, decays with `alpha`). Deviation checks use the EWMA figures.
+    """
+
+    __slots__ = ("alpha", "n", "mean", "m2", "ewma", "ewm_var", "last_update")
+
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma = 0.0
+        self.ewm_var = 0.0
+        self.last_update = None
+
+    def update(self, value, now=None):
+        value = float(value)
+        self.n += 1
+        # Welford
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+        # EWMA (seeded with the first sample)
+        if self.n == 1:
+            self.ewma = value
+            self.ewm_var = 0.0
+        else:
+            diff = value - self.ewma
+            incr = self.alpha * diff
+            self.ewma += incr
+            self.ewm_var = (1 - self.alpha) * (self.ewm_var + diff * incr)
+        self.last_update = now if now is not None else time.time()
+
+    @property
+    def stddev(self):
+        return (self.m2 / (self.n - 1)) ** 0.5 if self.n > 1 else 0.0
+
+    @property
+    def ewm_stddev(self):
+        return self.ewm_var ** 0.5
+
+    def zscore(self, value, min_stddev=1.0):
+        """Deviation of value from the EWMA in (floored) standard deviations."""
+        return (float(value) - self.ewma) / max(self.ewm_stddev, min_stddev)
+
+    def to_dict(self):
+        return {"n": self.n, "mean": self.mean, "m2": self.m2, "ewma": self.ewma,
+                "ewm_var": self.ewm_var, "last_update": self.last_update}
+
+    @classmethod
+    def from_dict(cls, data, alpha=0.1):
+        baseline = cls(alpha)
+        baseline.n = int(data.get("n", 0))
+        baseline.mean = float(data.get("mean", 0.0))
+        baseline.m2 = float(data.get("m2", 0.0))
+        baseline.ewma = float(data.get("ewma", 0.0))
+        baseline.ewm_var = float(data.get("ewm_var", 0.0))
+        baseline.last_update = data.get("last_update")
+        return baseline
+
+
+def _default_baseline_file():
+    """loop_baselines.json next to the executable (frozen) or this module."""
+    if getattr(sys, 'frozen', False):
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, "loop_baselines.json")
+
+
+class TrafficBaselineStore:
+    """
+    Persisted traffic baselines for LoopDetectionEngine.
+
+    Holds a StreamingBaseline per interface and per MAC for each rate in
+    RATE_KEYS, plus the learned legitimate_patterns sets, and checkpoints
+    them to a JSON file so a new engine starts from what earlier runs learned
+    instead of from zero.
+
+    Args:
+        path: Checkpoint file (default: loop_baselines.json beside the app)
+        alpha: EWMA smoothing factor for new baselines
+        min_samples: Windows required before a baseline is trusted for screening
+        max_macs: Per-MAC baselines kept (least recently updated are evicted)
+        checkpoint_interval: Minimum seconds between automatic checkpoints
+    """
+
+    RATE_KEYS = ("packet_rate", "arp_rate", "broadcast_rate")
+    PATTERN_KEYS = ("dhcp_servers", "routers", "mdns_devices", "broadcast_servers")
+
+    def __init__(self, path=None, alpha=0.1, min_samples=5, max_macs=5000, checkpoint_interval=60.0):
+        self.path = path or _default_baseline_file()
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.max_macs = max_macs
+        self.checkpoint_interval = checkpoint_interval
+        self.interfaces = {}  # iface -> {rate_key: StreamingBaseline}
+        self.macs = {}        # mac -> {rate_key: StreamingBaseline}
+        self.legitimate_patterns = {key: set() for key in self.PATTERN_KEYS}
+        self._lock = threading.Lock()
+        self._last_checkpoint = 0.0
+        self._dirty = False
+
+    def _series(self, table, key):
+        series = table.get(key)
+        if series is None:
+            series = {rate: StreamingBaseline(self.alpha) for rate in self.RATE_KEYS}
+            table[key] = series
+        return series
+
+    def interface_baseline(self, iface):
+        with self._lock:
+            return self._series(self.interfaces, iface or "default")
+
+    def mac_baseline(self, mac):
+        """Per-MAC baselines, or None if this MAC has never been seen."""
+        return self.macs.get(mac)
+
+    def update_window(self, iface, mac_rates, now=None):
+        """
+        Fold one capture window into the baselines (O(1) per MAC).
+
+        Args:
+            iface: Interface the window was captured on
+            mac_rates: {mac: {"packet_rate": pps, "arp_rate": pps, "broadcast_rate": pps}}
+                for the MACs that should count as normal traffic
+        """
+        now = now if now is not None else time.time()
+        totals = {rate: 0.0 for rate in self.RATE_KEYS}
+        with self._lock:
+            for mac, rates in mac_rates.items():
+                series = self._series(self.macs, mac)
+                for rate in self.RATE_KEYS:
+                    value = rates.get(rate, 0.0)
+                    series[rate].update(value, now)
+                    totals[rate] += value
+            iface_series = self._series(self.interfaces, iface or "default")
+            for rate in self.RATE_KEYS:
+                iface_series[rate].update(totals[rate], now)
+            
+            if len(self.macs) > self.max_macs:
+                stale = sorted(self.macs, key=lambda m: self.macs[m]["packet_rate"].last_update or 0)
+                for mac in stale[:len(self.macs) - self.max_macs]:
+                    del self.macs[mac]
+            self._dirty = True
+
+    def is_within_baseline(self, mac, rates, z_limit=3.0):
+        """
+        Cheap screening check: True if every rate of this MAC is within
+        z_limit EWMA standard deviations of its trusted baseline.
+        """
+        series = self.macs.get(mac)
+        if not series or series["packet_rate"].n < self.min_samples:
+            return False
+        return all(series[rate].zscore(rates.get(rate, 0.0)) <= z_limit for rate in self.RATE_KEYS)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "version": 1,
+                "saved_at": time.time(),
+                "interfaces": {iface: {rate: s.to_dict() for rate, s in series.items()}
+                               for iface, series in self.interfaces.items()},
+                "macs": {mac: {rate: s.to_dict() for rate, s in series.items()}
+                         for mac, series in self.macs.items()},
+                "legitimate_patterns": {key: sorted(macs) for key, macs in self.legitimate_patterns.items()}
+            }
+
+    def load(self):
+        """Load the checkpoint file if present. Returns True if loaded."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.warning(f"Could not load loop baselines from {self.path}: {e}")
+            return False
+        
+        def _restore(table):
+            return {key: {rate: StreamingBaseline.from_dict(series.get(rate, {}), self.alpha)
+                          for rate in self.RATE_KEYS}
+                    for key, series in table.items()}
+        
+        with self._lock:
+            self.interfaces = _restore(data.get("interfaces", {}))
+            self.macs = _restore(data.get("macs", {}))
+            for key in self.PATTERN_KEYS:
+                # Update in place: engines hold references to these sets
+                self.legitimate_patterns[key].clear()
+                self.legitimate_patterns[key].update(data.get("legitimate_patterns", {}).get(key, []))
+            self._dirty = False
+        logging.info(f"Loaded loop baselines: {len(self.interfaces)} interfaces, {len(self.macs)} MACs")
+        return True
+
+    def save(self):
+        """Write the checkpoint atomically (temp file + rename)."""
+        data = self.to_dict()
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.warning(f"Could not save loop baselines to {self.path}: {e}")
+            return False
+        with self._lock:
+            self._dirty = False
+            self._last_checkpoint = time.time()
+        return True
+
+    def checkpoint(self, force=False):
+        """Save if there are changes and checkpoint_interval has passed (or force)."""
+        if not self._dirty:
+            return False
+        if not force and time.time() - self._last_checkpoint < self.checkpoint_interval:
+            return False
+        return self.save()
+
+
+_baseline_store = None
+_baseline_store_lock = threading.Lock()
+
+
+def get_baseline_store():
+    """Process-wide TrafficBaselineStore, loaded from disk on first use."""
+    global _baseline_store
+    with _baseline_store_lock:
+        if _baseline_store is None:
+            _baseline_store = TrafficBaselineStore()
+            _baseline_store.load()
+        return _baseline_store
+
+
 class LoopDetectionEngine:
     """
     Advanced loop detection engine with support for multi-router environments,
@@ -886,27 +1420,25 @@ class LoopDetectionEngine:
     - Bypasses whitelist for confirmed loops
     """
     
-    def __init__(self):
-        # Historical data for pattern analysis
-        self.mac_history = defaultdict(lambda: {
-            "packet_times": deque(maxlen=1000),
-            "ip_changes": deque(maxlen=50),
-            "subnets": set(),
-            "first_seen": None,
-            "last_ip": None,
-            # LOOP DETECTION UPDATE: Track broadcast storm patterns
-            "broadcast_times": deque(maxlen=500),  # Track broadcast packet timestamps
-            "arp_broadcast_times": deque(maxlen=500),  # Track ARP broadcast timestamps
-            "fingerprint_window": deque(maxlen=500)  # Track fingerprint hashes for repetition
-        })
+    def __init__(self, baseline_store=None, iface=None):
+        # Historical data for pattern analysis (timestamps in NumPy ring arrays)
+        self.mac_history = _MacHistory()
+        
+        # Persisted baselines (optional); without a store each engine learns from scratch
+        self.baseline_store = baseline_store
+        self.iface = iface
         
         # Known legitimate traffic patterns (whitelist)
-        self.legitimate_patterns = {
-            "dhcp_servers": set(),  # Known DHCP server MACs
-            "routers": set(),  # Known router MACs (will auto-populate)
-            "mdns_devices": set(),  # Devices with consistent mDNS
-            "broadcast_servers": set(),  # Devices that legitimately broadcast (printers, DNS, etc.)
-        }
+        if baseline_store is not None:
+            # Shared with the store so learned patterns persist across runs
+            self.legitimate_patterns = baseline_store.legitimate_patterns
+        else:
+            self.legitimate_patterns = {
+                "dhcp_servers": set(),  # Known DHCP server MACs
+                "routers": set(),  # Known router MACs (will auto-populate)
+                "mdns_devices": set(),  # Devices with consistent mDNS
+                "broadcast_servers": set(),  # Devices that legitimately broadcast (printers, DNS, etc.)
+            }
         
         # Traffic baselines for anomaly detection
         self.baseline = {
@@ -915,6 +1447,87 @@ class LoopDetectionEngine:
             "stddev_arp": 0,
             "stddev_broadcast": 0
         }
+        self._load_interface_baseline()
+    
+    def _load_interface_baseline(self):
+        """
+        Seed self.baseline from the store's per-interface EWMA figures.
+        
+        These are totals over every MAC on the interface; per-MAC checks use
+        mac_broadcast_baseline() instead.
+        """
+        if self.baseline_store is None:
+            return
+        series = self.baseline_store.interface_baseline(self.iface)
+        if series["packet_rate"].n < self.baseline_store.min_samples:
+            return
+        self.baseline.update({
+            "avg_arp_rate": series["arp_rate"].ewma,
+            "avg_broadcast_rate": series["broadcast_rate"].ewma,
+            "stddev_arp": series["arp_rate"].ewm_stddev,
+            "stddev_broadcast": series["broadcast_rate"].ewm_stddev
+        })
+    
+    def mac_broadcast_baseline(self, mac):
+        """This MAC's learned broadcast rate (EWMA PPS), or 0 if not yet trusted."""
+        if self.baseline_store is None:
+            return 0.0
+        series = self.baseline_store.mac_baseline(mac)
+        if not series or series["broadcast_rate"].n < self.baseline_store.min_samples:
+            return 0.0
+        return series["broadcast_rate"].ewma
+    
+    def window_rates(self, stats, duration):
+        """Per-MAC packet/ARP/broadcast rates (PPS) for one capture window."""
+        duration = max(duration, 1e-6)
+        rates = {}
+        for mac, info in stats.items():
+            history = self.mac_history.get(mac)
+            broadcasts = len(history["broadcast_times"]) if history else 0
+            rates[mac] = {
+                "packet_rate": info.get("count", 0) / duration,
+                "arp_rate": info.get("arp_count", 0) / duration,
+                "broadcast_rate": broadcasts / duration
+            }
+        return rates
+    
+    def baseline_deviation(self, rates):
+        """
+        Largest interface-level deviation (in EWMA standard deviations) of this
+        window's total ARP/broadcast rate from the learned baseline.
+        """
+        if self.baseline_store is None:
+            return 0.0
+        series = self.baseline_store.interface_baseline(self.iface)
+        if series["packet_rate"].n < self.baseline_store.min_samples:
+            return 0.0
+        arp_total = sum(r["arp_rate"] for r in rates.values())
+        broadcast_total = sum(r["broadcast_rate"] for r in rates.values())
+        return max(series["arp_rate"].zscore(arp_total), series["broadcast_rate"].zscore(broadcast_total))
+    
+    def update_baselines(self, rates, stats, threshold=None):
+        """
+        Fold this window into the persisted baselines and checkpoint if due.
+        
+        MACs flagged as loops, and MACs whose severity is over threshold, are
+        left out so a storm is never learned as normal.
+        """
+        if self.baseline_store is None:
+            return
+        
+        def is_normal(info):
+            if info.get("loop_on_single_router"):
+                return False
+            if threshold is None:
+                return True
+            severity = info.get("severity", 0)
+            if isinstance(severity, dict):
+                severity = severity.get("total", 0)
+            return severity <= threshold
+        
+        normal = {mac: r for mac, r in rates.items() if is_normal(stats[mac])}
+        self.baseline_store.update_window(self.iface, normal)
+        self.baseline_store.checkpoint()
         
     def _extract_subnet(self, ip):
         """Extract subnet from IP address (assumes /24)."""
@@ -943,16 +1556,7 @@ class LoopDetectionEngine:
         if len(times) < burst_threshold:
             return 0
         
-        bursts = 0
-        times_list = list(times)
-        
-        for i in range(len(times_list)):
-            window_end = times_list[i] + burst_window
-            count = sum(1 for t in times_list[i:] if t <= window_end)
-            if count >= burst_threshold:
-                bursts += 1
-        
-        return bursts
+        return _count_bursts(_as_time_array(times), burst_window, burst_threshold)
     
     def _calculate_entropy(self, fingerprints):
         """
@@ -1049,39 +1653,36 @@ class LoopDetectionEngine:
         Returns (is_loop, storm_rate, reason)
         """
         mac_data = self.mac_history[mac]
-        # Ensure local variables exist even if optional branches are skipped
-        recent_broadcast = []
-        recent_packets = []
+        # Ensure local counts exist even if optional branches are skipped
+        recent_broadcast = 0
         
         # Check ARP broadcast rate (sliding window: last 1 second)
-        arp_times = list(mac_data["arp_broadcast_times"])
+        arp_times = mac_data["arp_broadcast_times"].to_array()
         if len(arp_times) >= 2:
-            recent_arp = [t for t in arp_times if current_time - t <= 1.0]
-            arp_rate = len(recent_arp)
+            arp_rate = int(np.count_nonzero(current_time - arp_times <= 1.0))
             
             # TRIGGER 1: ARP storm detection (>200 ARP/sec)
             if arp_rate > 200:
                 return True, arp_rate, "ARP broadcast storm detected (>200 ARP/sec)"
         
         # Check broadcast packet flood rate (sliding window: last 2 seconds)
-        broadcast_times = list(mac_data["broadcast_times"])
-        if broadcast_times:
-            recent_broadcast = [t for t in broadcast_times if current_time - t <= 2.0]
-            broadcast_count = len(recent_broadcast)
+        broadcast_times = mac_data["broadcast_times"].to_array()
+        if len(broadcast_times):
+            recent_broadcast = int(np.count_nonzero(current_time - broadcast_times <= 2.0))
             # TRIGGER 2: Broadcast flood detection (>300 broadcasts in 2 sec)
-            if broadcast_count > 300:
-                broadcast_rate = broadcast_count / 2.0
+            if recent_broadcast > 300:
+                broadcast_rate = recent_broadcast / 2.0
                 return True, broadcast_rate, "Broadcast packet flood (>300 packets/2sec)"
         
         # Check overall packet rate (sliding window: last 1 second)
-        packet_times = list(mac_data["packet_times"])
-        if packet_times:
-            recent_packets = [t for t in packet_times if current_time - t <= 1.0]
-            packet_rate = len(recent_packets)
+        packet_times = mac_data["packet_times"]
+        packet_array = packet_times.to_array()
+        if len(packet_array):
+            packet_rate = int(np.count_nonzero(current_time - packet_array <= 1.0))
             # TRIGGER 3: High sustained packet rate (>100 PPS)
             if packet_rate > 100:
                 # Additional check: verify it's mostly broadcasts
-                broadcast_ratio = (len(recent_broadcast) / max(1, len(recent_packets))) if recent_broadcast else 0.0
+                broadcast_ratio = (recent_broadcast / max(1, packet_rate)) if recent_broadcast else 0.0
                 if broadcast_ratio > 0.7:  # 70% broadcasts
                     return True, packet_rate, f"High broadcast rate ({packet_rate} PPS, {broadcast_ratio*100:.0f}% broadcasts)"
         
@@ -1096,12 +1697,13 @@ class LoopDetectionEngine:
                 if packet_rate > 50:  # Must be high rate too
                     return True, packet_rate, f"Repetitive packet flooding (entropy={entropy:.2f}, rate={packet_rate:.0f} PPS)"
         
-        # Check for baseline deviation (3x normal rate)
-        if self.baseline["avg_broadcast_rate"] > 0 and mac_data["first_seen"]:
+        # Check for baseline deviation (3x this MAC's normal rate)
+        mac_baseline_rate = self.mac_broadcast_baseline(mac)
+        if mac_baseline_rate > 0 and mac_data["first_seen"]:
             current_broadcast_rate = len(broadcast_times) / max(1, current_time - mac_data["first_seen"])
-            if current_broadcast_rate > self.baseline["avg_broadcast_rate"] * 3 and current_broadcast_rate > 50:
+            if current_broadcast_rate > mac_baseline_rate * 3 and current_broadcast_rate > 50:
                 return True, current_broadcast_rate, (
-                    f"3x baseline broadcast rate ({current_broadcast_rate:.0f} vs {self.baseline['avg_broadcast_rate']:.0f} PPS)"
+                    f"3x baseline broadcast rate ({current_broadcast_rate:.0f} vs {mac_baseline_rate:.0f} PPS)"
                 )
         
         return False, 0, None
@@ -1115,36 +1717,75 @@ class LoopDetectionEngine:
         - Subnet diversity
         - Time-based analysis
         """
-        packet_times = self.mac_history[mac]["packet_times"]
+        return self._calculate_advanced_severity_batch({mac: stats}, timeout)[mac]
+    
+    def _calculate_advanced_severity_batch(self, stats_by_mac, timeout):
+        """
+        Vectorized _calculate_advanced_severity for many MACs in one pass.
+        
+        Args:
+            stats_by_mac: {mac: stats} as built by detect_loops
+            timeout: Capture duration used to normalize packet type counts
+        
+        Returns:
+            dict: {mac: severity breakdown} with the same keys and values as
+            _calculate_advanced_severity
+        """
+        macs = list(stats_by_mac)
+        if not macs:
+            return {}
+        
+        history = [self.mac_history[mac] for mac in macs]
+        rows = np.array([self.mac_history.rows[mac] for mac in macs], dtype=np.int64)
+        times, counts = self.mac_history.packet_store.ordered_matrix(rows)
         
         # Factor 1: Packet frequency (packets/second)
-        frequency = self._calculate_packet_frequency(packet_times)
-        freq_score = min(frequency / 10, 10)  # Normalize to 0-10
+        last_index = np.maximum(counts - 1, 0)
+        time_span = times[np.arange(len(macs)), last_index] - times[:, 0]
+        has_span = (counts >= 2) & (time_span != 0)
+        frequency = np.zeros(len(macs), dtype=np.float64)
+        frequency[has_span] = counts[has_span] / time_span[has_span]
+        freq_score = np.minimum(frequency / 10, 10)  # Normalize to 0-10
         
         # Factor 2: Burst detection
-        bursts = self._detect_packet_bursts(packet_times)
-        burst_score = min(bursts / 5, 10)  # Normalize to 0-10
+        bursts = _count_bursts_matrix(times, counts, burst_window=1.0, burst_threshold=20)
+        burst_score = np.minimum(bursts / 5, 10)  # Normalize to 0-10
         
         # Factor 3: Packet type diversity (inverse entropy)
-        fingerprints = stats.get("fingerprints", {})
-        entropy = self._calculate_entropy(fingerprints)
+        fp_counts = []
+        fp_rows = []
+        for i, mac in enumerate(macs):
+            values = list(stats_by_mac[mac].get("fingerprints", {}).values())
+            fp_counts.extend(values)
+            fp_rows.extend([i] * len(values))
+        fp_counts = np.array(fp_counts, dtype=np.float64)
+        fp_rows = np.array(fp_rows, dtype=np.int64)
+        totals = np.bincount(fp_rows, weights=fp_counts, minlength=len(macs))
+        if len(fp_counts):
+            p = fp_counts / totals[fp_rows]
+            entropy = -np.bincount(fp_rows, weights=p * np.sqrt(p), minlength=len(macs))
+        else:
+            entropy = np.zeros(len(macs), dtype=np.float64)
         # Low entropy = high repetition = higher score
-        entropy_score = max(0, 10 - entropy * 2)
+        entropy_score = np.maximum(0, 10 - entropy * 2)
         
         # Factor 4: Subnet diversity (crossing subnets = suspicious)
-        subnets = self.mac_history[mac]["subnets"]
-        subnet_score = min(len(subnets) * 3, 10)
+        subnet_counts = np.array([len(h["subnets"]) for h in history], dtype=np.float64)
+        subnet_score = np.minimum(subnet_counts * 3, 10)
         
         # Factor 5: Weighted packet type scoring
-        arp_score = stats.get("arp_count", 0) * 2.5
-        stp_score = stats.get("stp_count", 0) * 5  # STP loops are critical
-        lldp_score = stats.get("lldp_count", 0) * 4
-        cdp_score = stats.get("cdp_count", 0) * 4
-        dhcp_score = stats.get("dhcp_count", 0) * 0.5  # Lower weight
-        mdns_score = stats.get("mdns_count", 0) * 0.3  # Lower weight
-        nbns_score = stats.get("nbns_count", 0) * 0.4
-        icmp_score = stats.get("icmp_redirect_count", 0) * 3
-        other_score = stats.get("other_count", 0) * 1.5
+        def column(key):
+            return np.array([stats_by_mac[mac].get(key, 0) for mac in macs], dtype=np.float64)
+        
+        arp_score = column("arp_count") * 2.5
+        stp_score = column("stp_count") * 5  # STP loops are critical
+        lldp_score = column("lldp_count") * 4
+        cdp_score = column("cdp_count") * 4
+        dhcp_score = column("dhcp_count") * 0.5  # Lower weight
+        mdns_score = column("mdns_count") * 0.3  # Lower weight
+        nbns_score = column("nbns_count") * 0.4
+        icmp_score = column("icmp_redirect_count") * 3
+        other_score = column("other_count") * 1.5
         
         packet_type_score = (
             arp_score + stp_score + lldp_score + cdp_score +
@@ -1152,8 +1793,8 @@ class LoopDetectionEngine:
         ) / max(1, timeout)
         
         # Factor 6: IP change frequency (dynamic IP handling)
-        ip_changes = len(self.mac_history[mac]["ip_changes"])
-        ip_change_score = min(ip_changes * 0.5, 5)
+        ip_changes = np.array([len(h["ip_changes"]) for h in history], dtype=np.float64)
+        ip_change_score = np.minimum(ip_changes * 0.5, 5)
         
         # Combine all factors with weights
         total_severity = (
@@ -1165,21 +1806,37 @@ class LoopDetectionEngine:
             ip_change_score * 0.5
         )
         
+        columns = zip(
+            total_severity.tolist(), freq_score.tolist(), burst_score.tolist(),
+            entropy_score.tolist(), subnet_score.tolist(),
+            packet_type_score.tolist(), ip_change_score.tolist()
+        )
         return {
-            "total": total_severity,
-            "frequency": freq_score,
-            "bursts": burst_score,
-            "entropy": entropy_score,
-            "subnets": subnet_score,
-            "packet_types": packet_type_score,
-            "ip_changes": ip_change_score
+            mac: {
+                "total": total,
+                "frequency": freq,
+                "bursts": burst,
+                "entropy": ent,
+                "subnets": subnet,
+                "packet_types": ptype,
+                "ip_changes": ipc
+            }
+            for mac, (total, freq, burst, ent, subnet, ptype, ipc) in zip(macs, columns)
         }
 
 
-def detect_loops(timeout=10, threshold=100, iface=None, enable_advanced=True):
+def detect_loops(timeout=10, threshold=100, iface=None, enable_advanced=True,
+                 use_baselines=True, baseline_screening=False):
     """
     Enhanced loop detection with multi-router support and advanced severity scoring.
     
+    Args:
+        use_baselines: Seed the engine from (and update) the persisted traffic
+            baselines from get_baseline_store()
+        baseline_screening: Skip full severity scoring for MACs whose rates are
+            within their learned per-MAC baseline (they score 0 and are marked
+            legitimate with reason "Within learned baseline")
+    
     Returns (total_count, offenders, stats, advanced_metrics).
     
     stats[mac] = {
@@ -1209,7 +1866,10 @@ def detect_loops(timeout=10, threshold=100, iface=None, enable_advanced=True):
         "timestamp": datetime
     }
     """
-    engine = LoopDetectionEngine() if enable_advanced else None
+    if enable_advanced:
+        engine = LoopDetectionEngine(get_baseline_store() if use_baselines else None, iface=iface)
+    else:
+        engine = None
     
     stats = defaultdict(lambda: {
         "count": 0,
@@ -1402,6 +2062,35 @@ def detect_loops(timeout=10, threshold=100, iface=None, enable_advanced=True):
             stats[early_exit["mac"]]["suggested_action"] = "URGENT: Disconnect cable loop immediately!"
             stats[early_exit["mac"]]["loop_reason"] = early_exit["reason"]
     
+    # Single-MAC loop check runs before screening so a loop is never screened out
+    loop_checks = {}
+    if enable_advanced and engine:
+        current_time = time.time()
+        loop_checks = {mac: engine._detect_single_mac_loop(mac, info, current_time)
+                       for mac, info in stats.items()}
+    
+    # Cheap deviation screen against learned per-MAC baselines
+    window_rates = engine.window_rates(stats, actual_duration) if engine else {}
+    screened = set()
+    if engine and baseline_screening and engine.baseline_store is not None:
+        screened = {
+            mac for mac, rates in window_rates.items()
+            if mac != early_exit["mac"]
+            and not loop_checks.get(mac, (False,))[0]
+            and engine.baseline_store.is_within_baseline(mac, rates)
+        }
+    
+    # Score every (unscreened) MAC in one vectorized pass over the timestamp rings
+    if enable_advanced and engine:
+        severity_batch = engine._calculate_advanced_severity_batch(
+            {mac: info for mac, info in stats.items() if mac not in screened}, timeout)
+    else:
+        severity_batch = {}
+    
+    # Reverse DNS for every MAC's first 5 IPs in one concurrent, cached batch
+    host_names = get_resolver().resolve_many(
+        [ip for info in stats.values() for ip in list(info["ips"])[:5]], timeout=3.0)
+    
     for mac, info in stats.items():
         # Convert sets to lists
         ip_list = list(info["ips"])
@@ -1413,13 +2102,8 @@ def detect_loops(timeout=10, threshold=100, iface=None, enable_advanced=True):
         if len(subnet_list) > 1:
             cross_subnet_activity = True
 
-        # Reverse DNS lookup
-        hosts = []
-        for ip in ip_list[:5]:  # Limit to first 5 IPs for performance
-            try:
-                hosts.append(socket.gethostbyaddr(ip)[0])
-            except Exception:
-                pass
+        # Reverse DNS lookup (resolved above)
+        hosts = [host_names[ip] for ip in ip_list[:5] if host_names.get(ip, "Unknown") != "Unknown"]
         info["hosts"] = hosts if hosts else ["Unknown"]
         
         # LOOP DETECTION UPDATE: Check for single-MAC loop (LAN-to-LAN cable)
@@ -1427,8 +2111,7 @@ def detect_loops(timeout=10, threshold=100, iface=None, enable_advanced=True):
         info["suggested_action"] = None
         
         if enable_advanced and engine:
-            current_time = time.time()
-            is_loop, storm_rate, loop_reason = engine._detect_single_mac_loop(mac, info, current_time)
+            is_loop, storm_rate, loop_reason = loop_checks[mac]
             
             if is_loop:
                 info["loop_on_single_router"] = True
@@ -1450,10 +2133,17 @@ def detect_loops(timeout=10, threshold=100, iface=None, enable_advanced=True):
                     info["severity"] = max(info.get("severity", 0), 999)
 
         # Calculate severity
-        if enable_advanced and engine:
+        if enable_advanced and engine and mac in screened:
+            info["severity"] = {"total": 0.0, "frequency": 0.0, "bursts": 0.0, "entropy": 0.0,
+                                "subnets": 0.0, "packet_types": 0.0, "ip_changes": 0.0}
+            info["is_legitimate"] = True
+            info["legitimate_reason"] = "Within learned baseline"
+        elif enable_advanced and engine:
             if not isinstance(info.get("severity"), dict):
-                severity_details = engine._calculate_advanced_severity(mac, info, timeout)
-                info["severity"] = severity_details
+                if mac in severity_batch:
+                    info["severity"] = severity_batch[mac]
+                else:
+                    info["severity"] = engine._calculate_advanced_severity(mac, info, timeout)
             
             # Check legitimacy
             is_legit, reason = engine._is_legitimate_traffic(mac, info)
@@ -1496,9 +2186,17 @@ def detect_loops(timeout=10, threshold=100, iface=None, enable_advanced=True):
         if severity_value > threshold:
             offenders.append(mac)
 
+    # Compare against, then fold this window into, the persisted baselines
+    baseline_deviation = 0.0
+    if engine:
+        baseline_deviation = engine.baseline_deviation(window_rates)
+        engine.update_baselines(window_rates, stats, threshold)
+
     # LOOP DETECTION UPDATE: Enhanced advanced metrics
     advanced_metrics = {
         "detection_method": "advanced" if enable_advanced else "simple",
+        "baseline_deviation": baseline_deviation,
+        "baseline_screened_macs": len(screened),
         "cross_subnet_activity": cross_subnet_activity,
         "total_unique_macs": len(stats),
         "total_unique_ips": len(set(ip for info in stats.values() for ip in info["ips"])),
@@ -1517,7 +2215,99 @@ def detect_loops(timeout=10, threshold=100, iface=None, enable_advanced=True):
     return total_count, list(set(offenders)), stats, advanced_metrics
 
 
-def detect_loops_lightweight(timeout=5, threshold=100, iface=None, use_sampling=True):
+class TimeWheelDedupe:
+    """
+    Fixed-memory duplicate filter for packet signatures.
+
+    Signatures are bucketed on a wheel of time slots spanning the duplicate
+    window. Advancing the wheel expires whole slots, so insert and expiry are
+    O(1) amortized, and a hard entry cap evicts the oldest signatures first
+    instead of dropping all dedupe state at once.
+    """
+
+    def __init__(self, window=2.0, slots=8, max_entries=4096):
+        self.window = window
+        self.max_entries = max_entries
+        self._slot_width = window / slots
+        # One spare slot so a full window of signatures is always retained
+        self._n_slots = slots + 1
+        self._buckets = [deque() for _ in range(self._n_slots)]
+        self._seen = {}  # {packet_signature: first-seen timestamp}
+        self._tick = None
+        self.inserted = 0
+        self.duplicates = 0
+        self.expired = 0
+        self.evicted = 0  # Entries dropped early because of the cap
+
+    def __len__(self):
+        return len(self._seen)
+
+    def _expire_slot(self, index, max_tick):
+        bucket = self._buckets[index]
+        while bucket:
+            sig = bucket.popleft()
+            ts = self._seen.get(sig)
+            # A signature re-added later lives in a newer slot; keep that one
+            if ts is not None and int(ts / self._slot_width) <= max_tick:
+                del self._seen[sig]
+                self.expired += 1
+
+    def _advance(self, now):
+        tick = int(now / self._slot_width)
+        if self._tick is None:
+            self._tick = tick
+            return
+        steps = tick - self._tick
+        if steps <= 0:
+            return
+        for step in range(1, min(steps, self._n_slots) + 1):
+            new_tick = self._tick + step
+            self._expire_slot(new_tick % self._n_slots, new_tick - self._n_slots)
+        self._tick = tick
+
+    def _evict_oldest(self):
+        for offset in range(1, self._n_slots + 1):
+            index = (self._tick + offset) % self._n_slots
+            bucket = self._buckets[index]
+            while bucket:
+                sig = bucket.popleft()
+                ts = self._seen.get(sig)
+                if ts is not None and int(ts / self._slot_width) % self._n_slots == index:
+                    del self._seen[sig]
+                    self.evicted += 1
+                    return
+
+    def check_and_add(self, sig, now):
+        """
+        Return True if `sig` was already seen within the window (a duplicate),
+        otherwise record it and return False.
+        """
+        self._advance(now)
+        last_time = self._seen.get(sig)
+        if last_time is not None and now - last_time < self.window:
+            self.duplicates += 1
+            return True
+
+        if last_time is None and len(self._seen) >= self.max_entries:
+            self._evict_oldest()
+        self._seen[sig] = now
+        self._buckets[self._tick % self._n_slots].append(sig)
+        self.inserted += 1
+        return False
+
+    def get_stats(self):
+        return {
+            "entries": len(self._seen),
+            "max_entries": self.max_entries,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "expired": self.expired,
+            "evicted": self.evicted
+        }
+
+
+def detect_loops_lightweight(timeout=5, threshold=100, iface=None, use_sampling=True,
+                             max_tracked_macs=2048):
     """
     Optimized lightweight loop detection for automatic monitoring.
     Uses shorter timeout, reduced packet analysis, simplified scoring, and intelligent sampling.
@@ -1529,6 +2319,8 @@ def detect_loops_lightweight(timeout=5, threshold=100, iface=None, use_sampling=
         threshold: Severity threshold for flagging offenders (INCREASED to reduce false positives)
         iface: Network interface to monitor
         use_sampling: Enable intelligent packet sampling for efficiency
+        max_tracked_macs: Hard cap on per-MAC state; packets from further MACs
+            are counted as overflow and reported as a MAC flood
     
     Returns (total_count, offenders, stats, status, severity_score, efficiency_metrics).
     """
@@ -1564,8 +2356,13 @@ def detect_loops_lightweight(timeout=5, threshold=100, iface=None, use_sampling=
     early_exit = {"triggered": False, "reason": None, "mac": None, "storm_rate": 0}
     
     # Duplicate packet detection to filter out normal retransmissions
-    seen_packets = {}  # {packet_signature: timestamp}
-    duplicate_window = 2.0  # seconds - only filter duplicates within 2 seconds
+    # (bounded time wheel - only filter duplicates within 2 seconds)
+    seen_packets = TimeWheelDedupe(window=2.0)
+    
+    # MAC table overflow tracking (MAC flooding protection); counted ahead of
+    # sampling and the storm cutoff so a flood of new MACs is always seen
+    tracked_macs = set()
+    mac_overflow = {"packets": 0, "first_seen": None}
     
     # Sampling strategy: sample every Nth packet when traffic is high
     sample_rate = 1
@@ -1581,6 +2378,17 @@ def detect_loops_lightweight(timeout=5, threshold=100, iface=None, use_sampling=
             if packet_count <= 10:
                 logging.debug(f"Packet #{packet_count}: {pkt.summary()}")
             
+            # Hard cap on tracked MACs: count overflow instead of growing
+            if pkt.haslayer(Ether):
+                src = pkt[Ether].src
+                if src not in tracked_macs:
+                    if len(tracked_macs) >= max_tracked_macs:
+                        mac_overflow["packets"] += 1
+                        if mac_overflow["first_seen"] is None:
+                            mac_overflow["first_seen"] = time.time()
+                        return
+                    tracked_macs.add(src)
+            
             # Dynamic sampling: adjust sample rate based on traffic volume
             if use_sampling:
                 elapsed = time.time() - start_time
@@ -1613,19 +2421,9 @@ def detect_loops_lightweight(timeout=5, threshold=100, iface=None, use_sampling=
                 elif pkt.haslayer(IP):
                     pkt_sig += f":IP:{pkt[IP].src}"
                 
-                # Check if we've seen this exact packet recently (within duplicate_window)
-                if pkt_sig in seen_packets:
-                    last_time = seen_packets[pkt_sig]
-                    if current_time - last_time < duplicate_window:
-                        return  # Skip recent duplicate
-                
-                # Update packet signature timestamp
-                seen_packets[pkt_sig] = current_time
-                
-                # Clean old entries from seen_packets to limit memory usage
-                if len(seen_packets) > 1000:
-                    # Remove entries older than duplicate_window
-                    seen_packets.clear()
+                # Skip if we've seen this exact packet recently (within the window)
+                if seen_packets.check_and_add(pkt_sig, current_time):
+                    return  # Skip recent duplicate
 
                 # LOOP DETECTION UPDATE: Track broadcast timing
                 dst = pkt[Ether].dst
@@ -1818,6 +2616,14 @@ def detect_loops_lightweight(timeout=5, threshold=100, iface=None, use_sampling=
     else:
         status = "clean"
     
+    # A MAC table overflow is itself an anomaly (MAC flooding / spoofing)
+    mac_flood_detected = mac_overflow["packets"] > 0
+    if mac_flood_detected:
+        logging.warning(f"⚠️ MAC flood: {max_tracked_macs} MACs tracked, "
+                        f"{mac_overflow['packets']} packets from untracked MACs")
+        if status == "clean":
+            status = "suspicious"
+    
     logging.info(f"Detection status: {status.upper()}")
     
     # Find offenders
@@ -1843,7 +2649,11 @@ def detect_loops_lightweight(timeout=5, threshold=100, iface=None, use_sampling=
         "storm_rate": max_storm_rate,  # NEW
         "early_exit": early_exit["triggered"],  # NEW
         "early_exit_reason": early_exit.get("reason", None),  # NEW
-        "actual_duration": actual_duration if 'actual_duration' in locals() else timeout  # NEW
+        "actual_duration": actual_duration if 'actual_duration' in locals() else timeout,  # NEW
+        "tracked_macs": len(mac_timing),
+        "mac_flood_detected": mac_flood_detected,
+        "mac_overflow_packets": mac_overflow["packets"],
+        "dedupe": seen_packets.get_stats()
     }
 
     return total_count, offenders, dict(stats), status, max_severity, efficiency_metrics
@@ -1977,9 +2787,12 @@ def auto_loop_detection(iface=None, save_to_db=True, api_base_url="http://localh
         }
 
 
-def discover_clients(timeout=10, iface=None):
+def discover_clients(timeout=10, iface=None, dns_wait=2.0):
     """
     Sniff network traffic for a while and return discovered clients.
+    
+    Hostnames are resolved in the background (see dns_resolver); lookups still
+    running `dns_wait` seconds after capture finish are filled in on later calls.
     Returns: dict {mac: {"ip": str, "vendor": str, "hostname": str, "last_seen": datetime}}
     """
     global clients
@@ -1991,28 +2804,40 @@ def discover_clients(timeout=10, iface=None):
                 now = datetime.now()
 
                 if mac not in clients:
-                    clients[mac] = {"ip": None, "vendor": "Unknown", "hostname": "Unknown", "last_seen": now}
+                    clients[mac] = {"ip": None, "vendor": get_vendor(mac), "hostname": "Unknown", "last_seen": now}
 
                 clients[mac]["last_seen"] = now
 
                 if pkt.haslayer(IP):
-                    clients[mac]["ip"] = pkt[IP].src
-                    try:
-                        clients[mac]["hostname"] = socket.gethostbyaddr(pkt[IP].src)[0]
-                    except Exception:
-                        clients[mac]["hostname"] = "Unknown"
-
+                    ip = pkt[IP].src
                 elif pkt.haslayer(ARP) and pkt[ARP].psrc:
-                    clients[mac]["ip"] = pkt[ARP].psrc
-                    try:
-                        clients[mac]["hostname"] = socket.gethostbyaddr(pkt[ARP].psrc)[0]
-                    except Exception:
-                        clients[mac]["hostname"] = "Unknown"
+                    ip = pkt[ARP].psrc
+                else:
+                    return
+
+                clients[mac]["ip"] = ip
+                if requested.get(mac) != ip:
+                    requested[mac] = ip
+                    # Never block capture on DNS: cached answer now, or filled in later
+                    hostname = resolver.resolve_later(ip, lambda ip, name, mac=mac: _set_hostname(mac, ip, name))
+                    if hostname is not None:
+                        clients[mac]["hostname"] = hostname
 
         except Exception:
             pass
 
+    def _set_hostname(mac, ip, hostname):
+        client = clients.get(mac)
+        if client is not None and client["ip"] == ip:
+            client["hostname"] = hostname
+
+    resolver = get_resolver()
+    requested = {}  # mac -> ip whose hostname was already requested this capture
     sniff(prn=pkt_handler, timeout=timeout, store=0, iface=iface)
+    
+    # Give lookups queued during capture a short grace period
+    resolver.wait_pending([c["ip"] for c in clients.values() if c["hostname"] == "Unknown"], timeout=dns_wait)
+    logging.info(resolver.format_stats())
     return clients.copy()
 
 def get_local_subnet():
@@ -2036,9 +2861,10 @@ def get_local_subnet():
     network = ipaddress.IPv4Network(f"{ip}/{netmask}", strict=False)
     return list(network.hosts())  # all possible host IPs
 
-def scan_subnet(iface=None, timeout=2):
+def scan_subnet(iface=None, timeout=2, dns_timeout=3.0):
     """
     Scan the local subnet using ARP and return active clients.
+    Hostnames are resolved concurrently, waiting at most dns_timeout seconds.
     Returns: dict {mac: {"ip": str, "hostname": str, "vendor": str, "last_seen": datetime}}
     """
     hosts = get_local_subnet()
@@ -2054,25 +2880,24 @@ def scan_subnet(iface=None, timeout=2):
     pkt = Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=[str(h) for h in hosts])
     ans, _ = srp(pkt, timeout=timeout, iface=iface, verbose=0)
 
-    for snd, rcv in ans:
-        mac = rcv[Ether].src
-        ip = rcv[ARP].psrc
-        try:
-            hostname = socket.gethostbyaddr(ip)[0]
-        except Exception:
-            hostname = "Unknown"
+    # Resolve all responders concurrently instead of one by one
+    responders = [(rcv[Ether].src, rcv[ARP].psrc) for snd, rcv in ans]
+    resolver = get_resolver()
+    hostnames = resolver.resolve_many([ip for _, ip in responders], timeout=dns_timeout)
 
+    for mac, ip in responders:
         clients[mac] = {
             "ip": ip,
-            "hostname": hostname,
-            "vendor": "Unknown",
+            "hostname": hostnames.get(ip, "Unknown"),
+            "vendor": get_vendor(mac),
             "last_seen": datetime.now()
         }
 
+    logging.info(resolver.format_stats())
     return clients
 
 
-def scan_router_subnet(router_ip, netmask="255.255.255.0", iface=None, timeout=2):
+def scan_router_subnet(router_ip, netmask="255.255.255.0", iface=None, timeout=2, dns_timeout=3.0):
     """
     Scan a specific router's subnet based on its IP address.
     
@@ -2081,6 +2906,7 @@ def scan_router_subnet(router_ip, netmask="255.255.255.0", iface=None, timeout=2
         netmask: The subnet mask (default: "255.255.255.0" for /24)
         iface: Network interface to use (optional, auto-detected if None)
         timeout: ARP scan timeout in seconds
+        dns_timeout: Max seconds to wait for the (concurrent) hostname lookups
     
     Returns:
         dict {mac: {"ip": str, "hostname": str, "vendor": str, "last_seen": datetime}}
@@ -2105,22 +2931,21 @@ def scan_router_subnet(router_ip, netmask="255.255.255.0", iface=None, timeout=2
         pkt = Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=[str(h) for h in hosts])
         ans, _ = srp(pkt, timeout=timeout, iface=iface, verbose=0)
         
-        for snd, rcv in ans:
-            mac = rcv[Ether].src
-            ip = rcv[ARP].psrc
-            try:
-                hostname = socket.gethostbyaddr(ip)[0]
-            except Exception:
-                hostname = "Unknown"
-            
+        # Resolve all responders concurrently instead of one by one
+        responders = [(rcv[Ether].src, rcv[ARP].psrc) for snd, rcv in ans]
+        resolver = get_resolver()
+        hostnames = resolver.resolve_many([ip for _, ip in responders], timeout=dns_timeout)
+        
+        for mac, ip in responders:
             clients[mac] = {
                 "ip": ip,
-                "hostname": hostname,
-                "vendor": "Unknown",
+                "hostname": hostnames.get(ip, "Unknown"),
+                "vendor": get_vendor(mac),
                 "last_seen": datetime.now()
             }
         
         print(f"✅ Found {len(clients)} clients in subnet {network}")
+        print(f"🔎 {resolver.format_stats()}")
         return clients
         
     except Exception as e:
@@ -2153,7 +2978,50 @@ def get_all_active_interfaces():
     return active_interfaces
 
 
-def detect_loops_multi_interface(timeout=5, threshold=100, use_sampling=False):
+# Per-MAC fields kept when a worker process ships its results to the parent
+_MULTI_INTERFACE_STAT_KEYS = (
+    "count", "arp_count", "broadcast_count", "stp_count", "ips", "subnets",
+    "severity", "loop_on_single_router", "suggested_action", "loop_reason"
+)
+_MULTI_INTERFACE_METRIC_KEYS = (
+    "total_packets_seen", "packets_analyzed", "early_exit", "early_exit_reason",
+    "storm_rate", "mac_flood_detected", "mac_overflow_packets"
+)
+
+
+def _scan_interface_timed(iface, timeout, threshold, use_sampling, compact=False):
+    """
+    Run detect_loops_lightweight on one interface and time it.
+    
+    With compact=True (process mode) the result is trimmed to small per-MAC
+    summaries so it pickles cheaply back to the parent over the pool's pipe.
+    
+    Returns (iface, result, error, duration).
+    """
+    started = time.time()
+    try:
+        print(f"  📡 Scanning interface: {iface}")
+        result = detect_loops_lightweight(
+            timeout=timeout,
+            threshold=threshold,
+            iface=iface,
+            use_sampling=use_sampling
+        )
+        if compact and result:
+            pkts, offenders, stats, status, severity, eff = result
+            stats = {
+                mac: {key: info[key] for key in _MULTI_INTERFACE_STAT_KEYS if key in info}
+                for mac, info in stats.items()
+            }
+            eff = {key: eff[key] for key in _MULTI_INTERFACE_METRIC_KEYS if key in eff}
+            result = (pkts, offenders, stats, status, severity, eff)
+        return (iface, result, None, time.time() - started)
+    except Exception as e:
+        print(f"  ⚠️ Error scanning {iface}: {e}")
+        return (iface, None, str(e), time.time() - started)
+
+
+def detect_loops_multi_interface(timeout=5, threshold=100, use_sampling=False, mode="thread"):
     """
     Enhanced loop detection that monitors ALL active network interfaces simultaneously.
     Perfect for environments where:
@@ -2165,14 +3033,20 @@ def detect_loops_multi_interface(timeout=5, threshold=100, use_sampling=False):
         timeout: Packet capture duration per interface (seconds)
         threshold: Minimum severity score to consider as potential loop (RAISED to reduce false positives)
         use_sampling: Use intelligent sampling for better performance (DISABLED by default for full capture)
+        mode: "thread" runs every capture in this process; "process" gives each
+            interface its own worker process so Scapy dissection is not GIL-bound
     
     Returns:
         Tuple: (total_packets, combined_offenders, combined_stats, overall_status, max_severity, efficiency_metrics)
     """
-    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+    from concurrent.futures.process import BrokenProcessPool
     import time
     
-    logging.info(f"🚀 Starting multi-interface detection (timeout={timeout}s, threshold={threshold}, sampling={use_sampling})")
+    if mode not in ("thread", "process"):
+        raise ValueError(f"Unknown multi-interface mode: {mode}")
+    
+    logging.info(f"🚀 Starting multi-interface detection (timeout={timeout}s, threshold={threshold}, sampling={use_sampling}, mode={mode})")
     
     start_time = time.time()
     interfaces = get_all_active_interfaces()
@@ -2191,69 +3065,71 @@ def detect_loops_multi_interface(timeout=5, threshold=100, use_sampling=False):
     all_results = []
     interfaces_scanned = []
     
-    def scan_interface(iface):
-        """Scan a single interface"""
+    def run_scans(executor_cls, compact):
+        """Scan all interfaces in parallel, yielding results as they finish"""
+        with executor_cls(max_workers=len(interfaces)) as executor:
+            futures = [
+                executor.submit(_scan_interface_timed, iface, timeout, threshold, use_sampling, compact)
+                for iface in interfaces
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+    
+    if mode == "process":
         try:
-            print(f"  📡 Scanning interface: {iface}")
-            result = detect_loops_lightweight(
-                timeout=timeout,
-                threshold=threshold,
-                iface=iface,
-                use_sampling=use_sampling
-            )
-            return (iface, result, None)
-        except Exception as e:
-            print(f"  ⚠️ Error scanning {iface}: {e}")
-            return (iface, None, str(e))
-    
-    # Parallel scanning of all interfaces
-    with ThreadPoolExecutor(max_workers=len(interfaces)) as executor:
-        future_to_iface = {executor.submit(scan_interface, iface): iface for iface in interfaces}
+            scan_results = list(run_scans(ProcessPoolExecutor, compact=True))
+        except (BrokenProcessPool, OSError) as e:
+            logging.warning(f"Process pool unavailable ({e}); falling back to thread mode")
+            mode = "thread"
+    if mode == "thread":
+        scan_results = run_scans(ThreadPoolExecutor, compact=False)
+    
+    for iface, result, error, scan_duration in scan_results:
+        if error:
+            print(f"  ❌ Failed to scan {iface}: {error}")
+            continue
         
-        for future in as_completed(future_to_iface):
-            iface, result, error = future.result()
+        if result:
+            interfaces_scanned.append(iface)
+            pkts, offenders, stats, status, severity, eff = result
+            packets_seen = eff.get('total_packets_seen', pkts)
+            all_results.append({
+                'interface': iface,
+                'packets': pkts,
+                'offenders': offenders,
+                'status': status,
+                'severity': severity,
+                'packets_seen': packets_seen,
+                'duration': round(scan_duration, 2),
+                'pps': round(packets_seen / scan_duration, 2) if scan_duration > 0 else 0
+            })
             
-            if error:
-                print(f"  ❌ Failed to scan {iface}: {error}")
-                continue
+            total_packets += pkts
             
-            if result:
-                interfaces_scanned.append(iface)
-                pkts, offenders, stats, status, severity, eff = result
-                all_results.append({
-                    'interface': iface,
-                    'packets': pkts,
-                    'offenders': offenders,
-                    'status': status,
-                    'severity': severity
-                })
-                
-                total_packets += pkts
-                
-                # Merge statistics from this interface
-                for mac, info in stats.items():
-                    if mac not in combined_stats:
-                        combined_stats[mac] = info.copy()
-                        combined_stats[mac]['interfaces'] = [iface]
-                    else:
-                        # MAC seen on multiple interfaces - more suspicious!
-                        combined_stats[mac]['interfaces'].append(iface)
-                        combined_stats[mac]['count'] += info.get('count', 0)
-                        
-                        # Increase severity if seen on multiple interfaces
-                        if len(combined_stats[mac]['interfaces']) > 1:
-                            if isinstance(combined_stats[mac].get('severity'), dict):
-                                combined_stats[mac]['severity']['multi_interface_bonus'] = 15
-                                combined_stats[mac]['severity']['total'] = min(100, 
-                                    combined_stats[mac]['severity'].get('total', 0) + 15)
-                            else:
-                                combined_stats[mac]['severity'] = min(100, 
-                                    combined_stats[mac].get('severity', 0) + 15)
-                
-                # Add offenders from this interface
-                for mac in offenders:
-                    if mac not in combined_offenders:
-                        combined_offenders.append(mac)
+            # Merge statistics from this interface
+            for mac, info in stats.items():
+                if mac not in combined_stats:
+                    combined_stats[mac] = info.copy()
+                    combined_stats[mac]['interfaces'] = [iface]
+                else:
+                    # MAC seen on multiple interfaces - more suspicious!
+                    combined_stats[mac]['interfaces'].append(iface)
+                    combined_stats[mac]['count'] += info.get('count', 0)
+                    
+                    # Increase severity if seen on multiple interfaces
+                    if len(combined_stats[mac]['interfaces']) > 1:
+                        if isinstance(combined_stats[mac].get('severity'), dict):
+                            combined_stats[mac]['severity']['multi_interface_bonus'] = 15
+                            combined_stats[mac]['severity']['total'] = min(100, 
+                                combined_stats[mac]['severity'].get('total', 0) + 15)
+                        else:
+                            combined_stats[mac]['severity'] = min(100, 
+                                combined_stats[mac].get('severity', 0) + 15)
+            
+            # Add offenders from this interface
+            for mac in offenders:
+                if mac not in combined_offenders:
+                    combined_offenders.append(mac)
     
     # Calculate overall status and severity
     max_severity = 0.0
@@ -2291,11 +3167,13 @@ def detect_loops_multi_interface(timeout=5, threshold=100, use_sampling=False):
     detection_duration = time.time() - start_time
     efficiency_metrics = {
         "detection_method": "multi_interface",
+        "execution_mode": mode,
         "interfaces_scanned": interfaces_scanned,
         "total_interfaces": len(interfaces),
         "cross_interface_activity": cross_interface_activity,
         "unique_macs": len(combined_stats),
         "detection_duration": round(detection_duration, 2),
+        "wall_time": round(detection_duration, 2),
         "packets_per_second": round(total_packets / detection_duration, 2) if detection_duration > 0 else 0,
         "interface_results": all_results
     }
@@ -2308,7 +3186,9 @@ def detect_loops_multi_interface(timeout=5, threshold=100, use_sampling=False):
     print(f"  ✓ Offenders: {len(combined_offenders)}")
     print(f"  ✓ Status: {overall_status.upper()}")
     print(f"  ✓ Max severity: {max_severity:.1f}")
-    print(f"  ✓ Duration: {detection_duration:.2f}s")
+    print(f"  ✓ Duration: {detection_duration:.2f}s ({mode} mode)")
+    for res in all_results:
+        print(f"    • {res['interface']}: {res['packets_seen']} packets in {res['duration']:.2f}s ({res['pps']:.0f} pps)")
     
     if cross_interface_activity:
         print(f"  ⚠️ ALERT: Cross-interface loop activity detected!")
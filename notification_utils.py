@@ -25,6 +25,7 @@ class NotificationType(Enum):
     SYSTEM_ALERT = "system_alert"
     MAINTENANCE = "maintenance"
     SECURITY_ALERT = "security_alert"
+    ANOMALY_DETECTED = "anomaly_detected"
 
 class NotificationPriority(Enum):
     LOW = 1
@@ -44,6 +45,7 @@ class NotificationManager:
             NotificationType.SYSTEM_ALERT: {"enabled": True, "priority": NotificationPriority.HIGH},
             NotificationType.MAINTENANCE: {"enabled": True, "priority": NotificationPriority.MEDIUM},
             NotificationType.SECURITY_ALERT: {"enabled": True, "priority": NotificationPriority.CRITICAL},
+            NotificationType.ANOMALY_DETECTED: {"enabled": True, "priority": NotificationPriority.MEDIUM},
         }
         try:
             self._init_database()
@@ -507,6 +509,32 @@ def notify_bandwidth_high(router_name: str, bandwidth_usage: float, threshold: f
         NotificationPriority.MEDIUM
     )
 
+def notify_anomaly(router_name: str, metric: str, value: float, expected: float, unit: str = "",
+                   zscore: float = 0.0, direction: str = "high", seasonal: bool = False):
+    """Create a notification for an unusual bandwidth or latency reading."""
+    title = f"📈 Unusual {metric}" if direction == "high" else f"📉 Unusual {metric}"
+    usual = "for this hour of the week" if seasonal else "recently"
+    message = (f"{router_name} {metric.lower()} is {value:.1f} {unit}, "
+               f"{'above' if direction == 'high' else 'below'} the usual {expected:.1f} {unit} {usual}")
+    
+    data = {
+        "router_name": router_name,
+        "metric": metric,
+        "value": value,
+        "expected": expected,
+        "zscore": zscore,
+        "direction": direction,
+        "seasonal": seasonal
+    }
+    
+    return notification_manager.create_notification(
+        NotificationType.ANOMALY_DETECTED,
+        title,
+        message,
+        data,
+        NotificationPriority.HIGH if abs(zscore) >= 8 else NotificationPriority.MEDIUM
+    )
+
 def notify_system_alert(title: str, message: str, priority: NotificationPriority = NotificationPriority.MEDIUM):
     """Create a system alert notification."""
     return notification_manager.create_notification(
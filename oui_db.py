@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+OUI Vendor Database Module
+Compact, memory-mapped IEEE OUI registry (MA-L, MA-M and MA-S) for MAC
+address → vendor lookups.
+
+The registry is compiled at build time (see build.py) into oui_vendors.bin:
+three sorted integer prefix tables plus a de-duplicated vendor name blob.
+At run time the file is memory-mapped and searched with bisect, so opening
+it costs nothing beyond an mmap and lookups do not allocate per entry.
+
+File layout (little endian, every section 8-byte aligned):
+    header   "<8sIIIII"  magic, n24, n28, n36, n_names, blob_len
+    keys24   u32[n24]    24-bit MA-L prefixes, sorted
+    names24  u32[n24]    vendor index for each MA-L prefix (high bit:
+                         block has MA-M/MA-S entries; 0x7FFFFFFF: none)
+    keys28   u32[n28]    28-bit MA-M prefixes, sorted
+    names28  u32[n28]
+    keys36   u64[n36]    36-bit MA-S prefixes, sorted
+    names36  u32[n36]
+    offsets  u32[n_names + 1]  start of each vendor name in the blob
+    blob     utf-8 vendor names
+
+Usage:
+    python oui_db.py build                          # from scapy's bundled manuf data
+    python oui_db.py build --ieee oui.csv mam.csv oui36.csv
+    python oui_db.py build --manuf /path/to/manuf
+    python oui_db.py lookup 00:1b:21:aa:bb:cc
+    python oui_db.py bench
+"""
+
+import argparse
+import csv
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+
+MAGIC = b"WINYOUI1"
+HEADER = struct.Struct("<8sIIIII")
+DB_FILENAME = "oui_vendors.bin"
+
+# prefix length in bits -> MAC right shift
+PREFIX_BITS = {24: 24, 28: 20, 36: 12}
+
+# Flag bit on MA-L vendor indexes whose block has MA-M/MA-S sub-assignments
+SUBDIVIDED = 0x80000000
+NO_VENDOR = 0x7FFFFFFF
+
+_MAC_SEPARATORS = str.maketrans("", "", ":-. ")
+
+# Recently looked-up MACs kept per database (cleared when full)
+RECENT_CACHE_SIZE = 65536
+_MISSING = object()
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+# --- Compilation (build time) ---
+
+def parse_ieee_csv(path):
+    """
+    Parse an IEEE registry CSV (oui.csv / mam.csv / oui36.csv).
+
+    Yields:
+        (prefix_bits, prefix_int, vendor)
+    """
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        for row in csv.DictReader(f):
+            assignment = (row.get("Assignment") or "").strip()
+            vendor = (row.get("Organization Name") or "").strip()
+            if not assignment or not vendor:
+                continue
+            bits = len(assignment) * 4
+            if bits in PREFIX_BITS:
+                yield bits, int(assignment, 16), vendor
+
+
+def parse_manuf(text):
+    """
+    Parse Wireshark 'manuf' data (the format scapy bundles).
+
+    Yields:
+        (prefix_bits, prefix_int, vendor)
+    """
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        fields = [f.strip() for f in line.split("\t") if f.strip()]
+        if len(fields) < 2:
+            continue
+        prefix, _, mask = fields[0].partition("/")
+        digits = prefix.replace(":", "").replace("-", "").replace(".", "")
+        try:
+            value = int(digits, 16)
+        except ValueError:
+            continue
+        bits = int(mask) if mask else len(digits) * 4
+        if bits not in PREFIX_BITS:
+            continue
+        # Prefixes in manuf are written as whole octets; keep only the prefix bits
+        value >>= len(digits) * 4 - bits
+        vendor = fields[2] if len(fields) > 2 else fields[1]
+        yield bits, value, vendor
+
+
+def default_manuf_text():
+    from scapy.libs.manuf import DATA
+    return DATA
+
+
+def compile_oui_database(entries, out_path):
+    """
+    Compile (prefix_bits, prefix, vendor) entries into the binary format.
+
+    Later entries for the same prefix win, so pass more authoritative sources last.
+
+    Returns:
+        dict: Entry counts per table and the output size in bytes
+    """
+    tables = {bits: {} for bits in PREFIX_BITS}
+    for bits, prefix, vendor in entries:
+        tables[bits][prefix] = vendor
+
+    names = {}
+    def name_index(vendor):
+        index = names.get(vendor)
+        if index is None:
+            index = names[vendor] = len(names)
+        return index
+
+    sorted_tables = {}
+    for bits in (28, 36):
+        keys = sorted(tables[bits])
+        sorted_tables[bits] = (keys, [name_index(tables[bits][k]) for k in keys])
+
+    # MA-L prefixes that contain MA-M/MA-S blocks carry the SUBDIVIDED flag
+    # (added with NO_VENDOR if the MA-L itself is unassigned) so lookups only
+    # search the finer tables when they can match.
+    subdivided = {k >> 4 for k in tables[28]} | {k >> 12 for k in tables[36]}
+    keys24 = sorted(set(tables[24]) | subdivided)
+    indexes24 = []
+    for key in keys24:
+        index = name_index(tables[24][key]) if key in tables[24] else NO_VENDOR
+        indexes24.append(index | SUBDIVIDED if key in subdivided else index)
+    sorted_tables[24] = (keys24, indexes24)
+
+    encoded = [vendor.encode("utf-8") for vendor in names]  # dicts keep insertion order
+    offsets = [0]
+    for name in encoded:
+        offsets.append(offsets[-1] + len(name))
+    blob = b"".join(encoded)
+
+    sections = []
+    for bits, key_fmt in ((24, "I"), (28, "I"), (36, "Q")):
+        keys, indexes = sorted_tables[bits]
+        sections.append(struct.pack(f"<{len(keys)}{key_fmt}", *keys))
+        sections.append(struct.pack(f"<{len(indexes)}I", *indexes))
+    sections.append(struct.pack(f"<{len(offsets)}I", *offsets))
+    sections.append(blob)
+
+    header = HEADER.pack(MAGIC, len(sorted_tables[24][0]), len(sorted_tables[28][0]),
+                         len(sorted_tables[36][0]), len(encoded), len(blob))
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        position = HEADER.size
+        for section in sections:
+            padding = _align(position) - position
+            f.write(b"\0" * padding)
+            f.write(section)
+            position += padding + len(section)
+    os.replace(tmp_path, out_path)
+
+    return {
+        "ma_l": len(sorted_tables[24][0]),
+        "ma_m": len(sorted_tables[28][0]),
+        "ma_s": len(sorted_tables[36][0]),
+        "vendors": len(encoded),
+        "bytes": os.path.getsize(out_path)
+    }
+
+
+# --- Lookup (run time) ---
+
+class OUIDatabase:
+    """
+    Read-only, memory-mapped view of a compiled OUI database.
+
+    The most specific assignment wins: MA-S, then MA-M, then MA-L.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        view = memoryview(self._mmap)
+
+        magic, n24, n28, n36, n_names, blob_len = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an OUI database")
+
+        position = HEADER.size
+        def section(count, fmt, size):
+            nonlocal position
+            position = _align(position)
+            part = view[position:position + count * size].cast(fmt)
+            position += count * size
+            return part
+
+        self._keys24, self._names24 = section(n24, "I", 4), section(n24, "I", 4)
+        self._keys28, self._names28 = section(n28, "I", 4), section(n28, "I", 4)
+        self._keys36, self._names36 = section(n36, "Q", 8), section(n36, "I", 4)
+        self.counts = {"ma_l": n24, "ma_m": n28, "ma_s": n36, "vendors": n_names}
+        self._offsets = section(n_names + 1, "I", 4)
+        position = _align(position)
+        self._blob = view[position:position + blob_len]
+        self._names = {}  # decoded vendor name cache
+        self._recent = {}  # mac as given -> vendor or None (discovery sees the same MACs repeatedly)
+
+    def _name(self, index):
+        name = self._names.get(index)
+        if name is None:
+            name = bytes(self._blob[self._offsets[index]:self._offsets[index + 1]]).decode("utf-8", "replace")
+            self._names[index] = name
+        return name
+
+    @staticmethod
+    def _find(keys, prefix):
+        i = bisect_left(keys, prefix)
+        return i if i < len(keys) and keys[i] == prefix else -1
+
+    def lookup(self, mac, default=None):
+        """Vendor for a MAC address (any common notation), or default."""
+        cached = self._recent.get(mac, _MISSING)
+        if cached is not _MISSING:
+            return default if cached is None else cached
+        vendor = self._lookup(mac)
+        if len(self._recent) >= RECENT_CACHE_SIZE:
+            self._recent.clear()
+        self._recent[mac] = vendor
+        return default if vendor is None else vendor
+
+    def _lookup(self, mac, default=None):
+        try:
+            value = mac if isinstance(mac, int) else int(mac.translate(_MAC_SEPARATORS), 16)
+        except (ValueError, AttributeError, TypeError):
+            return default
+        if not 0 <= value <= 0xFFFFFFFFFFFF:
+            return default
+
+        i = self._find(self._keys24, value >> 24)
+        if i < 0:
+            return default
+        index = self._names24[i]
+        if index & SUBDIVIDED:
+            # MA-L block carved into MA-M / MA-S assignments: most specific wins
+            j = self._find(self._keys36, value >> 12)
+            if j >= 0:
+                return self._name(self._names36[j])
+            j = self._find(self._keys28, value >> 20)
+            if j >= 0:
+                return self._name(self._names28[j])
+            index &= ~SUBDIVIDED
+            if index == NO_VENDOR:
+                return default
+        return self._name(index)
+
+    def close(self):
+        for attr in ("_keys24", "_names24", "_keys28", "_names28", "_keys36", "_names36", "_offsets", "_blob"):
+            part = getattr(self, attr, None)
+            if part is not None:
+                part.release()
+                setattr(self, attr, None)
+        try:
+            self._mmap.close()
+        except Exception:
+            pass
+        self._file.close()
+
+
+_database = None
+_database_lock = threading.Lock()
+_database_failed = False
+
+
+def _default_db_path():
+    try:
+        from resource_utils import get_resource_path
+        return get_resource_path(DB_FILENAME)
+    except ImportError:
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), DB_FILENAME)
+
+
+def get_oui_database():
+    """
+    Process-wide OUIDatabase, or None if unavailable.
+
+    In a source checkout the database is compiled on first use if build.py
+    has not produced it yet; frozen builds only use the bundled file.
+    """
+    global _database, _database_failed
+    if _database is not None or _database_failed:
+        return _database
+    with _database_lock:
+        if _database is not None or _database_failed:
+            return _database
+        path = _default_db_path()
+        try:
+            if not os.path.exists(path) and not getattr(sys, "frozen", False):
+                logging.info(f"Compiling {DB_FILENAME} from bundled manuf data...")
+                compile_oui_database(parse_manuf(default_manuf_text()), path)
+            _database = OUIDatabase(path)
+        except Exception as e:
+            logging.warning(f"OUI vendor database unavailable: {e}")
+            _database_failed = True
+        return _database
+
+
+def get_vendor(mac, default="Unknown"):
+    """Vendor name for a MAC address, or default when unknown."""
+    database = get_oui_database()
+    if database is None or not mac:
+        return default
+    return database.lookup(mac, default)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the OUI vendor database")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Compile oui_vendors.bin")
+    build.add_argument("--ieee", nargs="+", metavar="CSV",
+                       help="IEEE registry CSVs (oui.csv, mam.csv, oui36.csv)")
+    build.add_argument("--manuf", help="Wireshark manuf file (default: scapy's bundled copy)")
+    build.add_argument("-o", "--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), DB_FILENAME))
+
+    lookup = sub.add_parser("lookup", help="Look up MAC addresses")
+    lookup.add_argument("macs", nargs="+")
+
+    sub.add_parser("bench", help="Measure open and lookup time")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        if args.ieee:
+            entries = [entry for path in args.ieee for entry in parse_ieee_csv(path)]
+            source = ", ".join(args.ieee)
+        else:
+            if args.manuf:
+                with open(args.manuf, encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+                source = args.manuf
+            else:
+                text = default_manuf_text()
+                source = "scapy bundled manuf"
+            entries = list(parse_manuf(text))
+        started = time.perf_counter()
+        counts = compile_oui_database(entries, args.output)
+        print(f"✅ Compiled {args.output} from {source} in {time.perf_counter() - started:.2f}s")
+        print(f"   MA-L: {counts['ma_l']}  MA-M: {counts['ma_m']}  MA-S: {counts['ma_s']}  "
+              f"vendors: {counts['vendors']}  size: {counts['bytes'] / 1024:.0f} KB")
+
+    elif args.command == "lookup":
+        for mac in args.macs:
+            print(f"{mac}  {get_vendor(mac)}")
+
+    elif args.command == "bench":
+        import random
+        path = _default_db_path()
+        get_oui_database()  # Compile if needed, outside the timing
+        started = time.perf_counter()
+        database = OUIDatabase(path)
+        open_time = time.perf_counter() - started
+        macs = [random.getrandbits(48) for _ in range(200000)]
+        started = time.perf_counter()
+        found = sum(1 for mac in macs if database.lookup(mac) is not None)
+        lookup_time = time.perf_counter() - started
+        print(f"Open: {open_time * 1000:.2f} ms")
+        print(f"Lookup: {lookup_time / len(macs) * 1e6:.3f} us/MAC "
+              f"({found} of {len(macs)} random MACs matched)")
+        database.close()
+
+
+if __name__ == "__main__":
+    main()
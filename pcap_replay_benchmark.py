@@ -0,0 +1,408 @@
+"""
+Offline PCAP Replay Benchmark for Winyfi Detectors
+Feeds recorded pcap/pcapng files (or synthetic captures built from
+simulate_loop's packet builders) through the detectors without live
+capture, root privileges or a network.
+
+Detectors exercised:
+    lightweight  - network_utils.detect_loops_lightweight
+    advanced     - network_utils.detect_loops
+    discovery    - network_utils.discover_clients
+    bandwidth    - RouterBandwidthMonitor._packet_handler
+
+Pacing:
+    max       - replay as fast as possible; detector clocks follow the
+                capture timestamps so rates and verdicts match the trace
+    realtime  - sleep between frames to reproduce the original timing
+
+Reports frames/sec, per-frame handler cost percentiles, memory high-water
+mark and each detector's verdict.
+
+Usage:
+    python pcap_replay_benchmark.py --pcap capture.pcapng
+    python pcap_replay_benchmark.py --synthetic arp_storm --write-pcap arp_storm.pcap
+    python pcap_replay_benchmark.py --synthetic broadcast_storm --pps 5000 --json results.json
+"""
+
+import argparse
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+from scapy.all import ARP, Ether, IP, rdpcap, wrpcap
+
+import network_utils
+from router_bandwidth_monitor import RouterBandwidthMonitor
+
+DETECTORS = ("lightweight", "advanced", "discovery", "bandwidth")
+
+# Default rates for scenarios that have no simulate_loop.TEST_SCENARIOS entry
+_SYNTHETIC_PPS = {"mac_flood": 1000}
+
+
+# ---------------------------
+# Capture sources
+# ---------------------------
+def _synthetic_builders():
+    """Map scenario names to simulate_loop packet builders (called with a frame index)."""
+    import simulate_loop as sim
+
+    return {
+        "clean": lambda i: sim.create_arp_packet() if i % 2 else sim.create_broadcast_packet(),
+        "broadcast_storm": lambda i: sim.create_broadcast_packet(),
+        "arp_storm": lambda i: sim.create_arp_packet(),
+        "multicast_storm": lambda i: sim.create_multicast_packet(),
+        "spanning_tree_loop": lambda i: sim.create_bpdu_like_packet(),
+        "mac_flapping": lambda i: sim.create_mac_flapping_packet(i),
+        "cross_subnet_loop": lambda i: sim.create_cross_subnet_packet(),
+        "duplicate_packets": lambda i: sim.create_duplicate_packet(i // 50),
+        "entropy_test": lambda i: sim.create_low_entropy_packet(i // 100),
+        "multi_protocol_storm": lambda i: sim.create_mixed_protocol_packet(),
+        # A new locally administered source MAC per frame (MAC table flooding)
+        "mac_flood": lambda i: Ether(src="02:" + ":".join(f"{b:02x}" for b in i.to_bytes(5, "big")),
+                                     dst="ff:ff:ff:ff:ff:ff") / ARP(psrc="192.168.1.50", pdst="192.168.1.1"),
+    }
+
+
+def build_synthetic_capture(scenario, duration=5.0, pps=None):
+    """
+    Build a timestamped synthetic capture for a simulate_loop scenario.
+
+    Args:
+        scenario (str): Scenario name (see simulate_loop.TEST_SCENARIOS)
+        duration (float): Capture length in seconds
+        pps (int): Frames per second (defaults to the scenario's own rate)
+
+    Returns:
+        list: Scapy packets with .time set at even spacing
+    """
+    import simulate_loop as sim
+
+    builders = _synthetic_builders()
+    if scenario not in builders:
+        raise ValueError(f"Unknown scenario '{scenario}'. Available: {sorted(builders)}")
+
+    if pps is None:
+        default_pps = _SYNTHETIC_PPS.get(scenario, 100)
+        pps = max(1, sim.TEST_SCENARIOS.get(scenario, {}).get("packets_per_sec", default_pps))
+
+    build = builders[scenario]
+    start = time.time()
+    frames = []
+    for i in range(int(duration * pps)):
+        pkt = build(i)
+        pkt = pkt.__class__(bytes(pkt))  # Freeze random fields like a real capture
+        pkt.time = start + i / pps
+        frames.append(pkt)
+    return frames
+
+
+def load_capture(path):
+    """Load a pcap or pcapng file into memory."""
+    return list(rdpcap(path))
+
+
+# ---------------------------
+# Replay machinery
+# ---------------------------
+class _ReplayClock:
+    """Stand-in for the time module whose time() follows replayed frames."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class CaptureReplayer:
+    """
+    Drop-in replacement for scapy's sniff() that replays a frame list.
+
+    Records the cost of each prn() call and honours timeout (in capture
+    time) and stop_filter like the real sniff().
+    """
+
+    def __init__(self, frames, pacing="max", clock=None):
+        self.frames = frames
+        self.pacing = pacing
+        self.clock = clock
+        self.handler_costs = []
+        self.frames_replayed = 0
+        self.elapsed = 0.0
+
+    def sniff(self, prn=None, timeout=None, stop_filter=None, **kwargs):
+        if not self.frames:
+            return
+        first_ts = float(self.frames[0].time)
+        replay_start = time.perf_counter()
+        costs = self.handler_costs
+
+        for pkt in self.frames:
+            offset = float(pkt.time) - first_ts
+            if timeout is not None and offset > timeout:
+                break
+
+            if self.pacing == "realtime":
+                delay = offset - (time.perf_counter() - replay_start)
+                if delay > 0:
+                    time.sleep(delay)
+            if self.clock is not None:
+                self.clock.now = float(pkt.time)
+
+            t0 = time.perf_counter_ns()
+            if prn is not None:
+                prn(pkt)
+            costs.append(time.perf_counter_ns() - t0)
+            self.frames_replayed += 1
+
+            if stop_filter is not None and stop_filter(pkt):
+                break
+
+        self.elapsed = time.perf_counter() - replay_start
+
+
+@contextlib.contextmanager
+def _patched(obj, name, value):
+    original = getattr(obj, name)
+    setattr(obj, name, value)
+    try:
+        yield
+    finally:
+        setattr(obj, name, original)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _capture_duration(frames):
+    if len(frames) < 2:
+        return 1.0
+    return max(1.0, float(frames[-1].time) - float(frames[0].time))
+
+
+# ---------------------------
+# Detector runners
+# ---------------------------
+def _run_network_utils_detector(detector, frames, pacing):
+    """Run one of the sniff()-based detectors in network_utils against the frames."""
+    clock = _ReplayClock(float(frames[0].time)) if pacing == "max" and frames else None
+    replayer = CaptureReplayer(frames, pacing=pacing, clock=clock)
+    timeout = _capture_duration(frames)
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(_patched(network_utils, "sniff", replayer.sniff))
+        if clock is not None:
+            stack.enter_context(_patched(network_utils, "time", clock))
+
+        if detector == "lightweight":
+            total, offenders, stats, status, severity, metrics = network_utils.detect_loops_lightweight(
+                timeout=timeout, threshold=100, iface="replay", use_sampling=False
+            )
+            verdict = {
+                "status": status,
+                "max_severity": round(severity, 2),
+                "offenders": offenders,
+                "arp_storm_detected": metrics.get("arp_storm_detected", False),
+                "broadcast_flood_detected": metrics.get("broadcast_flood_detected", False),
+                "storm_rate": metrics.get("storm_rate", 0),
+                "early_exit": metrics.get("early_exit", False),
+                "mac_flood_detected": metrics.get("mac_flood_detected", False),
+                "mac_overflow_packets": metrics.get("mac_overflow_packets", 0),
+            }
+        elif detector == "advanced":
+            total, offenders, stats, metrics = network_utils.detect_loops(
+                timeout=timeout, threshold=150, iface="replay", enable_advanced=True,
+                use_baselines=False  # Keep replays reproducible (no learned state)
+            )
+            verdict = {
+                "offenders": offenders,
+                "loop_macs": [mac for mac, info in stats.items() if info.get("loop_on_single_router")],
+                "arp_storm_detected": metrics.get("arp_storm_detected", False),
+                "broadcast_flood_detected": metrics.get("broadcast_flood_detected", False),
+                "storm_rate": metrics.get("storm_rate", 0),
+                "early_exit": metrics.get("early_exit", False),
+            }
+        elif detector == "discovery":
+            network_utils.clients.clear()
+            found = network_utils.discover_clients(timeout=timeout, iface="replay")
+            verdict = {"clients": len(found)}
+        else:
+            raise ValueError(detector)
+
+    return replayer, verdict
+
+
+def _run_bandwidth_handler(frames, pacing, routers=None, top_n=5):
+    """Replay frames through RouterBandwidthMonitor._packet_handler."""
+    if not routers:
+        talkers = Counter()
+        for pkt in frames:
+            if pkt.haslayer(IP):
+                talkers[pkt[IP].src] += 1
+                talkers[pkt[IP].dst] += 1
+        routers = [ip for ip, _ in talkers.most_common(top_n)]
+
+    monitor = RouterBandwidthMonitor(iface="replay")
+    for ip in routers:
+        monitor.add_router(ip)
+
+    replayer = CaptureReplayer(frames, pacing=pacing)
+    replayer.sniff(prn=monitor._packet_handler)
+
+    duration = _capture_duration(frames)
+    verdict = {}
+    for ip in routers:
+        counters = monitor.get_counters(ip)
+        verdict[ip] = {
+            "download_mbps": round(counters["download_bytes"] * 8 / (1_000_000 * duration), 3),
+            "upload_mbps": round(counters["upload_bytes"] * 8 / (1_000_000 * duration), 3),
+            "packets": counters["packets"],
+        }
+    return replayer, verdict
+
+
+def run_detector(detector, frames, pacing="max", trace_memory=True, routers=None):
+    """
+    Replay frames through one detector and collect performance metrics.
+
+    Returns:
+        dict: frames, frames_per_sec, handler cost percentiles (microseconds),
+        memory high-water mark and the detector verdict
+    """
+    if trace_memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        if detector == "bandwidth":
+            replayer, verdict = _run_bandwidth_handler(frames, pacing, routers=routers)
+        else:
+            replayer, verdict = _run_network_utils_detector(detector, frames, pacing)
+        error = None
+    except Exception as e:
+        replayer, verdict, error = None, None, str(e)
+    wall_time = time.perf_counter() - started
+    peak_bytes = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    result = {"detector": detector, "pacing": pacing, "wall_time": round(wall_time, 3), "error": error}
+    if replayer is None:
+        return result
+
+    costs = sorted(replayer.handler_costs)
+    replay_time = replayer.elapsed or wall_time
+    result.update({
+        "frames": replayer.frames_replayed,
+        "frames_per_sec": round(replayer.frames_replayed / replay_time, 1) if replay_time > 0 else 0,
+        "handler_us": {
+            "p50": round(_percentile(costs, 50) / 1000, 2),
+            "p90": round(_percentile(costs, 90) / 1000, 2),
+            "p99": round(_percentile(costs, 99) / 1000, 2),
+            "max": round(costs[-1] / 1000, 2) if costs else 0,
+        },
+        "memory_peak_mb": round(peak_bytes / (1024 * 1024), 2) if peak_bytes is not None else None,
+        "verdict": verdict,
+    })
+    return result
+
+
+def _process_peak_rss_mb():
+    """Process memory high-water mark in MB (None if unavailable)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+    except ImportError:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+        except Exception:
+            return None
+
+
+def print_report(results):
+    print("\n" + "=" * 78)
+    print(f"{'Detector':<12} {'Frames':>8} {'Frames/s':>10} {'p50 us':>8} {'p90 us':>8} "
+          f"{'p99 us':>8} {'Mem MB':>8}")
+    print("-" * 78)
+    for res in results:
+        if res.get("error"):
+            print(f"{res['detector']:<12} ERROR: {res['error']}")
+            continue
+        h = res["handler_us"]
+        mem = res["memory_peak_mb"] if res["memory_peak_mb"] is not None else "-"
+        print(f"{res['detector']:<12} {res['frames']:>8} {res['frames_per_sec']:>10} "
+              f"{h['p50']:>8} {h['p90']:>8} {h['p99']:>8} {mem:>8}")
+    print("=" * 78)
+    for res in results:
+        if not res.get("error"):
+            print(f"  {res['detector']}: {json.dumps(res['verdict'], default=str)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captures through Winyfi detectors")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pcap", help="pcap/pcapng file to replay")
+    source.add_argument("--synthetic", help="simulate_loop scenario to synthesize")
+    parser.add_argument("--duration", type=float, default=5.0, help="Synthetic capture length (s)")
+    parser.add_argument("--pps", type=int, help="Synthetic frames per second")
+    parser.add_argument("--write-pcap", help="Save the synthetic capture to this file")
+    parser.add_argument("--detectors", default=",".join(DETECTORS),
+                        help=f"Comma-separated subset of: {', '.join(DETECTORS)}")
+    parser.add_argument("--pacing", choices=("max", "realtime"), default="max")
+    parser.add_argument("--router", action="append", help="Router IP for the bandwidth handler (repeatable)")
+    parser.add_argument("--no-trace-memory", action="store_true",
+                        help="Skip tracemalloc (faster, no per-detector memory figure)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.pcap:
+        frames = load_capture(args.pcap)
+        source_name = args.pcap
+    else:
+        frames = build_synthetic_capture(args.synthetic, duration=args.duration, pps=args.pps)
+        source_name = f"synthetic:{args.synthetic}"
+        if args.write_pcap:
+            wrpcap(args.write_pcap, frames)
+            print(f"💾 Wrote {len(frames)} frames to {args.write_pcap}")
+
+    detectors = [d.strip() for d in args.detectors.split(",") if d.strip()]
+    unknown = set(detectors) - set(DETECTORS)
+    if unknown:
+        parser.error(f"Unknown detectors: {', '.join(sorted(unknown))}")
+
+    print(f"🎞️  Replaying {len(frames)} frames from {source_name} ({args.pacing} pacing)")
+    results = [
+        run_detector(d, frames, pacing=args.pacing, trace_memory=not args.no_trace_memory, routers=args.router)
+        for d in detectors
+    ]
+    print_report(results)
+    peak_rss = _process_peak_rss_mb()
+    if peak_rss is not None:
+        print(f"  Process peak RSS: {peak_rss} MB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"source": source_name, "frames": len(frames), "pacing": args.pacing,
+                       "process_peak_rss_mb": peak_rss, "results": results}, f, indent=2, default=str)
+        print(f"💾 Results written to {args.json}")
+
+    return 1 if any(res.get("error") for res in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,541 @@
+"""
+Presence Tracker
+Keeps an in-memory MAC -> (ip, router, last_seen) index of LAN clients so
+client lists can be answered without ARP-sweeping every subnet per request.
+
+Sources, cheapest first:
+- The OS neighbour table (/proc/net/arp on Linux, `arp -a` elsewhere),
+  polled every few seconds.
+- Passive capture of ARP and DHCP traffic (joins, renewals, releases and
+  DHCP hostnames) through a scapy AsyncSniffer.
+- Active ARP sweeps of each router's subnet, run only as a slow periodic
+  background refresh or on explicit request.
+"""
+
+import ipaddress
+import logging
+import platform
+import re
+import threading
+import time
+from datetime import datetime
+
+from dns_resolver import get_resolver, UNKNOWN_HOSTNAME
+from oui_db import get_vendor
+
+
+PROC_NET_ARP = "/proc/net/arp"
+ATF_COM = 0x02  # Neighbour entry is complete (has a hardware address)
+
+_WINDOWS_ARP_LINE = re.compile(
+    r"^\s*(\d{1,3}(?:\.\d{1,3}){3})\s+([0-9a-fA-F]{2}(?:[-:][0-9a-fA-F]{2}){5})\s+(\w+)"
+)
+_IGNORED_MACS = {"00:00:00:00:00:00", "ff:ff:ff:ff:ff:ff"}
+
+DHCP_REQUEST = 3
+DHCP_ACK = 5
+DHCP_RELEASE = 7
+
+
+def _normalize_mac(mac):
+    return mac.strip().lower().replace("-", ":") if mac else None
+
+
+def read_neighbour_table():
+    """
+    Read the OS neighbour (ARP) cache.
+
+    Returns:
+        list: [(ip, mac, device)] for complete, non-broadcast entries;
+        device is None where the platform does not report it
+    """
+    if platform.system() == "Linux":
+        return _read_proc_net_arp()
+    return _read_arp_command()
+
+
+def _read_proc_net_arp(path=PROC_NET_ARP):
+    entries = []
+    try:
+        with open(path, "r") as f:
+            next(f, None)  # Header
+            for line in f:
+                parts = line.split()
+                if len(parts) < 6:
+                    continue
+                ip, _, flags, mac, _, device = parts[:6]
+                try:
+                    if not int(flags, 16) & ATF_COM:
+                        continue
+                except ValueError:
+                    continue
+                mac = _normalize_mac(mac)
+                if mac in _IGNORED_MACS:
+                    continue
+                entries.append((ip, mac, device))
+    except OSError as e:
+        logging.debug(f"Neighbour table unavailable: {e}")
+    return entries
+
+
+def _read_arp_command():
+    from network_utils import _run_silent_subprocess
+
+    entries = []
+    try:
+        result = _run_silent_subprocess(["arp", "-a"], capture_output=True, text=True, timeout=5)
+    except Exception as e:
+        logging.debug(f"arp -a failed: {e}")
+        return entries
+
+    for line in (result.stdout or "").splitlines():
+        match = _WINDOWS_ARP_LINE.match(line)
+        if not match:
+            continue
+        ip, mac, _ = match.groups()
+        mac = _normalize_mac(mac)
+        if mac in _IGNORED_MACS or ip.endswith(".255") or ipaddress.ip_address(ip).is_multicast:
+            continue
+        entries.append((ip, mac, None))
+    return entries
+
+
+class PresenceEntry:
+    """Last known whereabouts of one client MAC."""
+
+    __slots__ = ("mac", "ip", "router_id", "router_name", "first_seen", "last_seen",
+                 "source", "hostname", "vendor", "released")
+
+    def __init__(self, mac, now):
+        self.mac = mac
+        self.ip = None
+        self.router_id = None
+        self.router_name = None
+        self.first_seen = now
+        self.last_seen = now
+        self.source = None
+        self.hostname = UNKNOWN_HOSTNAME
+        self.vendor = get_vendor(mac)
+        self.released = False
+
+    def to_dict(self):
+        return {
+            "mac_address": self.mac,
+            "ip_address": self.ip,
+            "hostname": self.hostname,
+            "vendor": self.vendor,
+            "router_id": self.router_id,
+            "router_name": self.router_name,
+            "first_seen": datetime.fromtimestamp(self.first_seen),
+            "last_seen": datetime.fromtimestamp(self.last_seen),
+            "source": self.source
+        }
+
+
+class PresenceTracker:
+    """
+    Always-on client presence index.
+
+    Every sighting (neighbour table row, ARP packet, DHCP exchange or sweep
+    response) updates the entry for that MAC and attributes it to the router
+    whose subnet contains its IP (longest prefix wins; when several routers
+    share a subnet, the router whose sweep saw the client keeps it).
+
+    Args:
+        routers_provider: Callable() -> list of router dicts (id, name, ip_address,
+            mac_address[, netmask]); defaults to router_utils.get_routers
+        neighbour_interval (float): Seconds between neighbour table reads
+        sweep_interval (float): Seconds between background ARP sweeps of every router
+            (0 disables them)
+        online_window (float): A client is listed as present if seen within this many seconds
+        retain (float): Entries not seen for this long are dropped from the index
+        iface: Interface for passive capture and sweeps (auto-detected if None)
+        passive (bool): Capture ARP/DHCP traffic in the background
+    """
+
+    CAPTURE_FILTER = "arp or (udp and (port 67 or port 68))"
+
+    def __init__(self, routers_provider=None, neighbour_interval=10.0, sweep_interval=900.0,
+                 online_window=600.0, retain=86400.0, iface=None, passive=True):
+        self.routers_provider = routers_provider
+        self.neighbour_interval = neighbour_interval
+        self.sweep_interval = sweep_interval
+        self.online_window = online_window
+        self.retain = retain
+        self.iface = iface
+        self.passive = passive
+
+        self._lock = threading.RLock()
+        self._entries = {}         # mac -> PresenceEntry
+        self._by_ip = {}           # ip -> mac
+        self._networks = []        # [(prefixlen, network_int, netmask_int, router)]
+        self._router_macs = set()  # Router interfaces are not listed as clients
+        self._last_sweep = {}      # router_id -> timestamp
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._sniffer = None
+
+        self.stats = {
+            "neighbour_reads": 0,
+            "arp_packets": 0,
+            "dhcp_packets": 0,
+            "sweeps": 0,
+            "sweep_time": 0.0,
+            "queries": 0,
+            "ip_changes": 0
+        }
+
+    # --- routers ---
+
+    def set_routers(self, routers):
+        """Replace the router list used to attribute clients (subnet -> router)."""
+        networks = []
+        router_macs = set()
+        for router in routers or []:
+            ip = router.get("ip_address")
+            if not ip:
+                continue
+            try:
+                net = ipaddress.IPv4Network(f"{ip}/{router.get('netmask') or '255.255.255.0'}", strict=False)
+            except ValueError:
+                continue
+            networks.append((net.prefixlen, int(net.network_address), int(net.netmask), router))
+            if router.get("mac_address"):
+                router_macs.add(_normalize_mac(router["mac_address"]))
+        networks.sort(key=lambda n: -n[0])
+
+        with self._lock:
+            self._networks = networks
+            self._router_macs = router_macs
+            for entry in self._entries.values():
+                self._attribute(entry)
+
+    def _load_routers(self):
+        provider = self.routers_provider
+        if provider is None:
+            from router_utils import get_routers
+            provider = get_routers
+        try:
+            self.set_routers(provider())
+        except Exception as e:
+            logging.warning(f"Presence tracker could not load routers: {e}")
+
+    def _matching_routers(self, ip):
+        try:
+            value = int(ipaddress.IPv4Address(ip))
+        except ValueError:
+            return []
+        matches = []
+        best = None
+        for prefixlen, network, netmask, router in self._networks:
+            if best is not None and prefixlen < best:
+                break
+            if value & netmask == network:
+                best = prefixlen
+                matches.append(router)
+        return matches
+
+    def _attribute(self, entry, swept_router=None):
+        """Pick the router for entry.ip; caller holds the lock."""
+        if not entry.ip:
+            return
+        matches = self._matching_routers(entry.ip)
+        if not matches:
+            entry.router_id = entry.router_name = None
+            return
+        if swept_router is not None and any(r.get("id") == swept_router.get("id") for r in matches):
+            router = swept_router
+        else:
+            router = next((r for r in matches if r.get("id") == entry.router_id), matches[0])
+        entry.router_id = router.get("id")
+        entry.router_name = router.get("name")
+
+    # --- index updates ---
+
+    def observe(self, mac, ip, source, hostname=None, swept_router=None, now=None):
+        """
+        Record a sighting of `mac` at `ip`.
+
+        Returns:
+            PresenceEntry: The updated entry
+        """
+        mac = _normalize_mac(mac)
+        if not mac or mac in _IGNORED_MACS:
+            return None
+        now = now or time.time()
+        resolve_ip = None
+
+        with self._lock:
+            entry = self._entries.get(mac)
+            if entry is None:
+                entry = self._entries[mac] = PresenceEntry(mac, now)
+            entry.last_seen = max(entry.last_seen, now)
+            entry.source = source
+            entry.released = False
+
+            if ip and ip != "0.0.0.0" and ip != entry.ip:
+                if entry.ip:
+                    self.stats["ip_changes"] += 1
+                    if self._by_ip.get(entry.ip) == mac:
+                        del self._by_ip[entry.ip]
+                # An IP now held by another MAC moves to this one
+                previous = self._by_ip.get(ip)
+                if previous and previous != mac and previous in self._entries:
+                    self._entries[previous].ip = None
+                self._by_ip[ip] = mac
+                entry.ip = ip
+                entry.hostname = UNKNOWN_HOSTNAME
+                resolve_ip = ip
+                self._attribute(entry, swept_router)
+            elif swept_router is not None:
+                self._attribute(entry, swept_router)
+
+            if hostname and hostname != UNKNOWN_HOSTNAME:
+                entry.hostname = hostname
+                resolve_ip = None
+
+        if resolve_ip:
+            cached = get_resolver().resolve_later(resolve_ip, lambda ip, name, mac=mac: self._set_hostname(mac, ip, name))
+            if cached is not None:
+                self._set_hostname(mac, resolve_ip, cached)
+        return entry
+
+    def _set_hostname(self, mac, ip, hostname):
+        with self._lock:
+            entry = self._entries.get(mac)
+            if entry is not None and entry.ip == ip and entry.hostname == UNKNOWN_HOSTNAME:
+                entry.hostname = hostname
+
+    def release(self, mac, now=None):
+        """Client gave its lease back (DHCP RELEASE): no longer present."""
+        with self._lock:
+            entry = self._entries.get(_normalize_mac(mac))
+            if entry is not None:
+                entry.released = True
+                entry.last_seen = now or time.time()
+
+    def poll_neighbour_table(self):
+        """Fold the current OS neighbour table into the index."""
+        now = time.time()
+        rows = read_neighbour_table()
+        for ip, mac, _ in rows:
+            self.observe(mac, ip, "neighbour", now=now)
+        self.stats["neighbour_reads"] += 1
+        return len(rows)
+
+    def prune(self, now=None):
+        now = now or time.time()
+        cutoff = now - self.retain
+        with self._lock:
+            stale = [mac for mac, entry in self._entries.items() if entry.last_seen < cutoff]
+            for mac in stale:
+                entry = self._entries.pop(mac)
+                if entry.ip and self._by_ip.get(entry.ip) == mac:
+                    del self._by_ip[entry.ip]
+        return len(stale)
+
+    # --- passive capture ---
+
+    def _handle_packet(self, pkt):
+        try:
+            from scapy.all import ARP, Ether
+            from scapy.layers.dhcp import BOOTP, DHCP
+
+            if pkt.haslayer(ARP):
+                arp = pkt[ARP]
+                self.stats["arp_packets"] += 1
+                # ARP probes (psrc 0.0.0.0) announce a MAC but claim no address yet
+                self.observe(arp.hwsrc, arp.psrc, "arp")
+                return
+
+            if pkt.haslayer(DHCP) and pkt.haslayer(BOOTP):
+                self.stats["dhcp_packets"] += 1
+                bootp = pkt[BOOTP]
+                options = {}
+                for option in pkt[DHCP].options:
+                    if isinstance(option, tuple) and len(option) >= 2:
+                        options[option[0]] = option[1]
+                mac = ":".join(f"{b:02x}" for b in bytes(bootp.chaddr)[:6])
+                hostname = options.get("hostname")
+                if isinstance(hostname, bytes):
+                    hostname = hostname.decode("utf-8", "ignore") or None
+
+                message_type = options.get("message-type")
+                if message_type == DHCP_ACK:
+                    self.observe(mac, bootp.yiaddr, "dhcp", hostname=hostname)
+                elif message_type == DHCP_REQUEST:
+                    self.observe(mac, options.get("requested_addr") or bootp.ciaddr, "dhcp", hostname=hostname)
+                elif message_type == DHCP_RELEASE:
+                    self.release(mac)
+                elif pkt.haslayer(Ether):
+                    self.observe(pkt[Ether].src, None, "dhcp", hostname=hostname)
+        except Exception:
+            pass
+
+    def _start_sniffer(self):
+        try:
+            from scapy.all import AsyncSniffer, ARP
+            from scapy.layers.dhcp import DHCP
+            from arp_scanner import capture_filter_kwargs
+
+            self._sniffer = AsyncSniffer(prn=self._handle_packet, store=False, iface=self.iface,
+                                         **capture_filter_kwargs(self.CAPTURE_FILTER,
+                                                                 lambda p: p.haslayer(ARP) or p.haslayer(DHCP)))
+            self._sniffer.start()
+        except Exception as e:
+            logging.warning(f"Passive presence capture unavailable: {e}")
+            self._sniffer = None
+
+    # --- active sweeps ---
+
+    def refresh_routers(self, routers, dns_timeout=1.0):
+        """
+        ARP-sweep the given routers' subnets now (all in parallel, see
+        arp_scanner) and fold the responders into the index as they reply.
+
+        Returns:
+            dict: The scanner report (clients, per-subnet summaries, total_time)
+        """
+        from arp_scanner import get_arp_scanner
+
+        by_id = {r.get("id"): r for r in routers}
+
+        def on_result(result):
+            self.observe(result["mac"], result["ip"], "sweep", swept_router=by_id.get(result["router_id"]))
+
+        report = get_arp_scanner().scan(routers, iface=self.iface, on_result=on_result, dns_timeout=dns_timeout)
+        for result in report["clients"].values():
+            if result["hostname"] != UNKNOWN_HOSTNAME:
+                self._set_hostname(result["mac"], result["ip"], result["hostname"])
+
+        now = time.time()
+        with self._lock:
+            for router in routers:
+                self._last_sweep[router.get("id")] = now
+            self.stats["sweeps"] += 1
+            self.stats["sweep_time"] += report["total_time"]
+        return report
+
+    def refresh_router(self, router, dns_timeout=1.0):
+        """
+        ARP-sweep one router's subnet now.
+
+        Returns:
+            int: Number of responders
+        """
+        return len(self.refresh_routers([router], dns_timeout=dns_timeout)["clients"])
+
+    def has_swept(self, router_id):
+        with self._lock:
+            return router_id in self._last_sweep
+
+    def _sweep_due_routers(self):
+        now = time.time()
+        with self._lock:
+            routers = [n[3] for n in self._networks]
+            due = [r for r in routers
+                   if now - self._last_sweep.get(r.get("id"), 0) >= self.sweep_interval
+                   and not (r.get("is_unifi") or str(r.get("brand") or "").lower() == "unifi")]
+        if due and not self._stop.is_set():
+            try:
+                self.refresh_routers(due)
+            except Exception as e:
+                logging.warning(f"Background sweep of {len(due)} router(s) failed: {e}")
+
+    # --- lifecycle ---
+
+    def start(self):
+        """Load routers, read the neighbour table once and start the background workers."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._load_routers()
+        self.poll_neighbour_table()
+        if self.passive:
+            self._start_sniffer()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="presence-tracker")
+        self._thread.start()
+
+    def _run(self):
+        last_router_reload = time.time()
+        while not self._stop.wait(self.neighbour_interval):
+            try:
+                self.poll_neighbour_table()
+                if time.time() - last_router_reload >= 300:
+                    self._load_routers()
+                    last_router_reload = time.time()
+                if self.sweep_interval:
+                    self._sweep_due_routers()
+                self.prune()
+            except Exception as e:
+                logging.warning(f"Presence tracker cycle failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._sniffer is not None:
+            try:
+                self._sniffer.stop()
+            except Exception:
+                pass
+            self._sniffer = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    # --- queries ---
+
+    def get_clients(self, router_id=None, max_age=None, include_routers=False):
+        """
+        Clients seen within `max_age` seconds (default online_window).
+
+        Returns:
+            list: PresenceEntry.to_dict() rows, most recently seen first
+        """
+        max_age = self.online_window if max_age is None else max_age
+        cutoff = time.time() - max_age
+        with self._lock:
+            self.stats["queries"] += 1
+            rows = [entry.to_dict() for entry in self._entries.values()
+                    if entry.last_seen >= cutoff and not entry.released
+                    and (router_id is None or entry.router_id == router_id)
+                    and (include_routers or entry.mac not in self._router_macs)]
+        rows.sort(key=lambda row: row["last_seen"], reverse=True)
+        return rows
+
+    def lookup(self, mac):
+        with self._lock:
+            entry = self._entries.get(_normalize_mac(mac))
+            return entry.to_dict() if entry else None
+
+    def lookup_ip(self, ip):
+        with self._lock:
+            mac = self._by_ip.get(ip)
+            entry = self._entries.get(mac) if mac else None
+            return entry.to_dict() if entry else None
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["tracked_macs"] = len(self._entries)
+            stats["routers"] = len(self._networks)
+            stats["passive_capture"] = self._sniffer is not None
+        stats["avg_sweep_time"] = stats["sweep_time"] / stats["sweeps"] if stats["sweeps"] else 0.0
+        return stats
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_presence_tracker(start=True):
+    """Process-wide PresenceTracker, started on first use unless start=False."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = PresenceTracker()
+        if start and not _tracker.running:
+            _tracker.start()
+        return _tracker
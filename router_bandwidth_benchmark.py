@@ -0,0 +1,210 @@
+"""
+RouterBandwidthMonitor Packet Routing Benchmark
+Measures the per-packet cost of RouterBandwidthMonitor._packet_handler with
+many registered routers, against the previous implementation that scanned
+every router under the global lock, and checks that a live run at a target
+packet rate loses no bytes across sampling-interval boundaries.
+
+Phases:
+    handler   - replay pre-built frames through each handler as fast as
+                possible; reports ns/packet and sustainable packets/sec
+    sustained - feed frames at --pps from a capture thread while the
+                calculation thread samples every --interval seconds;
+                reports achieved rate and byte accounting
+
+Usage:
+    python router_bandwidth_benchmark.py
+    python router_bandwidth_benchmark.py --routers 500 --pps 50000 --duration 5
+    python router_bandwidth_benchmark.py --json bench.json
+"""
+
+import argparse
+import ipaddress
+import json
+import random
+import sys
+import threading
+import time
+
+from scapy.all import IP, TCP, Ether
+
+from router_bandwidth_monitor import RouterBandwidthMonitor
+
+
+class LegacyRouterBandwidthMonitor(RouterBandwidthMonitor):
+    """The pre-index packet path: lock, then compare against every router."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.legacy_counters = {}
+
+    def add_router(self, ip, mac=None, name=None):
+        super().add_router(ip, mac=mac, name=name)
+        self.legacy_counters[ip] = {"download_bytes": 0, "upload_bytes": 0, "total_packets": 0}
+
+    def _packet_handler(self, packet):
+        try:
+            if not packet.haslayer(IP):
+                return
+            src_ip = packet[IP].src
+            dst_ip = packet[IP].dst
+            packet_size = len(packet)
+            with self.lock:
+                for router_ip, router_info in self.routers.items():
+                    if src_ip == router_ip:
+                        self.legacy_counters[router_ip]["upload_bytes"] += packet_size
+                        self.legacy_counters[router_ip]["total_packets"] += 1
+                        if not router_info["mac"] and packet.haslayer(Ether):
+                            router_info["mac"] = packet[Ether].src
+                    elif dst_ip == router_ip:
+                        self.legacy_counters[router_ip]["download_bytes"] += packet_size
+                        self.legacy_counters[router_ip]["total_packets"] += 1
+                        if not router_info["mac"] and packet.haslayer(Ether):
+                            router_info["mac"] = packet[Ether].dst
+        except Exception:
+            pass
+
+
+def build_routers(count):
+    """`count` router IPs spread over 10.x.y.1 addresses."""
+    return [str(ipaddress.IPv4Address(int(ipaddress.IPv4Address("10.0.0.1")) + (i << 8))) for i in range(count)]
+
+
+def build_frames(routers, count, router_share=0.7, seed=7):
+    """
+    Frames as a capture would deliver them (dissected from raw bytes).
+
+    router_share of frames have a router as source or destination; the rest
+    are client-to-client traffic that matches nothing.
+    """
+    rng = random.Random(seed)
+    templates = []
+    for i in range(min(count, 4096)):
+        client = f"192.168.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+        if rng.random() < router_share:
+            router = rng.choice(routers)
+            src, dst = (router, client) if rng.random() < 0.5 else (client, router)
+        else:
+            src, dst = client, f"192.168.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+        payload = b"x" * rng.choice((40, 200, 1200))
+        raw = bytes(Ether(src="02:00:00:00:00:01", dst="02:00:00:00:00:02") / IP(src=src, dst=dst) / TCP() / payload)
+        templates.append(Ether(raw))
+    return [templates[i % len(templates)] for i in range(count)]
+
+
+def bench_handler(monitor_cls, routers, frames):
+    monitor = monitor_cls(iface="bench")
+    for ip in routers:
+        monitor.add_router(ip, mac="02:00:00:00:00:02")
+    handler = monitor._packet_handler
+    started = time.perf_counter()
+    for frame in frames:
+        handler(frame)
+    elapsed = time.perf_counter() - started
+    return {
+        "packets": len(frames),
+        "seconds": round(elapsed, 3),
+        "ns_per_packet": round(elapsed / len(frames) * 1e9),
+        "max_pps": round(len(frames) / elapsed)
+    }
+
+
+def bench_sustained(routers, frames, pps, duration, interval):
+    """Capture thread at `pps` while the calculation thread samples every `interval` s."""
+    monitor = RouterBandwidthMonitor(iface="bench", sampling_interval=interval,
+                                     history_size=int(duration / interval) + 10)
+    for ip in routers:
+        monitor.add_router(ip, mac="02:00:00:00:00:02")
+
+    expected = {"bytes": 0}
+    stop = threading.Event()
+
+    def capture():
+        handler = monitor._packet_handler
+        period = 1.0 / pps
+        next_at = time.perf_counter()
+        sent = 0
+        total = len(frames)
+        deadline = next_at + duration
+        while not stop.is_set():
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            # Deliver everything that is due (a capture loop drains a burst at a time)
+            while next_at <= now:
+                frame = frames[sent % total]
+                handler(frame)
+                sent += 1
+                next_at += period
+            time.sleep(0.0005)
+        expected["sent"] = sent
+
+    monitor.running = True
+    calc = threading.Thread(target=monitor._calculate_bandwidth_loop, daemon=True)
+    calc.start()
+    started = time.perf_counter()
+    capture_thread = threading.Thread(target=capture)
+    capture_thread.start()
+    capture_thread.join()
+    elapsed = time.perf_counter() - started
+    monitor.running = False
+    calc.join()
+    monitor._sample()  # Fold in whatever arrived after the last interval
+
+    counted = 0
+    for ip in routers:
+        counted += sum(h["download_bytes"] + h["upload_bytes"] for h in monitor.bandwidth_stats[ip]["history"])
+    cumulative = sum(c["download_bytes"] + c["upload_bytes"]
+                     for c in (monitor.get_counters(ip) for ip in routers))
+    return {
+        "target_pps": pps,
+        "achieved_pps": round(expected["sent"] / elapsed),
+        "packets": expected["sent"],
+        "intervals": len(monitor.bandwidth_stats[routers[0]]["history"]),
+        "bytes_in_history": counted,
+        "bytes_counted": cumulative,
+        "lost_bytes": cumulative - counted
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark RouterBandwidthMonitor packet routing")
+    parser.add_argument("--routers", type=int, default=500, help="Registered routers")
+    parser.add_argument("--pps", type=int, default=50000, help="Target packet rate for the sustained phase")
+    parser.add_argument("--packets", type=int, default=200000, help="Frames replayed in the handler phase")
+    parser.add_argument("--duration", type=float, default=5.0, help="Sustained phase length (s)")
+    parser.add_argument("--interval", type=float, default=0.5, help="Sampling interval in the sustained phase (s)")
+    parser.add_argument("--skip-legacy", action="store_true", help="Don't benchmark the O(routers) handler")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    routers = build_routers(args.routers)
+    frames = build_frames(routers, args.packets)
+    print(f"📦 {args.routers} routers, {len(frames)} frames")
+
+    results = {"routers": args.routers}
+    results["indexed"] = bench_handler(RouterBandwidthMonitor, routers, frames)
+    print(f"  indexed handler: {results['indexed']['ns_per_packet']} ns/packet "
+          f"(~{results['indexed']['max_pps']:,} pps)")
+    if not args.skip_legacy:
+        legacy_frames = frames[: max(1000, len(frames) // 20)]
+        results["legacy"] = bench_handler(LegacyRouterBandwidthMonitor, routers, legacy_frames)
+        print(f"  legacy handler:  {results['legacy']['ns_per_packet']} ns/packet "
+              f"(~{results['legacy']['max_pps']:,} pps)")
+
+    results["sustained"] = bench_sustained(routers, frames, args.pps, args.duration, args.interval)
+    s = results["sustained"]
+    print(f"  sustained: {s['achieved_pps']:,}/{s['target_pps']:,} pps over {s['intervals']} intervals, "
+          f"lost bytes at interval boundaries: {s['lost_bytes']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+    ok = s["lost_bytes"] == 0 and s["achieved_pps"] >= 0.95 * s["target_pps"]
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
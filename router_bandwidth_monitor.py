@@ -4,6 +4,7 @@ Estimates per-router bandwidth usage using Layer 2 packet inspection.
 No SNMP, no port mirroring, no managed switches required.
 """
 
+import socket
 import threading
 import time
 from collections import defaultdict, deque
@@ -11,10 +12,55 @@ from datetime import datetime
 from scapy.all import AsyncSniffer, Ether, IP, ARP
 import logging
 
+ETHERTYPE_IPV4 = b"\x08\x00"
+ETHERTYPE_VLAN = b"\x81\x00"
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 
 
+def _pack_mac(mac):
+    try:
+        return bytes.fromhex(mac.replace(":", "").replace("-", ""))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _format_mac(packed):
+    return ":".join(f"{b:02x}" for b in packed)
+
+
+class _RouterCounters:
+    """
+    Counter slot for one router.
+
+    The capture thread is the only writer and the counters only ever grow,
+    so the packet path needs no lock; the calculation thread turns them into
+    per-interval figures by differencing against the values it read last time.
+    """
+
+    __slots__ = ("ip", "mac", "download_bytes", "upload_bytes", "packets",
+                 "read_download", "read_upload", "read_packets", "talkers")
+
+    def __init__(self, ip, mac=None):
+        self.ip = ip
+        self.mac = mac
+        self.talkers = None  # SpaceSaving of LAN hosts for the current interval (top_talkers mode)
+        self.download_bytes = 0
+        self.upload_bytes = 0
+        self.packets = 0
+        self.read_download = 0
+        self.read_upload = 0
+        self.read_packets = 0
+
+    def take_interval(self):
+        """(download_bytes, upload_bytes, packets) since the previous call."""
+        download, upload, packets = self.download_bytes, self.upload_bytes, self.packets
+        delta = (download - self.read_download, upload - self.read_upload, packets - self.read_packets)
+        self.read_download, self.read_upload, self.read_packets = download, upload, packets
+        return delta
+
+
 class RouterBandwidthMonitor:
     """
     Monitors bandwidth usage for non-UniFi routers using packet capture.
@@ -26,6 +72,11 @@ class RouterBandwidthMonitor:
     - Thread-safe data access
     - Compatible with Windows and Linux
     
+    Packets are routed to routers through hash indexes (IP -> counter slot,
+    and optionally learned MAC -> slot) instead of scanning every router, and
+    counting takes no lock; each interval's results are published as a new
+    snapshot that readers pick up with a single reference read.
+    
     Usage:
         monitor = RouterBandwidthMonitor(sampling_interval=5)
         monitor.add_router("192.168.1.1", "AA:BB:CC:DD:EE:FF")
@@ -36,7 +87,8 @@ class RouterBandwidthMonitor:
         print(f"Download: {bandwidth['download_mbps']} Mbps")
     """
     
-    def __init__(self, sampling_interval=5, history_size=60, iface=None):
+    def __init__(self, sampling_interval=5, history_size=60, iface=None, count_learned_macs=False,
+                 capture_backend="auto", top_talkers=0, series_store=None, anomaly_detector=None):
         """
         Initialize the bandwidth monitor.
         
@@ -44,27 +96,53 @@ class RouterBandwidthMonitor:
             sampling_interval (int): Seconds between bandwidth calculations (default: 5)
             history_size (int): Number of historical samples to keep (default: 60)
             iface (str): Network interface to monitor (None = auto-detect)
+            count_learned_macs (bool): Also attribute frames whose Ethernet src/dst is a
+                router's (learned) MAC when neither IP belongs to a router, e.g. client
+                traffic routed through it (default: False, router IPs only)
+            capture_backend (str): "mmap" (Linux TPACKET_V3 ring, see packet_ring),
+                "scapy" (AsyncSniffer) or "auto" (mmap where available, else scapy)
+            top_talkers (int): Keep the top N hosts by bytes per router and interval in a
+                fixed-size heavy-hitter summary (see get_top_talkers); 0 disables it
+            series_store (TimeSeriesStore): Also append every sample to this compressed
+                on-disk store (see timeseries_store), keyed by router IP, for history
+                beyond history_size
+            anomaly_detector (AnomalyDetector): Score every sample against the router's
+                learned baseline and notify on unusual traffic (see anomaly_detector);
+                without one, samples above 50 Mbps are just logged
         """
         self.sampling_interval = sampling_interval
         self.history_size = history_size
         self.iface = iface or self._get_default_interface()
+        self.count_learned_macs = count_learned_macs
+        self.top_talkers = top_talkers
+        self.series_store = series_store
+        self.anomaly_detector = anomaly_detector
         
         # Router registry: {ip: {"mac": str, "name": str}}
         self.routers = {}
         
+        # Packet routing indexes, replaced (never mutated) on change so the
+        # capture thread can read them without locking
+        self._ip_index = {}    # ip string -> _RouterCounters (API lookups)
+        self._addr_index = {}  # packed 4-byte address -> _RouterCounters (packet path)
+        self._mac_index = {}   # packed 6-byte MAC -> _RouterCounters
+        
         # Bandwidth data per router
         self.bandwidth_stats = defaultdict(lambda: {
-            "download_bytes": 0,
-            "upload_bytes": 0,
             "last_reset": time.time(),
-            "history": deque(maxlen=history_size),
-            "total_packets": 0
+            "history": deque(maxlen=history_size)
         })
+        # Latest measurement per router, swapped as a whole each interval
+        self._latest = {}
+        self._latest_talkers = {}
         
         # Packet capture state
+        self.capture_backend = capture_backend
+        self.active_backend = None
+        self.ring = None
         self.sniffer = None
         self.running = False
-        self.lock = threading.Lock()
+        self.lock = threading.RLock()
         
         # Calculation thread
         self.calc_thread = None
@@ -101,6 +179,17 @@ class RouterBandwidthMonitor:
                 "mac": mac,
                 "name": name or f"Router-{ip}"
             }
+            slot = self._ip_index.get(ip) or _RouterCounters(ip, mac)
+            slot.mac = mac.lower() if mac else slot.mac
+            if self.top_talkers and slot.talkers is None:
+                slot.talkers = self._new_talkers()
+            self._ip_index = dict(self._ip_index, **{ip: slot})
+            self._addr_index = dict(self._addr_index)
+            self._addr_index[socket.inet_aton(ip)] = slot
+            if slot.mac:
+                self._mac_index = dict(self._mac_index)
+                self._mac_index[_pack_mac(slot.mac)] = slot
+            self.bandwidth_stats[ip]["last_reset"] = time.time()
             logging.info(f"Added router: {ip} ({name or 'unnamed'})")
     
     def remove_router(self, ip):
@@ -108,49 +197,121 @@ class RouterBandwidthMonitor:
         with self.lock:
             if ip in self.routers:
                 del self.routers[ip]
-                del self.bandwidth_stats[ip]
+                self.bandwidth_stats.pop(ip, None)
+                self._ip_index = {k: v for k, v in self._ip_index.items() if k != ip}
+                self._addr_index = {k: v for k, v in self._addr_index.items() if v.ip != ip}
+                self._mac_index = {k: v for k, v in self._mac_index.items() if v.ip != ip}
+                self._latest = {k: v for k, v in self._latest.items() if k != ip}
+                self._latest_talkers = {k: v for k, v in self._latest_talkers.items() if k != ip}
                 logging.info(f"Removed router: {ip}")
     
+    def _learn_mac(self, slot, mac):
+        """Record a router's MAC the first time it is seen (rare; takes the lock)."""
+        with self.lock:
+            if slot.mac or slot.ip not in self.routers:
+                return
+            slot.mac = mac.lower()
+            self.routers[slot.ip]["mac"] = mac
+            self._mac_index = dict(self._mac_index)
+            self._mac_index[_pack_mac(slot.mac)] = slot
+            logging.info(f"Learned MAC for {slot.ip}: {mac}")
+    
     def _packet_handler(self, packet):
         """
         Process captured packets and accumulate bandwidth data.
         Called for each packet by AsyncSniffer.
+        
+        Two dict lookups per packet regardless of how many routers are
+        registered, and counters are bumped without taking the lock. Ethernet
+        frames are read straight from the captured bytes; anything else goes
+        through scapy's dissected layers.
         """
         try:
-            # Only process IP packets
-            if not packet.haslayer(IP):
+            raw = packet.original
+            if raw and packet.__class__ is Ether and len(raw) >= 34:
+                ethertype = raw[12:14]
+                offset = 14
+                if ethertype == ETHERTYPE_VLAN:
+                    ethertype = raw[16:18]
+                    offset = 18
+                # Only process IP packets
+                if ethertype != ETHERTYPE_IPV4:
+                    return
+                self._count(raw[offset + 12:offset + 16], raw[offset + 16:offset + 20],
+                            len(raw), raw[6:12], raw[0:6])
                 return
             
-            src_ip = packet[IP].src
-            dst_ip = packet[IP].dst
-            packet_size = len(packet)
-            
-            with self.lock:
-                # Check all registered routers
-                for router_ip, router_info in self.routers.items():
-                    # Upload: router is source
-                    if src_ip == router_ip:
-                        self.bandwidth_stats[router_ip]["upload_bytes"] += packet_size
-                        self.bandwidth_stats[router_ip]["total_packets"] += 1
-                        
-                        # Learn MAC address if not known
-                        if not router_info["mac"] and packet.haslayer(Ether):
-                            router_info["mac"] = packet[Ether].src
-                            logging.info(f"Learned MAC for {router_ip}: {router_info['mac']}")
-                    
-                    # Download: router is destination
-                    elif dst_ip == router_ip:
-                        self.bandwidth_stats[router_ip]["download_bytes"] += packet_size
-                        self.bandwidth_stats[router_ip]["total_packets"] += 1
-                        
-                        # Learn MAC address if not known
-                        if not router_info["mac"] and packet.haslayer(Ether):
-                            router_info["mac"] = packet[Ether].dst
-                            logging.info(f"Learned MAC for {router_ip}: {router_info['mac']}")
+            ip_layer = packet.getlayer(IP)
+            if ip_layer is None:
+                return
+            ether = packet.getlayer(Ether)
+            self._count(socket.inet_aton(ip_layer.src), socket.inet_aton(ip_layer.dst),
+                        len(raw) if raw else len(packet),
+                        _pack_mac(ether.src) if ether is not None else None,
+                        _pack_mac(ether.dst) if ether is not None else None)
         
         except Exception as e:
             logging.debug(f"Packet handler error: {e}")
     
+    def _count(self, src, dst, packet_size, src_mac, dst_mac):
+        """
+        Attribute one packet (packed addresses) to its router(s).
+        
+        In top_talkers mode the host on the other end is also counted in the
+        router's heavy-hitter summary: channel 0 is traffic the router sent to
+        it (the host's download), channel 1 traffic it sent to the router.
+        """
+        index = self._addr_index
+        
+        # Upload: router is source
+        src_slot = index.get(src)
+        if src_slot is not None:
+            src_slot.upload_bytes += packet_size
+            src_slot.packets += 1
+            if src_slot.talkers is not None:
+                src_slot.talkers.add(dst, packet_size, 0)
+            if src_slot.mac is None and src_mac:
+                self._learn_mac(src_slot, _format_mac(src_mac))
+        
+        # Download: router is destination
+        dst_slot = index.get(dst)
+        if dst_slot is not None:
+            dst_slot.download_bytes += packet_size
+            dst_slot.packets += 1
+            if dst_slot.talkers is not None:
+                dst_slot.talkers.add(src, packet_size, 1)
+            if dst_slot.mac is None and dst_mac:
+                self._learn_mac(dst_slot, _format_mac(dst_mac))
+        
+        # Traffic routed through a router (its MAC, someone else's IP)
+        if self.count_learned_macs and src_slot is None and dst_slot is None and src_mac:
+            mac_index = self._mac_index
+            slot = mac_index.get(src_mac)
+            if slot is not None:
+                slot.upload_bytes += packet_size
+                slot.packets += 1
+                if slot.talkers is not None:
+                    slot.talkers.add(dst, packet_size, 0)
+            else:
+                slot = mac_index.get(dst_mac)
+                if slot is not None:
+                    slot.download_bytes += packet_size
+                    slot.packets += 1
+                    if slot.talkers is not None:
+                        slot.talkers.add(src, packet_size, 1)
+    
+    def get_counters(self, router_ip):
+        """
+        Cumulative counters for a router since it was added.
+        
+        Returns:
+            dict: {"download_bytes", "upload_bytes", "packets"} or None
+        """
+        slot = self._ip_index.get(router_ip)
+        if slot is None:
+            return None
+        return {"download_bytes": slot.download_bytes, "upload_bytes": slot.upload_bytes, "packets": slot.packets}
+    
     def _calculate_bandwidth_loop(self):
         """
         Background thread that calculates bandwidth periodically.
@@ -159,49 +320,107 @@ class RouterBandwidthMonitor:
         while self.running:
             try:
                 time.sleep(self.sampling_interval)
-                
-                with self.lock:
-                    current_time = time.time()
-                    
-                    for router_ip in list(self.routers.keys()):
-                        stats = self.bandwidth_stats[router_ip]
-                        
-                        # Calculate time elapsed
-                        elapsed = current_time - stats["last_reset"]
-                        
-                        if elapsed > 0:
-                            # Calculate Mbps
-                            download_mbps = (stats["download_bytes"] * 8) / (1_000_000 * elapsed)
-                            upload_mbps = (stats["upload_bytes"] * 8) / (1_000_000 * elapsed)
-                            
-                            # Store in history
-                            history_entry = {
-                                "timestamp": datetime.now(),
-                                "download_mbps": round(download_mbps, 2),
-                                "upload_mbps": round(upload_mbps, 2),
-                                "download_bytes": stats["download_bytes"],
-                                "upload_bytes": stats["upload_bytes"],
-                                "duration": round(elapsed, 2),
-                                "packets": stats["total_packets"]
-                            }
-                            stats["history"].append(history_entry)
-                            
-                            # Log high bandwidth usage
-                            if download_mbps > 50 or upload_mbps > 50:
-                                logging.info(
-                                    f"High bandwidth on {router_ip}: "
-                                    f"↓{download_mbps:.2f} Mbps ↑{upload_mbps:.2f} Mbps"
-                                )
-                            
-                            # Reset counters for next interval
-                            stats["download_bytes"] = 0
-                            stats["upload_bytes"] = 0
-                            stats["total_packets"] = 0
-                            stats["last_reset"] = current_time
-            
+                self._sample()
             except Exception as e:
                 logging.error(f"Bandwidth calculation error: {e}")
     
+    def _sample(self):
+        """Turn the counters accumulated since the last call into one history entry per router."""
+        with self.lock:
+            current_time = time.time()
+            now = datetime.now()
+            latest = {}
+            talkers = {}
+            observations = []
+            
+            for router_ip, slot in self._ip_index.items():
+                stats = self.bandwidth_stats[router_ip]
+                
+                # Calculate time elapsed
+                elapsed = current_time - stats["last_reset"]
+                if elapsed <= 0:
+                    continue
+                
+                download_bytes, upload_bytes, packets = slot.take_interval()
+                if slot.talkers is not None:
+                    talkers[router_ip] = self._take_talkers(slot, elapsed, now)
+                
+                # Calculate Mbps
+                download_mbps = (download_bytes * 8) / (1_000_000 * elapsed)
+                upload_mbps = (upload_bytes * 8) / (1_000_000 * elapsed)
+                
+                # Store in history
+                history_entry = {
+                    "timestamp": now,
+                    "download_mbps": round(download_mbps, 2),
+                    "upload_mbps": round(upload_mbps, 2),
+                    "download_bytes": download_bytes,
+                    "upload_bytes": upload_bytes,
+                    "duration": round(elapsed, 2),
+                    "packets": packets
+                }
+                stats["history"].append(history_entry)
+                stats["last_reset"] = current_time
+                latest[router_ip] = history_entry
+                if self.series_store is not None:
+                    try:
+                        self.series_store.append(router_ip, current_time, history_entry)
+                    except Exception as e:
+                        logging.error(f"Could not store bandwidth sample for {router_ip}: {e}")
+                
+                # Score against the learned baseline, else log high bandwidth usage
+                if self.anomaly_detector is not None:
+                    name = self.routers.get(router_ip, {}).get("name") or router_ip
+                    observations.append((router_ip, name, {"download_mbps": download_mbps,
+                                                           "upload_mbps": upload_mbps}))
+                elif download_mbps > 50 or upload_mbps > 50:
+                    logging.info(
+                        f"High bandwidth on {router_ip}: "
+                        f"↓{download_mbps:.2f} Mbps ↑{upload_mbps:.2f} Mbps"
+                    )
+            
+            # Readers see either the previous interval or this one, never a mix
+            self._latest = latest
+            if self.top_talkers:
+                self._latest_talkers = talkers
+        
+        # Outside the lock: alerts may write notifications to the database
+        for router_ip, name, values in observations:
+            self.anomaly_detector.observe(router_ip, values, current_time, name=name)
+    
+    def _new_talkers(self):
+        from heavy_hitters import SpaceSaving
+        # A few times more slots than reported keeps the top N exact on skewed traffic.
+        # No count-min sketch here: it costs ~1us per eviction on the capture path.
+        return SpaceSaving(8 * self.top_talkers)
+    
+    def _take_talkers(self, slot, elapsed, now):
+        """
+        Swap in an empty summary for the next interval and rank the finished one.
+        
+        A packet the capture thread is adding while the swap happens can land
+        in the retired summary after it was read; this is within the sketch's
+        error bound and the byte counters themselves are unaffected.
+        """
+        finished, slot.talkers = slot.talkers, self._new_talkers()
+        total = finished.total
+        entries = []
+        for item in finished.top(self.top_talkers):
+            download, upload = item["channel_bytes"]
+            key = item["key"]
+            entries.append({
+                "ip": socket.inet_ntoa(key) if isinstance(key, bytes) else key,
+                "download_mbps": round(download * 8 / (1_000_000 * elapsed), 3),
+                "upload_mbps": round(upload * 8 / (1_000_000 * elapsed), 3),
+                "bytes": item["bytes"],
+                "error_bytes": item["error"],
+                "share": round(item["bytes"] / total, 4) if total else 0.0,
+                "packets": item["packets"],
+                "guaranteed": item["guaranteed"]
+            })
+        return {"timestamp": now, "duration": round(elapsed, 2), "total_bytes": total,
+                "hosts_evicted": finished.evictions, "talkers": entries}
+    
     def start(self):
         """
         Start bandwidth monitoring.
@@ -213,34 +432,76 @@ class RouterBandwidthMonitor:
         
         self.running = True
         
-        # Start packet sniffer
+        # Start packet capture
+        if not self._start_capture():
+            self.running = False
+            return
+        
+        # Start calculation thread
+        self.calc_thread = threading.Thread(
+            target=self._calculate_bandwidth_loop,
+            daemon=True
+        )
+        self.calc_thread.start()
+        logging.info("Bandwidth calculation thread started")
+        
+        logging.info(f"RouterBandwidthMonitor started (interval: {self.sampling_interval}s)")
+    
+    def _start_capture(self):
+        """Start the configured capture backend; returns False if none could start."""
+        if self.capture_backend in ("auto", "mmap"):
+            from packet_ring import PacketRingCapture, is_supported
+            if is_supported() and self.iface:
+                try:
+                    self.ring = PacketRingCapture(self.iface, self._count)
+                    self.ring.start()
+                    self.active_backend = "mmap"
+                    return True
+                except Exception as e:
+                    self.ring = None
+                    level = logging.error if self.capture_backend == "mmap" else logging.info
+                    level(f"PACKET_MMAP ring unavailable on {self.iface}: {e}")
+            elif self.capture_backend == "mmap":
+                logging.error("PACKET_MMAP capture needs Linux and an interface")
+            if self.capture_backend == "mmap":
+                return False
+        
         try:
+            from arp_scanner import capture_filter_kwargs
             self.sniffer = AsyncSniffer(
                 iface=self.iface,
                 prn=self._packet_handler,
                 store=False,
-                filter="ip"  # Only capture IP packets
+                # Only capture IP packets
+                **capture_filter_kwargs("ip", lambda p: p.haslayer(IP))
             )
             self.sniffer.start()
+            self.active_backend = "scapy"
             logging.info("Packet sniffer started")
+            return True
         except PermissionError:
             logging.error("Permission denied! Run as Administrator/root for packet capture")
-            self.running = False
-            return
         except Exception as e:
             logging.error(f"Failed to start sniffer: {e}")
-            self.running = False
-            return
-        
-        # Start calculation thread
-        self.calc_thread = threading.Thread(
-            target=self._calculate_bandwidth_loop,
-            daemon=True
-        )
-        self.calc_thread.start()
-        logging.info("Bandwidth calculation thread started")
+        return False
+    
+    def get_capture_stats(self):
+        """
+        Capture backend and kernel counters.
         
-        logging.info(f"RouterBandwidthMonitor started (interval: {self.sampling_interval}s)")
+        Returns:
+            dict: {"backend", "kernel_packets", "kernel_drops", "drop_rate"}; the kernel
+            figures are None for the scapy backend, which does not expose them
+        """
+        if self.ring is not None:
+            stats = self.ring.get_stats()
+            return {
+                "backend": "mmap",
+                "kernel_packets": stats["kernel_packets"],
+                "kernel_drops": stats["kernel_drops"],
+                "drop_rate": stats["drop_rate"]
+            }
+        return {"backend": self.active_backend, "kernel_packets": None, "kernel_drops": None, "drop_rate": None}
     
     def stop(self):
         """
@@ -252,7 +513,13 @@ class RouterBandwidthMonitor:
         
         self.running = False
         
-        # Stop sniffer
+        # Stop capture
+        if self.ring:
+            try:
+                self.ring.stop()
+                logging.info("Packet ring stopped")
+            except Exception as e:
+                logging.error(f"Error stopping packet ring: {e}")
         if self.sniffer:
             try:
                 self.sniffer.stop()
@@ -264,6 +531,11 @@ class RouterBandwidthMonitor:
         if self.calc_thread and self.calc_thread.is_alive():
             self.calc_thread.join(timeout=2)
         
+        if self.series_store is not None:
+            self.series_store.flush()
+        if self.anomaly_detector is not None:
+            self.anomaly_detector.checkpoint(force=True)
+        
         logging.info("RouterBandwidthMonitor stopped")
     
     def get_router_bandwidth(self, router_ip):
@@ -283,41 +555,66 @@ class RouterBandwidthMonitor:
                 "upload_mbps": float,
                 "timestamp": str (ISO format),
                 "packets": int,
-                "status": str
+                "status": str,
+                "capture": {"backend": str, "kernel_packets": int, "kernel_drops": int,
+                            "drop_rate": float}  (kernel figures None on the scapy backend)
             }
         """
-        with self.lock:
-            if router_ip not in self.routers:
-                return None
-            
-            router_info = self.routers[router_ip]
-            stats = self.bandwidth_stats[router_ip]
-            
-            # Get most recent measurement from history
-            if stats["history"]:
-                latest = stats["history"][-1]
-                return {
-                    "router_ip": router_ip,
-                    "router_mac": router_info.get("mac", "Unknown"),
-                    "router_name": router_info.get("name", "Unknown"),
-                    "download_mbps": latest["download_mbps"],
-                    "upload_mbps": latest["upload_mbps"],
-                    "timestamp": latest["timestamp"].isoformat(),
-                    "packets": latest["packets"],
-                    "status": "active"
-                }
-            else:
-                # No data yet
-                return {
-                    "router_ip": router_ip,
-                    "router_mac": router_info.get("mac", "Unknown"),
-                    "router_name": router_info.get("name", "Unknown"),
-                    "download_mbps": 0.0,
-                    "upload_mbps": 0.0,
-                    "timestamp": datetime.now().isoformat(),
-                    "packets": 0,
-                    "status": "no_data"
-                }
+        router_info = self.routers.get(router_ip)
+        if router_info is None:
+            return None
+        
+        # Most recent measurement from the published snapshot (no lock needed)
+        latest = self._latest.get(router_ip)
+        capture = self.get_capture_stats()
+        if latest is not None:
+            return {
+                "router_ip": router_ip,
+                "router_mac": router_info.get("mac", "Unknown"),
+                "router_name": router_info.get("name", "Unknown"),
+                "download_mbps": latest["download_mbps"],
+                "upload_mbps": latest["upload_mbps"],
+                "timestamp": latest["timestamp"].isoformat(),
+                "packets": latest["packets"],
+                "status": "active",
+                "capture": capture
+            }
+        else:
+            # No data yet
+            return {
+                "router_ip": router_ip,
+                "router_mac": router_info.get("mac", "Unknown"),
+                "router_name": router_info.get("name", "Unknown"),
+                "download_mbps": 0.0,
+                "upload_mbps": 0.0,
+                "timestamp": datetime.now().isoformat(),
+                "packets": 0,
+                "status": "no_data",
+                "capture": capture
+            }
+    
+    def get_top_talkers(self, router_ip, limit=None):
+        """
+        Hosts using the most bandwidth through a router in the last interval.
+        
+        Needs top_talkers > 0. Counts come from a fixed-size summary: "bytes" is
+        an upper bound that overstates by at most "error_bytes", and
+        "guaranteed" marks hosts certain to belong in the list.
+        
+        Args:
+            router_ip (str): Router IP address
+            limit (int): Return at most this many hosts (default: top_talkers)
+        
+        Returns:
+            dict: {"router_ip", "timestamp", "duration", "total_bytes", "hosts_evicted",
+                   "talkers": [{"ip", "download_mbps", "upload_mbps", "bytes", "error_bytes",
+                   "share", "packets", "guaranteed"}, ...]} or None before the first interval
+        """
+        latest = self._latest_talkers.get(router_ip)
+        if latest is None:
+            return None
+        talkers = latest["talkers"] if limit is None else latest["talkers"][:limit]
+        return dict(latest, router_ip=router_ip, timestamp=latest["timestamp"].isoformat(), talkers=talkers)
     
     def get_all_routers_bandwidth(self):
         """
@@ -326,13 +623,12 @@ class RouterBandwidthMonitor:
         Returns:
             list: List of bandwidth data dictionaries
         """
-        with self.lock:
-            results = []
-            for router_ip in self.routers.keys():
-                bandwidth = self.get_router_bandwidth(router_ip)
-                if bandwidth:
-                    results.append(bandwidth)
-            return results
+        results = []
+        for router_ip in list(self.routers.keys()):
+            bandwidth = self.get_router_bandwidth(router_ip)
+            if bandwidth:
+                results.append(bandwidth)
+        return results
     
     def get_router_history(self, router_ip, limit=None):
         """
@@ -354,11 +650,29 @@ class RouterBandwidthMonitor:
             if limit:
                 history = history[-limit:]
             
-            # Convert timestamps to ISO format
-            for entry in history:
-                entry["timestamp"] = entry["timestamp"].isoformat()
-            
-            return history
+            # Convert timestamps to ISO format (on copies; the stored entries keep datetimes)
+            return [dict(entry, timestamp=entry["timestamp"].isoformat()) for entry in history]
+    
+    def get_router_series(self, router_ip, start=None, end=None, step=None, aggregate="avg"):
+        """
+        Stored samples for a router from the series_store, optionally downsampled.
+        
+        Args:
+            router_ip (str): Router IP address
+            start, end: datetime or epoch seconds (None = unbounded)
+            step (float): Bucket width in seconds; None returns every sample
+            aggregate (str): "avg", "min", "max", "last" or "sum" per bucket
+        
+        Returns:
+            dict: {"timestamps": [...], "download_mbps": [...], "upload_mbps": [...],
+                   "packets": [...]} (plus "count" when downsampled), or None
+                   without a series_store
+        """
+        if self.series_store is None:
+            return None
+        if step:
+            return self.series_store.downsample(router_ip, start, end, step, aggregate)
+        return self.series_store.query(router_ip, start, end)
     
     def get_average_bandwidth(self, router_ip, minutes=5):
         """
@@ -493,7 +807,8 @@ def get_router_bandwidth_realtime(router_ip, monitor_instance=None):
             "upload": rate_bandwidth(bandwidth_data["upload_mbps"])
         },
         "timestamp": bandwidth_data["timestamp"],
-        "packets": bandwidth_data.get("packets", 0)
+        "packets": bandwidth_data.get("packets", 0),
+        "capture": bandwidth_data.get("capture")
     }
 
 
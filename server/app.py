@@ -4,6 +4,7 @@ from flask_cors import CORS
 
 # Reuse existing utilities from project root
 import sys, os
+import threading
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if BASE_DIR not in sys.path:
     sys.path.append(BASE_DIR)
@@ -14,6 +15,14 @@ from router_utils import get_routers, is_router_online_by_status
 from db import get_connection, log_user_login, create_login_sessions_table, get_user_last_login_info, get_user_login_history, update_user_profile, change_user_password, log_activity, create_activity_logs_table, log_user_logout
 from db import ensure_users_agent_column
 from report_utils import get_uptime_percentage, get_bandwidth_usage
+from oui_db import get_vendor
+
+
+def _device_vendor(mac, reported):
+    """Agent-reported vendor, or an OUI lookup when the agent didn't know it."""
+    if reported and reported != "Unknown":
+        return reported
+    return get_vendor(mac)
 
 def create_app():
     app = Flask(__name__)
@@ -284,7 +293,7 @@ def create_app():
                     mac_address=mac,
                     ip_address=device.get("ip_address"),
                     hostname=device.get("hostname", "Unknown"),
-                    vendor=device.get("vendor", "Unknown"),
+                    vendor=_device_vendor(mac, device.get("vendor")),
                     ping_latency=device.get("ping_latency"),
                     device_type=device.get("device_type"),
                     notes=f"Reported by agent: {agent_username}" if agent_username else None,
@@ -347,6 +356,49 @@ def create_app():
         except Exception as exc:
             return jsonify({"error": str(exc)}), 500
 
+    live = {"reader": None, "lock": threading.Lock()}
+
+    def _read_live(read):
+        """
+        Run read(reader) against the Dashboard's shared-memory metrics, or
+        return None when it is not running. Requests share one reader, so
+        reattaching (after the Dashboard restarted) and reads hold a lock.
+        """
+        from live_metrics import open_live_reader
+        with live["lock"]:
+            reader = live["reader"]
+            if reader is not None and not reader.writer_alive():
+                reader.close()
+                reader = live["reader"] = None
+            if reader is None:
+                reader = live["reader"] = open_live_reader()
+            if reader is None:
+                return None
+            return read(reader)
+
+    @app.get("/api/live/routers")
+    def live_routers():
+        """Latest status/latency/bandwidth of every router straight from the Dashboard's shared memory."""
+        try:
+            result = _read_live(lambda reader: {"writer": reader.writer_info(), "routers": reader.snapshot()})
+            if result is None:
+                return jsonify({"error": "Dashboard live metrics are not available"}), 503
+            return jsonify(result)
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
+
+    @app.get("/api/live/routers/<int:router_id>")
+    def live_router_history(router_id):
+        """Recent live samples of one router (?limit=N, oldest first)."""
+        try:
+            limit = request.args.get("limit", type=int)
+            samples = _read_live(lambda reader: reader.history(router_id, limit))
+            if samples is None:
+                return jsonify({"error": "Dashboard live metrics are not available"}), 503
+            return jsonify({"router_id": router_id, "samples": samples})
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
+
     @app.get("/api/routers/<int:router_id>/status")
     def router_status(router_id):
         try:
@@ -377,10 +429,17 @@ def create_app():
     def scan_network_clients():
         """
         Trigger a network-wide client discovery scan across all AP subnets.
-        Returns discovered clients with router associations.
+        All non-UniFi router subnets are ARP-swept in parallel under a global
+        packets-per-second budget (see arp_scanner).
+        Body params: max_pps (int, capped at the scanner's budget), dns_timeout (float), stream (bool)
+        With stream=true the response is NDJSON: one {"type": "client"} or
+        {"type": "subnet"} line as results arrive, then a {"type": "summary"} line.
         """
         try:
-            from network_utils import discover_clients
+            import json
+            import queue
+            from flask import Response
+            from arp_scanner import get_arp_scanner
             from db import save_network_client, create_network_clients_table, create_connection_history_table
             
             # Ensure tables exist
@@ -389,52 +448,92 @@ def create_app():
             
             # Get scan parameters from request
             data = request.get_json(silent=True) or {}
-            timeout = int(data.get("timeout", 2))
-            use_db_routers = data.get("use_db_routers", True)
-            
-            # Run discovery
-            clients = discover_clients(
-                timeout=timeout,
-                use_db_routers=use_db_routers,
-                scan_all_subnets=False
-            )
-            
-            # Save all discovered clients to database
-            saved_count = 0
-            for mac, info in clients.items():
-                try:
-                    save_network_client(
-                        mac_address=mac,
-                        ip_address=info.get("ip"),
-                        hostname=info.get("hostname", "Unknown"),
-                        vendor=info.get("vendor", "Unknown"),
-                        ping_latency=None  # Can be measured separately if needed
-                    )
-                    saved_count += 1
-                except Exception as e:
-                    print(f"Error saving client {mac}: {e}")
-            
-            # Convert clients dict to list format for API response
-            client_list = []
-            for mac, info in clients.items():
-                client_list.append({
-                    "mac_address": mac,
-                    "ip_address": info.get("ip"),
-                    "hostname": info.get("hostname", "Unknown"),
+            dns_timeout = float(data.get("dns_timeout", 2))
+            stream = bool(data.get("stream", False))
+            
+            routers = [r for r in get_routers()
+                       if not (r.get('is_unifi') or str(r.get('brand') or '').lower() == 'unifi')]
+            scanner = get_arp_scanner()
+            # Per-request budget, never above the configured global one; the
+            # shared scanner's default is left alone
+            max_pps = None
+            if data.get("max_pps"):
+                max_pps = max(1, min(int(data["max_pps"]), scanner.max_pps))
+            
+            def client_row(info):
+                return {
+                    "mac_address": info["mac"],
+                    "ip_address": info["ip"],
+                    "hostname": info.get("hostname") or "Unknown",
                     "vendor": info.get("vendor", "Unknown"),
                     "subnet": info.get("subnet"),
-                    "interface": info.get("interface"),
+                    "latency_ms": info.get("latency_ms"),
                     "router_id": info.get("router_id"),
                     "router_name": info.get("router_name"),
-                    "last_seen": info.get("last_seen").isoformat() if info.get("last_seen") else None
-                })
+                    "last_seen": info["last_seen"].isoformat()
+                }
             
-            return jsonify({
-                "success": True,
-                "total_discovered": len(clients),
-                "saved_to_db": saved_count,
-                "clients": client_list
-            })
+            def save_clients(clients):
+                saved = 0
+                for mac, info in clients.items():
+                    try:
+                        save_network_client(
+                            mac_address=mac,
+                            ip_address=info.get("ip"),
+                            hostname=info.get("hostname", "Unknown"),
+                            vendor=info.get("vendor", "Unknown"),
+                            ping_latency=None,  # Can be measured separately if needed
+                            router_id=info.get("router_id"),
+                            router_name=info.get("router_name")
+                        )
+                        saved += 1
+                    except Exception as e:
+                        print(f"Error saving client {mac}: {e}")
+                return saved
+            
+            def summary(report, saved):
+                return {
+                    "total_discovered": len(report["clients"]),
+                    "saved_to_db": saved,
+                    "subnets": report["subnets"],
+                    "packets_sent": report["packets_sent"],
+                    "total_scan_time": report["total_time"]
+                }
+            
+            if not stream:
+                report = scanner.scan(routers, on_result=None, dns_timeout=dns_timeout, max_pps=max_pps)
+                saved_count = save_clients(report["clients"])
+                return jsonify(dict(
+                    summary(report, saved_count),
+                    success=True,
+                    clients=[client_row(info) for info in report["clients"].values()]
+                ))
+            
+            events = queue.Queue()
+            
+            def run_scan():
+                try:
+                    report = scanner.scan(
+                        routers,
+                        on_result=lambda info: events.put({"type": "client", **client_row(info)}),
+                        on_subnet_done=lambda sub: events.put({"type": "subnet", **sub}),
+                        dns_timeout=dns_timeout,
+                        max_pps=max_pps
+                    )
+                    saved_count = save_clients(report["clients"])
+                    events.put({"type": "summary", "success": True, **summary(report, saved_count)})
+                except Exception as exc:
+                    events.put({"type": "summary", "success": False, "error": str(exc)})
+            
+            def generate():
+                threading.Thread(target=run_scan, daemon=True).start()
+                while True:
+                    event = events.get()
+                    yield json.dumps(event) + "\n"
+                    if event["type"] == "summary":
+                        return
+            
+            return Response(generate(), mimetype="application/x-ndjson")
             
         except Exception as exc:
             return jsonify({"error": str(exc)}), 500
@@ -481,10 +580,13 @@ def create_app():
     def get_router_clients(router_id):
         """
         Get clients associated with a specific router/AP.
-        Uses network discovery filtered by router_id.
+        Answered from the passive presence index (neighbour table, ARP/DHCP
+        capture, periodic sweeps); pass refresh=true to sweep this router's
+        subnet first.
+        Query params: refresh (bool), max_age (seconds)
         """
         try:
-            from network_utils import discover_clients
+            from presence_tracker import get_presence_tracker
             from router_utils import get_routers
             
             # Get router info
@@ -505,26 +607,26 @@ def create_app():
                     "is_unifi": True
                 })
             
-            # Run discovery for all routers, then filter by router_id
-            all_clients = discover_clients(
-                timeout=2,
-                use_db_routers=True,
-                scan_all_subnets=False
-            )
+            tracker = get_presence_tracker()
+            tracker.set_routers(routers)
+            
+            # Only sweep on demand, or the first time this router is asked for
+            refresh = request.args.get("refresh", "false").lower() == "true"
+            if refresh or not tracker.has_swept(router_id) and not tracker.get_clients(router_id=router_id):
+                tracker.refresh_router(router)
             
-            # Filter clients belonging to this router
+            max_age = request.args.get("max_age", type=float)
             router_clients = []
-            for mac, info in all_clients.items():
-                if info.get("router_id") == router_id:
-                    router_clients.append({
-                        "mac_address": mac,
-                        "ip_address": info.get("ip"),
-                        "hostname": info.get("hostname", "Unknown"),
-                        "vendor": info.get("vendor", "Unknown"),
-                        "subnet": info.get("subnet"),
-                        "interface": info.get("interface"),
-                        "last_seen": info.get("last_seen").isoformat() if info.get("last_seen") else None
-                    })
+            for info in tracker.get_clients(router_id=router_id, max_age=max_age):
+                router_clients.append({
+                    "mac_address": info["mac_address"],
+                    "ip_address": info["ip_address"],
+                    "hostname": info["hostname"],
+                    "vendor": info["vendor"],
+                    "source": info["source"],
+                    "first_seen": info["first_seen"].isoformat(),
+                    "last_seen": info["last_seen"].isoformat()
+                })
             
             return jsonify({
                 "success": True,
@@ -540,11 +642,11 @@ def create_app():
     @app.post("/api/routers/<int:router_id>/clients/discover_save")
     def discover_and_save_router_clients(router_id):
         """
-        Discover clients for a specific router, save them to DB with router association,
-        and return the saved list. Intended for admin use.
+        Sweep a specific router's subnet, save its clients to DB with router
+        association, and return the saved list. Intended for admin use.
         """
         try:
-            from network_utils import discover_clients
+            from presence_tracker import get_presence_tracker
             from router_utils import get_routers
             from db import save_network_client, create_network_clients_table, ensure_network_clients_router_columns
 
@@ -564,37 +666,35 @@ def create_app():
                     "is_unifi": True
                 }), 400
 
-            all_clients = discover_clients(
-                timeout=2,
-                use_db_routers=True,
-                scan_all_subnets=False
-            )
+            tracker = get_presence_tracker()
+            tracker.set_routers(routers)
+            tracker.refresh_router(router)
 
             saved_clients = []
-            for mac, info in all_clients.items():
-                if info.get("router_id") == router_id:
-                    # Save/update client with router association
-                    save_network_client(
-                        mac_address=mac,
-                        ip_address=info.get("ip"),
-                        hostname=info.get("hostname", "Unknown"),
-                        vendor=info.get("vendor", "Unknown"),
-                        ping_latency=None,
-                        device_type=None,
-                        notes=None,
-                        router_id=router_id,
-                        router_name=router.get('name')
-                    )
+            for info in tracker.get_clients(router_id=router_id):
+                mac = info["mac_address"]
+                # Save/update client with router association
+                save_network_client(
+                    mac_address=mac,
+                    ip_address=info["ip_address"],
+                    hostname=info["hostname"],
+                    vendor=info["vendor"],
+                    ping_latency=None,
+                    device_type=None,
+                    notes=None,
+                    router_id=router_id,
+                    router_name=router.get('name')
+                )
 
-                    saved_clients.append({
-                        "mac_address": mac,
-                        "ip_address": info.get("ip"),
-                        "hostname": info.get("hostname", "Unknown"),
-                        "vendor": info.get("vendor", "Unknown"),
-                        "router_id": router_id,
-                        "router_name": router.get('name'),
-                        "last_seen": info.get("last_seen").isoformat() if info.get("last_seen") else None
-                    })
+                saved_clients.append({
+                    "mac_address": mac,
+                    "ip_address": info["ip_address"],
+                    "hostname": info["hostname"],
+                    "vendor": info["vendor"],
+                    "router_id": router_id,
+                    "router_name": router.get('name'),
+                    "last_seen": info["last_seen"].isoformat()
+                })
 
             return jsonify({
                 "success": True,
@@ -607,6 +707,15 @@ def create_app():
         except Exception as exc:
             return jsonify({"error": str(exc)}), 500
 
+    @app.get("/api/presence/stats")
+    def get_presence_stats():
+        """Presence tracker index size, source counters and sweep timings."""
+        try:
+            from presence_tracker import get_presence_tracker
+            return jsonify({"success": True, "stats": get_presence_tracker(start=False).get_stats()})
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
+
     @app.get("/api/clients/<string:mac_address>/history")
     def get_client_connection_history(mac_address):
         """Get connection history for a specific client by MAC address."""
@@ -1349,6 +1458,77 @@ def create_app():
         except Exception as exc:
             return jsonify({"error": str(exc)}), 500
 
+    @app.get("/api/loop-detection/history")
+    def get_loop_detection_history_summaries():
+        """Loop detection summaries (no offender blobs); use /<id>/offenders for details."""
+        try:
+            from db import get_loop_detection_summaries, get_loop_detection_offenders
+            limit = min(int(request.args.get("limit", 100)), 1000)
+            offset = int(request.args.get("offset", 0))
+            status = request.args.get("status") or None
+            
+            detections = get_loop_detection_summaries(limit=limit, offset=offset, status=status)
+            
+            # Offenders are only expanded when explicitly requested
+            if request.args.get("include_offenders") in ("1", "true", "yes"):
+                for detection in detections:
+                    if detection.get("offenders_count"):
+                        detection["offenders"] = get_loop_detection_offenders(detection["id"])
+                    else:
+                        detection["offenders"] = []
+            
+            return jsonify(detections)
+        except ValueError:
+            return jsonify({"error": "limit and offset must be integers"}), 400
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
+
+    @app.get("/api/loop-detection/<int:detection_id>/offenders")
+    def get_loop_detection_offender_details(detection_id):
+        """Offender MACs (severity, reason, interface) for one detection."""
+        try:
+            from db import get_loop_detection_offenders
+            return jsonify(get_loop_detection_offenders(detection_id))
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
+
+    @app.get("/api/loop-detection/stats")
+    def get_loop_detection_stats_summary():
+        """Loop detection counters plus the latest detection."""
+        try:
+            from db import get_loop_detection_stats, get_loop_detection_summaries
+            stats = get_loop_detection_stats()
+            latest = get_loop_detection_summaries(limit=1)
+            stats["latest_detection"] = latest[0] if latest else None
+            return jsonify(stats)
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
+
+    @app.get("/api/loop-detection/offenders/top")
+    def get_loop_detection_top_offenders():
+        """MACs that were loop offenders most often over the last ?days= days."""
+        try:
+            from db import get_top_loop_offenders
+            days = int(request.args.get("days", 7))
+            limit = min(int(request.args.get("limit", 10)), 100)
+            return jsonify(get_top_loop_offenders(days=days, limit=limit))
+        except ValueError:
+            return jsonify({"error": "days and limit must be integers"}), 400
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
+
+    @app.get("/api/loop-detection/offenders/<mac>")
+    def get_loop_detection_mac_history(mac):
+        """Every detection in which the given MAC was an offender."""
+        try:
+            from db import get_mac_offender_history
+            limit = min(int(request.args.get("limit", 100)), 1000)
+            return jsonify(get_mac_offender_history(mac.lower(), limit=limit))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
+
     @app.get("/api/reports/pdf-with-charts")
     def generate_pdf_report_with_charts():
         """Generate PDF report with charts for client"""
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Flask API for the NetFlow / IPFIX collector
+
+Runs the UDP flow collector (flow_collector.FlowCollector) and exposes its
+state for service monitoring and the dashboard.
+
+Endpoints:
+- GET  /api/health             -> Service health (used by ServiceManager)
+- GET  /api/flows/stats        -> Decoder and flush counters
+- GET  /api/flows/exporters    -> Per-exporter summary of the last flush
+- GET  /api/flows/top          -> Top talkers (?exporter=<ip>&limit=<n>)
+
+Configuration (environment):
+- FLOW_COLLECTOR_PORT:  UDP port for exports (default 2055)
+- FLOW_FLUSH_INTERVAL:  Seconds between flushes into bandwidth_logs (default 60)
+"""
+
+import os
+import sys
+import time
+
+from flask import Flask, jsonify, request
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from flow_collector import NETFLOW_PORT, get_flow_collector  # noqa: E402
+
+
+def create_app(collector=None):
+    app = Flask(__name__)
+    collector = collector or get_flow_collector(
+        port=int(os.environ.get('FLOW_COLLECTOR_PORT', NETFLOW_PORT)),
+        flush_interval=float(os.environ.get('FLOW_FLUSH_INTERVAL', 60))
+    )
+
+    @app.get('/api/health')
+    def health_check():
+        """Health check endpoint for service monitoring"""
+        stats = collector.get_stats()
+        return jsonify({
+            'status': 'healthy' if stats['running'] else 'stopped',
+            'service': 'flow_collector',
+            'udp_port': stats['port'],
+            'timestamp': time.time()
+        }), 200 if stats['running'] else 503
+
+    @app.get('/api/flows/stats')
+    def flow_stats():
+        return jsonify(collector.get_stats())
+
+    @app.get('/api/flows/exporters')
+    def flow_exporters():
+        return jsonify(collector.get_exporters())
+
+    @app.get('/api/flows/top')
+    def flow_top_talkers():
+        try:
+            limit = int(request.args.get('limit', collector.top_n))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        return jsonify(collector.get_top_talkers(request.args.get('exporter'), limit))
+
+    return app
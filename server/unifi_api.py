@@ -11,6 +11,7 @@ Key endpoints (unchanged for consumers):
 - GET  /api/unifi/clients/count          -> Count of active clients
 - GET  /api/unifi/devices/<mac>/clients  -> Clients connected to specific AP
 - GET  /api/unifi/ping/<mac>             -> Ping AP by MAC (real latency if possible)
+- GET  /api/unifi/cache/stats            -> Controller response cache hit ratio and latency
 
 Compatibility endpoints (raw UniFi-like):
 - GET  /api/s/<site>/stat/device
@@ -23,6 +24,11 @@ Configuration:
 - SITE:            default default
 
 Environment variables can override these: UNIFI_URL, UNIFI_USER, UNIFI_PASS, UNIFI_SITE.
+
+Controller device/client lists are cached per site for UNIFI_CACHE_TTL seconds
+(default 5); for UNIFI_CACHE_STALE more seconds (default 30) the old list is
+served while one background request refreshes it. Concurrent misses share a
+single controller request. UNIFI_CACHE_TTL=0 disables the cache.
 """
 
 from flask import Flask, jsonify, request, g
@@ -34,7 +40,9 @@ import os
 from typing import Any, Dict, List, Optional, Tuple
 import re
 import hmac
+import threading
 from functools import wraps
+import sys
 
 import requests
 from requests.adapters import HTTPAdapter
@@ -46,6 +54,13 @@ except Exception:  # pragma: no cover
     Retry = None  # Fallback to no retries if urllib3 Retry unavailable
     urllib3 = None
 
+# Reuse the OUI vendor database from the project root
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from oui_db import get_vendor  # noqa: E402
+
 # Helper for silent subprocess execution
 def _run_silent_subprocess(cmd, timeout=None, **kwargs):
     """Run subprocess silently without showing CMD windows on Windows."""
@@ -108,6 +123,10 @@ ENABLE_MOCK = os.getenv("ENABLE_MOCK", "true" if FLASK_DEBUG else "false").lower
 ALLOWED_ORIGINS = {o.strip() for o in os.getenv("ALLOWED_ORIGINS", "").split(",") if o.strip()}
 ENABLE_HSTS = os.getenv("ENABLE_HSTS", "false").lower() == "true"
 
+# Controller response cache (seconds): fresh for TTL, then served stale while refreshing
+CACHE_TTL = float(os.getenv("UNIFI_CACHE_TTL", "5"))
+CACHE_STALE = float(os.getenv("UNIFI_CACHE_STALE", "30"))
+
 # Simple in-memory rate-limiter storage { key: [timestamps] }
 _RATE_STORE: Dict[str, List[float]] = {}
 
@@ -355,6 +374,172 @@ def get_session() -> UniFiSession:
     return _unifi_session
 
 
+# --- Per-site controller response cache ---
+class _Flight:
+    """One upstream request that concurrent callers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SiteCache:
+    """TTL cache of controller lists keyed by (site, kind), with stale-while-revalidate.
+
+    A fresh entry is returned as is. An entry up to `stale` seconds past its TTL is
+    also returned, and one background request refreshes it. On a miss, the first
+    caller fetches and every concurrent caller for the same key waits for that
+    result (or its exception) instead of calling the controller again. Failed
+    fetches are never cached. Cached lists are shared: callers must not mutate them.
+    """
+
+    def __init__(self, ttl: float = 5.0, stale: float = 30.0):
+        self.ttl = ttl
+        self.stale = stale
+        self._entries: Dict[Tuple[str, str], Tuple[float, Any]] = {}  # key -> (fetched_at, value)
+        self._flights: Dict[Tuple[str, str], _Flight] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "upstream_calls": 0,
+            "upstream_errors": 0,
+            "upstream_time_total": 0.0,
+            "upstream_time_max": 0.0,
+            "upstream_time_last": 0.0,
+        }
+
+    def get(self, site: str, kind: str, loader):
+        """Return the cached `kind` list for `site`, calling loader() only when needed."""
+        if self.ttl <= 0:
+            return self._call(loader)
+        key = (site, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry[0]
+                if age < self.ttl:
+                    self.stats["hits"] += 1
+                    return entry[1]
+                if age < self.ttl + self.stale:
+                    self.stats["stale_hits"] += 1
+                    if key not in self._flights:
+                        self._flights[key] = _Flight()
+                        self.stats["refreshes"] += 1
+                        threading.Thread(target=self._refresh, args=(key, loader, self._flights[key]),
+                                         daemon=True).start()
+                    return entry[1]
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+                self.stats["misses"] += 1
+            else:
+                leader = False
+                self.stats["coalesced"] += 1
+        if leader:
+            self._fetch(key, loader, flight)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _fetch(self, key, loader, flight: _Flight):
+        try:
+            flight.value = self._call(loader)
+            with self._lock:
+                self._entries[key] = (time.monotonic(), flight.value)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _refresh(self, key, loader, flight: _Flight):
+        self._fetch(key, loader, flight)
+        if flight.error is not None:
+            # The stale entry keeps being served until it expires
+            print(f"[UniFi Cache] Refreshing {key[1]} for site {key[0]} failed: {flight.error}")
+
+    def _call(self, loader):
+        start = time.monotonic()
+        try:
+            return loader()
+        except Exception:
+            with self._lock:
+                self.stats["upstream_errors"] += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                stats = self.stats
+                stats["upstream_calls"] += 1
+                stats["upstream_time_total"] += elapsed
+                stats["upstream_time_last"] = elapsed
+                stats["upstream_time_max"] = max(stats["upstream_time_max"], elapsed)
+
+    def invalidate(self, site: Optional[str] = None) -> None:
+        """Drop cached lists for one site (or all sites)."""
+        with self._lock:
+            for key in [k for k in self._entries if site is None or k[0] == site]:
+                del self._entries[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            now = time.monotonic()
+            entries = {f"{site}/{kind}": round(now - fetched_at, 2)
+                       for (site, kind), (fetched_at, _) in self._entries.items()}
+        served = stats["hits"] + stats["stale_hits"] + stats["misses"] + stats["coalesced"]
+        calls = stats["upstream_calls"]
+        return {
+            "ttl": self.ttl,
+            "stale": self.stale,
+            "requests": served,
+            "hits": stats["hits"],
+            "stale_hits": stats["stale_hits"],
+            "misses": stats["misses"],
+            "coalesced": stats["coalesced"],
+            "refreshes": stats["refreshes"],
+            "hit_ratio": round((stats["hits"] + stats["stale_hits"]) / served, 4) if served else None,
+            "upstream": {
+                "calls": calls,
+                "errors": stats["upstream_errors"],
+                "avg_ms": round(stats["upstream_time_total"] / calls * 1000, 1) if calls else None,
+                "max_ms": round(stats["upstream_time_max"] * 1000, 1),
+                "last_ms": round(stats["upstream_time_last"] * 1000, 1),
+            },
+            "entry_age_seconds": entries,
+        }
+
+
+_site_cache = SiteCache(CACHE_TTL, CACHE_STALE)
+
+
+def cached_devices(site: str) -> List[Dict[str, Any]]:
+    """Controller device list for a site, via the response cache."""
+    return _site_cache.get(site, "devices", lambda: get_session().get_devices(site))
+
+
+def cached_clients(site: str) -> List[Dict[str, Any]]:
+    """Controller client list for a site, via the response cache."""
+    return _site_cache.get(site, "clients", lambda: get_session().get_clients(site))
+
+
+def client_vendor(c: Dict[str, Any]) -> str:
+    """Vendor of a client's MAC from the OUI database, else the controller's 'oui' field."""
+    vendor = get_vendor(c.get('mac'))
+    if vendor == 'Unknown' and c.get('oui'):
+        return c['oui']
+    return vendor
+
+
 # --- Helpers: Auth, Rate limiting, Validation, Headers ---
 
 def _constant_time_in(member: str, choices: set) -> bool:
@@ -568,7 +753,7 @@ def compat_stat_device(site):
     if MOCK_MODE['routers']:
         return jsonify({'data': MOCK_APS})
     try:
-        devices = get_session().get_devices(site)
+        devices = cached_devices(site)
         return jsonify({'data': devices})
     except requests.exceptions.SSLError as e:
         return jsonify({'data': [], 'error': 'ssl_error', 'message': 'SSL certificate verification failed. Set UNIFI_VERIFY=false'}), 502
@@ -588,7 +773,7 @@ def compat_stat_sta(site):
     if MOCK_MODE['clients']:
         return jsonify({'data': MOCK_CLIENTS})
     try:
-        clients = get_session().get_clients(site)
+        clients = cached_clients(site)
         return jsonify({'data': clients})
     except requests.exceptions.SSLError as e:
         return jsonify({'data': [], 'error': 'ssl_error', 'message': 'SSL certificate verification failed. Set UNIFI_VERIFY=false'}), 502
@@ -607,7 +792,7 @@ def api_devices():
     if MOCK_MODE['routers']:
         return jsonify(MOCK_APS)
     try:
-        raw = get_session().get_devices(SITE)
+        raw = cached_devices(SITE)
         # Debug: print first device to see available fields
         if raw and len(raw) > 0:
             print(f"[UniFi API] Sample device keys: {list(raw[0].keys())}")
@@ -683,7 +868,7 @@ def api_clients():
     if MOCK_MODE['clients']:
         return jsonify(MOCK_CLIENTS)
     try:
-        raw_clients = get_session().get_clients(SITE)
+        raw_clients = cached_clients(SITE)
         if raw_clients and len(raw_clients) > 0:
             print(f"[UniFi API] Found {len(raw_clients)} clients")
             print(f"[UniFi API] Sample client keys: {list(raw_clients[0].keys())}")
@@ -730,7 +915,9 @@ def api_clients():
                 'tx_rate': tx_rate,
                 'signal': signal,
                 'channel': c.get('channel') or c.get('radio'),
-                'uptime': c.get('uptime')
+                'uptime': c.get('uptime'),
+                'oui': c.get('oui'),
+                'vendor': client_vendor(c)
             }
 
         clients = [map_client(c) for c in raw_clients]
@@ -776,7 +963,7 @@ def api_bandwidth_total():
         total_up = sum(ap.get('xput_up') or 0 for ap in MOCK_APS)
         return jsonify({'total_down': total_down, 'total_up': total_up})
     try:
-        devices = get_session().get_devices(SITE)
+        devices = cached_devices(SITE)
         total_down = 0.0
         total_up = 0.0
         for d in devices:
@@ -794,7 +981,7 @@ def api_clients_count():
     if MOCK_MODE['clients']:
         return jsonify({'count': len(MOCK_CLIENTS)})
     try:
-        clients = get_session().get_clients(SITE)
+        clients = cached_clients(SITE)
         return jsonify({'count': len(clients)})
     except Exception as e:
         return jsonify({'count': 0, 'error': 'upstream_error'}), 502
@@ -834,7 +1021,7 @@ def api_test_connection():
             'help': 'Check UNIFI_URL, credentials, and network connectivity'
         }), 502
     try:
-        clients = get_session().get_clients(SITE)
+        clients = cached_clients(SITE)
         return jsonify({'count': len(clients)})
     except Exception as e:
         return jsonify({'count': 0, 'error': 'upstream_error'}), 502
@@ -849,7 +1036,7 @@ def api_device_clients(mac):
         device_clients = [c for c in MOCK_CLIENTS if c.get('ap_mac', '').upper() == mac.upper()]
         return jsonify(device_clients)
     try:
-        raw_clients = get_session().get_clients(SITE)
+        raw_clients = cached_clients(SITE)
         # Filter by AP MAC using common fields
         filtered = []
         for c in raw_clients:
@@ -892,7 +1079,9 @@ def api_device_clients(mac):
                 'tx_rate': tx_rate,
                 'signal': signal,
                 'channel': c.get('channel') or c.get('radio'),
-                'uptime': c.get('uptime')
+                'uptime': c.get('uptime'),
+                'oui': c.get('oui'),
+                'vendor': client_vendor(c)
             }
 
         device_clients = [map_client(c) for c in filtered]
@@ -901,6 +1090,14 @@ def api_device_clients(mac):
         return jsonify({'error': 'upstream_error'}), 502
 
 
+# --- Controller response cache stats ---
+@app.route('/api/unifi/cache/stats')
+@require_api_key()
+def api_cache_stats():
+    """Hit ratio, coalesced requests and upstream latency of the controller cache."""
+    return jsonify(_site_cache.get_stats())
+
+
 # --- NEW: Simulated Ping Endpoint ---
 @app.route('/api/unifi/ping/<mac>')
 @require_api_key()
@@ -913,7 +1110,7 @@ def api_ping_device(mac):
     ip = None
     state = None
     try:
-        devices = get_session().get_devices(SITE)
+        devices = cached_devices(SITE)
         # Match MAC address (case-insensitive)
         ap = next((d for d in devices if (d.get('mac') or '').lower() == mac.lower()), None)
         if ap:
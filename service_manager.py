@@ -1,6 +1,7 @@
 """
 Service Manager for WinyFi
-Manages Flask API (app.py) and UniFi API (unifi_api.py) as background processes
+Manages Flask API (app.py), UniFi API (unifi_api.py) and the NetFlow/IPFIX
+collector (flow_api.py) as background processes
 """
 
 import subprocess
@@ -52,6 +53,7 @@ class ServiceManager:
         # Auto-detect script paths
         flask_script = self._find_script('run_app.py')
         unifi_script = self._find_script('run_unifi_api.py')
+        flow_script = self._find_script('run_flow_collector.py')
         
         # Load server configuration for API endpoints
         api_host = self._load_api_host()
@@ -87,6 +89,20 @@ class ServiceManager:
                 'password': 'admin123',
                 'site': 'default',
                 'ssl_verify': False
+            },
+            'flow_collector': {
+                'name': 'Flow Collector',
+                'script': str(flow_script) if flow_script else None,
+                'port': 5002,
+                'host': 'localhost',
+                'health_endpoint': 'http://localhost:5002/api/health',
+                'process': None,
+                'enabled': False,
+                'auto_start': False,
+                'stdout_file': None,
+                'stderr_file': None,
+                'udp_port': 2055,         # NetFlow/IPFIX export port on this host
+                'flush_interval': 60      # Seconds between writes into bandwidth_logs
             }
         }
         
@@ -394,6 +410,9 @@ class ServiceManager:
                                 self.services[service_name]['password'] = saved_data.get('password', 'admin123')
                                 self.services[service_name]['site'] = saved_data.get('site', 'default')
                                 self.services[service_name]['ssl_verify'] = saved_data.get('ssl_verify', False)
+                            elif service_name == 'flow_collector':
+                                self.services[service_name]['udp_port'] = saved_data.get('udp_port', 2055)
+                                self.services[service_name]['flush_interval'] = saved_data.get('flush_interval', 60)
                 logger.info("[SUCCESS] Service configuration loaded")
         except Exception as e:
             logger.warning(f"[WARNING] Could not load service config: {e}")
@@ -416,6 +435,11 @@ class ServiceManager:
                         'site': data.get('site', 'default'),
                         'ssl_verify': data.get('ssl_verify', False)
                     })
+                elif service_name == 'flow_collector':
+                    service_config.update({
+                        'udp_port': data.get('udp_port', 2055),
+                        'flush_interval': data.get('flush_interval', 60)
+                    })
                 config[service_name] = service_config
             with open(self.config_file, 'w') as f:
                 json.dump(config, f, indent=2)
@@ -496,7 +520,15 @@ class ServiceManager:
                     sys.path.insert(0, str(parent_dir))
                 
                 # Import the appropriate module
-                if 'flask' in service_name or 'app' in str(script_path):
+                if service_name == 'flow_collector':
+                    # Thread mode shares our environment; pass the collector settings explicitly
+                    service = self.services[service_name]
+                    os.environ['FLOW_COLLECTOR_PORT'] = str(service.get('udp_port', 2055))
+                    os.environ['FLOW_FLUSH_INTERVAL'] = str(service.get('flush_interval', 60))
+                    from flow_api import create_app as create_flow_app  # type: ignore
+                    app = create_flow_app()
+                    port = 5002
+                elif 'flask' in service_name or 'app' in str(script_path):
                     from app import create_app  # type: ignore
                     app = create_app()
                     port = 5000
@@ -602,9 +634,10 @@ class ServiceManager:
         if service['script'] is None:
             error_msg = f"[ERROR] Script not configured for {service['name']}"
             logger.error(error_msg)
+            script_name = {'flask_api': 'run_app.py', 'flow_collector': 'run_flow_collector.py'}.get(service_name, 'run_unifi_api.py')
             logger.error(f"[INFO] Expected script locations:")
-            logger.error(f"   - {self.bundle_dir / 'server' / ('run_app.py' if 'flask' in service_name else 'run_unifi_api.py')}")
-            logger.error(f"   - {self.bundle_dir / ('run_app.py' if 'flask' in service_name else 'run_unifi_api.py')}")
+            logger.error(f"   - {self.bundle_dir / 'server' / script_name}")
+            logger.error(f"   - {self.bundle_dir / script_name}")
             try:
                 with open(runtime_error_log, 'a', encoding='utf-8') as f:
                     timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
@@ -717,6 +750,9 @@ class ServiceManager:
                 env['UNIFI_PASS'] = service.get('password', 'admin123')
                 env['UNIFI_SITE'] = service.get('site', 'default')
                 env['UNIFI_VERIFY'] = 'true' if service.get('ssl_verify', False) else 'false'
+            elif service_name == 'flow_collector':
+                env['FLOW_COLLECTOR_PORT'] = str(service.get('udp_port', 2055))
+                env['FLOW_FLUSH_INTERVAL'] = str(service.get('flush_interval', 60))
             
             # CRITICAL FIX: In frozen/packaged mode, ALWAYS use thread mode
             # External Python cannot access PyInstaller bundled modules
@@ -1,3 +1,4 @@
+import errno
 import time
 import threading
 import random
@@ -531,6 +532,197 @@ def simulate_mild_loop(duration, packets_per_sec):
     print(f"   Sent {count} packets")
 
 
+# ---------------------------
+# High-Rate Generator (paced raw-socket bursts)
+# ---------------------------
+# Scenario -> packet builder called with a frame index (variants are prebuilt once)
+BLAST_BUILDERS = {
+    "clean": lambda i: create_broadcast_packet(),
+    "suspicious": lambda i: create_broadcast_packet() if i % 2 else create_arp_packet(),
+    "broadcast_storm": lambda i: create_broadcast_packet(),
+    "arp_storm": lambda i: create_arp_packet(),
+    "spanning_tree_loop": lambda i: create_bpdu_like_packet(),
+    "multicast_storm": lambda i: create_multicast_packet(),
+    "mac_flapping": lambda i: create_mac_flapping_packet(i),
+    "cross_subnet_loop": lambda i: create_cross_subnet_packet(),
+    "duplicate_packets": lambda i: create_duplicate_packet(i // 50),
+    "burst_loop": lambda i: create_broadcast_packet(),
+    "entropy_test": lambda i: create_low_entropy_packet(i // 100),
+    "multi_protocol_storm": lambda i: create_mixed_protocol_packet(),
+}
+
+
+# A full TX queue; anything else (ENETDOWN, ENXIO, EMSGSIZE...) is a real failure
+_NO_BUFFER_ERRNOS = {errno.ENOBUFS, getattr(errno, "WSAENOBUFS", errno.ENOBUFS)}
+
+
+def prebuild_frames(scenario, variants=256):
+    """Serialize `variants` frames for a scenario once, so sending is just bytes."""
+    if scenario not in BLAST_BUILDERS:
+        raise ValueError(f"Unknown scenario: {scenario}")
+    build = BLAST_BUILDERS[scenario]
+    return [bytes(build(i)) for i in range(variants)]
+
+
+class RawFrameBlaster:
+    """
+    Sends prebuilt frame bytes at a paced rate through a raw socket, one
+    send() per frame in short bursts.
+
+    On Linux this is an AF_PACKET socket bound to the interface (tens of
+    thousands of pps from one core); elsewhere it falls back to Scapy's
+    layer-2 socket, which is slower but still avoids per-packet dissection.
+    """
+
+    def __init__(self, iface, burst_size=64):
+        self.iface = iface
+        self.burst_size = burst_size
+        self.sock = None
+
+    def open(self):
+        import socket
+        if hasattr(socket, "AF_PACKET"):
+            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+            sock.bind((self.iface, 0))
+            self.sock = sock
+        else:
+            from scapy.all import conf
+            self.sock = conf.L2socket(iface=self.iface)
+        return self
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def blast(self, frames, packets_per_sec, duration, stop_event=None):
+        """
+        Send frames round-robin at `packets_per_sec` for `duration` seconds.
+
+        Frames go out in bursts of up to burst_size back-to-back sends;
+        between bursts the sender sleeps (or spins for sub-millisecond gaps)
+        until the schedule catches up, so the achieved rate tracks the target
+        closely.
+
+        Returns:
+            dict: sent, dropped (ENOBUFS), elapsed, achieved_pps
+
+        Raises:
+            OSError: Any send error other than a full TX queue (e.g. the
+                interface went down or was removed)
+        """
+        send = self.sock.send
+        n_frames = len(frames)
+        interval = 1.0 / packets_per_sec
+        sent = 0
+        dropped = 0
+        index = 0
+
+        start = time.perf_counter()
+        deadline = start + duration
+        while True:
+            now = time.perf_counter()
+            if now >= deadline or (stop_event is not None and stop_event.is_set()):
+                break
+
+            # How far behind schedule we are, capped at one burst
+            due = int((now - start) * packets_per_sec) - sent - dropped
+            if due <= 0:
+                wait = start + (sent + dropped + 1) * interval - now
+                if wait > 0.001:
+                    time.sleep(wait - 0.0005)
+                continue
+
+            for _ in range(min(due, self.burst_size)):
+                try:
+                    send(frames[index])
+                    sent += 1
+                except OSError as e:
+                    if e.errno not in _NO_BUFFER_ERRNOS:
+                        raise
+                    # The TX queue is full: count it and keep pacing
+                    dropped += 1
+                index += 1
+                if index == n_frames:
+                    index = 0
+
+        elapsed = time.perf_counter() - start
+        return {
+            "sent": sent,
+            "dropped": dropped,
+            "elapsed": round(elapsed, 3),
+            "achieved_pps": round(sent / elapsed, 1) if elapsed > 0 else 0
+        }
+
+
+def create_veth_pair(name="wfyloop0", peer="wfyloop1"):
+    """Create and bring up a veth pair so generator and detector share one host (Linux, root)."""
+    import subprocess
+    subprocess.run(["ip", "link", "add", name, "type", "veth", "peer", "name", peer], check=True)
+    for dev in (name, peer):
+        subprocess.run(["ip", "link", "set", dev, "up"], check=True)
+    return name, peer
+
+
+def delete_veth_pair(name="wfyloop0"):
+    import subprocess
+    subprocess.run(["ip", "link", "del", name], check=False)
+
+
+def run_high_rate_scenario(scenario, packets_per_sec, duration, iface=None, detect_iface=None, variants=256):
+    """
+    Blast a scenario at a realistic storm rate, optionally running the
+    lightweight detector on `detect_iface` (e.g. the veth peer) meanwhile.
+
+    Returns:
+        dict: sender statistics plus the detector result if one was run
+    """
+    iface = iface or IFACE
+    frames = prebuild_frames(scenario, variants=variants)
+    print(f"🚀 High-rate {scenario}: {packets_per_sec} pps for {duration}s on {iface} "
+          f"({len(frames)} prebuilt frames)")
+
+    detection = {}
+    detector_thread = None
+    if detect_iface:
+        from network_utils import detect_loops_lightweight
+
+        def _detect():
+            total, offenders, stats, status, severity, metrics = detect_loops_lightweight(
+                timeout=duration, threshold=100, iface=detect_iface, use_sampling=True
+            )
+            detection.update({
+                "status": status,
+                "severity": round(severity, 2),
+                "offenders": offenders,
+                "packets_seen": metrics.get("total_packets_seen", total),
+                "early_exit_reason": metrics.get("early_exit_reason")
+            })
+
+        detector_thread = threading.Thread(target=_detect, daemon=True)
+        detector_thread.start()
+        time.sleep(0.5)  # Let the capture start before the storm
+
+    with RawFrameBlaster(iface) as blaster:
+        result = blaster.blast(frames, packets_per_sec, duration)
+    print(f"   Sent {result['sent']} frames in {result['elapsed']}s "
+          f"({result['achieved_pps']} pps, {result['dropped']} dropped)")
+
+    if detector_thread:
+        detector_thread.join(timeout=duration + 10)
+        result["detection"] = detection
+        print(f"   Detector on {detect_iface}: {detection.get('status', 'n/a').upper()} "
+              f"(severity {detection.get('severity', 0)}, {detection.get('packets_seen', 0)} packets seen)")
+    return result
+
+
 def check_interface_availability():
     """Check if the selected interface is available and working."""
     try:
@@ -1055,6 +1247,12 @@ def show_help():
       - Look for "Loop Detected" or "Suspicious" messages
       - Check severity scores and packet counts
 
+   4. HIGH-RATE MODE (Linux, root):
+      - python simulate_loop.py --blast broadcast_storm --pps 50000 --veth
+      - Prebuilt frames are sent in paced bursts over an AF_PACKET socket
+      - --veth sends on a temporary veth pair and runs the detector on
+        the peer, so the storm never leaves this machine
+
 ⚠️  REQUIREMENTS:
 
    - Administrator/root privileges (for packet capture)
@@ -1093,7 +1291,35 @@ def show_help():
     input("Press ENTER to continue...")
 
 
+def high_rate_cli(argv):
+    """Non-interactive entry point: python simulate_loop.py --blast SCENARIO [options]"""
+    import argparse
+    parser = argparse.ArgumentParser(description="High-rate loop storm generator")
+    parser.add_argument("--blast", required=True, choices=sorted(BLAST_BUILDERS), help="Scenario to generate")
+    parser.add_argument("--pps", type=int, default=20000, help="Target packets per second")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to transmit")
+    parser.add_argument("--iface", default=None, help="Interface to send on (default: auto-detected)")
+    parser.add_argument("--detect-iface", default=None, help="Run the lightweight detector on this interface")
+    parser.add_argument("--veth", action="store_true",
+                        help="Create a temporary veth pair, send on one end and detect on the other")
+    args = parser.parse_args(argv)
+
+    iface, detect_iface = args.iface, args.detect_iface
+    if args.veth:
+        iface, detect_iface = create_veth_pair()
+    try:
+        run_high_rate_scenario(args.blast, args.pps, args.duration, iface=iface, detect_iface=detect_iface)
+    finally:
+        if args.veth:
+            delete_veth_pair(iface)
+
+
 if __name__ == "__main__":
+    import sys
+    if "--blast" in sys.argv:
+        high_rate_cli(sys.argv[1:])
+        sys.exit(0)
+
     print("\n╔════════════════════════════════════════════════════════════════════╗")
     print("║       🔄 Advanced Loop Detection Test Simulator v2.0              ║")
     print("║                  Enhanced Multi-Interface Support                  ║")
@@ -0,0 +1,1005 @@
+"""
+SNMP Interface Counter Poller
+Polls ifHCInOctets/ifHCOutOctets from SNMP-capable routers (v2c or v3 USM)
+and logs the resulting rates to bandwidth_logs.
+
+All devices are polled concurrently from one asyncio event loop over a
+single UDP socket, with requests matched back by request/message ID. The
+interface table is walked with GETBULK when a device is first seen, after a
+reboot and every `rediscover_every` polls; in between only the chosen
+interfaces' counters are fetched. Deltas go through
+BandwidthTracker.compute_delta, which treats a lower sysUpTime or any
+decrease of the 64-bit counters (e.g. "clear counters") as a reset.
+
+The BER/SNMP encoding is implemented here with the standard library; SNMPv3
+privacy (AES-128) additionally needs the optional `cryptography` package.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import logging
+import os
+import re
+import socket
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+SNMP_PORT = 161
+COUNTER64_MAX = 1 << 64
+
+# OIDs
+SYS_UPTIME = (1, 3, 6, 1, 2, 1, 1, 3, 0)
+IF_DESCR = (1, 3, 6, 1, 2, 1, 2, 2, 1, 2)
+IF_TYPE = (1, 3, 6, 1, 2, 1, 2, 2, 1, 3)
+IF_OPER_STATUS = (1, 3, 6, 1, 2, 1, 2, 2, 1, 8)
+IF_NAME = (1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 1)
+IF_HC_IN_OCTETS = (1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 6)
+IF_HC_OUT_OCTETS = (1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 10)
+USM_STATS = (1, 3, 6, 1, 6, 3, 15, 1, 1)
+USM_NOT_IN_TIME_WINDOW = USM_STATS + (2, 0)
+
+IF_TYPE_SOFTWARE_LOOPBACK = 24
+WAN_NAME_PATTERN = re.compile(r"wan|ppp|dialer|uplink|internet", re.IGNORECASE)
+
+# --- BER ---
+
+TAG_INTEGER = 0x02
+TAG_OCTET_STRING = 0x04
+TAG_NULL = 0x05
+TAG_OID = 0x06
+TAG_SEQUENCE = 0x30
+TAG_IPADDRESS = 0x40
+TAG_COUNTER32 = 0x41
+TAG_GAUGE32 = 0x42
+TAG_TIMETICKS = 0x43
+TAG_COUNTER64 = 0x46
+TAG_NO_SUCH_OBJECT = 0x80
+TAG_NO_SUCH_INSTANCE = 0x81
+TAG_END_OF_MIB_VIEW = 0x82
+
+PDU_GET = 0xA0
+PDU_GETNEXT = 0xA1
+PDU_RESPONSE = 0xA2
+PDU_GETBULK = 0xA5
+PDU_REPORT = 0xA8
+
+_UNSIGNED_TAGS = {TAG_COUNTER32, TAG_GAUGE32, TAG_TIMETICKS, TAG_COUNTER64}
+_EXCEPTION_TAGS = {TAG_NO_SUCH_OBJECT, TAG_NO_SUCH_INSTANCE, TAG_END_OF_MIB_VIEW}
+
+
+class SnmpError(Exception):
+    """Malformed message, error-status response, authentication failure or timeout."""
+
+
+class SnmpException:
+    """noSuchObject / noSuchInstance / endOfMibView varbind value."""
+
+    __slots__ = ("tag",)
+
+    def __init__(self, tag):
+        self.tag = tag
+
+    def __repr__(self):
+        return {TAG_NO_SUCH_OBJECT: "noSuchObject", TAG_NO_SUCH_INSTANCE: "noSuchInstance",
+                TAG_END_OF_MIB_VIEW: "endOfMibView"}[self.tag]
+
+
+def _length(n):
+    if n < 0x80:
+        return bytes((n,))
+    body = n.to_bytes((n.bit_length() + 7) // 8, "big")
+    return bytes((0x80 | len(body),)) + body
+
+
+def tlv(tag, value):
+    return bytes((tag,)) + _length(len(value)) + value
+
+
+def encode_integer(value, tag=TAG_INTEGER):
+    if tag in _UNSIGNED_TAGS:
+        return tlv(tag, value.to_bytes(value.bit_length() // 8 + 1, "big"))
+    return tlv(tag, value.to_bytes(max(1, (value.bit_length() + 8) // 8), "big", signed=True))
+
+
+def encode_oid(oid):
+    body = bytearray((oid[0] * 40 + oid[1],))
+    for sub in oid[2:]:
+        chunk = [sub & 0x7F]
+        sub >>= 7
+        while sub:
+            chunk.append(0x80 | (sub & 0x7F))
+            sub >>= 7
+        body.extend(reversed(chunk))
+    return tlv(TAG_OID, bytes(body))
+
+
+def encode_value(value):
+    """Encode a varbind value: None (NULL), int, bytes/str, OID tuple, (tag, int) or SnmpException."""
+    if value is None:
+        return tlv(TAG_NULL, b"")
+    if isinstance(value, SnmpException):
+        return tlv(value.tag, b"")
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return encode_integer(value)
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, (bytes, bytearray)):
+        return tlv(TAG_OCTET_STRING, bytes(value))
+    if isinstance(value, tuple) and len(value) == 2 and value[0] in _UNSIGNED_TAGS | {TAG_IPADDRESS}:
+        tag, raw = value
+        if tag == TAG_IPADDRESS:
+            return tlv(tag, bytes(raw))
+        return encode_integer(raw, tag)
+    if isinstance(value, tuple):
+        return encode_oid(value)
+    raise SnmpError(f"Cannot encode {value!r}")
+
+
+def decode_tlv(data, offset):
+    """(tag, value_start, value_end) of the TLV at `offset`."""
+    if offset + 2 > len(data):
+        raise SnmpError("Truncated BER")
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        count = length & 0x7F
+        length = int.from_bytes(data[offset:offset + count], "big")
+        offset += count
+    end = offset + length
+    if end > len(data):
+        raise SnmpError("Truncated BER")
+    return tag, offset, end
+
+
+def decode_oid(data, start, end):
+    first = data[start]
+    oid = [first // 40, first % 40] if first < 80 else [2, first - 80]
+    value = 0
+    for byte in data[start + 1:end]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            oid.append(value)
+            value = 0
+    return tuple(oid)
+
+
+def decode_value(tag, data, start, end):
+    if tag == TAG_INTEGER:
+        return int.from_bytes(data[start:end], "big", signed=True)
+    if tag in _UNSIGNED_TAGS:
+        return int.from_bytes(data[start:end], "big")
+    if tag in (TAG_OCTET_STRING, TAG_IPADDRESS):
+        return bytes(data[start:end])
+    if tag == TAG_OID:
+        return decode_oid(data, start, end)
+    if tag == TAG_NULL:
+        return None
+    if tag in _EXCEPTION_TAGS:
+        return SnmpException(tag)
+    return bytes(data[start:end])
+
+
+def _children(data, start, end):
+    """Iterate (tag, start, end) over the TLVs in data[start:end]."""
+    while start < end:
+        tag, value_start, value_end = decode_tlv(data, start)
+        yield tag, value_start, value_end
+        start = value_end
+
+
+def encode_pdu(pdu_type, request_id, varbinds, error_status=0, error_index=0):
+    """varbinds: [(oid, value)]; for GETBULK error_status/error_index are non-repeaters/max-repetitions."""
+    bindings = b"".join(tlv(TAG_SEQUENCE, encode_oid(oid) + encode_value(value)) for oid, value in varbinds)
+    return tlv(pdu_type, encode_integer(request_id) + encode_integer(error_status)
+               + encode_integer(error_index) + tlv(TAG_SEQUENCE, bindings))
+
+
+def decode_pdu(data, offset=0):
+    """(pdu_type, request_id, error_status, error_index, [(oid, value)])"""
+    pdu_type, start, end = decode_tlv(data, offset)
+    return _decode_pdu_body(data, pdu_type, start, end)
+
+
+def _decode_pdu_body(data, pdu_type, start, end):
+    fields = list(_children(data, start, end))
+    if len(fields) != 4:
+        raise SnmpError("Malformed PDU")
+    request_id, error_status, error_index = (decode_value(t, data, s, e) for t, s, e in fields[:3])
+    varbinds = []
+    _, vb_start, vb_end = fields[3]
+    for _, s, e in _children(data, vb_start, vb_end):
+        (_, oid_start, oid_end), (value_tag, value_start, value_end) = _children(data, s, e)
+        varbinds.append((decode_oid(data, oid_start, oid_end), decode_value(value_tag, data, value_start, value_end)))
+    return pdu_type, request_id, error_status, error_index, varbinds
+
+
+# --- SNMPv3 USM ---
+
+_AUTH_HASHES = {"MD5": hashlib.md5, "SHA": hashlib.sha1}
+_AUTH_PARAM_LENGTH = 12  # HMAC-96
+FLAG_AUTH = 0x01
+FLAG_PRIV = 0x02
+FLAG_REPORTABLE = 0x04
+
+
+def password_to_key(password, engine_id, auth_protocol):
+    """RFC 3414 A.2: hash 1 MB of the repeated password, then localize to the engine."""
+    digest = _AUTH_HASHES[auth_protocol]
+    password = password.encode() if isinstance(password, str) else password
+    h = digest()
+    repeated = (password * (64 // len(password) + 1))
+    block = (repeated * (1048576 // len(repeated) + 2))[:1048576]
+    h.update(block)
+    ku = h.digest()
+    return digest(ku + engine_id + ku).digest()
+
+
+def _aes_cfb(key, iv, data, encrypt):
+    try:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    except ImportError:
+        raise SnmpError("SNMPv3 privacy (AES) needs the 'cryptography' package") from None
+    cipher = Cipher(algorithms.AES(key), modes.CFB(iv))
+    op = cipher.encryptor() if encrypt else cipher.decryptor()
+    return op.update(data) + op.finalize()
+
+
+class SnmpTarget:
+    """
+    One SNMP agent and its credentials.
+
+    Args:
+        host (str): Agent address
+        port (int): Agent UDP port
+        version (str): "2c" or "3"
+        community (str): v2c community
+        user (str): v3 user name
+        auth_protocol (str): None, "MD5" or "SHA"
+        auth_password (str): v3 authentication passphrase
+        priv_protocol (str): None or "AES"
+        priv_password (str): v3 privacy passphrase
+        context (str): v3 context name
+        timeout (float): Seconds to wait for each response
+        retries (int): Retransmissions after the first request
+    """
+
+    def __init__(self, host, port=SNMP_PORT, version="2c", community="public", user=None,
+                 auth_protocol=None, auth_password=None, priv_protocol=None, priv_password=None,
+                 context="", timeout=2.0, retries=1):
+        self.host = host
+        self.port = int(port)
+        self.version = str(version).lower().lstrip("v")
+        self.community = community
+        self.user = user or ""
+        self.auth_protocol = auth_protocol.upper() if auth_protocol else None
+        self.auth_password = auth_password
+        self.priv_protocol = priv_protocol.upper() if priv_protocol else None
+        self.priv_password = priv_password
+        self.context = context
+        self.timeout = timeout
+        self.retries = retries
+        if self.version not in ("2c", "3"):
+            raise ValueError(f"Unsupported SNMP version {version!r}")
+        if self.auth_protocol and self.auth_protocol not in _AUTH_HASHES:
+            raise ValueError(f"Unsupported SNMPv3 auth protocol {auth_protocol!r}")
+        if self.priv_protocol and (self.priv_protocol != "AES" or not self.auth_protocol):
+            raise ValueError("SNMPv3 privacy must be AES and requires authentication")
+
+        # Discovered authoritative engine (v3)
+        self.engine_id = None
+        self.engine_boots = 0
+        self.engine_time = 0
+        self._engine_clock = 0.0
+        self._auth_key = None
+        self._priv_key = None
+
+    @property
+    def address(self):
+        return (self.host, self.port)
+
+    @property
+    def flags(self):
+        return (FLAG_AUTH if self.auth_protocol else 0) | (FLAG_PRIV if self.priv_protocol else 0)
+
+    def set_engine(self, engine_id, boots, engine_time):
+        if engine_id != self.engine_id:
+            self.engine_id = engine_id
+            if self.auth_protocol:
+                self._auth_key = password_to_key(self.auth_password, engine_id, self.auth_protocol)
+            if self.priv_protocol:
+                self._priv_key = password_to_key(self.priv_password, engine_id, self.auth_protocol)[:16]
+        self.engine_boots = boots
+        self.engine_time = engine_time
+        self._engine_clock = time.monotonic()
+
+    def current_engine_time(self):
+        return self.engine_time + int(time.monotonic() - self._engine_clock)
+
+
+def encode_v2c(community, pdu):
+    community = community.encode() if isinstance(community, str) else community
+    return tlv(TAG_SEQUENCE, encode_integer(1) + tlv(TAG_OCTET_STRING, community) + pdu)
+
+
+def _usm_parameters(engine_id, boots, engine_time, user, auth, priv):
+    return tlv(TAG_SEQUENCE, tlv(TAG_OCTET_STRING, engine_id) + encode_integer(boots)
+               + encode_integer(engine_time) + tlv(TAG_OCTET_STRING, user)
+               + tlv(TAG_OCTET_STRING, auth) + tlv(TAG_OCTET_STRING, priv))
+
+
+def encode_v3(msg_id, flags, engine_id, boots, engine_time, user, scoped_pdu,
+              auth_protocol=None, auth_key=None, priv_key=None, salt=None, max_size=65507):
+    """
+    Build an SNMPv3 message; with auth the HMAC-96 is computed over the whole
+    message with a zeroed placeholder, with priv the scoped PDU is AES-CFB encrypted.
+    """
+    user = user.encode() if isinstance(user, str) else user
+    priv_params = b""
+    if flags & FLAG_PRIV:
+        priv_params = salt
+        iv = struct.pack("!II", boots, engine_time) + salt
+        body = tlv(TAG_OCTET_STRING, _aes_cfb(priv_key, iv, scoped_pdu, encrypt=True))
+    else:
+        body = scoped_pdu
+    placeholder = b"\0" * _AUTH_PARAM_LENGTH if flags & FLAG_AUTH else b""
+    header = tlv(TAG_SEQUENCE, encode_integer(msg_id) + encode_integer(max_size)
+                 + tlv(TAG_OCTET_STRING, bytes((flags,))) + encode_integer(3))
+    usm = _usm_parameters(engine_id, boots, engine_time, user, placeholder, priv_params)
+    message = tlv(TAG_SEQUENCE, encode_integer(3) + header + tlv(TAG_OCTET_STRING, usm) + body)
+    if flags & FLAG_AUTH:
+        mac = hmac.new(auth_key, message, _AUTH_HASHES[auth_protocol]).digest()[:_AUTH_PARAM_LENGTH]
+        index = message.rfind(placeholder, 0, len(message) - len(body))
+        message = message[:index] + mac + message[index + _AUTH_PARAM_LENGTH:]
+    return message
+
+
+def encode_scoped_pdu(context_engine_id, context_name, pdu):
+    context_name = context_name.encode() if isinstance(context_name, str) else context_name
+    return tlv(TAG_SEQUENCE, tlv(TAG_OCTET_STRING, context_engine_id) + tlv(TAG_OCTET_STRING, context_name) + pdu)
+
+
+def decode_message(data):
+    """
+    Split a message into its parts without verifying or decrypting.
+
+    Returns:
+        dict with "version" and, for v2c, "community" and "pdu"; for v3,
+        "msg_id", "flags", "engine_id", "boots", "time", "user", "auth",
+        "priv", "auth_offset" and "scoped" (bytes, encrypted if flags has priv)
+    """
+    tag, start, end = decode_tlv(data, 0)
+    if tag != TAG_SEQUENCE:
+        raise SnmpError("Not an SNMP message")
+    parts = list(_children(data, start, end))
+    if not parts or parts[0][0] != TAG_INTEGER:
+        raise SnmpError("Not an SNMP message")
+    version = decode_value(TAG_INTEGER, data, *parts[0][1:])
+    if version in (0, 1) and len(parts) == 3:
+        return {"version": version, "community": decode_value(parts[1][0], data, *parts[1][1:]),
+                "pdu": _decode_pdu_body(data, *parts[2])}
+    if version != 3 or len(parts) != 4:
+        raise SnmpError(f"Unsupported SNMP message version {version}")
+    header = [decode_value(t, data, s, e) for t, s, e in _children(data, *parts[1][1:])]
+    _, seq_start, seq_end = decode_tlv(data, parts[2][1])
+    usm = list(_children(data, seq_start, seq_end))
+    if len(header) != 4 or len(usm) != 6:
+        raise SnmpError("Malformed SNMPv3 header")
+    values = [decode_value(t, data, s, e) for t, s, e in usm]
+    body_tag, body_start, body_end = parts[3]
+    return {
+        "version": 3,
+        "msg_id": header[0],
+        "flags": header[2][0] if header[2] else 0,
+        "engine_id": values[0],
+        "boots": values[1],
+        "time": values[2],
+        "user": values[3],
+        "auth": values[4],
+        "priv": values[5],
+        "auth_offset": usm[4][1],
+        # Encrypted: the OCTET STRING contents; plaintext: the whole ScopedPDU sequence
+        "scoped": (data[body_start:body_end] if body_tag == TAG_OCTET_STRING
+                   else tlv(body_tag, data[body_start:body_end]))
+    }
+
+
+def verify_v3(data, message, auth_protocol, auth_key):
+    """Check the HMAC-96 of a received v3 message."""
+    offset = message["auth_offset"]
+    received = data[offset:offset + _AUTH_PARAM_LENGTH]
+    zeroed = data[:offset] + b"\0" * _AUTH_PARAM_LENGTH + data[offset + _AUTH_PARAM_LENGTH:]
+    expected = hmac.new(auth_key, zeroed, _AUTH_HASHES[auth_protocol]).digest()[:_AUTH_PARAM_LENGTH]
+    return hmac.compare_digest(received, expected)
+
+
+def open_scoped_pdu(message, priv_key=None):
+    """(context_engine_id, context_name, pdu tuple) of a decoded v3 message."""
+    scoped = message["scoped"]
+    if message["flags"] & FLAG_PRIV:
+        iv = struct.pack("!II", message["boots"], message["time"]) + message["priv"]
+        scoped = _aes_cfb(priv_key, iv, scoped, encrypt=False)
+    _, start, end = decode_tlv(scoped, 0)
+    parts = list(_children(scoped, start, end))
+    if len(parts) != 3:
+        raise SnmpError("Malformed scoped PDU (wrong privacy password?)")
+    return (decode_value(parts[0][0], scoped, *parts[0][1:]), decode_value(parts[1][0], scoped, *parts[1][1:]),
+            _decode_pdu_body(scoped, *parts[2]))
+
+
+# --- async client ---
+
+class _SnmpProtocol(asyncio.DatagramProtocol):
+    """One UDP socket shared by every request; responses are matched by request/message ID."""
+
+    def __init__(self):
+        self.transport = None
+        self.pending = {}  # (host, port, id) -> Future
+        self.unmatched = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            message = decode_message(data)
+            key_id = message["msg_id"] if message["version"] == 3 else message["pdu"][1]
+        except Exception:
+            self.unmatched += 1
+            return
+        future = self.pending.pop((addr[0], addr[1], key_id), None)
+        if future is None or future.done():
+            self.unmatched += 1
+            return
+        future.set_result((data, message))
+
+    def error_received(self, exc):
+        logging.debug(f"SNMP socket error: {exc}")
+
+
+class SnmpClient:
+    """
+    Async SNMP v2c/v3 client for many agents over one socket.
+
+    Must be used from the event loop it was opened on.
+
+    Args:
+        rcvbuf (int): Socket receive buffer size in bytes; replies to a whole
+            cycle of walks can arrive at once
+    """
+
+    def __init__(self, rcvbuf=4 << 20):
+        self.rcvbuf = rcvbuf
+        self._protocol = None
+        self._ids = itertools.count(int.from_bytes(os.urandom(3), "big") + 1)
+        self.stats = {"requests": 0, "retries": 0, "timeouts": 0, "reports": 0, "auth_failures": 0}
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        transport, self._protocol = await loop.create_datagram_endpoint(_SnmpProtocol, local_addr=("0.0.0.0", 0))
+        try:
+            transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        except OSError as e:
+            logging.debug(f"Could not enlarge SNMP receive buffer: {e}")
+        return self
+
+    def close(self):
+        if self._protocol is not None and self._protocol.transport is not None:
+            self._protocol.transport.close()
+        self._protocol = None
+
+    def _next_id(self):
+        return next(self._ids) & 0x7FFFFFFF
+
+    async def _exchange(self, target, build, key_id):
+        """Send build() (rebuilt per attempt) and wait for the reply matched by key_id."""
+        loop = asyncio.get_running_loop()
+        protocol = self._protocol
+        host, port = target.address
+        for attempt in range(target.retries + 1):
+            future = loop.create_future()
+            protocol.pending[(host, port, key_id)] = future
+            protocol.transport.sendto(build(), target.address)
+            self.stats["requests"] += 1
+            if attempt:
+                self.stats["retries"] += 1
+            try:
+                return await asyncio.wait_for(future, target.timeout)
+            except asyncio.TimeoutError:
+                continue
+            finally:
+                protocol.pending.pop((host, port, key_id), None)
+        self.stats["timeouts"] += 1
+        raise SnmpError(f"No response from {host}:{port}")
+
+    async def _discover_engine(self, target):
+        msg_id = self._next_id()
+        pdu = encode_pdu(PDU_GET, self._next_id(), [])
+        message = encode_v3(msg_id, FLAG_REPORTABLE, b"", 0, 0, b"", encode_scoped_pdu(b"", b"", pdu))
+        _, reply = await self._exchange(target, lambda: message, msg_id)
+        if not reply["engine_id"]:
+            raise SnmpError(f"{target.host}: engine discovery returned no engine ID")
+        target.set_engine(reply["engine_id"], reply["boots"], reply["time"])
+
+    async def request(self, target, pdu_type, varbinds, error_status=0, error_index=0):
+        """Send one PDU and return its response varbinds."""
+        if target.version == "2c":
+            request_id = self._next_id()
+            message = encode_v2c(target.community, encode_pdu(pdu_type, request_id, varbinds,
+                                                               error_status, error_index))
+            _, reply = await self._exchange(target, lambda: message, request_id)
+            return self._check(target, reply["pdu"])
+
+        for attempt in range(2):
+            if target.engine_id is None:
+                await self._discover_engine(target)
+            msg_id = self._next_id()
+            pdu = encode_pdu(pdu_type, self._next_id(), varbinds, error_status, error_index)
+            scoped = encode_scoped_pdu(target.engine_id, target.context, pdu)
+
+            def build():
+                return encode_v3(msg_id, target.flags | FLAG_REPORTABLE, target.engine_id, target.engine_boots,
+                                 target.current_engine_time(), target.user, scoped,
+                                 auth_protocol=target.auth_protocol, auth_key=target._auth_key,
+                                 priv_key=target._priv_key, salt=os.urandom(8) if target.priv_protocol else None)
+
+            data, reply = await self._exchange(target, build, msg_id)
+            if reply["flags"] & FLAG_AUTH and not verify_v3(data, reply, target.auth_protocol, target._auth_key):
+                self.stats["auth_failures"] += 1
+                raise SnmpError(f"{target.host}: response failed authentication")
+            _, _, response = open_scoped_pdu(reply, target._priv_key)
+            if response[0] == PDU_REPORT:
+                self.stats["reports"] += 1
+                oid = response[4][0][0] if response[4] else None
+                if oid == USM_NOT_IN_TIME_WINDOW and attempt == 0:
+                    target.set_engine(reply["engine_id"], reply["boots"], reply["time"])
+                    continue
+                raise SnmpError(f"{target.host}: agent report {oid}")
+            return self._check(target, response)
+        raise SnmpError(f"{target.host}: could not synchronise engine time")
+
+    @staticmethod
+    def _check(target, pdu):
+        pdu_type, _, error_status, error_index, varbinds = pdu
+        if pdu_type == PDU_REPORT:
+            raise SnmpError(f"{target.host}: agent report {varbinds[0][0] if varbinds else None}")
+        if error_status:
+            raise SnmpError(f"{target.host}: error-status {error_status} at varbind {error_index}")
+        return varbinds
+
+    async def get(self, target, oids):
+        return await self.request(target, PDU_GET, [(oid, None) for oid in oids])
+
+    async def bulk_walk(self, target, columns, non_repeaters=(), max_repetitions=25):
+        """
+        Walk table columns with GETBULK.
+
+        Returns:
+            (scalars, rows): {oid: value} for the non-repeaters and
+            {column: {index tuple: value}} for the columns
+        """
+        scalars = {}
+        rows = {column: {} for column in columns}
+        cursors = [(column, column) for column in columns]  # (column, last OID returned)
+        first = True
+        while cursors:
+            repeaters = [(oid, None) for _, oid in cursors]
+            if first:
+                request = [(oid, None) for oid in non_repeaters] + repeaters
+                varbinds = await self.request(target, PDU_GETBULK, request, len(non_repeaters), max_repetitions)
+                for oid, value in varbinds[:len(non_repeaters)]:
+                    scalars[oid] = value
+                varbinds = varbinds[len(non_repeaters):]
+                first = False
+            else:
+                varbinds = await self.request(target, PDU_GETBULK, repeaters, 0, max_repetitions)
+            if not varbinds:
+                break
+            width = len(cursors)
+            advanced = list(cursors)
+            active = [True] * width
+            for position, (oid, value) in enumerate(varbinds):
+                slot = position % width
+                column = cursors[slot][0]
+                if not active[slot]:
+                    continue
+                if isinstance(value, SnmpException) or oid[:len(column)] != column:
+                    active[slot] = False
+                    continue
+                rows[column][oid[len(column):]] = value
+                advanced[slot] = (column, oid)
+            # Columns whose OID did not move would loop forever
+            cursors = [cursor for cursor, old, alive in zip(advanced, cursors, active) if alive and cursor != old]
+        return scalars, rows
+
+
+# --- poller ---
+
+class _DeviceState:
+    __slots__ = ("target", "router_id", "name", "interfaces", "signature", "selected", "polls",
+                 "last_uptime", "last_error", "last_poll", "rtt_ms")
+
+    def __init__(self, target, router_id, name, interfaces, signature=None):
+        self.target = target
+        self.router_id = router_id
+        self.name = name
+        self.interfaces = interfaces  # configured names/indexes, or None for automatic
+        self.signature = signature    # settings the target was built from
+        self.selected = None          # {ifIndex: ifName}
+        self.polls = 0
+        self.last_uptime = None
+        self.last_error = None
+        self.last_poll = None
+        self.rtt_ms = None
+
+
+def _default_config_path():
+    base = Path(sys.executable).parent if getattr(sys, "frozen", False) else Path(__file__).parent
+    return base / "snmp_config.json"
+
+
+def load_snmp_config(path=None):
+    """
+    Read snmp_config.json:
+
+        {
+          "enabled": true,
+          "interval": 60,
+          "poll_all": false,
+          "defaults": {"version": "2c", "community": "public", "port": 161},
+          "routers": {"192.168.1.1": {"version": "3", "user": "monitor",
+                      "auth_protocol": "SHA", "auth_password": "...",
+                      "interfaces": ["wan"]}}
+        }
+
+    Routers are keyed by IP address or router ID; with poll_all every
+    non-UniFi router is polled with the defaults.
+    """
+    path = Path(path) if path else _default_config_path()
+    if not path.exists():
+        return {"enabled": False}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.error(f"Could not read SNMP config {path}: {e}")
+        return {"enabled": False}
+
+
+def _write_bandwidth_logs(rows):
+    from db import insert_bandwidth_logs
+    return insert_bandwidth_logs(rows)
+
+
+class SnmpBandwidthPoller:
+    """
+    Periodic SNMP interface counter poller feeding bandwidth_logs.
+
+    Download is the selected interfaces' ifHCInOctets rate and upload their
+    ifHCOutOctets rate. Interfaces come from the router's "interfaces"
+    setting (names or ifIndex numbers); otherwise the first interface whose
+    name looks like a WAN uplink is used, or failing that the busiest
+    non-loopback interface.
+
+    Args:
+        routers_provider: Function returning routers [{id, ip_address, name, brand}, ...]
+        config (dict): Parsed snmp_config.json (default: load_snmp_config())
+        interval (float): Seconds between polls (default: config "interval" or 60)
+        max_concurrent (int): Devices polled at the same time
+        rediscover_every (int): Re-walk the interface table every N polls
+        sink: Callable(rows) receiving [(router_id, download_mbps, upload_mbps,
+            latency_ms, timestamp), ...] (default: db.insert_bandwidth_logs)
+    """
+
+    def __init__(self, routers_provider, config=None, interval=None, max_concurrent=256,
+                 rediscover_every=30, sink=None):
+        from bandwidth_tracker import BandwidthTracker
+
+        self.routers_provider = routers_provider
+        self.config = config if config is not None else load_snmp_config()
+        self.interval = float(interval or self.config.get("interval", 60))
+        self.max_concurrent = max_concurrent
+        self.rediscover_every = rediscover_every
+        self.sink = sink or _write_bandwidth_logs
+        # Separate cache from the UniFi tracker; keys are (router_id, ifIndex)
+        self.tracker = BandwidthTracker(load_from_db=False)
+
+        self._devices = {}  # router_id -> _DeviceState
+        self._latest = {}   # router_id -> last result
+        self._lock = threading.Lock()
+        self._thread = None
+        self._loop = None
+        self._stop = None
+        self.client = SnmpClient()
+        self.stats = {"cycles": 0, "polled": 0, "failed": 0, "rows_written": 0,
+                      "reboots": 0, "last_cycle_seconds": None, "last_cycle": None}
+
+    # --- targets ---
+
+    def _settings_for(self, router):
+        routers = self.config.get("routers", {})
+        own = routers.get(str(router.get("id"))) or routers.get(router.get("ip_address"))
+        if own is None and not self.config.get("poll_all"):
+            return None
+        settings = dict(self.config.get("defaults", {}))
+        settings.update(own or {})
+        return settings
+
+    def covers(self, router):
+        """True when this poller measures `router` (so other loggers can skip it)."""
+        if not self.config.get("enabled"):
+            return False
+        if str(router.get("brand", "")).lower() == "unifi":
+            return False
+        return self._settings_for(router) is not None
+
+    def _refresh_devices(self):
+        try:
+            routers = self.routers_provider() or []
+        except Exception as e:
+            logging.error(f"SNMP poller could not load routers: {e}")
+            return
+        wanted = {}
+        for router in routers:
+            if router.get("id") is None or not router.get("ip_address") or not self.covers(router):
+                continue
+            settings = self._settings_for(router)
+            interfaces = settings.pop("interfaces", None)
+            known = self._devices.get(router["id"])
+            target_settings = {k: v for k, v in settings.items()
+                               if k in ("port", "version", "community", "user", "auth_protocol", "auth_password",
+                                        "priv_protocol", "priv_password", "context", "timeout", "retries")}
+            signature = (router["ip_address"], tuple(sorted(target_settings.items())), str(interfaces))
+            if known is not None and known.signature == signature:
+                wanted[router["id"]] = known
+                continue
+            try:
+                target = SnmpTarget(router["ip_address"], **target_settings)
+            except ValueError as e:
+                logging.error(f"SNMP settings for router {router['id']} are invalid: {e}")
+                continue
+            wanted[router["id"]] = _DeviceState(target, router["id"], router.get("name"), interfaces, signature)
+        self._devices = wanted
+
+    # --- polling ---
+
+    def _choose_interfaces(self, state, names, types, status, counters):
+        if state.interfaces:
+            chosen = {}
+            for wanted in state.interfaces:
+                for index, name in names.items():
+                    if str(wanted) == str(index) or str(wanted).lower() == name.lower():
+                        chosen[index] = name
+            return chosen
+        candidates = [i for i in counters if types.get(i) != IF_TYPE_SOFTWARE_LOOPBACK]
+        up = [i for i in candidates if status.get(i, 1) == 1] or candidates
+        for index in sorted(up):
+            if WAN_NAME_PATTERN.search(names.get(index, "")):
+                return {index: names.get(index, str(index))}
+        if not up:
+            return {}
+        busiest = max(up, key=lambda i: counters[i][0] + counters[i][1])
+        return {busiest: names.get(busiest, str(busiest))}
+
+    async def _discover(self, state):
+        target = state.target
+        scalars, rows = await self.client.bulk_walk(
+            target, [IF_NAME, IF_HC_IN_OCTETS, IF_HC_OUT_OCTETS, IF_DESCR, IF_TYPE, IF_OPER_STATUS],
+            non_repeaters=[SYS_UPTIME])
+        names = {index[0]: (rows[IF_NAME].get(index) or rows[IF_DESCR].get(index) or b"").decode(errors="replace")
+                 for index in set(rows[IF_NAME]) | set(rows[IF_DESCR])}
+        counters = {index[0]: (rows[IF_HC_IN_OCTETS][index], rows[IF_HC_OUT_OCTETS].get(index, 0))
+                    for index in rows[IF_HC_IN_OCTETS]}
+        if not counters:
+            raise SnmpError(f"{target.host}: no ifHCInOctets (agent without IF-MIB 64-bit counters?)")
+        types = {index[0]: value for index, value in rows[IF_TYPE].items()}
+        status = {index[0]: value for index, value in rows[IF_OPER_STATUS].items()}
+        state.selected = self._choose_interfaces(state, names, types, status, counters)
+        if not state.selected:
+            raise SnmpError(f"{target.host}: none of the configured interfaces {state.interfaces} exist")
+        uptime = scalars.get(SYS_UPTIME)
+        return uptime, {index: counters[index] for index in state.selected if index in counters}
+
+    async def _read_counters(self, state):
+        oids = [SYS_UPTIME]
+        for index in state.selected:
+            oids += [IF_HC_IN_OCTETS + (index,), IF_HC_OUT_OCTETS + (index,)]
+        varbinds = dict(await self.client.get(state.target, oids))
+        counters = {}
+        for index in state.selected:
+            rx = varbinds.get(IF_HC_IN_OCTETS + (index,))
+            tx = varbinds.get(IF_HC_OUT_OCTETS + (index,))
+            if isinstance(rx, int) and isinstance(tx, int):
+                counters[index] = (rx, tx)
+        uptime = varbinds.get(SYS_UPTIME)
+        return uptime if isinstance(uptime, int) else None, counters
+
+    async def _poll_device(self, state, semaphore):
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                if state.selected is None or state.polls % self.rediscover_every == 0:
+                    uptime, counters = await self._discover(state)
+                else:
+                    uptime, counters = await self._read_counters(state)
+                    if len(counters) < len(state.selected):
+                        # Interfaces renumbered (e.g. after a reboot): walk again
+                        uptime, counters = await self._discover(state)
+            except Exception as e:
+                state.last_error = str(e)
+                return None
+            state.rtt_ms = round((time.monotonic() - started) * 1000, 1)
+            state.polls += 1
+            state.last_error = None
+            return self._fold(state, uptime, counters)
+
+    def _fold(self, state, uptime, counters):
+        """Turn one reading into rates with compute_delta (wrap- and reboot-aware)."""
+        previous_uptime = state.last_uptime
+        previous_poll = state.last_poll
+        now = time.monotonic()
+        rebooted = uptime is not None and previous_uptime is not None and uptime < previous_uptime
+        if rebooted:
+            state.selected = None  # Interface indexes may have been renumbered; walk again next time
+            with self._lock:
+                self.stats["reboots"] += 1
+        rx_total = tx_total = 0
+        baseline = previous_poll is None
+        for index, (rx, tx) in counters.items():
+            rx_diff, tx_diff, is_reset = self.tracker.compute_delta(
+                (state.router_id, index), rx, tx, counter_max=COUNTER64_MAX, uptime=uptime)
+            baseline = baseline or is_reset
+            rx_total += rx_diff
+            tx_total += tx_diff
+        state.last_uptime = uptime
+        state.last_poll = now
+        if baseline:
+            return None
+        # sysUpTime (centiseconds) times the interval on the agent, free of our own
+        # scheduling delays; fall back to our clock when it is missing or implausible
+        wall = now - previous_poll
+        elapsed = (uptime - previous_uptime) / 100.0 if uptime is not None and previous_uptime is not None else 0
+        if not 0.5 * wall < elapsed < 2 * wall + 1:
+            elapsed = wall
+        elapsed = max(elapsed, 1e-3)
+        return {
+            "router_id": state.router_id,
+            "name": state.name,
+            "interfaces": dict(state.selected),
+            "download_mbps": round(rx_total * 8 / elapsed / 1e6, 3),
+            "upload_mbps": round(tx_total * 8 / elapsed / 1e6, 3),
+            "rx_bytes": rx_total,
+            "tx_bytes": tx_total,
+            "interval": round(elapsed, 2),
+            "rtt_ms": state.rtt_ms
+        }
+
+    async def poll_once(self):
+        """Poll every device concurrently, write the rates and return the results."""
+        self._refresh_devices()
+        if self.client._protocol is None:
+            await self.client.open()
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        devices = list(self._devices.values())
+        outcomes = await asyncio.gather(*(self._poll_device(state, semaphore) for state in devices))
+        when = datetime.now().replace(microsecond=0)
+        results = [r for r in outcomes if r is not None]
+        rows = [(r["router_id"], r["download_mbps"], r["upload_mbps"], None, when) for r in results]
+        if rows:
+            try:
+                if self.sink(rows) is not False:
+                    self.stats["rows_written"] += len(rows)
+            except Exception as e:
+                logging.error(f"SNMP poller could not write bandwidth logs: {e}")
+        with self._lock:
+            for r in results:
+                r["timestamp"] = when.isoformat()
+                self._latest[r["router_id"]] = r
+            self.stats["cycles"] += 1
+            self.stats["polled"] += sum(1 for s in devices if s.last_error is None)
+            self.stats["failed"] += sum(1 for s in devices if s.last_error is not None)
+            self.stats["last_cycle_seconds"] = round(time.monotonic() - started, 3)
+            self.stats["last_cycle"] = when.isoformat()
+        return results
+
+    async def _run(self):
+        self._stop = asyncio.Event()
+        await self.client.open()
+        try:
+            while not self._stop.is_set():
+                cycle_started = time.monotonic()
+                try:
+                    await self.poll_once()
+                except Exception as e:
+                    logging.error(f"SNMP poll cycle failed: {e}")
+                delay = max(0.0, self.interval - (time.monotonic() - cycle_started))
+                try:
+                    await asyncio.wait_for(self._stop.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.client.close()
+
+    # --- control ---
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            ready.set()
+            try:
+                self._loop.run_until_complete(self._run())
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True, name="snmp-poller")
+        self._thread.start()
+        ready.wait(2)
+        logging.info(f"SNMP poller started (every {self.interval:.0f}s)")
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    # --- queries ---
+
+    def get_latest(self, router_id=None):
+        with self._lock:
+            if router_id is not None:
+                return dict(self._latest[router_id]) if router_id in self._latest else None
+            return [dict(r) for r in self._latest.values()]
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update({f"snmp_{k}": v for k, v in self.client.stats.items()})
+        stats["devices"] = len(self._devices)
+        stats["errors"] = {state.router_id: state.last_error for state in self._devices.values() if state.last_error}
+        stats["interval"] = self.interval
+        stats["running"] = self._thread is not None
+        return stats
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def get_snmp_poller():
+    """The poller started by start_snmp_polling, or None."""
+    return _poller
+
+
+def start_snmp_polling(routers_provider, config=None):
+    """
+    Start the SNMP poller if snmp_config.json enables it.
+
+    Returns:
+        SnmpBandwidthPoller or None when SNMP polling is disabled
+    """
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            config = config if config is not None else load_snmp_config()
+            if not config.get("enabled"):
+                return None
+            _poller = SnmpBandwidthPoller(routers_provider, config=config).start()
+        return _poller
@@ -0,0 +1,248 @@
+"""
+SNMP Agent Simulator
+Local SNMP v2c/v3 agents serving IF-MIB interface counters, for exercising
+snmp_poller without real routers.
+
+Each agent answers GET, GETNEXT and GETBULK for sysUpTime, ifDescr, ifType,
+ifOperStatus, ifName and ifHCIn/OutOctets. Counters grow at a fixed rate
+per interface, can start just below 2**64 to force a wrap, and the agent
+can "reboot" (uptime and counters back to zero) after a set time.
+
+Usage:
+    python snmp_simulator.py --agents 50 --base-port 16100
+    python snmp_simulator.py --agents 1 --wrap --reboot-after 120
+    python snmp_simulator.py --user monitor --auth SHA --auth-password secret123
+"""
+
+import argparse
+import asyncio
+import bisect
+import os
+import sys
+import time
+
+from snmp_poller import (
+    COUNTER64_MAX, FLAG_AUTH, FLAG_PRIV, IF_DESCR, IF_HC_IN_OCTETS, IF_HC_OUT_OCTETS, IF_NAME,
+    IF_OPER_STATUS, IF_TYPE, PDU_GET, PDU_GETBULK, PDU_GETNEXT, PDU_REPORT, PDU_RESPONSE,
+    SYS_UPTIME, TAG_COUNTER64, TAG_END_OF_MIB_VIEW, TAG_NO_SUCH_OBJECT, TAG_TIMETICKS,
+    USM_NOT_IN_TIME_WINDOW, USM_STATS, SnmpError, SnmpException, decode_message, encode_pdu,
+    encode_scoped_pdu, encode_v2c, encode_v3, open_scoped_pdu, password_to_key, verify_v3
+)
+
+USM_UNKNOWN_ENGINE_IDS = USM_STATS + (4, 0)
+USM_UNKNOWN_USER_NAMES = USM_STATS + (3, 0)
+USM_WRONG_DIGESTS = USM_STATS + (5, 0)
+TIME_WINDOW = 150
+
+
+class SimulatedAgent(asyncio.DatagramProtocol):
+    """
+    One simulated device.
+
+    Args:
+        interfaces (list): [(name, if_type, rx_bytes_per_sec, tx_bytes_per_sec), ...]
+        community (str): Accepted v2c community
+        users (dict): v3 users {name: {"auth_protocol", "auth_password", "priv_protocol", "priv_password"}}
+        wrap (bool): Start the counters 30 seconds' worth of traffic below 2**64
+        reboot_after (float): Seconds after which the device restarts (uptime and counters reset)
+    """
+
+    def __init__(self, interfaces, community="public", users=None, wrap=False, reboot_after=None):
+        self.interfaces = interfaces
+        self.community = community.encode()
+        self.users = users or {}
+        self.wrap = wrap
+        self.reboot_after = reboot_after
+        self.engine_id = b"\x80\x00\x1f\x88\x04" + os.urandom(8)
+        self.boots = 1
+        self.started = time.monotonic()
+        self.transport = None
+        self.requests = 0
+        self._keys = {}
+        for name, user in self.users.items():
+            auth = user.get("auth_protocol")
+            self._keys[name.encode()] = (
+                auth.upper() if auth else None,
+                password_to_key(user["auth_password"], self.engine_id, auth.upper()) if auth else None,
+                password_to_key(user["priv_password"], self.engine_id, auth.upper())[:16]
+                if user.get("priv_protocol") else None
+            )
+        self._oids = sorted(self._mib())
+
+    # --- MIB ---
+
+    def _mib(self):
+        oids = {SYS_UPTIME}
+        for index in range(1, len(self.interfaces) + 1):
+            for column in (IF_DESCR, IF_TYPE, IF_OPER_STATUS, IF_NAME, IF_HC_IN_OCTETS, IF_HC_OUT_OCTETS):
+                oids.add(column + (index,))
+        return oids
+
+    def _elapsed(self):
+        elapsed = time.monotonic() - self.started
+        if self.reboot_after and elapsed >= self.reboot_after:
+            self.started += self.reboot_after
+            self.boots += 1
+            self.wrap = False  # Counters restart from zero after the reboot
+            elapsed = time.monotonic() - self.started
+        return elapsed
+
+    def value(self, oid):
+        elapsed = self._elapsed()
+        if oid == SYS_UPTIME:
+            return (TAG_TIMETICKS, int(elapsed * 100))
+        column, index = oid[:-1], oid[-1]
+        if not 1 <= index <= len(self.interfaces):
+            return SnmpException(TAG_NO_SUCH_OBJECT)
+        name, if_type, rx_rate, tx_rate = self.interfaces[index - 1]
+        if column in (IF_NAME, IF_DESCR):
+            return name.encode()
+        if column == IF_TYPE:
+            return if_type
+        if column == IF_OPER_STATUS:
+            return 1
+        if column in (IF_HC_IN_OCTETS, IF_HC_OUT_OCTETS):
+            rate = rx_rate if column == IF_HC_IN_OCTETS else tx_rate
+            start = COUNTER64_MAX - int(rate * 30) if self.wrap else 0
+            return (TAG_COUNTER64, (start + int(rate * elapsed)) % COUNTER64_MAX)
+        return SnmpException(TAG_NO_SUCH_OBJECT)
+
+    def _next(self, oid):
+        position = bisect.bisect_right(self._oids, oid)
+        if position >= len(self._oids):
+            return oid, SnmpException(TAG_END_OF_MIB_VIEW)
+        following = self._oids[position]
+        return following, self.value(following)
+
+    def respond(self, pdu):
+        pdu_type, request_id, non_repeaters, max_repetitions, varbinds = pdu
+        if pdu_type == PDU_GET:
+            result = [(oid, self.value(oid) if oid in self._oids else SnmpException(TAG_NO_SUCH_OBJECT))
+                      for oid, _ in varbinds]
+        elif pdu_type == PDU_GETNEXT:
+            result = [self._next(oid) for oid, _ in varbinds]
+        elif pdu_type == PDU_GETBULK:
+            result = [self._next(oid) for oid, _ in varbinds[:non_repeaters]]
+            cursors = [oid for oid, _ in varbinds[non_repeaters:]]
+            for _ in range(max_repetitions if cursors else 0):
+                row = [self._next(oid) for oid in cursors]
+                result.extend(row)
+                cursors = [oid for oid, _ in row]
+                if all(isinstance(value, SnmpException) for _, value in row):
+                    break
+            return encode_pdu(PDU_RESPONSE, request_id, result)
+        else:
+            return None
+        return encode_pdu(PDU_RESPONSE, request_id, result)
+
+    # --- transport ---
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.requests += 1
+        try:
+            message = decode_message(data)
+            reply = self._handle_v3(data, message) if message["version"] == 3 else self._handle_v2c(message)
+        except SnmpError:
+            return
+        if reply is not None:
+            self.transport.sendto(reply, addr)
+
+    def _handle_v2c(self, message):
+        if message["community"] != self.community:
+            return None
+        response = self.respond(message["pdu"])
+        return encode_v2c(self.community, response) if response is not None else None
+
+    def _handle_v3(self, data, message):
+        engine_time = int(self._elapsed())
+        if message["engine_id"] != self.engine_id:
+            return self._report(message, USM_UNKNOWN_ENGINE_IDS, engine_time)
+        keys = self._keys.get(message["user"])
+        if keys is None:
+            return self._report(message, USM_UNKNOWN_USER_NAMES, engine_time)
+        auth_protocol, auth_key, priv_key = keys
+        flags = message["flags"] & (FLAG_AUTH | FLAG_PRIV)
+        if flags & FLAG_AUTH:
+            if not auth_key or not verify_v3(data, message, auth_protocol, auth_key):
+                return self._report(message, USM_WRONG_DIGESTS, engine_time)
+            if message["boots"] != self.boots or abs(message["time"] - engine_time) > TIME_WINDOW:
+                return self._report(message, USM_NOT_IN_TIME_WINDOW, engine_time, keys, FLAG_AUTH)
+        _, _, pdu = open_scoped_pdu(message, priv_key)
+        response = self.respond(pdu)
+        if response is None:
+            return None
+        return encode_v3(message["msg_id"], flags, self.engine_id, self.boots, engine_time, message["user"],
+                         encode_scoped_pdu(self.engine_id, b"", response), auth_protocol=auth_protocol,
+                         auth_key=auth_key, priv_key=priv_key, salt=os.urandom(8) if flags & FLAG_PRIV else None)
+
+    def _report(self, message, oid, engine_time, keys=(None, None, None), flags=0):
+        auth_protocol, auth_key, _ = keys
+        pdu = encode_pdu(PDU_REPORT, 0, [(oid, (0x41, 1))])
+        return encode_v3(message["msg_id"], flags, self.engine_id, self.boots, engine_time,
+                         message["user"] if flags else b"", encode_scoped_pdu(self.engine_id, b"", pdu),
+                         auth_protocol=auth_protocol, auth_key=auth_key)
+
+
+async def start_agents(count, base_port=16100, host="127.0.0.1", interfaces=None, **kwargs):
+    """
+    Start `count` agents on consecutive ports.
+
+    Returns:
+        list of (port, SimulatedAgent, transport)
+    """
+    loop = asyncio.get_running_loop()
+    agents = []
+    for i in range(count):
+        layout = interfaces or [
+            ("lo", 24, 1000, 1000),
+            ("eth0", 6, 125000 * (i % 10 + 1), 25000 * (i % 10 + 1)),
+            ("wan0", 6, 1250000 + 1000 * i, 250000 + 100 * i),
+        ]
+        transport, agent = await loop.create_datagram_endpoint(
+            lambda layout=layout: SimulatedAgent(layout, **kwargs), local_addr=(host, base_port + i))
+        agents.append((base_port + i, agent, transport))
+    return agents
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run simulated SNMP agents serving IF-MIB counters")
+    parser.add_argument("--agents", type=int, default=1, help="Number of agents")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--base-port", type=int, default=16100, help="Port of the first agent")
+    parser.add_argument("--community", default="public", help="v2c community")
+    parser.add_argument("--user", help="v3 user name")
+    parser.add_argument("--auth", choices=["MD5", "SHA"], help="v3 authentication protocol")
+    parser.add_argument("--auth-password", help="v3 authentication passphrase")
+    parser.add_argument("--priv-password", help="v3 AES privacy passphrase (needs the cryptography package)")
+    parser.add_argument("--wrap", action="store_true", help="Start counters just below 2**64")
+    parser.add_argument("--reboot-after", type=float, help="Reboot the agents after this many seconds")
+    args = parser.parse_args(argv)
+
+    users = {}
+    if args.user:
+        users[args.user] = {"auth_protocol": args.auth, "auth_password": args.auth_password,
+                            "priv_protocol": "AES" if args.priv_password else None,
+                            "priv_password": args.priv_password}
+
+    async def run():
+        agents = await start_agents(args.agents, args.base_port, args.host, community=args.community,
+                                    users=users, wrap=args.wrap, reboot_after=args.reboot_after)
+        print(f"📡 {len(agents)} SNMP agent(s) on {args.host}:{args.base_port}-{args.base_port + len(agents) - 1}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            for _, _, transport in agents:
+                transport.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
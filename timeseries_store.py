@@ -0,0 +1,524 @@
+"""
+Compressed Time-Series Store
+Append-only on-disk storage for high-frequency bandwidth samples.
+
+Samples are kept per router in one chunk file per UTC day
+(<base>/<router>/<YYYYMMDD>.wts). Each file is a small header followed by
+independently decodable blocks of up to `block_points` samples. Inside a
+block, timestamps use delta-of-delta encoding and each field is either
+quantized to a fixed precision and delta encoded, or stored losslessly with
+XOR float compression (Gorilla); steady 5-second samples take a few bytes
+each instead of a MySQL row. Files are read through mmap and blocks outside
+a query's time range are skipped from their headers alone.
+
+Points are buffered in memory and written a block at a time (or after
+`flush_interval` seconds); queries include the buffered points.
+"""
+
+import json
+import logging
+import math
+import mmap
+import os
+import shutil
+import struct
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+
+MAGIC = b"WTS1"
+_FILE_HEADER = struct.Struct("<4sH")           # magic, schema length
+_BLOCK_HEADER = struct.Struct("<IqqII")        # points, first ms, last ms, payload bytes, crc32
+_DOUBLE = struct.Struct("<d")
+_U64 = struct.Struct("<Q")
+
+# Default schema: RouterBandwidthMonitor rates to 1 kbps, packets exact
+DEFAULT_FIELDS = (("download_mbps", 0.001), ("upload_mbps", 0.001), ("packets", 1))
+
+# Prefix-coded buckets for zigzagged signed integers: (prefix bits, prefix length, value bits)
+_BUCKETS = ((0b10, 2, 7), (0b110, 3, 12), (0b1110, 4, 20), (0b11110, 5, 32))
+_WIDE = (0b11111, 5, 64)
+
+AGGREGATES = ("avg", "min", "max", "last", "sum")
+
+
+def _default_base_dir():
+    """bandwidth_series next to the executable (frozen) or this module."""
+    if getattr(sys, 'frozen', False):
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, "bandwidth_series")
+
+
+def _to_ms(when):
+    if isinstance(when, datetime):
+        return int(when.timestamp() * 1000)
+    return int(round(when * 1000))
+
+
+def _day_of(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y%m%d")
+
+
+class _BitWriter:
+    __slots__ = ("out", "acc", "nbits")
+
+    def __init__(self):
+        self.out = bytearray()
+        self.acc = 0
+        self.nbits = 0
+
+    def write(self, value, bits):
+        self.acc = (self.acc << bits) | value
+        self.nbits += bits
+        if self.nbits >= 64:
+            spill = self.nbits - self.nbits % 8
+            self.out += (self.acc >> (self.nbits - spill)).to_bytes(spill // 8, "big")
+            self.nbits -= spill
+            self.acc &= (1 << self.nbits) - 1
+
+    def write_signed(self, value):
+        zigzag = value << 1 if value >= 0 else ((-value) << 1) - 1
+        if zigzag == 0:
+            self.write(0, 1)
+            return
+        for prefix, prefix_bits, bits in _BUCKETS:
+            if zigzag < (1 << bits):
+                self.write(prefix, prefix_bits)
+                self.write(zigzag, bits)
+                return
+        self.write(_WIDE[0], _WIDE[1])
+        self.write(zigzag, 64)
+
+    def getvalue(self):
+        if self.nbits:
+            pad = -self.nbits % 8
+            return bytes(self.out + (self.acc << pad).to_bytes((self.nbits + pad) // 8, "big"))
+        return bytes(self.out)
+
+
+class _BitReader:
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def read(self, bits):
+        pos = self.pos
+        start = pos >> 3
+        end = (pos + bits + 7) >> 3
+        chunk = int.from_bytes(self.data[start:end], "big")
+        self.pos = pos + bits
+        return (chunk >> ((end - start) * 8 - (pos & 7) - bits)) & ((1 << bits) - 1)
+
+    def read_signed(self):
+        if not self.read(1):
+            return 0
+        bits = _WIDE[2]
+        for _, prefix_bits, bucket_bits in _BUCKETS:
+            if not self.read(1):
+                bits = bucket_bits
+                break
+        zigzag = self.read(bits)
+        return (zigzag >> 1) ^ -(zigzag & 1)
+
+
+def _encode_block(points, precisions):
+    """points: [(ms, values tuple)] -> payload bytes."""
+    writer = _BitWriter()
+    first_ms = points[0][0]
+    prev_ms, prev_delta = first_ms, 0
+    states = [None] * len(precisions)
+    for ms, values in points:
+        delta = ms - prev_ms
+        writer.write_signed(delta - prev_delta)
+        prev_ms, prev_delta = ms, delta
+        for i, precision in enumerate(precisions):
+            value = values[i]
+            if precision:
+                quantized = 0 if value is None else int(round(value / precision))
+                writer.write_signed(quantized - (states[i] or 0))
+                states[i] = quantized
+                continue
+            # XOR against the previous value's bits (Gorilla)
+            bits = _U64.unpack(_DOUBLE.pack(math.nan if value is None else value))[0]
+            state = states[i]
+            if state is None:
+                writer.write(bits, 64)
+                states[i] = (bits, 65, 0)
+                continue
+            prev_bits, prev_lead, prev_trail = state
+            xor = bits ^ prev_bits
+            if xor == 0:
+                writer.write(0, 1)
+                continue
+            lead = min(64 - xor.bit_length(), 31)
+            trail = (xor & -xor).bit_length() - 1
+            if lead >= prev_lead and trail >= prev_trail:
+                writer.write(0b10, 2)
+                writer.write(xor >> prev_trail, 64 - prev_lead - prev_trail)
+                states[i] = (bits, prev_lead, prev_trail)
+            else:
+                meaningful = 64 - lead - trail
+                writer.write(0b11, 2)
+                writer.write(lead, 5)
+                writer.write(meaningful - 1, 6)
+                writer.write(xor >> trail, meaningful)
+                states[i] = (bits, lead, trail)
+    return writer.getvalue()
+
+
+def _decode_block(payload, count, first_ms, precisions):
+    """Inverse of _encode_block: [(ms, [values])]."""
+    reader = _BitReader(payload)
+    prev_ms, prev_delta = first_ms, 0
+    states = [None] * len(precisions)
+    points = []
+    for _ in range(count):
+        prev_delta += reader.read_signed()
+        prev_ms += prev_delta
+        values = []
+        for i, precision in enumerate(precisions):
+            if precision:
+                quantized = (states[i] or 0) + reader.read_signed()
+                states[i] = quantized
+                values.append(round(quantized * precision, 9) if precision < 1 else quantized * precision)
+                continue
+            state = states[i]
+            if state is None:
+                bits = reader.read(64)
+                states[i] = (bits, 65, 0)
+            else:
+                prev_bits, prev_lead, prev_trail = state
+                if not reader.read(1):
+                    bits = prev_bits
+                elif not reader.read(1):
+                    bits = prev_bits ^ (reader.read(64 - prev_lead - prev_trail) << prev_trail)
+                else:
+                    lead = reader.read(5)
+                    meaningful = reader.read(6) + 1
+                    trail = 64 - lead - meaningful
+                    bits = prev_bits ^ (reader.read(meaningful) << trail)
+                    prev_lead, prev_trail = lead, trail
+                states[i] = (bits, prev_lead, prev_trail)
+            values.append(_DOUBLE.unpack(_U64.pack(bits))[0])
+        points.append((prev_ms, values))
+    return points
+
+
+class TimeSeriesStore:
+    """
+    Per-router compressed sample store.
+
+    Args:
+        base_dir (str): Directory holding one sub-directory per router
+        fields (tuple): ((name, precision), ...); precision None stores the
+            float losslessly (XOR), a number quantizes to that step. Missing
+            values are stored as NaN (XOR) or 0 (quantized)
+        block_points (int): Samples per block (block = unit of writing and decoding)
+        flush_interval (float): Write a partial block once its oldest sample is this old (seconds)
+        retention_days (int): prune() removes chunk files older than this (None = keep everything)
+    """
+
+    def __init__(self, base_dir=None, fields=DEFAULT_FIELDS, block_points=120, flush_interval=300,
+                 retention_days=None):
+        self.base_dir = base_dir or _default_base_dir()
+        self.fields = tuple(name for name, _ in fields)
+        self.precisions = tuple(precision for _, precision in fields)
+        self.block_points = block_points
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self._schema = json.dumps({"fields": [[name, precision] for name, precision in fields]}).encode()
+        self._buffers = {}  # router key -> [(ms, values)]
+        self._checked = set()  # Chunk files already repaired by this process
+        self._lock = threading.Lock()
+        self.stats = {"points": 0, "blocks": 0, "bytes_written": 0, "corrupt_blocks": 0}
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    # --- paths ---
+
+    @staticmethod
+    def _key(router_id):
+        return "".join(c if c.isalnum() or c in "-." else "_" for c in str(router_id))
+
+    def _router_dir(self, router_id):
+        return os.path.join(self.base_dir, self._key(router_id))
+
+    # --- writing ---
+
+    def append(self, router_id, timestamp, values):
+        """
+        Buffer one sample.
+
+        Args:
+            router_id: Router key (IP or database id)
+            timestamp: datetime or epoch seconds; must not go backwards per router
+            values: dict keyed by field name or a sequence in field order
+        """
+        if isinstance(values, dict):
+            values = tuple(values.get(name) for name in self.fields)
+        else:
+            values = tuple(values)
+        ms = _to_ms(timestamp)
+        key = self._key(router_id)
+        with self._lock:
+            buffer = self._buffers.setdefault(key, [])
+            if buffer and ms < buffer[-1][0]:
+                raise ValueError(f"Timestamp for {router_id} goes backwards")
+            if buffer and _day_of(ms) != _day_of(buffer[0][0]):
+                self._write_block(key, buffer)
+                buffer = self._buffers[key] = []
+            buffer.append((ms, values))
+            self.stats["points"] += 1
+            if len(buffer) >= self.block_points or (ms - buffer[0][0]) / 1000 >= self.flush_interval:
+                self._write_block(key, buffer)
+                self._buffers[key] = []
+
+    def _write_block(self, key, points):
+        if not points:
+            return
+        payload = _encode_block(points, self.precisions)
+        directory = os.path.join(self.base_dir, key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, _day_of(points[0][0]) + ".wts")
+        try:
+            if path not in self._checked:
+                self._repair_tail(path)
+                self._checked.add(path)
+            with open(path, "ab") as f:
+                if f.tell() == 0:
+                    f.write(_FILE_HEADER.pack(MAGIC, len(self._schema)) + self._schema)
+                f.write(_BLOCK_HEADER.pack(len(points), points[0][0], points[-1][0], len(payload),
+                                           zlib.crc32(payload)) + payload)
+        except OSError as e:
+            logging.error(f"Could not write time-series block to {path}: {e}")
+            return
+        self.stats["blocks"] += 1
+        self.stats["bytes_written"] += _BLOCK_HEADER.size + len(payload)
+
+    @staticmethod
+    def _repair_tail(path):
+        """
+        Truncate a chunk file back to its last complete block.
+
+        A block cut short by a crash would otherwise swallow the header of
+        the next block appended after a restart, and every later block of
+        that day would be unreadable.
+        """
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        with open(path, "r+b") as f:
+            header = f.read(_FILE_HEADER.size)
+            if len(header) < _FILE_HEADER.size:
+                f.truncate(0)
+                return
+            magic, schema_length = _FILE_HEADER.unpack(header)
+            offset = _FILE_HEADER.size + schema_length
+            if magic != MAGIC or offset > size:
+                if magic == MAGIC:
+                    f.truncate(0)  # Schema cut short; rewrite the header
+                return
+            while offset + _BLOCK_HEADER.size <= size:
+                f.seek(offset)
+                length = _BLOCK_HEADER.unpack(f.read(_BLOCK_HEADER.size))[3]
+                if offset + _BLOCK_HEADER.size + length > size:
+                    break
+                offset += _BLOCK_HEADER.size + length
+            if offset < size:
+                logging.warning(f"Dropping {size - offset} bytes of a partial block at the end of {path}")
+                f.truncate(offset)
+
+    def flush(self, router_id=None):
+        """Write buffered samples (of one router, or all) as partial blocks."""
+        with self._lock:
+            keys = [self._key(router_id)] if router_id is not None else list(self._buffers)
+            for key in keys:
+                self._write_block(key, self._buffers.pop(key, []))
+
+    # --- reading ---
+
+    def _read_file(self, path, start_ms, end_ms):
+        """Points of one chunk file within [start_ms, end_ms]."""
+        points = []
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < _FILE_HEADER.size:
+                    return points
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    magic, schema_length = _FILE_HEADER.unpack_from(view, 0)
+                    if magic != MAGIC:
+                        logging.error(f"{path} is not a time-series chunk")
+                        return points
+                    offset = _FILE_HEADER.size + schema_length
+                    schema = json.loads(bytes(view[_FILE_HEADER.size:offset]))["fields"]
+                    names = [name for name, _ in schema]
+                    precisions = [precision for _, precision in schema]
+                    size = len(view)
+                    while offset + _BLOCK_HEADER.size <= size:
+                        count, first_ms, last_ms, length, crc = _BLOCK_HEADER.unpack_from(view, offset)
+                        offset += _BLOCK_HEADER.size
+                        if offset + length > size:
+                            break  # Block cut short by a crash mid-write
+                        if last_ms >= start_ms and first_ms <= end_ms:
+                            payload = view[offset:offset + length]
+                            if zlib.crc32(payload) != crc:
+                                self.stats["corrupt_blocks"] += 1
+                            else:
+                                points.extend(p for p in _decode_block(payload, count, first_ms, precisions)
+                                              if start_ms <= p[0] <= end_ms)
+                        offset += length
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not read time-series chunk {path}: {e}")
+            return []
+        if names != list(self.fields):
+            # Chunk written with another schema: map by name
+            positions = [names.index(name) if name in names else None for name in self.fields]
+            points = [(ms, [values[p] if p is not None else None for p in positions]) for ms, values in points]
+        return points
+
+    def query(self, router_id, start=None, end=None, fields=None):
+        """
+        Samples of one router in a time range.
+
+        Args:
+            router_id: Router key
+            start, end: datetime or epoch seconds (inclusive; None = unbounded)
+            fields (list): Field names to return (default: all)
+
+        Returns:
+            dict: {"timestamps": [epoch seconds], field: [values], ...}
+        """
+        start_ms = _to_ms(start) if start is not None else -(1 << 62)
+        end_ms = _to_ms(end) if end is not None else 1 << 62
+        directory = self._router_dir(router_id)
+        points = []
+        if os.path.isdir(directory):
+            first_day = _day_of(start_ms) if start is not None else ""
+            last_day = _day_of(end_ms) if end is not None else "99999999"
+            for name in sorted(os.listdir(directory)):
+                day = name[:-4]
+                if name.endswith(".wts") and first_day <= day <= last_day:
+                    points.extend(self._read_file(os.path.join(directory, name), start_ms, end_ms))
+        with self._lock:
+            points.extend((ms, list(values)) for ms, values in self._buffers.get(self._key(router_id), [])
+                          if start_ms <= ms <= end_ms)
+
+        wanted = list(fields or self.fields)
+        positions = [self.fields.index(name) for name in wanted]
+        result = {"timestamps": [ms / 1000 for ms, _ in points]}
+        for name, position in zip(wanted, positions):
+            result[name] = [values[position] for _, values in points]
+        return result
+
+    def downsample(self, router_id, start, end, step, aggregate="avg", fields=None):
+        """
+        Samples of a time range aggregated into fixed buckets.
+
+        Args:
+            router_id: Router key
+            start, end: datetime or epoch seconds
+            step (float): Bucket width in seconds (buckets are aligned to multiples of step)
+            aggregate (str): One of AGGREGATES
+            fields (list): Field names (default: all)
+
+        Returns:
+            dict: {"timestamps": [bucket start], "count": [samples per bucket], field: [values], ...};
+            empty buckets are left out
+        """
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"aggregate must be one of {AGGREGATES}")
+        raw = self.query(router_id, start, end, fields)
+        names = [name for name in raw if name != "timestamps"]
+        buckets = {}
+        for index, ts in enumerate(raw["timestamps"]):
+            bucket = math.floor(ts / step) * step
+            entry = buckets.get(bucket)
+            values = [raw[name][index] for name in names]
+            if entry is None:
+                buckets[bucket] = [1, values, list(values), list(values), list(values)]  # count, sum, min, max, last
+                continue
+            entry[0] += 1
+            for i, value in enumerate(values):
+                if value is None:
+                    continue
+                entry[1][i] = value if entry[1][i] is None else entry[1][i] + value
+                entry[2][i] = value if entry[2][i] is None else min(entry[2][i], value)
+                entry[3][i] = value if entry[3][i] is None else max(entry[3][i], value)
+                entry[4][i] = value
+        result = {"timestamps": sorted(buckets), "count": []}
+        for name in names:
+            result[name] = []
+        for bucket in result["timestamps"]:
+            count, sums, mins, maxes, lasts = buckets[bucket]
+            result["count"].append(count)
+            for i, name in enumerate(names):
+                if aggregate == "avg":
+                    value = sums[i] / count if sums[i] is not None else None
+                else:
+                    value = {"sum": sums, "min": mins, "max": maxes, "last": lasts}[aggregate][i]
+                result[name].append(round(value, 6) if isinstance(value, float) else value)
+        return result
+
+    # --- housekeeping ---
+
+    def routers(self):
+        """Router keys with stored or buffered data."""
+        with self._lock:
+            buffered = set(self._buffers)
+        stored = {name for name in os.listdir(self.base_dir) if os.path.isdir(os.path.join(self.base_dir, name))}
+        return sorted(stored | buffered)
+
+    def prune(self, older_than_days=None):
+        """Delete chunk files older than the retention period; returns the number removed."""
+        days = older_than_days if older_than_days is not None else self.retention_days
+        if days is None:
+            return 0
+        cutoff = _day_of(int((time.time() - days * 86400) * 1000))
+        removed = 0
+        for key in os.listdir(self.base_dir):
+            directory = os.path.join(self.base_dir, key)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.endswith(".wts") and name[:-4] < cutoff:
+                    try:
+                        os.remove(os.path.join(directory, name))
+                        removed += 1
+                    except OSError as e:
+                        logging.error(f"Could not remove {name}: {e}")
+            if not os.listdir(directory):
+                shutil.rmtree(directory, ignore_errors=True)
+        return removed
+
+    def get_stats(self):
+        """Write counters plus on-disk size and bytes per stored point."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["buffered_points"] = sum(len(b) for b in self._buffers.values())
+        disk = 0
+        for root, _, files in os.walk(self.base_dir):
+            disk += sum(os.path.getsize(os.path.join(root, name)) for name in files if name.endswith(".wts"))
+        stats["disk_bytes"] = disk
+        stored = stats["points"] - stats["buffered_points"]
+        stats["bytes_per_point"] = round(stats["bytes_written"] / stored, 2) if stored > 0 else None
+        return stats
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_timeseries_store(base_dir=None, **kwargs):
+    """Shared TimeSeriesStore (created on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TimeSeriesStore(base_dir, **kwargs)
+        return _store
@@ -64,6 +64,8 @@ def _fetch_unifi_devices(self):
             transformed = []
             new_devices_count = 0
             bandwidth_updates_count = 0
+            bandwidth_samples = []
+            device_names = {}
             
             for device in devices:
                 try:
@@ -95,38 +97,11 @@ def _fetch_unifi_devices(self):
                     tx_bytes_current = device.get('tx_bytes', 0)
                     
                     if router_id and (rx_bytes_current > 0 or tx_bytes_current > 0):
+                        # Deltas are computed and written for all devices after the loop
+                        bandwidth_samples.append((router_id, rx_bytes_current, tx_bytes_current))
+                        device_names[router_id] = name
+                        
                         try:
-                            # Compute bandwidth delta since last check
-                            rx_diff, tx_diff, is_reset = tracker.compute_delta(
-                                router_id, 
-                                rx_bytes_current, 
-                                tx_bytes_current
-                            )
-                            
-                            # Log the snapshot with deltas
-                            if rx_diff > 0 or tx_diff > 0:
-                                # Save snapshot to database
-                                tracker.save_snapshot(
-                                    router_id,
-                                    rx_bytes_current,
-                                    tx_bytes_current,
-                                    rx_diff,
-                                    tx_diff
-                                )
-                                
-                                # Update router's cumulative totals
-                                tracker.update_router_totals(router_id, rx_diff, tx_diff)
-                                
-                                # Human-readable logging with timestamp
-                                timestamp = datetime.now().strftime("%H:%M:%S")
-                                rx_human = tracker.format_bytes(rx_diff)
-                                tx_human = tracker.format_bytes(tx_diff)
-                                
-                                reset_indicator = " [RESET DETECTED]" if is_reset else ""
-                                print(f"[{timestamp}] 📊 {name} — RX +{rx_human}, TX +{tx_human}{reset_indicator}")
-                                
-                                bandwidth_updates_count += 1
-                            
                             # Also log instantaneous throughput (backward compatibility)
                             if xput_down is not None or xput_up is not None:
                                 insert_bandwidth_log(
@@ -135,10 +110,9 @@ def _fetch_unifi_devices(self):
                                     float(xput_up or 0), 
                                     None  # latency
                                 )
-                                
                         except Exception as bandwidth_error:
-                            # Don't fail the whole process if bandwidth tracking fails
-                            print(f"⚠️ Bandwidth tracking error for {name}: {str(bandwidth_error)}")
+                            # Don't fail the whole process if bandwidth logging fails
+                            print(f"⚠️ Bandwidth logging error for {name}: {str(bandwidth_error)}")
                     
                     # Build response data structure
                     transformed.append({
@@ -161,6 +135,27 @@ def _fetch_unifi_devices(self):
                     print(f"⚠️ Error processing UniFi device {device.get('name', 'Unknown')}: {str(device_error)}")
                     continue
             
+            # Snapshots and router totals for the whole poll in one transaction
+            if bandwidth_samples:
+                try:
+                    timestamp = datetime.now().strftime("%H:%M:%S")
+                    for result in tracker.record_poll_cycle(bandwidth_samples):
+                        rx_diff, tx_diff = result['rx_diff'], result['tx_diff']
+                        if rx_diff <= 0 and tx_diff <= 0:
+                            continue
+                        
+                        # Human-readable logging with timestamp
+                        rx_human = tracker.format_bytes(rx_diff)
+                        tx_human = tracker.format_bytes(tx_diff)
+                        reset_indicator = " [RESET DETECTED]" if result['is_reset'] else ""
+                        print(f"[{timestamp}] 📊 {device_names[result['router_id']]} — "
+                              f"RX +{rx_human}, TX +{tx_human}{reset_indicator}")
+                        
+                        bandwidth_updates_count += 1
+                except Exception as bandwidth_error:
+                    # Don't fail the whole process if bandwidth tracking fails
+                    print(f"⚠️ Bandwidth tracking error: {str(bandwidth_error)}")
+            
             # Summary logging
             if new_devices_count > 0:
                 print(f"🎉 Added {new_devices_count} new UniFi device(s) to the database")
@@ -27,7 +27,7 @@ a = Analysis(
         # Assets and resources
         ('routerLocImg', 'routerLocImg'),  # Router images directory
         ('assets', 'assets'),              # App assets (logos, images)
-        ('server', 'server'),              # Server scripts (run_app.py, run_unifi_api.py, app.py)
+        ('server', 'server'),              # Server scripts (run_app.py, run_unifi_api.py, run_flow_collector.py, app.py)
         
         # Service Manager launchers
         ('launch_service_manager.bat', '.'),  # Service manager batch launcher
@@ -46,6 +46,9 @@ a = Analysis(
         
         # Icon file
         ('icon.ico', '.'),                 # Application icon
+        
+        # OUI vendor database (compiled by build.py: python oui_db.py build)
+        ('oui_vendors.bin', '.'),
     ],
     hiddenimports=[
         # UI Framework
@@ -109,6 +112,18 @@ a = Analysis(
         'db',
         'router_utils',
         'network_utils',
+        'dns_resolver',  # Cached async reverse DNS for discovery/scans
+        'oui_db',  # Memory-mapped OUI vendor lookups
+        'arp_scanner',  # Parallel rate-limited multi-subnet ARP sweeps
+        'presence_tracker',  # Passive client presence index (neighbour table, ARP/DHCP)
+        'client_snapshot',  # Connection event diffing between client scans
+        'loop_scan_coordinator',  # Coalesced router-offline loop scans
+        'flow_collector',  # NetFlow v5/v9/IPFIX collector (server/flow_api.py)
+        'snmp_poller',  # Async SNMP interface counter poller (snmp_config.json)
+        'heavy_hitters',  # Space-saving / count-min top-talker summaries
+        'timeseries_store',  # Compressed on-disk bandwidth sample store
+        'live_metrics',  # Shared-memory live router metrics (seqlock ring)
+        'anomaly_detector',  # Streaming bandwidth/latency anomaly detection
         'user_utils',
         'ticket_utils',
         'report_utils',